@@ -0,0 +1,133 @@
+"""block_index.py
+
+Bitmaps of the blocks of a raster file that contain valid data.
+"""
+
+from typing import Any, Dict, List, Mapping, Sequence, Tuple
+
+import base64
+import math
+import zlib
+
+import numpy as np
+
+
+def _encode_bitmap(bitmap: np.ndarray) -> str:
+    return base64.b64encode(zlib.compress(np.packbits(bitmap, axis=None).tobytes())).decode('ascii')
+
+
+def _decode_bitmap(encoded: str, shape: Sequence[int]) -> np.ndarray:
+    bits = np.frombuffer(zlib.decompress(base64.b64decode(encoded)), 'uint8')
+    num_blocks = int(np.prod(shape))
+    return np.unpackbits(bits, count=num_blocks).astype('bool').reshape(shape)
+
+
+class BlockIndex:
+    """Which blocks of a raster band contain valid data, for full resolution and all overviews.
+
+    Level ``f`` has one entry per ``f x f`` full resolution blocks, which corresponds to the
+    blocks of the overview with decimation factor ``f`` (if it uses the same block size).
+    An entry is only empty if all full resolution pixels it covers are invalid, so any level
+    can be used to prove that a region of the raster is empty.
+
+    Overview levels are not read from the overviews stored in the file, but derived from the
+    full resolution level: an entry has data if any of the ``f x f`` blocks it covers has
+    data. This is conservative, since overview pixels are computed from the same region of
+    the full resolution raster.
+    """
+
+    def __init__(self, *, shape: Tuple[int, int], block_shape: Tuple[int, int],
+                 transform: Sequence[float], levels: Mapping[int, np.ndarray]) -> None:
+        if 1 not in levels:
+            raise ValueError('block index needs full resolution level')
+
+        #: (height, width) of the raster band in pixels
+        self.shape = shape
+        #: (height, width) of a block in pixels
+        self.block_shape = block_shape
+        #: affine transform from pixel to CRS coordinates, as (a, b, c, d, e, f)
+        self.transform = tuple(transform)
+        self._levels = dict(levels)
+
+    @classmethod
+    def from_bitmap(cls, has_data: np.ndarray, *, shape: Tuple[int, int],
+                    block_shape: Tuple[int, int], transform: Sequence[float],
+                    overviews: Sequence[int] = ()) -> 'BlockIndex':
+        """Build index from the full resolution bitmap of shape (block rows, block columns).
+
+        Levels for the given overview decimation factors are derived from that bitmap.
+        """
+        levels = {1: has_data.astype('bool')}
+
+        for factor in overviews:
+            rows, cols = has_data.shape
+            padded = np.zeros(
+                (math.ceil(rows / factor) * factor, math.ceil(cols / factor) * factor),
+                dtype='bool'
+            )
+            padded[:rows, :cols] = has_data
+            levels[factor] = padded.reshape(
+                padded.shape[0] // factor, factor, padded.shape[1] // factor, factor
+            ).any(axis=(1, 3))
+
+        return cls(shape=shape, block_shape=block_shape, transform=transform, levels=levels)
+
+    @property
+    def is_empty(self) -> bool:
+        return not self._levels[1].any()
+
+    def window_has_data(self, row_range: Tuple[float, float], col_range: Tuple[float, float],
+                        decimation: float = 1.) -> bool:
+        """Check whether any block intersecting the given full resolution pixel window has data.
+
+        Uses the coarsest level that is not coarser than ``decimation`` (the number of full
+        resolution pixels per pixel read), which is where GDAL would read from.
+        """
+        height, width = self.shape
+        row_start, row_stop = max(row_range[0], 0), min(row_range[1], height)
+        col_start, col_stop = max(col_range[0], 0), min(col_range[1], width)
+
+        if row_start >= row_stop or col_start >= col_stop:
+            return False
+
+        factor = max(f for f in self._levels if f <= max(decimation, 1))
+        level = self._levels[factor]
+
+        block_height, block_width = self.block_shape[0] * factor, self.block_shape[1] * factor
+        rows = slice(int(row_start // block_height), int(math.ceil(row_stop / block_height)))
+        cols = slice(int(col_start // block_width), int(math.ceil(col_stop / block_width)))
+        return bool(level[rows, cols].any())
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Encode index as JSON-serializable dict.
+
+        Bitmaps are stored row by row (one bit per block, most significant bit first),
+        compressed with zlib, and encoded as base64.
+        """
+        levels: List[Dict[str, Any]] = []
+
+        for factor, bitmap in sorted(self._levels.items()):
+            levels.append({
+                'factor': factor,
+                'shape': list(bitmap.shape),
+                'bitmap': _encode_bitmap(bitmap)
+            })
+
+        return {
+            'shape': list(self.shape),
+            'block_shape': list(self.block_shape),
+            'transform': list(self.transform),
+            'levels': levels
+        }
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> 'BlockIndex':
+        """Decode index from the output of :meth:`to_dict`."""
+        levels = {
+            level['factor']: _decode_bitmap(level['bitmap'], level['shape'])
+            for level in data['levels']
+        }
+        return cls(
+            shape=tuple(data['shape']), block_shape=tuple(data['block_shape']),
+            transform=data['transform'], levels=levels
+        )
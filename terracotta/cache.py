@@ -3,59 +3,582 @@
 Custom cache implementations.
 """
 
-from typing import Tuple, Callable, Any
+from typing import Tuple, Callable, Any, Dict, Hashable, Optional, Set, Type
+from collections import OrderedDict
 
+import functools
 import sys
+import threading
+import time
+import warnings
 import zlib
 
 import numpy as np
-from cachetools import LFUCache, Cache
+from cachetools import LRUCache, Cache
+
+from terracotta import exceptions
+
+try:
+    import lz4.frame
+    has_lz4 = True
+except ImportError:  # pragma: no cover
+    has_lz4 = False
+
+try:
+    import zstandard
+    has_zstd = True
+except ImportError:  # pragma: no cover
+    has_zstd = False
 
 CompressionTuple = Tuple[bytes, bytes, str, Tuple[int, int]]
 SizeFunction = Callable[[CompressionTuple], int]
 
+# compressed data and mask, dtype, shape, and accounted size in bytes
+CacheEntry = Tuple[bytes, bytes, str, Tuple[int, int], int]
 
-class CompressedLFUCache(LFUCache):
-    """Least-frequently-used cache with ZLIB compression"""
+# largest object handled by the Python allocator, larger ones come from the system allocator
+_SMALL_OBJECT_LIMIT = 512
+
+# dictionaries that hold every entry of the cache (values and sizes)
+_CACHE_CONTAINERS: Tuple[Type[Any], ...] = (dict, dict)
+
+# name -> (compress(buffer, level), decompress(data))
+Codec = Tuple[Callable[[Any, int], bytes], Callable[[bytes], bytes]]
+
+CODECS: Dict[str, Codec] = {
+    'none': (lambda data, level: bytes(data), bytes),
+    'zlib': (zlib.compress, zlib.decompress),
+}
+
+if has_lz4:
+    CODECS['lz4'] = (
+        lambda data, level: lz4.frame.compress(data, compression_level=level),
+        lz4.frame.decompress
+    )
+
+if has_zstd:
+    CODECS['zstd'] = (
+        lambda data, level: zstandard.ZstdCompressor(level=level).compress(data),
+        lambda data: zstandard.ZstdDecompressor().decompress(data)
+    )
+
+FILTERS = ('none', 'shuffle', 'delta')
+
+
+def _shuffle(data: np.ndarray) -> np.ndarray:
+    # store bytes of equal significance next to each other
+    # (copying byte by byte is much faster than copying the transposed array)
+    as_bytes = data.view(np.uint8).reshape(-1, data.dtype.itemsize)
+    out = np.empty(as_bytes.shape[::-1], dtype=np.uint8)
+    for i in range(data.dtype.itemsize):
+        out[i] = as_bytes[:, i]
+    return out
+
+
+def _unshuffle(buffer: bytes, dtype: np.dtype) -> np.ndarray:
+    shuffled = np.frombuffer(buffer, dtype=np.uint8).reshape(dtype.itemsize, -1)
+    out = np.empty(shuffled.shape[::-1], dtype=np.uint8)
+    for i in range(dtype.itemsize):
+        out[:, i] = shuffled[i]
+    return out.view(dtype).ravel()
+
+
+def _delta(data: np.ndarray) -> np.ndarray:
+    # differences between neighboring pixels of each row, as wrapping unsigned integers
+    as_uint = data.view(f'u{data.dtype.itemsize}')
+    out = as_uint.copy()
+    np.subtract(as_uint[..., 1:], as_uint[..., :-1], out=out[..., 1:])
+    return out
+
+
+def _undelta(buffer: bytes, dtype: np.dtype, shape: Tuple[int, ...]) -> np.ndarray:
+    uint_dtype = np.dtype(f'u{dtype.itemsize}')
+    as_uint = np.frombuffer(buffer, dtype=uint_dtype).reshape(shape)
+    return np.cumsum(as_uint, axis=-1, dtype=uint_dtype).view(dtype).ravel()
+
+
+def _get_allocated_size(obj: Any) -> int:
+    """Memory allocated for an object and all tuples, strings, and numbers it contains.
+
+    Singletons, small integers, types, and identifiers (like keyword argument names, which
+    are interned) are shared by all entries and not counted. Sizes of small objects are
+    rounded up to the 16 byte alignment of the Python allocator.
+    """
+    if obj is None or isinstance(obj, (bool, type)) or (type(obj) is int and -5 <= obj <= 256):
+        return 0
+
+    if isinstance(obj, str) and obj.isidentifier():
+        return 0
+
+    size = sys.getsizeof(obj)
+
+    if size <= _SMALL_OBJECT_LIMIT:
+        size = -(-size // 16) * 16
+
+    if isinstance(obj, tuple):
+        size += sum(_get_allocated_size(item) for item in obj)
+
+    return size
+
+
+@functools.lru_cache(maxsize=None)
+def _get_item_size(container_type: Type[Any]) -> int:
+    """Average memory per item of a dictionary type, over a full cycle of its growth.
+
+    Dictionaries over-allocate when they grow, so the memory used by every item varies by
+    up to a factor of two depending on the number of items.
+    """
+    container = container_type()
+    empty_size = sys.getsizeof(container)
+    num_items = num_bytes = 0
+
+    for i in range(2048):
+        container[i] = None
+
+        if len(container) >= 1024:
+            num_bytes += sys.getsizeof(container) - empty_size
+            num_items += len(container)
+
+    return -(-num_bytes // num_items)
+
+
+class LFUPolicy:
+    """Evicts the least frequently used entry (the least recently used one on ties).
+
+    Use counts never decay, and every entry starts with a count of one.
+    """
+
+    # dictionaries that hold every entry (count, and position in bucket)
+    ENTRY_CONTAINERS: Tuple[Type[Any], ...] = (dict, OrderedDict)
+
+    def __init__(self, maxsize: int) -> None:
+        self._counts: Dict[Hashable, int] = {}
+        # use count -> keys with that count, least recently used first
+        self._buckets: Dict[int, 'OrderedDict[Hashable, None]'] = {}
+
+    def _move(self, key: Hashable, old_count: int, new_count: int) -> None:
+        if old_count:
+            bucket = self._buckets[old_count]
+            del bucket[key]
+            if not bucket:
+                del self._buckets[old_count]
+
+        if new_count:
+            self._buckets.setdefault(new_count, OrderedDict())[key] = None
+
+    def add(self, key: Hashable, size: int) -> None:
+        self._counts[key] = 1
+        self._move(key, 0, 1)
+
+    def access(self, key: Hashable) -> None:
+        count = self._counts.get(key)
+        if count is None:
+            return
+        self._counts[key] = count + 1
+        self._move(key, count, count + 1)
+
+    def remove(self, key: Hashable) -> None:
+        self._move(key, self._counts.pop(key), 0)
+
+    def victim(self) -> Hashable:
+        if not self._buckets:
+            raise KeyError('no entries to evict')
+        return next(iter(self._buckets[min(self._buckets)]))
+
+
+class FrequencySketch:
+    """Count-min sketch of access frequencies, with 4 bit counters."""
+
+    _SEEDS = (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0xD6E8FEB86659FD93)
+    _MAX_COUNT = 15
+
+    def __init__(self, width: int) -> None:
+        width = 1 << max(width - 1, 1).bit_length()
+        self._mask = width - 1
+        self._rows = [bytearray(width) for _ in self._SEEDS]
+
+    def _indices(self, key: Hashable) -> Tuple[int, ...]:
+        key_hash = hash(key)
+        return tuple(((key_hash * seed) >> 32) & self._mask for seed in self._SEEDS)
+
+    def increment(self, key: Hashable) -> None:
+        for row, idx in zip(self._rows, self._indices(key)):
+            if row[idx] < self._MAX_COUNT:
+                row[idx] += 1
+
+    def frequency(self, key: Hashable) -> int:
+        return min(row[idx] for row, idx in zip(self._rows, self._indices(key)))
+
+    def age(self) -> None:
+        """Halve all counters, so frequencies reflect recent accesses."""
+        for row in self._rows:
+            counters = np.frombuffer(row, dtype=np.uint8)
+            counters >>= 1
+
+
+class TinyLFUPolicy:
+    """Window TinyLFU eviction policy, which keeps frequently used entries even during scans.
+
+    New entries are kept in a small least-recently-used window. Entries leaving the window
+    are only admitted to the main cache if they were used more often than the entry they
+    would replace there. Frequencies of all requested keys (including misses) are estimated
+    with a :class:`FrequencySketch` that is aged after ``AGING_FACTOR`` accesses per entry,
+    so entries that are not used anymore eventually leave the cache.
+
+    The main cache is a segmented LRU cache: entries that are used again move from the
+    probation to the protected segment.
+    """
+
+    WINDOW_FRACTION = 0.01
+    PROTECTED_FRACTION = 0.8
+    AGING_FACTOR = 10
+
+    # dictionaries that hold every entry (the segment it is in); the frequency sketch has
+    # a fixed size and is not charged to entries
+    ENTRY_CONTAINERS: Tuple[Type[Any], ...] = (OrderedDict,)
+
+    # expected size of entries in bytes, used to size the frequency sketch
+    _ENTRY_SIZE_HINT = 4096
+
+    def __init__(self, maxsize: int) -> None:
+        self._window_maxsize = max(int(maxsize * self.WINDOW_FRACTION), 1)
+        self._main_maxsize = maxsize - self._window_maxsize
+        self._protected_maxsize = int(self._main_maxsize * self.PROTECTED_FRACTION)
+
+        # key -> size, least recently used first
+        self._window: 'OrderedDict[Hashable, int]' = OrderedDict()
+        self._probation: 'OrderedDict[Hashable, int]' = OrderedDict()
+        self._protected: 'OrderedDict[Hashable, int]' = OrderedDict()
+        self._window_size = self._probation_size = self._protected_size = 0
+
+        self._sketch = FrequencySketch(
+            min(max(maxsize // self._ENTRY_SIZE_HINT, 256), 1024 * 1024)
+        )
+        self._num_accesses = 0
+
+    def add(self, key: Hashable, size: int) -> None:
+        self._window[key] = size
+        self._window_size += size
+
+    def access(self, key: Hashable) -> None:
+        self._sketch.increment(key)
+        self._num_accesses += 1
+
+        num_entries = len(self._window) + len(self._probation) + len(self._protected)
+        if self._num_accesses >= self.AGING_FACTOR * max(num_entries, 100):
+            self._sketch.age()
+            self._num_accesses = 0
+
+        if key in self._window:
+            self._window.move_to_end(key)
+
+        elif key in self._probation:
+            size = self._probation.pop(key)
+            self._probation_size -= size
+            self._protected[key] = size
+            self._protected_size += size
+
+            while self._protected_size > self._protected_maxsize:
+                demoted_key, demoted_size = self._protected.popitem(last=False)
+                self._protected_size -= demoted_size
+                self._probation[demoted_key] = demoted_size
+                self._probation_size += demoted_size
+
+        elif key in self._protected:
+            self._protected.move_to_end(key)
+
+    def remove(self, key: Hashable) -> None:
+        if key in self._window:
+            self._window_size -= self._window.pop(key)
+        elif key in self._probation:
+            self._probation_size -= self._probation.pop(key)
+        else:
+            self._protected_size -= self._protected.pop(key)
+
+    def _admit(self, key: Hashable) -> None:
+        # move from window to main cache
+        size = self._window.pop(key)
+        self._window_size -= size
+        self._probation[key] = size
+        self._probation_size += size
+
+    def victim(self) -> Hashable:
+        while self._window_size > self._window_maxsize:
+            candidate, size = next(iter(self._window.items()))
+
+            if self._probation_size + self._protected_size + size <= self._main_maxsize:
+                self._admit(candidate)
+                continue
+
+            if self._probation:
+                main_victim = next(iter(self._probation))
+            elif self._protected:
+                main_victim = next(iter(self._protected))
+            else:
+                return candidate
+
+            if self._sketch.frequency(candidate) > self._sketch.frequency(main_victim):
+                self._admit(candidate)
+                return main_victim
+
+            return candidate
+
+        for segment in (self._probation, self._protected, self._window):
+            if segment:
+                return next(iter(segment))
+
+        raise KeyError('no entries to evict')
+
+
+POLICIES: Dict[str, Type[Any]] = {
+    'lfu': LFUPolicy,
+    'tinylfu': TinyLFUPolicy,
+}
+
+
+class CompressedLFUCache(Cache):
+    """Frequency-based cache with compression
+
+    Items are compressed with one of :data:`CODECS`, optionally after applying a filter
+    that makes raster data easier to compress: ``shuffle`` groups the bytes of all values
+    by significance, ``delta`` stores differences between neighboring pixels.
+
+    Entries to evict are chosen by one of :data:`POLICIES`, plain LFU (:class:`LFUPolicy`)
+    or Window TinyLFU (:class:`TinyLFUPolicy`). Pinned entries are never evicted, but may
+    take up at most half of the cache.
+
+    The size of every entry is the memory allocated for its compressed value and its key,
+    plus its share of the dictionaries of the cache and its policy. Not thread-safe.
+    """
+
+    def __init__(self, maxsize: int, compression_level: int, codec: str = 'zlib',
+                 compression_filter: str = 'none', policy: str = 'lfu'):
+        super().__init__(maxsize, self._get_entry_size)
+
+        if codec not in CODECS:
+            warnings.warn(
+                f'Compression codec {codec} failed to import. Using zlib instead.',
+                exceptions.PerformanceWarning
+            )
+            codec = 'zlib'
+
+        if compression_filter not in FILTERS:
+            raise ValueError(f'unknown compression filter {compression_filter}')
+
+        if policy not in POLICIES:
+            raise ValueError(f'unknown eviction policy {policy}')
 
-    def __init__(self, maxsize: int, compression_level: int):
-        super().__init__(maxsize, self._get_size)
         self.compression_level = compression_level
+        self.codec = codec
+        self.compression_filter = compression_filter
+        self.policy = policy
+        self._compress, self._decompress = CODECS[codec]
+        self._policy = POLICIES[policy](maxsize)
+        self._entry_overhead = sum(
+            _get_item_size(container_type)
+            for container_type in _CACHE_CONTAINERS + self._policy.ENTRY_CONTAINERS
+        )
+        self._pinned: Set[Hashable] = set()
+        self._pinned_size = 0
+        self._stats: Dict[str, float] = dict(
+            inserts=0, evictions=0, rejected=0, compress_time=0., decompress_time=0.
+        )
 
-    def __getitem__(self, key: Any,
-                    cache_getitem: Callable = Cache.__getitem__) -> np.ma.MaskedArray:
-        compressed_item = super().__getitem__(key, cache_getitem)
-        return self._decompress_tuple(compressed_item)
+    def __getitem__(self, key: Any) -> np.ma.MaskedArray:
+        self._policy.access(key)
+        entry = super().__getitem__(key)
 
-    def __setitem__(self, key: Any,
-                    value: np.ma.MaskedArray,
-                    cache_setitem: Callable = Cache.__setitem__) -> None:
-        val_compressed = self._compress_ma(value, self.compression_level)
-        super().__setitem__(key, val_compressed, cache_setitem)
+        start = time.perf_counter()
+        value = self._decompress_tuple(entry[:4])
+        self._stats['decompress_time'] += time.perf_counter() - start
+        return value
 
-    @staticmethod
-    def _compress_ma(arr: np.ma.MaskedArray, compression_level: int) -> CompressionTuple:
-        compressed_data = zlib.compress(arr.data, compression_level)
-        mask_to_int = np.packbits(arr.mask.astype(np.uint8))
-        compressed_mask = zlib.compress(mask_to_int, compression_level)
+    def __setitem__(self, key: Any, value: np.ma.MaskedArray) -> None:
+        if key in self:
+            del self[key]
+
+        start = time.perf_counter()
+        val_compressed = self._compress_ma(value)
+        self._stats['compress_time'] += time.perf_counter() - start
+
+        # entry holds its own size, so the size of the key can be included
+        # (the size is counted as an integer as large as maxsize)
+        entry_size = (
+            self._get_size((*val_compressed, self.maxsize)) + _get_allocated_size(key)
+            + self._entry_overhead
+        )
+
+        if entry_size > self.maxsize - self._pinned_size:
+            self._stats['rejected'] += 1
+            raise ValueError('value too large')
+
+        super().__setitem__(key, (*val_compressed, entry_size))
+        self._policy.add(key, entry_size)
+        self._stats['inserts'] += 1
+
+    def __delitem__(self, key: Any) -> None:
+        entry_size = self._get_entry_size(super().__getitem__(key))
+        super().__delitem__(key)
+
+        if key in self._pinned:
+            self._pinned.remove(key)
+            self._pinned_size -= entry_size
+        else:
+            self._policy.remove(key)
+
+    def popitem(self) -> Tuple[Any, Any]:
+        try:
+            key = self._policy.victim()
+        except KeyError:
+            raise KeyError(f'{type(self).__name__} has no entries to evict') from None
+
+        # evicted values are discarded, so there is no need to decompress them
+        entry = super().__getitem__(key)
+        del self[key]
+        self._stats['evictions'] += 1
+        return key, entry
+
+    def clear(self) -> None:
+        # pinned entries are never evicted through popitem
+        for key in list(self.keys()):
+            del self[key]
+
+    def pin(self, key: Any) -> bool:
+        """Exclude an entry from eviction.
+
+        Returns False if the entry is not in the cache, or if pinned entries would take up
+        more than half of the cache.
+        """
+        if key in self._pinned:
+            return True
+
+        if key not in self:
+            return False
+
+        entry_size = self._get_entry_size(super().__getitem__(key))
+
+        if self._pinned_size + entry_size > self.maxsize // 2:
+            return False
+
+        self._policy.remove(key)
+        self._pinned.add(key)
+        self._pinned_size += entry_size
+        return True
+
+    def get_stats(self) -> Dict[str, float]:
+        """Return cache statistics, and current and maximum size in bytes.
+
+        Counts ``inserts``, ``evictions``, and items that were ``rejected`` because they are
+        larger than the whole cache. ``compress_time`` and ``decompress_time`` are the total
+        time spent on (de)compression in seconds. ``pinned`` and ``pinned_size`` are the
+        number and size of pinned entries. Hits and misses are counted by the caller.
+        """
+        return dict(
+            self._stats, entries=len(self), size=int(self.currsize), maxsize=int(self.maxsize),
+            pinned=len(self._pinned), pinned_size=self._pinned_size
+        )
+
+    def _get_filter(self, dtype: np.dtype, ndim: int) -> str:
+        # filters work on whole bytes of up to 64 bit values
+        if dtype.itemsize not in (1, 2, 4, 8) or ndim == 0:
+            return 'none'
+        return self.compression_filter
+
+    def _compress_ma(self, arr: np.ma.MaskedArray) -> CompressionTuple:
+        data = np.ascontiguousarray(arr.data)
+        compression_filter = self._get_filter(data.dtype, data.ndim)
+
+        if compression_filter == 'shuffle':
+            filtered_data = _shuffle(data)
+        elif compression_filter == 'delta':
+            filtered_data = _delta(data)
+        else:
+            filtered_data = data
+
+        compressed_data = self._compress(filtered_data, self.compression_level)
+        mask_to_int = np.packbits(np.ma.getmaskarray(arr).astype(np.uint8))
+        compressed_mask = self._compress(mask_to_int, self.compression_level)
         out = (
             compressed_data,
             compressed_mask,
-            arr.dtype.name,
+            arr.dtype.str,
             arr.shape
         )
         return out
 
-    @staticmethod
-    def _decompress_tuple(compressed_data: CompressionTuple) -> np.ma.MaskedArray:
+    def _decompress_tuple(self, compressed_data: CompressionTuple) -> np.ma.MaskedArray:
         data_b, mask_b, dt, ds = compressed_data
-        data = np.frombuffer(zlib.decompress(data_b), dtype=dt).reshape(ds)
-        mask = np.frombuffer(zlib.decompress(mask_b), dtype=np.uint8)
+        dtype = np.dtype(dt)
+        compression_filter = self._get_filter(dtype, len(ds))
+
+        raw_data = self._decompress(data_b)
+        if compression_filter == 'shuffle':
+            data = _unshuffle(raw_data, dtype).reshape(ds)
+        elif compression_filter == 'delta':
+            data = _undelta(raw_data, dtype, ds).reshape(ds)
+        else:
+            data = np.frombuffer(raw_data, dtype=dtype).reshape(ds)
+
+        mask = np.frombuffer(self._decompress(mask_b), dtype=np.uint8)
         mask = np.unpackbits(mask)[:np.prod(ds)]
         mask = mask.reshape(ds)
         return np.ma.masked_array(data, mask=mask)
 
     @staticmethod
     def _get_size(x: Tuple) -> int:
-        sizes = map(sys.getsizeof, x)
-        return sum(sizes)
+        return _get_allocated_size(x)
+
+    @staticmethod
+    def _get_entry_size(entry: CacheEntry) -> int:
+        return entry[-1]
+
+
+class BlockCache(LRUCache):
+    """Least-recently-used cache of decoded raster blocks with a size limit in bytes.
+
+    Can be shared between threads. Counts hits and misses, and how many decoded bytes were
+    served from the cache instead of being decoded again (``hit_bytes``).
+    """
+
+    def __init__(self, maxsize: int):
+        super().__init__(maxsize, self._get_size)
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = dict(hits=0, misses=0, hit_bytes=0, evictions=0)
+
+    def get_block(self, key: Hashable) -> Optional[np.ndarray]:
+        with self._lock:
+            block = self.get(key)
+
+            if block is None:
+                self._stats['misses'] += 1
+            else:
+                self._stats['hits'] += 1
+                self._stats['hit_bytes'] += block.nbytes
+
+        return block
+
+    def put_block(self, key: Hashable, block: np.ndarray) -> None:
+        if block.nbytes > self.maxsize:
+            return
+
+        # blocks are shared by all readers
+        block.flags.writeable = False
+
+        with self._lock:
+            self[key] = block
+
+    def popitem(self) -> Tuple[Any, Any]:
+        item = super().popitem()
+        self._stats['evictions'] += 1
+        return item
+
+    def get_stats(self) -> Dict[str, int]:
+        """Return cache statistics, and current and maximum size in bytes."""
+        with self._lock:
+            return dict(
+                self._stats, blocks=len(self), size=int(self.currsize), maxsize=int(self.maxsize)
+            )
+
+    @staticmethod
+    def _get_size(block: np.ndarray) -> int:
+        return block.nbytes
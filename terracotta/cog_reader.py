@@ -0,0 +1,531 @@
+"""cog_reader.py
+
+Reads tiles from local, tiled GeoTIFFs with NumPy, without going through GDAL.
+"""
+
+from typing import (Any, Callable, Dict, List, Mapping, NamedTuple, Optional, Sequence, Tuple,
+                    Union)
+
+import math
+import mmap
+import os
+import struct
+import zlib
+
+import numpy as np
+
+from terracotta.cache import BlockCache
+from terracotta.range_cache import RemoteFile
+
+try:
+    import zstandard
+    has_zstd = True
+except ImportError:  # pragma: no cover
+    has_zstd = False
+
+# TIFF tags
+_NEW_SUBFILE_TYPE = 254
+_IMAGE_WIDTH = 256
+_IMAGE_LENGTH = 257
+_BITS_PER_SAMPLE = 258
+_COMPRESSION = 259
+_PHOTOMETRIC = 262
+_SAMPLES_PER_PIXEL = 277
+_PLANAR_CONFIGURATION = 284
+_PREDICTOR = 317
+_TILE_WIDTH = 322
+_TILE_LENGTH = 323
+_TILE_OFFSETS = 324
+_TILE_BYTE_COUNTS = 325
+_EXTRA_SAMPLES = 338
+_SAMPLE_FORMAT = 339
+_MODEL_PIXEL_SCALE = 33550
+_MODEL_TIEPOINT = 33922
+_MODEL_TRANSFORMATION = 34264
+_GEO_KEY_DIRECTORY = 34735
+_GDAL_NODATA = 42113
+
+# TIFF field type -> NumPy type of a single value (rationals consist of two values)
+_FIELD_TYPES = {
+    1: 'u1', 2: 'u1', 3: 'u2', 4: 'u4', 5: 'u4', 6: 'i1', 7: 'u1', 8: 'i2', 9: 'i4',
+    10: 'i4', 11: 'f4', 12: 'f8', 13: 'u4', 16: 'u8', 17: 'i8', 18: 'u8'
+}
+_ASCII_FIELD = 2
+_RATIONAL_FIELDS = (5, 10)
+
+# (SampleFormat, BitsPerSample) -> NumPy dtype
+_SAMPLE_DTYPES = {
+    (1, 8): 'uint8', (1, 16): 'uint16', (1, 32): 'uint32', (1, 64): 'uint64',
+    (2, 8): 'int8', (2, 16): 'int16', (2, 32): 'int32', (2, 64): 'int64',
+    (3, 32): 'float32', (3, 64): 'float64'
+}
+
+_DECOMPRESSORS: Dict[int, Callable[[bytes], bytes]] = {
+    1: lambda data: data,
+    8: zlib.decompress,
+    32946: zlib.decompress
+}
+
+if has_zstd:
+    _DECOMPRESSORS[50000] = lambda data: zstandard.ZstdDecompressor().decompressobj().decompress(
+        data
+    )
+
+# GeoTIFF key and value for pixels that refer to points instead of areas
+_RASTER_TYPE_GEO_KEY = 1025
+_RASTER_PIXEL_IS_POINT = 2
+
+# files next to the raster that GDAL reads and that could change the result
+_SIDECAR_EXTENSIONS = ('.ovr', '.msk', '.aux.xml')
+
+#: maximum misalignment in pixels between a tile and the pixel grid of the file
+ALIGNMENT_TOLERANCE = 1e-6
+
+
+class ImageLevel(NamedTuple):
+    """Full resolution image or overview of a tiled GeoTIFF."""
+    width: int
+    height: int
+    block_width: int
+    block_height: int
+    offsets: np.ndarray
+    byte_counts: np.ndarray
+
+    @property
+    def blocks_per_row(self) -> int:
+        return -(-self.width // self.block_width)
+
+    @property
+    def blocks_per_plane(self) -> int:
+        return self.blocks_per_row * -(-self.height // self.block_height)
+
+
+class LocalFile:
+    """Memory-mapped local file."""
+
+    def __init__(self, path: str) -> None:
+        for extension in _SIDECAR_EXTENSIONS:
+            if os.path.exists(path + extension):
+                raise ValueError(f'sidecar file {path + extension} is not supported')
+
+        with open(path, 'rb') as f:
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            stat = os.fstat(f.fileno())
+
+        #: identifies this version of the file in block cache keys
+        self.file_id: Tuple[Any, ...] = (path, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def read(self, offset: int, size: int) -> bytes:
+        return self._buffer[offset:offset + size]
+
+    def read_ranges(self, ranges: Sequence[Tuple[int, int]]) -> List[bytes]:
+        return [self.read(offset, size) for offset, size in ranges]
+
+
+class COGReader:
+    """Reads tiles from a tiled GeoTIFF that are aligned with its pixel grid.
+
+    The offsets of all blocks are parsed once. Reading a tile then only fetches and
+    decompresses the blocks that intersect it and assembles them in NumPy, which avoids the
+    per-read overhead of GDAL. Local files are memory-mapped, remote files can be read
+    through a :class:`~terracotta.range_cache.RemoteFile` given as source.
+
+    Only the subset of GeoTIFF that GDAL produces for cloud-optimized files is supported:
+    tiled layout, internal overviews, no compression, DEFLATE or ZSTD (if zstandard is
+    installed), horizontal predictor, nodata values, and a north-up geotransform. Files with
+    masks, alpha bands, or other features raise a ValueError on construction.
+
+    If a block cache is given, decoded blocks are stored there and re-used by all readers that
+    share the cache.
+    """
+
+    def __init__(self, path: str, block_cache: Optional[BlockCache] = None,
+                 source: Union[LocalFile, RemoteFile] = None) -> None:
+        self._source = source if source is not None else LocalFile(path)
+        self._block_cache = block_cache
+
+        header = self._source.read(0, 16)
+        byteorder = header[:2]
+        if byteorder == b'II':
+            self._byteorder = '<'
+        elif byteorder == b'MM':
+            self._byteorder = '>'
+        else:
+            raise ValueError('not a TIFF file')
+
+        version, = struct.unpack_from(self._byteorder + 'H', header, 2)
+        if version == 42:
+            self._bigtiff = False
+            ifd_offset, = struct.unpack_from(self._byteorder + 'I', header, 4)
+        elif version == 43:
+            self._bigtiff = True
+            ifd_offset, = struct.unpack_from(self._byteorder + 'Q', header, 8)
+        else:
+            raise ValueError(f'unknown TIFF version {version}')
+
+        ifds = []
+        seen_offsets = set()
+        while ifd_offset and ifd_offset not in seen_offsets:
+            seen_offsets.add(ifd_offset)
+            ifd, ifd_offset = self._read_ifd(ifd_offset)
+            ifds.append(ifd)
+
+        if not ifds:
+            raise ValueError('file contains no images')
+
+        subfile_types = [
+            int(ifd[_NEW_SUBFILE_TYPE][0]) if _NEW_SUBFILE_TYPE in ifd else 0 for ifd in ifds
+        ]
+        if any(subfile_type & 4 for subfile_type in subfile_types):
+            raise ValueError('masks are not supported')
+
+        # GDAL only uses the first page and its reduced resolution versions
+        image_ifds = [ifds[0]] + [
+            ifd for ifd, subfile_type in zip(ifds[1:], subfile_types[1:]) if subfile_type & 1
+        ]
+
+        self._parse_format(image_ifds)
+        self._parse_georeference(ifds[0])
+
+        self.levels = sorted(
+            (self._parse_level(ifd) for ifd in image_ifds),
+            key=lambda level: level.width, reverse=True
+        )
+
+        #: (height, width) of full resolution image
+        self.shape = (self.levels[0].height, self.levels[0].width)
+
+    def _read_ifd(self, offset: int) -> Tuple[Dict[int, Any], int]:
+        """Parse image file directory at offset, return tags and offset of next directory."""
+        if self._bigtiff:
+            count_fmt, entry_fmt, offset_fmt = 'Q', 'HHQ8s', 'Q'
+        else:
+            count_fmt, entry_fmt, offset_fmt = 'H', 'HHI4s', 'I'
+
+        count_fmt, entry_fmt, offset_fmt = (
+            self._byteorder + fmt for fmt in (count_fmt, entry_fmt, offset_fmt)
+        )
+        count_size, entry_size = struct.calcsize(count_fmt), struct.calcsize(entry_fmt)
+
+        num_entries, = struct.unpack(count_fmt, self._source.read(offset, count_size))
+
+        # read all entries and offset of next directory at once
+        entries_size = num_entries * entry_size + struct.calcsize(offset_fmt)
+        entries = self._source.read(offset + count_size, entries_size)
+
+        if len(entries) != entries_size:
+            raise ValueError('image file directory is truncated')
+
+        tags: Dict[int, Any] = {}
+        for i in range(num_entries):
+            tag, field_type, count, value = struct.unpack_from(entry_fmt, entries, i * entry_size)
+
+            if field_type not in _FIELD_TYPES:
+                continue
+
+            dtype = np.dtype(self._byteorder + _FIELD_TYPES[field_type])
+            num_values = count * (2 if field_type in _RATIONAL_FIELDS else 1)
+            num_bytes = num_values * dtype.itemsize
+
+            if num_bytes <= len(value):
+                raw = value[:num_bytes]
+            else:
+                value_offset, = struct.unpack(offset_fmt, value)
+                raw = self._source.read(value_offset, num_bytes)
+
+            if len(raw) != num_bytes:
+                raise ValueError(f'tag {tag} points outside of file')
+
+            if field_type == _ASCII_FIELD:
+                tags[tag] = raw.rstrip(b'\x00').decode('ascii', errors='replace')
+            else:
+                tags[tag] = np.frombuffer(raw, dtype=dtype).astype(dtype.newbyteorder('='))
+
+        next_offset, = struct.unpack_from(offset_fmt, entries, num_entries * entry_size)
+        return tags, next_offset
+
+    def _parse_format(self, ifds: Sequence[Dict[int, Any]]) -> None:
+        def get_format(ifd: Dict[int, Any]) -> Tuple[Any, ...]:
+            def values(tag: int, default: int) -> List[Any]:
+                return ifd[tag].tolist() if tag in ifd else [default]
+
+            bits_per_sample = set(values(_BITS_PER_SAMPLE, 1))
+            sample_format = set(values(_SAMPLE_FORMAT, 1))
+            return (
+                values(_SAMPLES_PER_PIXEL, 1)[0],
+                bits_per_sample.pop() if len(bits_per_sample) == 1 else None,
+                sample_format.pop() if len(sample_format) == 1 else None,
+                tuple(ifd[_EXTRA_SAMPLES].tolist()) if _EXTRA_SAMPLES in ifd else (),
+                values(_PLANAR_CONFIGURATION, 1)[0],
+                values(_PHOTOMETRIC, 1)[0],
+                values(_COMPRESSION, 1)[0],
+                values(_PREDICTOR, 1)[0]
+            )
+
+        image_format = get_format(ifds[0])
+        if any(get_format(ifd) != image_format for ifd in ifds[1:]):
+            raise ValueError('overviews use a different format than full resolution image')
+
+        (samples_per_pixel, bits_per_sample, sample_format, extra_samples, planar_config,
+         photometric, compression, predictor) = image_format
+
+        if (sample_format, bits_per_sample) not in _SAMPLE_DTYPES:
+            raise ValueError(f'unsupported sample type {sample_format}, {bits_per_sample} bits')
+
+        if any(extra_sample in (1, 2) for extra_sample in extra_samples):
+            raise ValueError('alpha bands are not supported')
+
+        if planar_config not in (1, 2):
+            raise ValueError(f'unsupported planar configuration {planar_config}')
+
+        if photometric == 6:
+            raise ValueError('YCbCr images are not supported')
+
+        if compression not in _DECOMPRESSORS:
+            raise ValueError(f'unsupported compression {compression}')
+
+        dtype = np.dtype(_SAMPLE_DTYPES[(sample_format, bits_per_sample)])
+
+        if predictor not in (1, 2) or (predictor == 2 and dtype.kind == 'f'):
+            raise ValueError(f'unsupported predictor {predictor}')
+
+        #: number of bands
+        self.count = samples_per_pixel
+        #: data type of all bands
+        self.dtype = dtype
+        self._file_dtype = np.dtype(self._byteorder + dtype.str[1:])
+        self._interleaved = planar_config == 1 and samples_per_pixel > 1
+        self._decompress = _DECOMPRESSORS[compression]
+        self._predictor = predictor
+
+    def _parse_georeference(self, ifd: Dict[int, Any]) -> None:
+        geo_keys = ifd.get(_GEO_KEY_DIRECTORY)
+        if geo_keys is not None:
+            for key, location, _, value in geo_keys[4:].reshape(-1, 4).tolist():
+                if key == _RASTER_TYPE_GEO_KEY and location == 0 \
+                        and value == _RASTER_PIXEL_IS_POINT:
+                    raise ValueError('PixelIsPoint rasters are not supported')
+
+        if _MODEL_TRANSFORMATION in ifd:
+            matrix = ifd[_MODEL_TRANSFORMATION].tolist()
+            transform = (matrix[0], matrix[1], matrix[3], matrix[4], matrix[5], matrix[7])
+        elif _MODEL_PIXEL_SCALE in ifd and _MODEL_TIEPOINT in ifd:
+            scale_x, scale_y = ifd[_MODEL_PIXEL_SCALE].tolist()[:2]
+            tiepoints = ifd[_MODEL_TIEPOINT].tolist()
+            if len(tiepoints) != 6:
+                raise ValueError('multiple tiepoints are not supported')
+            col, row, _, x, y, _ = tiepoints
+            transform = (scale_x, 0., x - col * scale_x, 0., -scale_y, y + row * scale_y)
+        else:
+            raise ValueError('file has no geotransform')
+
+        if transform[1] != 0 or transform[3] != 0 or transform[0] <= 0 or transform[4] >= 0:
+            raise ValueError('only north-up geotransforms are supported')
+
+        #: affine transform from pixel to CRS coordinates, as (a, b, c, d, e, f)
+        self.transform = transform
+
+        nodata_str = ifd.get(_GDAL_NODATA)
+        #: nodata value shared by all bands (None if not set)
+        self.nodata = float(nodata_str) if nodata_str else None
+
+        # value of blocks that are not stored in the file
+        if self.nodata is None or (self.dtype.kind != 'f' and not math.isfinite(self.nodata)):
+            self._fill_value = 0.
+        else:
+            self._fill_value = self.nodata
+
+    def _parse_level(self, ifd: Dict[int, Any]) -> ImageLevel:
+        if _TILE_WIDTH not in ifd or _TILE_OFFSETS not in ifd:
+            raise ValueError('file is not tiled')
+
+        level = ImageLevel(
+            width=int(ifd[_IMAGE_WIDTH][0]),
+            height=int(ifd[_IMAGE_LENGTH][0]),
+            block_width=int(ifd[_TILE_WIDTH][0]),
+            block_height=int(ifd[_TILE_LENGTH][0]),
+            offsets=ifd[_TILE_OFFSETS].astype('int64'),
+            byte_counts=ifd[_TILE_BYTE_COUNTS].astype('int64')
+        )
+
+        num_planes = 1 if self._interleaved else self.count
+        if len(level.offsets) != level.blocks_per_plane * num_planes:
+            raise ValueError('number of tile offsets does not match image size')
+
+        return level
+
+    def _find_window(self, tile_bounds: Sequence[float], tile_size: Sequence[int]
+                     ) -> Optional[Tuple[ImageLevel, int, int]]:
+        """Find level and pixel offsets (row, column) that map exactly onto given tile."""
+        west, south, east, north = tile_bounds
+        height, width = tile_size
+        res_x, res_y = (east - west) / width, (north - south) / height
+        full_res_x, _, origin_x, _, full_res_y, origin_y = self.transform
+
+        for level in self.levels:
+            # same convention as GDAL for overviews that do not divide the image evenly
+            level_res_x = full_res_x * self.shape[1] / level.width
+            level_res_y = -full_res_y * self.shape[0] / level.height
+
+            if (abs(level_res_x - res_x) * width > ALIGNMENT_TOLERANCE * res_x
+                    or abs(level_res_y - res_y) * height > ALIGNMENT_TOLERANCE * res_y):
+                continue
+
+            col_off = (west - origin_x) / level_res_x
+            row_off = (origin_y - north) / level_res_y
+
+            if (abs(col_off - round(col_off)) > ALIGNMENT_TOLERANCE
+                    or abs(row_off - round(row_off)) > ALIGNMENT_TOLERANCE):
+                return None
+
+            return level, round(row_off), round(col_off)
+
+        return None
+
+    def _load_blocks(self, level: ImageLevel, block_indices: Sequence[int]
+                     ) -> Dict[int, Optional[np.ndarray]]:
+        """Decode given blocks, returns arrays of shape (rows, columns, samples) by index.
+
+        Sparse blocks are returned as None. Blocks that are not in the block cache are
+        fetched from the source at once.
+        """
+        num_samples = self.count if self._interleaved else 1
+        block_shape = (level.block_height, level.block_width, num_samples)
+
+        blocks: Dict[int, Optional[np.ndarray]] = {}
+        to_fetch: List[int] = []
+
+        for idx in block_indices:
+            offset, num_bytes = int(level.offsets[idx]), int(level.byte_counts[idx])
+
+            if offset == 0 or num_bytes == 0:
+                # sparse block
+                blocks[idx] = None
+                continue
+
+            if self._block_cache is not None:
+                cached_data = self._block_cache.get_block((self._source.file_id, offset))
+                if cached_data is not None:
+                    blocks[idx] = cached_data
+                    continue
+
+            to_fetch.append(idx)
+
+        raw_blocks = self._source.read_ranges([
+            (int(level.offsets[idx]), int(level.byte_counts[idx])) for idx in to_fetch
+        ])
+
+        for idx, raw in zip(to_fetch, raw_blocks):
+            data = np.frombuffer(
+                self._decompress(raw), dtype=self._file_dtype, count=int(np.prod(block_shape))
+            ).reshape(block_shape).astype(self.dtype)
+
+            if self._predictor == 2:
+                # horizontal differencing, integer overflow is intended
+                data = np.cumsum(data, axis=1, dtype=self.dtype)
+
+            if self._block_cache is not None:
+                self._block_cache.put_block((self._source.file_id, int(level.offsets[idx])), data)
+
+            blocks[idx] = data
+
+        return blocks
+
+    def _get_block_indices(self, level: ImageLevel, block_idx: int,
+                           bands: Sequence[int]) -> List[int]:
+        # index of given block in offsets for every band
+        if self._interleaved:
+            return [block_idx]
+        return [(band - 1) * level.blocks_per_plane + block_idx for band in bands]
+
+    def _get_block_data(self, blocks: Mapping[int, Optional[np.ndarray]], level: ImageLevel,
+                        block_idx: int, bands: Sequence[int]) -> np.ndarray:
+        """Get the given bands of a loaded block as array of shape (bands, rows, columns)."""
+        block_shape = (level.block_height, level.block_width)
+
+        if self._interleaved:
+            pixels = blocks[block_idx]
+            if pixels is None:
+                return np.full((len(bands), *block_shape), self._fill_value, dtype=self.dtype)
+            return pixels[..., [band - 1 for band in bands]].transpose(2, 0, 1)
+
+        out = np.empty((len(bands), *block_shape), dtype=self.dtype)
+        for i, idx in enumerate(self._get_block_indices(level, block_idx, bands)):
+            plane = blocks[idx]
+            out[i] = self._fill_value if plane is None else plane[..., 0]
+
+        return out
+
+    def read(self, bands: Sequence[int], tile_bounds: Sequence[float],
+             tile_size: Sequence[int]) -> Optional[List[np.ma.MaskedArray]]:
+        """Read the given bands (starting at 1) of a tile in the CRS of the file.
+
+        Only tiles that map onto whole pixels of the full resolution image or of an overview
+        can be read, returns None for all other tiles. Pixels outside of the image are masked.
+        """
+        if any(not 1 <= band <= self.count for band in bands):
+            raise IndexError('band index out of range')
+
+        window = self._find_window(tile_bounds, tile_size)
+
+        if window is None:
+            return None
+
+        level, row_off, col_off = window
+        height, width = tile_size
+
+        data = np.zeros((len(bands), height, width), dtype=self.dtype)
+        mask = np.ones((height, width), dtype='bool')
+
+        row_start, row_stop = max(row_off, 0), min(row_off + height, level.height)
+        col_start, col_stop = max(col_off, 0), min(col_off + width, level.width)
+
+        if row_start < row_stop and col_start < col_stop:
+            mask[row_start - row_off:row_stop - row_off, col_start - col_off:col_stop - col_off] = 0
+
+            block_height, block_width = level.block_height, level.block_width
+            block_rows = range(row_start // block_height, (row_stop - 1) // block_height + 1)
+            block_cols = range(col_start // block_width, (col_stop - 1) // block_width + 1)
+
+            # load all blocks first, so remote blocks can be fetched together
+            block_indices = [
+                block_row * level.blocks_per_row + block_col
+                for block_row in block_rows for block_col in block_cols
+            ]
+            blocks = self._load_blocks(level, [
+                idx for block_idx in block_indices
+                for idx in self._get_block_indices(level, block_idx, bands)
+            ])
+
+            for block_row in block_rows:
+                block_top = block_row * block_height
+                read_rows = (max(block_top, row_start), min(block_top + block_height, row_stop))
+
+                for block_col in block_cols:
+                    block_left = block_col * block_width
+                    read_cols = (
+                        max(block_left, col_start), min(block_left + block_width, col_stop)
+                    )
+
+                    block = self._get_block_data(
+                        blocks, level, block_row * level.blocks_per_row + block_col, bands
+                    )
+                    data[:, read_rows[0] - row_off:read_rows[1] - row_off,
+                         read_cols[0] - col_off:read_cols[1] - col_off] = block[
+                        :, read_rows[0] - block_top:read_rows[1] - block_top,
+                        read_cols[0] - block_left:read_cols[1] - block_left
+                    ]
+
+        out: List[np.ma.MaskedArray] = []
+        for band_data in data:
+            band_mask = mask.copy()
+
+            if self.nodata is not None:
+                if math.isnan(self.nodata):
+                    band_mask |= np.isnan(band_data)
+                else:
+                    band_mask |= band_data == self.nodata
+
+            out.append(np.ma.masked_array(band_data, mask=band_mask))
+
+        return out
@@ -34,9 +34,81 @@ class TerracottaSettings(NamedTuple):
     #: Size of raster file in-memory cache in bytes
     RASTER_CACHE_SIZE: int = 1024 * 1024 * 490  # 490 MB
 
-    #: Compression level of raster file in-memory cache, from 0-9
+    #: Compression level of raster file in-memory cache, from 0-9 (passed to the codec)
     RASTER_CACHE_COMPRESS_LEVEL: int = 9
 
+    #: Compression codec of the raster cache ('none', 'zlib', 'lz4', or 'zstd'; lz4 and zstd
+    #: require the lz4 and zstandard packages)
+    RASTER_CACHE_COMPRESSION: str = 'zlib'
+
+    #: Filter applied to raster data before compressing it for the raster cache ('none',
+    #: 'shuffle' to group bytes by significance, or 'delta' to store pixel differences)
+    RASTER_CACHE_FILTER: str = 'none'
+
+    #: Eviction policy of the raster cache ('lfu' or 'tinylfu'; tinylfu forgets tiles that
+    #: are not requested anymore, and is not flushed by requests for many tiles that are
+    #: used only once, like seeding)
+    RASTER_CACHE_POLICY: str = 'lfu'
+
+    #: Datasets whose tiles are never evicted from the raster cache, as lists of key values
+    #: (tiles of all members of pinned mosaics are pinned, too; pinned tiles can take up at
+    #: most half of the cache)
+    RASTER_CACHE_PINNED_DATASETS: List[List[str]] = []
+
+    #: Maximum number of open raster file handles kept by each tile worker (0 to disable)
+    RASTER_HANDLE_POOL_SIZE: int = 32
+
+    #: Read tiles from local tiled GeoTIFFs with NumPy instead of GDAL if they line up with the
+    #: pixel grid of the file or one of its overviews (no warping or resampling needed)
+    RASTER_NUMPY_READER: bool = False
+
+    #: Maximum number of files kept open (memory-mapped) by the NumPy reader, per process
+    RASTER_NUMPY_READER_POOL_SIZE: int = 32
+
+    #: Size of the cache of decoded blocks used by the NumPy reader in bytes, per process
+    #: (0 to disable)
+    RASTER_BLOCK_CACHE_SIZE: int = 1024 * 1024 * 64  # 64 MB
+
+    #: Read blocks of N x N neighboring XYZ tiles in one pass and cache them all (1 to disable)
+    METATILE_SIZE: int = 1
+
+    #: Where to read raster tiles (process pool, thread pool, or inline in the calling thread)
+    RASTER_EXECUTOR: str = 'process'
+
+    #: Number of workers used to read raster tiles (ignored for inline executor)
+    RASTER_EXECUTOR_WORKERS: int = 3
+
+    #: Replace all tile workers after this many tasks per worker to limit memory growth
+    #: (0 to disable)
+    RASTER_EXECUTOR_MAX_TASKS: int = 0
+
+    #: Size of shared memory used to transfer tiles from worker processes in bytes
+    #: (0 to disable, requires Python 3.8+)
+    RASTER_SHARED_MEMORY_SIZE: int = 1024 * 1024 * 32
+
+    #: Maximum number of tiles per process that are remembered to be outside of a dataset
+    #: (0 to disable)
+    EMPTY_TILE_CACHE_SIZE: int = 100000
+
+    #: Time in seconds to remember tiles that are outside of a dataset. Each process only
+    #: forgets them early when it inserts or deletes a dataset itself, so other processes
+    #: may keep serving empty tiles for a re-ingested dataset for up to this long
+    EMPTY_TILE_CACHE_TTL: int = 600
+
+    #: Time in seconds after which tile requests whose reads have not started yet are dropped
+    #: (None or 0 to disable)
+    TILE_TIMEOUT: Optional[float] = 30.
+
+    #: Read neighboring and child tiles into the raster cache in the background after
+    #: serving an XYZ tile
+    PREFETCH_TILES: bool = False
+
+    #: Maximum number of prefetched tiles that are being read at the same time per process
+    PREFETCH_MAX_PENDING: int = 16
+
+    #: Maximum number of prefetched tiles that are being read at the same time per dataset
+    PREFETCH_MAX_PENDING_PER_DATASET: int = 4
+
     #: Tile size to return if not given in parameters
     DEFAULT_TILE_SIZE: Tuple[int, int] = (256, 256)
 
@@ -55,12 +127,37 @@ class TerracottaSettings(NamedTuple):
     #: Time-to-live of remote database cache in seconds
     REMOTE_DB_CACHE_TTL: int = 10 * 60  # 10 min
 
+    #: Path where byte ranges of remote rasters read by the NumPy reader are cached
+    REMOTE_RASTER_CACHE_DIR: str = os.path.join(
+        tempfile.gettempdir(), 'terracotta', 'raster-cache'
+    )
+
+    #: Maximum size of the on-disk cache of remote rasters in bytes, shared by all processes
+    #: (0 to disable)
+    REMOTE_RASTER_CACHE_DISK_SIZE: int = 1024 * 1024 * 1024  # 1 GB
+
+    #: Maximum size of the in-memory cache of remote rasters in bytes per process
+    REMOTE_RASTER_CACHE_MEMORY_SIZE: int = 1024 * 1024 * 32  # 32 MB
+
     #: Resampling method to use when reading reprojected data
     RESAMPLING_METHOD: str = 'average'
 
     #: Resampling method to use when reprojecting data to Web Mercator
     REPROJECTION_METHOD: str = 'linear'
 
+    #: Number of threads GDAL uses to warp a single tile or raster (0 to use all CPUs)
+    WARP_NUM_THREADS: int = 1
+
+    #: Maximum error in pixels of the approximate transformation used when warping
+    WARP_ERROR_THRESHOLD: float = 0.125
+
+    #: Working memory of the GDAL warper in bytes (0 to use GDAL default)
+    WARP_MEMORY_LIMIT: int = 0
+
+    #: Additional GDAL warp options, e.g. ``SRC_ALPHA_MAX``, ``DST_ALPHA_MAX``, or
+    #: ``UNIFIED_SRC_NODATA`` to control source and destination alpha handling
+    WARP_EXTRA_OPTIONS: Dict[str, str] = {}
+
     #: CORS allowed origins for metadata endpoint
     ALLOWED_ORIGINS_METADATA: List[str] = ['*']
 
@@ -96,6 +193,29 @@ class SettingSchema(Schema):
 
     RASTER_CACHE_SIZE = fields.Integer(validate=validate.Range(min=0))
     RASTER_CACHE_COMPRESS_LEVEL = fields.Integer(validate=validate.Range(min=0, max=9))
+    RASTER_CACHE_COMPRESSION = fields.String(
+        validate=validate.OneOf(['none', 'zlib', 'lz4', 'zstd'])
+    )
+    RASTER_CACHE_FILTER = fields.String(validate=validate.OneOf(['none', 'shuffle', 'delta']))
+    RASTER_CACHE_POLICY = fields.String(validate=validate.OneOf(['lfu', 'tinylfu']))
+    RASTER_CACHE_PINNED_DATASETS = fields.List(fields.List(fields.String()))
+    RASTER_HANDLE_POOL_SIZE = fields.Integer(validate=validate.Range(min=0))
+    RASTER_NUMPY_READER = fields.Boolean()
+    RASTER_NUMPY_READER_POOL_SIZE = fields.Integer(validate=validate.Range(min=0))
+    RASTER_BLOCK_CACHE_SIZE = fields.Integer(validate=validate.Range(min=0))
+    METATILE_SIZE = fields.Integer(validate=validate.Range(min=1))
+    RASTER_EXECUTOR = fields.String(validate=validate.OneOf(['process', 'thread', 'inline']))
+    RASTER_EXECUTOR_WORKERS = fields.Integer(validate=validate.Range(min=1))
+    RASTER_EXECUTOR_MAX_TASKS = fields.Integer(validate=validate.Range(min=0))
+    RASTER_SHARED_MEMORY_SIZE = fields.Integer(validate=validate.Range(min=0))
+
+    EMPTY_TILE_CACHE_SIZE = fields.Integer(validate=validate.Range(min=0))
+    EMPTY_TILE_CACHE_TTL = fields.Integer(validate=validate.Range(min=0))
+    TILE_TIMEOUT = fields.Float(validate=validate.Range(min=0), allow_none=True)
+
+    PREFETCH_TILES = fields.Boolean()
+    PREFETCH_MAX_PENDING = fields.Integer(validate=validate.Range(min=0))
+    PREFETCH_MAX_PENDING_PER_DATASET = fields.Integer(validate=validate.Range(min=0))
 
     DEFAULT_TILE_SIZE = fields.List(fields.Integer(), validate=validate.Length(equal=2))
 
@@ -109,6 +229,9 @@ class SettingSchema(Schema):
     DB_CONNECTION_TIMEOUT = fields.Integer(validate=validate.Range(min=0))
     REMOTE_DB_CACHE_DIR = fields.String(validate=_is_writable)
     REMOTE_DB_CACHE_TTL = fields.Integer(validate=validate.Range(min=0))
+    REMOTE_RASTER_CACHE_DIR = fields.String(validate=_is_writable)
+    REMOTE_RASTER_CACHE_DISK_SIZE = fields.Integer(validate=validate.Range(min=0))
+    REMOTE_RASTER_CACHE_MEMORY_SIZE = fields.Integer(validate=validate.Range(min=0))
 
     RESAMPLING_METHOD = fields.String(
         validate=validate.OneOf(['nearest', 'linear', 'cubic', 'average'])
@@ -117,6 +240,12 @@ class SettingSchema(Schema):
         validate=validate.OneOf(['nearest', 'linear', 'cubic', 'average'])
     )
 
+    WARP_NUM_THREADS = fields.Integer(validate=validate.Range(min=0))
+    # exact transformation is not supported by rasterio for explicit VRT transforms
+    WARP_ERROR_THRESHOLD = fields.Float(validate=lambda val: val > 0)
+    WARP_MEMORY_LIMIT = fields.Integer(validate=validate.Range(min=0))
+    WARP_EXTRA_OPTIONS = fields.Dict(keys=fields.String(), values=fields.String())
+
     ALLOWED_ORIGINS_METADATA = fields.List(fields.String())
     ALLOWED_ORIGINS_TILES = fields.List(fields.String())
 
@@ -125,8 +254,9 @@ class SettingSchema(Schema):
 
     @pre_load
     def decode_lists(self, data: Dict[str, Any], **kwargs: Any) -> Dict[str, Any]:
-        for var in ('DEFAULT_TILE_SIZE', 'LAZY_LOADING_MAX_SHAPE',
-                    'ALLOWED_ORIGINS_METADATA', 'ALLOWED_ORIGINS_TILES'):
+        for var in ('DEFAULT_TILE_SIZE', 'LAZY_LOADING_MAX_SHAPE', 'WARP_EXTRA_OPTIONS',
+                    'ALLOWED_ORIGINS_METADATA', 'ALLOWED_ORIGINS_TILES',
+                    'RASTER_CACHE_PINNED_DATASETS'):
             val = data.get(var)
             if val and isinstance(val, str):
                 try:
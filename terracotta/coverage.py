@@ -0,0 +1,177 @@
+"""coverage.py
+
+Bitmaps of the XYZ tiles that contain valid data of a dataset.
+"""
+
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+import base64
+import math
+import zlib
+
+import numpy as np
+
+# latitude of the northern and southern edge of the Web Mercator tile grid
+MAX_LATITUDE = 85.0511287798066
+
+# deepest zoom level for which coverage is stored
+MAX_COVERAGE_ZOOM = 24
+
+# maximum number of tiles in the bitmap of the deepest stored zoom level
+MAX_COVERAGE_TILES = 2 ** 20
+
+Window = Tuple[int, int, int, int]
+
+
+class TileCoverage:
+    """Which XYZ tiles contain data, for all zoom levels up to ``max_zoom``.
+
+    Each zoom level consists of a window ``(x offset, y offset, width, height)`` in the tile
+    grid and a bit-packed boolean array of shape ``(height, width)``. Tiles outside of the
+    window contain no data. Deeper zoom levels are checked against their ancestor at
+    ``max_zoom``, so the answer is conservative there.
+    """
+
+    def __init__(self, levels: Mapping[int, Tuple[Window, np.ndarray]]) -> None:
+        if not levels:
+            raise ValueError('coverage needs at least one zoom level')
+
+        self._levels = dict(levels)
+        self.max_zoom = max(self._levels)
+
+    def tile_has_data(self, tile_x: int, tile_y: int, tile_z: int) -> bool:
+        """Check whether given XYZ tile might contain data."""
+        if tile_z > self.max_zoom:
+            shift = tile_z - self.max_zoom
+            tile_x, tile_y, tile_z = tile_x >> shift, tile_y >> shift, self.max_zoom
+
+        (x_offset, y_offset, width, height), bits = self._levels[tile_z]
+        col, row = tile_x - x_offset, tile_y - y_offset
+
+        if not (0 <= col < width and 0 <= row < height):
+            return False
+
+        index = row * width + col
+        return bool(bits[index >> 3] & (0x80 >> (index & 7)))
+
+    @classmethod
+    def from_tiles(cls, tile_x: np.ndarray, tile_y: np.ndarray, tile_z: int) -> 'TileCoverage':
+        """Build coverage from the indices of all tiles at zoom level tile_z that contain data."""
+        levels: Dict[int, Tuple[Window, np.ndarray]] = {}
+
+        for zoom in range(tile_z, -1, -1):
+            shift = tile_z - zoom
+            level_x, level_y = tile_x >> shift, tile_y >> shift
+
+            x_offset, y_offset = int(level_x.min()), int(level_y.min())
+            width = int(level_x.max()) - x_offset + 1
+            height = int(level_y.max()) - y_offset + 1
+
+            bitmap = np.zeros((height, width), dtype='bool')
+            bitmap[level_y - y_offset, level_x - x_offset] = True
+            levels[zoom] = ((x_offset, y_offset, width, height), np.packbits(bitmap, axis=None))
+
+        return cls(levels)
+
+    @classmethod
+    def from_pixel_corners(cls, lon: np.ndarray, lat: np.ndarray, valid: np.ndarray,
+                           max_tiles: int = MAX_COVERAGE_TILES) -> Optional['TileCoverage']:
+        """Compute coverage of a raster from the WGS84 coordinates of its pixel corners.
+
+        ``lon`` and ``lat`` have shape ``(height + 1, width + 1)``, ``valid`` has shape
+        ``(height, width)``. Every tile touching a valid pixel is marked at the deepest zoom
+        level where pixels are smaller than tiles (and the bitmap has at most ``max_tiles``
+        entries). This follows the actual data footprint in any projection, including
+        datasets close to the poles or crossing the antimeridian.
+
+        Returns None if the coverage cannot be determined.
+        """
+        def corners(arr: np.ndarray) -> np.ndarray:
+            return np.stack([
+                arr[:-1, :-1][valid], arr[:-1, 1:][valid], arr[1:, :-1][valid], arr[1:, 1:][valid]
+            ])
+
+        corner_lat = corners(lat)
+
+        # pixels that lie beyond the edge of the tile grid are never displayed
+        visible = (np.abs(corner_lat) < MAX_LATITUDE).any(axis=0)
+        corner_lat = corner_lat[:, visible]
+        corner_lon = corners(lon)[:, visible]
+
+        if not corner_lat.size:
+            return None
+
+        if not (np.isfinite(corner_lat).all() and np.isfinite(corner_lon).all()):
+            # pixel corners outside of the projection domain
+            return None
+
+        # fractional tile coordinates at zoom level 0
+        corner_x = (corner_lon + 180) / 360
+        lat_rad = np.radians(np.clip(corner_lat, -MAX_LATITUDE, MAX_LATITUDE))
+        corner_y = (1 - np.log(np.tan(lat_rad) + 1 / np.cos(lat_rad)) / np.pi) / 2
+
+        # unwrap pixels crossing the antimeridian
+        crosses = corner_x.max(axis=0) - corner_x.min(axis=0) > 0.5
+        corner_x[:, crosses] = np.where(
+            corner_x[:, crosses] < 0.5, corner_x[:, crosses] + 1, corner_x[:, crosses]
+        )
+
+        min_x, max_x = corner_x.min(axis=0), corner_x.max(axis=0)
+        min_y, max_y = corner_y.min(axis=0), corner_y.max(axis=0)
+
+        pixel_size = max(float((max_x - min_x).max()), float((max_y - min_y).max()))
+        if pixel_size > 0:
+            zoom = min(MAX_COVERAGE_ZOOM, max(0, math.floor(-math.log2(pixel_size))))
+        else:
+            zoom = MAX_COVERAGE_ZOOM
+
+        while True:
+            num_tiles = 2 ** zoom
+
+            # pixels are smaller than tiles, so each of them touches at most 2x2 tiles
+            tile_cols = [np.floor(min_x * num_tiles), np.floor(max_x * num_tiles)]
+            tile_rows = [np.floor(min_y * num_tiles), np.floor(max_y * num_tiles)]
+            tile_x = np.concatenate([tile_cols[0], tile_cols[1]] * 2).astype('int64') % num_tiles
+            tile_y = np.clip(
+                np.concatenate([tile_rows[0]] * 2 + [tile_rows[1]] * 2), 0, num_tiles - 1
+            ).astype('int64')
+
+            window_size = (
+                (tile_x.max() - tile_x.min() + 1) * (tile_y.max() - tile_y.min() + 1)
+            )
+
+            if window_size <= max_tiles or zoom == 0:
+                break
+
+            zoom -= 1
+
+        return cls.from_tiles(tile_x, tile_y, zoom)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Encode coverage as JSON-serializable dict.
+
+        Bitmaps are stored row by row (north to south, west to east, one bit per tile, most
+        significant bit first), compressed with zlib, and encoded as base64.
+        """
+        levels: List[Dict[str, Any]] = []
+
+        for zoom, (window, bits) in sorted(self._levels.items()):
+            levels.append({
+                'zoom': zoom,
+                'window': list(window),
+                'bitmap': base64.b64encode(zlib.compress(bits.tobytes())).decode('ascii')
+            })
+
+        return {'max_zoom': self.max_zoom, 'levels': levels}
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> 'TileCoverage':
+        """Decode coverage from the output of :meth:`to_dict`."""
+        levels: Dict[int, Tuple[Window, np.ndarray]] = {}
+
+        for level in data['levels']:
+            x_offset, y_offset, width, height = level['window']
+            bits = np.frombuffer(zlib.decompress(base64.b64decode(level['bitmap'])), 'uint8')
+            levels[level['zoom']] = ((x_offset, y_offset, width, height), bits)
+
+        return cls(levels)
@@ -3,7 +3,7 @@
 Define an interface to retrieve Terracotta drivers.
 """
 
-from typing import Union, Tuple, Dict, Type
+from typing import Union, Tuple, Dict, Type, Optional
 import urllib.parse as urlparse
 from pathlib import Path
 
@@ -44,7 +44,7 @@ def auto_detect_provider(url_or_path: Union[str, Path]) -> str:
 _DRIVER_CACHE: Dict[Tuple[URLOrPathType, str], Driver] = {}
 
 
-def get_driver(url_or_path: URLOrPathType, provider: str = None) -> Driver:
+def get_driver(url_or_path: URLOrPathType, provider: Optional[str] = None) -> Driver:
     """Retrieve Terracotta driver instance for the given path.
 
     This function always returns the same instance for identical inputs.
@@ -3,15 +3,24 @@
 Base class for drivers.
 """
 
-from typing import Callable, Mapping, Any, Tuple, Sequence, Dict, Union, TypeVar
+from typing import (Callable, Mapping, Any, Tuple, Sequence, Dict, List, Union, TypeVar,
+                    Optional, TYPE_CHECKING)
 from abc import ABC, abstractmethod
 from collections import OrderedDict
 import functools
 import contextlib
 
+if TYPE_CHECKING:  # pragma: no cover
+    from terracotta.coverage import TileCoverage  # noqa: F401
+
 Number = TypeVar('Number', int, float)
 T = TypeVar('T')
 
+# scheduling priorities of tile requests (lower is more urgent)
+PRIORITY_INTERACTIVE = 0
+PRIORITY_PREVIEW = 1
+PRIORITY_PREFETCH = 2
+
 
 def requires_connection(fun: Callable[..., T]) -> Callable[..., T]:
     @functools.wraps(fun)
@@ -119,14 +128,15 @@ class Driver(ABC):
                         tile_bounds: Sequence[float] = None,
                         tile_size: Sequence[int] = (256, 256),
                         preserve_values: bool = False,
-                        asynchronous: bool = False) -> Any:
+                        asynchronous: bool = False,
+                        target_crs: str = None) -> Any:
         """Load a raster tile with given keys and bounds.
 
         Arguments:
 
             keys: Keys of the requested dataset. Can either be given as a sequence of key values,
                 or as a mapping ``{key_name: key_value}``.
-            tile_bounds: Physical bounds of the tile to read, in Web Mercator projection (EPSG3857).
+            tile_bounds: Physical bounds of the tile to read, in ``target_crs``.
                 Reads the whole dataset if not given.
             tile_size: Shape of the output array to return. Must be two-dimensional.
                 Defaults to :attr:`~terracotta.config.TerracottaSettings.DEFAULT_TILE_SIZE`.
@@ -135,6 +145,8 @@ class Driver(ABC):
             asynchronous: If given, the tile will be read asynchronously in a separate thread.
                 This function will return immediately with a :class:`~concurrent.futures.Future`
                 that can be used to retrieve the result.
+            target_crs: CRS of ``tile_bounds`` and the returned tile. Defaults to Web Mercator
+                projection (EPSG:3857).
 
         Returns:
 
@@ -145,6 +157,98 @@ class Driver(ABC):
         """
         pass
 
+    def get_raster_tiles(self, keys_list: Sequence[Union[Sequence[str], Mapping[str, str]]], *,
+                         tile_bounds: Sequence[float] = None,
+                         tile_size: Sequence[int] = (256, 256),
+                         preserve_values: bool = False,
+                         asynchronous: bool = False,
+                         metatile: Sequence[Sequence[Sequence[float]]] = None,
+                         priority: int = PRIORITY_INTERACTIVE,
+                         deadline: float = None,
+                         target_crs: str = None) -> List[Any]:
+        """Load raster tiles for several datasets with the same bounds.
+
+        Drivers may override this to share work between datasets, e.g. when they are
+        stored in the same file.
+
+        Arguments:
+
+            keys_list: Keys of all requested datasets.
+            metatile: Bounds of all tiles in the metatile containing ``tile_bounds``, as a list
+                of rows (north to south) of tile bounds (west to east). Drivers may use this
+                hint to read and cache neighboring tiles together. Ignored by default.
+            priority: Scheduling priority of the request, one of ``PRIORITY_INTERACTIVE``,
+                ``PRIORITY_PREVIEW``, and ``PRIORITY_PREFETCH``. Ignored by default.
+            deadline: Time (as returned by :func:`time.monotonic`) after which the tiles are
+                not needed anymore. Drivers may drop reads that have not started by then
+                and raise :class:`~terracotta.exceptions.DeadlineExceededError`.
+                Ignored by default.
+
+        All other arguments are the same as for :meth:`get_raster_tile`.
+
+        Returns:
+
+            List of results of :meth:`get_raster_tile`, in the same order as ``keys_list``.
+
+        """
+        return [
+            self.get_raster_tile(
+                keys, tile_bounds=tile_bounds, tile_size=tile_size,
+                preserve_values=preserve_values, asynchronous=asynchronous,
+                target_crs=target_crs
+            ) for keys in keys_list
+        ]
+
+    def is_empty_tile(self, keys: Union[Sequence[str], Mapping[str, str]],
+                      tile_bounds: Sequence[float]) -> bool:
+        """Check whether a tile is known to contain no data of the given dataset.
+
+        Does not access the database or any raster files. Always returns False by default.
+        """
+        return False
+
+    def add_empty_tile(self, keys: Union[Sequence[str], Mapping[str, str]],
+                       tile_bounds: Sequence[float]) -> None:
+        """Remember that a tile contains no data of the given dataset. Ignored by default."""
+        pass
+
+    def get_coverage(self, keys: Union[Sequence[str], Mapping[str, str]]
+                     ) -> Optional['TileCoverage']:
+        """Return which XYZ tiles contain data of the given dataset, as computed during ingestion.
+
+        Returns None if this is unknown (the default), in which case tiles are only checked
+        against the dataset bounds. Coverage refers to the Web Mercator tile grid, so tiles of
+        other tile matrix sets are always only checked against the dataset bounds.
+        """
+        return None
+
+    def prefetch_raster_tiles(self,
+                              keys_list: Sequence[Union[Sequence[str], Mapping[str, str]]],
+                              tile_bounds_list: Sequence[Sequence[float]], *,
+                              tile_size: Sequence[int] = (256, 256),
+                              preserve_values: bool = False,
+                              deadline: float = None,
+                              target_crs: str = None) -> int:
+        """Load raster tiles in the background so later requests for them are fast.
+
+        This is only a hint; drivers without a tile cache ignore it.
+
+        Arguments:
+
+            keys_list: Keys of all datasets to prefetch.
+            tile_bounds_list: Physical bounds of all tiles to prefetch, most important first.
+            deadline: Time (as returned by :func:`time.monotonic`) after which prefetching
+                is not useful anymore.
+
+        All other arguments are the same as for :meth:`get_raster_tile`.
+
+        Returns:
+
+            Number of tiles scheduled for retrieval.
+
+        """
+        return 0
+
     @staticmethod
     @abstractmethod
     def compute_metadata(data: Any, *,
@@ -0,0 +1,309 @@
+"""drivers/mosaic.py
+
+Virtual mosaic datasets that are assembled on the fly from several member datasets.
+
+A mosaic stores no pixel data of its own, only the keys and WGS84 bounds of its members.
+During tile retrieval, an R-tree over the member bounds selects the members that intersect the
+requested tile, these are read like any other dataset, and the results are composited so that
+each pixel is taken from the first member (in insertion order) with valid data there.
+"""
+
+from typing import Any, Dict, List, Mapping, Sequence, Set, Tuple
+from concurrent.futures import Future
+
+import functools
+import threading
+
+import numpy as np
+
+from terracotta import exceptions
+
+#: File path stored for mosaic datasets in place of a raster file
+MOSAIC_PATH = 'mosaic://'
+
+Bounds = Tuple[float, float, float, float]
+
+
+class RTree:
+    """Static R-tree over bounding boxes, bulk-loaded with the Sort-Tile-Recursive algorithm.
+
+    Boxes are given as ``(west, south, east, north)`` and identified by their position.
+    """
+
+    def __init__(self, boxes: Sequence[Sequence[float]], node_capacity: int = 16) -> None:
+        if node_capacity < 2:
+            raise ValueError('node capacity must be at least 2')
+
+        self.node_capacity = node_capacity
+
+        # from the leaves to the root: (bounds of all entries of the level,
+        # indices of the entries that are grouped into each node of the next level)
+        self._levels: List[Tuple[np.ndarray, List[np.ndarray]]] = []
+
+        level_bounds = np.asarray(boxes, dtype='float64').reshape(-1, 4)
+        self._size = len(level_bounds)
+
+        while len(level_bounds):
+            groups = self._pack(level_bounds)
+            self._levels.append((level_bounds, groups))
+
+            if len(groups) == 1:
+                break
+
+            level_bounds = np.array([
+                [*level_bounds[group, :2].min(axis=0), *level_bounds[group, 2:].max(axis=0)]
+                for group in groups
+            ])
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _pack(self, boxes: np.ndarray) -> List[np.ndarray]:
+        # sort into vertical slices by center x, then into nodes by center y
+        num_nodes = -(-len(boxes) // self.node_capacity)
+        slice_size = int(np.ceil(np.sqrt(num_nodes))) * self.node_capacity
+
+        center_x = boxes[:, 0] + boxes[:, 2]
+        center_y = boxes[:, 1] + boxes[:, 3]
+
+        groups = []
+        by_x = np.argsort(center_x, kind='stable')
+
+        for slice_start in range(0, len(boxes), slice_size):
+            boxes_in_slice = by_x[slice_start:slice_start + slice_size]
+            boxes_in_slice = boxes_in_slice[np.argsort(center_y[boxes_in_slice], kind='stable')]
+
+            for node_start in range(0, len(boxes_in_slice), self.node_capacity):
+                groups.append(boxes_in_slice[node_start:node_start + self.node_capacity])
+
+        return groups
+
+    def query(self, bounds: Sequence[float]) -> List[int]:
+        """Return indices of all boxes that intersect given bounds, in ascending order.
+
+        Boxes that only touch the bounds do not count as intersecting.
+        """
+        if not self._size:
+            return []
+
+        west, south, east, north = bounds
+
+        # start from the root, which is the only node of the level above the last one
+        candidates = np.zeros(1, dtype='int64')
+
+        for level_bounds, groups in reversed(self._levels):
+            children = np.concatenate([groups[node] for node in candidates])
+            child_bounds = level_bounds[children]
+
+            hits = (
+                (child_bounds[:, 0] < east) & (west < child_bounds[:, 2])
+                & (child_bounds[:, 1] < north) & (south < child_bounds[:, 3])
+            )
+            candidates = children[hits]
+
+            if not len(candidates):
+                return []
+
+        return sorted(candidates.tolist())
+
+
+def _split_antimeridian(bounds: Sequence[float]) -> List[Bounds]:
+    # WGS84 bounds with west > east cross the antimeridian
+    west, south, east, north = bounds
+
+    if west <= east:
+        return [(west, south, east, north)]
+
+    return [(west, south, 180., north), (-180., south, east, north)]
+
+
+@functools.lru_cache(1024)
+def _to_wgs84(crs: str, bounds: Bounds) -> Bounds:
+    # densified, so the result contains the whole tile (and possibly some more)
+    from rasterio import warp
+    return warp.transform_bounds(crs, 'epsg:4326', *bounds, densify_pts=21)
+
+
+class MosaicIndex:
+    """Member datasets of a mosaic, with a spatial index over their WGS84 bounds."""
+
+    def __init__(self, members: Sequence[Mapping[str, Any]]) -> None:
+        if not members:
+            raise ValueError('mosaic needs at least one member')
+
+        self.members = [tuple(member['keys']) for member in members]
+
+        # member index of every box in the tree (members crossing the antimeridian have two)
+        boxes: List[Bounds] = []
+        self._box_members: List[int] = []
+
+        for i, member in enumerate(members):
+            for box in _split_antimeridian(member['bounds']):
+                boxes.append(box)
+                self._box_members.append(i)
+
+        self._tree = RTree(boxes)
+
+        west, south = np.min(boxes, axis=0)[:2]
+        east, north = np.max(boxes, axis=0)[2:]
+        self.bounds: Bounds = (float(west), float(south), float(east), float(north))
+
+    def query(self, tile_bounds: Sequence[float], crs: str) -> List[Tuple[str, ...]]:
+        """Return keys of all members that intersect the given tile, in mosaic order."""
+        wgs_bounds = _to_wgs84(crs, tuple(tile_bounds))
+
+        hits: Set[int] = set()
+        for box in _split_antimeridian(wgs_bounds):
+            hits.update(self._box_members[i] for i in self._tree.query(box))
+
+        return [self.members[i] for i in sorted(hits)]
+
+    def target_bounds(self, crs: str) -> Bounds:
+        """Bounds of the whole mosaic in given CRS."""
+        from rasterio import warp
+        return warp.transform_bounds('epsg:4326', crs, *self.bounds, densify_pts=21)
+
+
+def composite(tiles: Sequence[np.ma.MaskedArray]) -> np.ma.MaskedArray:
+    """Combine tiles of equal shape, taking each pixel from the first tile that is valid there."""
+    dtype = np.result_type(*(tile.dtype for tile in tiles))
+
+    data = np.array(tiles[0].data, dtype=dtype)
+    mask = np.array(np.ma.getmaskarray(tiles[0]))
+
+    for tile in tiles[1:]:
+        if not mask.any():
+            break
+
+        fill = mask & ~np.ma.getmaskarray(tile)
+        data[fill] = tile.data[fill]
+        mask &= ~fill
+
+    return np.ma.masked_array(data, mask=mask)
+
+
+def composite_futures(futures: Sequence[Future]) -> Future:
+    """Return a future that resolves to the composite of the tiles of the given futures.
+
+    Members whose tile is out of bounds are skipped. If there are none left, the future
+    raises :class:`~terracotta.exceptions.TileOutOfBoundsError`, and if any member failed
+    otherwise, its exception is propagated.
+    """
+    out: Future = Future()
+    num_pending = len(futures)
+    lock = threading.Lock()
+
+    def finish() -> None:
+        tiles = []
+
+        for future in futures:
+            try:
+                tiles.append(future.result())
+            except exceptions.TileOutOfBoundsError:
+                continue
+            except BaseException as exc:
+                out.set_exception(exc)
+                return
+
+        if not tiles:
+            out.set_exception(
+                exceptions.TileOutOfBoundsError('Tile does not intersect any mosaic member')
+            )
+            return
+
+        try:
+            out.set_result(composite(tiles))
+        except Exception as exc:
+            out.set_exception(exc)
+
+    def member_done(_: Future) -> None:
+        nonlocal num_pending
+
+        with lock:
+            num_pending -= 1
+            is_last = num_pending == 0
+
+        if is_last:
+            finish()
+
+    if not futures:
+        finish()
+
+    for future in futures:
+        future.add_done_callback(member_done)
+
+    return out
+
+
+def merge_metadata(member_metadata: Sequence[Mapping[str, Any]]) -> Dict[str, Any]:
+    """Estimate metadata of a mosaic from the metadata of its members.
+
+    Statistics are weighted by the (approximate) valid area of each member, and percentiles
+    are those of the mixture of all member distributions. Overlaps between members are
+    counted multiple times, so the results are not exact.
+    """
+    from shapely import geometry, ops
+
+    boxes = np.array([
+        box for metadata in member_metadata for box in _split_antimeridian(metadata['bounds'])
+    ])
+    west, south = boxes[:, :2].min(axis=0)
+    east, north = boxes[:, 2:].max(axis=0)
+
+    def area(bounds: Sequence[float]) -> float:
+        # in square degrees of longitude at the equator
+        west, south, east, north = bounds
+        return sum(
+            (e - w) * (n - s) * np.cos(np.radians((n + s) / 2))
+            for w, s, e, n in _split_antimeridian((west, south, east, north))
+        )
+
+    valid_area = np.array([
+        metadata['valid_percentage'] / 100 * area(metadata['bounds'])
+        for metadata in member_metadata
+    ])
+
+    if valid_area.sum() > 0:
+        weights = valid_area / valid_area.sum()
+    else:
+        weights = np.full(len(member_metadata), 1 / len(member_metadata))
+
+    means = np.array([metadata['mean'] for metadata in member_metadata])
+    stdevs = np.array([metadata['stdev'] for metadata in member_metadata])
+    mean = float(np.sum(weights * means))
+    stdev = float(np.sqrt(np.sum(weights * (stdevs ** 2 + (means - mean) ** 2))))
+
+    # mixture quantiles, every member percentile stands for an equal share of its member
+    percentile_values = np.concatenate([
+        np.asarray(metadata['percentiles'], dtype='float64') for metadata in member_metadata
+    ])
+    percentile_weights = np.concatenate([
+        np.full(len(metadata['percentiles']), weight / len(metadata['percentiles']))
+        for weight, metadata in zip(weights, member_metadata)
+    ])
+    order = np.argsort(percentile_values, kind='stable')
+    cumulative_weights = np.cumsum(percentile_weights[order]) - percentile_weights[order] / 2
+    percentiles = np.interp(
+        np.arange(1, 100) / 100, cumulative_weights, percentile_values[order]
+    )
+
+    convex_hull = ops.unary_union([
+        geometry.shape(metadata['convex_hull']) for metadata in member_metadata
+    ]).convex_hull
+
+    total_area = area((west, south, east, north))
+    valid_percentage = min(100., valid_area.sum() / total_area * 100) if total_area > 0 else 100.
+
+    return {
+        'bounds': (float(west), float(south), float(east), float(north)),
+        'convex_hull': geometry.mapping(convex_hull),
+        'valid_percentage': float(valid_percentage),
+        'range': (
+            float(min(metadata['range'][0] for metadata in member_metadata)),
+            float(max(metadata['range'][1] for metadata in member_metadata))
+        ),
+        'mean': mean,
+        'stdev': stdev,
+        'percentiles': percentiles.tolist(),
+        'metadata': {}
+    }
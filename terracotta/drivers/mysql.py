@@ -5,7 +5,7 @@ to be present on disk.
 """
 
 from typing import (Tuple, Dict, Iterator, Sequence, Union,
-                    Mapping, Any, Optional, cast, TypeVar)
+                    Mapping, Any, List, Optional, FrozenSet, cast, TypeVar)
 from collections import OrderedDict
 import contextlib
 from contextlib import AbstractContextManager
@@ -82,8 +82,10 @@ class MySQLDriver(RasterDriver):
 
     - ``terracotta``: Metadata about the database itself.
     - ``key_names``: Contains two columns holding all available keys and their description.
-    - ``datasets``: Maps key values to physical raster path.
+    - ``datasets``: Maps key values to physical raster path and band index.
     - ``metadata``: Contains actual metadata as separate columns. Indexed via key values.
+      Also stores georeferencing information used during tile retrieval, and the members
+      of mosaic datasets.
 
     This driver caches raster data and key names, but not metadata.
     """
@@ -102,6 +104,14 @@ class MySQLDriver(RasterDriver):
         ('percentiles', 'BLOB'),
         ('metadata', 'LONGTEXT')
     )
+    # internal, not part of the public metadata
+    _COVERAGE_COLUMN_TYPE: str = 'LONGTEXT'
+    _MOSAIC_COLUMN_TYPE: str = 'LONGTEXT'
+    _GEOREFERENCE_COLUMN_TYPE: str = 'LONGTEXT'
+    # columns that are missing in databases created by older versions
+    _OPTIONAL_COLUMNS: FrozenSet[str] = frozenset(
+        ('band_index', 'georeference', 'coverage', 'mosaic_members')
+    )
     _CHARSET: str = 'utf8mb4'
 
     def __init__(self, mysql_path: str) -> None:
@@ -143,6 +153,7 @@ class MySQLDriver(RasterDriver):
 
         self._version_checked: bool = False
         self._db_keys: Optional[OrderedDict] = None
+        self._columns: Optional[FrozenSet[str]] = None
 
         # use normalized path to make sure username and password don't leak into __repr__
         qualified_path = self._normalize_path(mysql_path)
@@ -197,6 +208,25 @@ class MySQLDriver(RasterDriver):
                 )
             self._version_checked = True
 
+        if self._columns is None:
+            self._columns = self._get_columns()
+
+    @convert_exceptions(_ERROR_ON_CONNECT)
+    def _get_columns(self) -> FrozenSet[str]:
+        """Names of all columns of the datasets and metadata tables"""
+        cursor = self._cursor
+        columns: List[str] = []
+
+        for table in ('datasets', 'metadata'):
+            cursor.execute(f'SHOW COLUMNS FROM {table}')
+            columns.extend(row['Field'] for row in cursor.fetchall() or ())
+
+        return frozenset(columns)
+
+    def _has_column(self, column: str) -> bool:
+        assert self._columns is not None
+        return column in self._columns
+
     def _get_key_names(self) -> Tuple[str, ...]:
         """Names of all keys defined by the database"""
         return tuple(self.get_keys().keys())
@@ -294,15 +324,54 @@ class MySQLDriver(RasterDriver):
 
             key_string = ', '.join([f'{key} {key_type}' for key in keys])
             cursor.execute(f'CREATE TABLE datasets ({key_string}, filepath VARCHAR(8000), '
-                           f'PRIMARY KEY({", ".join(keys)})) CHARACTER SET {self._CHARSET}')
+                           f'band_index INTEGER DEFAULT 1, PRIMARY KEY({", ".join(keys)})) '
+                           f'CHARACTER SET {self._CHARSET}')
 
             column_string = ', '.join(f'{col} {col_type}' for col, col_type
                                       in self._METADATA_COLUMNS)
             cursor.execute(f'CREATE TABLE metadata ({key_string}, {column_string}, '
+                           f'georeference {self._GEOREFERENCE_COLUMN_TYPE}, '
+                           f'coverage {self._COVERAGE_COLUMN_TYPE}, '
+                           f'mosaic_members {self._MOSAIC_COLUMN_TYPE}, '
                            f'PRIMARY KEY ({", ".join(keys)})) CHARACTER SET {self._CHARSET}')
 
-        # invalidate key cache
+        # invalidate key and column cache
         self._db_keys = None
+        self._columns = None
+
+    @requires_connection
+    def _upgrade_schema(self) -> None:
+        """Add columns introduced after the database was created.
+
+        Georeferences of existing datasets are computed when they are first read.
+        """
+        cursor = self._cursor
+        columns = self._columns
+        assert columns is not None
+
+        if self._OPTIONAL_COLUMNS <= columns:
+            return
+
+        if 'band_index' not in columns:
+            cursor.execute('ALTER TABLE datasets ADD COLUMN band_index INTEGER DEFAULT 1')
+
+        if 'coverage' not in columns:
+            # only computed during ingestion, until then tiles are checked against dataset bounds
+            cursor.execute(
+                f'ALTER TABLE metadata ADD COLUMN coverage {self._COVERAGE_COLUMN_TYPE}'
+            )
+
+        if 'mosaic_members' not in columns:
+            cursor.execute(
+                f'ALTER TABLE metadata ADD COLUMN mosaic_members {self._MOSAIC_COLUMN_TYPE}'
+            )
+
+        if 'georeference' not in columns:
+            cursor.execute(
+                f'ALTER TABLE metadata ADD COLUMN georeference {self._GEOREFERENCE_COLUMN_TYPE}'
+            )
+
+        self._columns = self._get_columns()
 
     def get_keys(self) -> OrderedDict:
         if self._db_keys is None:
@@ -378,6 +447,17 @@ class MySQLDriver(RasterDriver):
             'percentiles': np.array(decoded['percentiles'], dtype='float32').tobytes(),
             'metadata': json.dumps(decoded['metadata'])
         }
+
+        georeference = decoded.get('georeference')
+        if georeference is not None:
+            encoded['georeference'] = json.dumps(georeference)
+
+        if 'coverage' in decoded:
+            encoded['coverage'] = json.dumps(decoded['coverage'])
+
+        if 'mosaic_members' in decoded:
+            encoded['mosaic_members'] = json.dumps(decoded['mosaic_members'])
+
         return encoded
 
     @staticmethod
@@ -417,7 +497,8 @@ class MySQLDriver(RasterDriver):
             assert len(filepath) == 1
 
             # compute metadata and try again
-            self.insert(keys, filepath[keys], skip_metadata=False)
+            _, band = self._get_raster_source(keys)
+            self.insert(keys, filepath[keys], skip_metadata=False, band=band)
             cursor.execute(f'SELECT * FROM metadata WHERE {where_string}', keys)
             row = cursor.fetchone()
 
@@ -427,6 +508,74 @@ class MySQLDriver(RasterDriver):
         encoded_data = {col: row[col] for col in self.key_names + data_columns}
         return self._decode_data(encoded_data)
 
+    @requires_connection
+    @convert_exceptions('Could not retrieve datasets')
+    def _get_raster_source(self, keys: Sequence[str]) -> Tuple[str, int]:
+        cursor = self._cursor
+        where_string = ' AND '.join([f'{key}=%s' for key in self.key_names])
+
+        # database might not have been upgraded yet
+        band_column = 'band_index' if self._has_column('band_index') else '1 AS band_index'
+        cursor.execute(f'SELECT filepath, {band_column} FROM datasets WHERE {where_string}', keys)
+
+        row = cursor.fetchone()
+
+        if row is None:
+            raise exceptions.DatasetNotFoundError(f'No dataset found for given keys {keys}')
+
+        return row['filepath'], row['band_index']
+
+    @requires_connection
+    def _get_georeference(self, keys: Sequence[str]) -> Optional[Dict[str, Any]]:
+        if not self._has_column('georeference'):
+            # database has not been upgraded yet
+            return None
+
+        cursor = self._cursor
+        where_string = ' AND '.join([f'{key}=%s' for key in self.key_names])
+        cursor.execute(f'SELECT georeference FROM metadata WHERE {where_string}', keys)
+
+        row = cursor.fetchone()
+
+        if row is None or row['georeference'] is None:
+            return None
+
+        return json.loads(row['georeference'])
+
+    @requires_connection
+    def _get_coverage(self, keys: Sequence[str]) -> Optional[Dict[str, Any]]:
+        if not self._has_column('coverage'):
+            # database has not been upgraded yet
+            return None
+
+        cursor = self._cursor
+        where_string = ' AND '.join([f'{key}=%s' for key in self.key_names])
+        cursor.execute(f'SELECT coverage FROM metadata WHERE {where_string}', keys)
+
+        row = cursor.fetchone()
+
+        if row is None or row['coverage'] is None:
+            return None
+
+        return json.loads(row['coverage'])
+
+    @requires_connection
+    def _get_mosaic_members(self, keys: Sequence[str]) -> Optional[List[Dict[str, Any]]]:
+        if not self._has_column('mosaic_members'):
+            # database has not been upgraded yet
+            return None
+
+        cursor = self._cursor
+        where_string = ' AND '.join([f'{key}=%s' for key in self.key_names])
+        cursor.execute(f'SELECT mosaic_members FROM metadata WHERE {where_string}', keys)
+
+        row = cursor.fetchone()
+
+        if row is None or row['mosaic_members'] is None:
+            return None
+
+        return json.loads(row['mosaic_members'])
+
     @trace('insert')
     @requires_connection
     @convert_exceptions('Could not write to database')
@@ -435,7 +584,8 @@ class MySQLDriver(RasterDriver):
                filepath: str, *,
                metadata: Mapping[str, Any] = None,
                skip_metadata: bool = False,
-               override_path: str = None) -> None:
+               override_path: str = None,
+               band: int = 1) -> None:
         cursor = self._cursor
 
         if len(keys) != len(self.key_names):
@@ -446,13 +596,16 @@ class MySQLDriver(RasterDriver):
         if override_path is None:
             override_path = filepath
 
+        self._upgrade_schema()
+        self._clear_dataset_caches()
+
         keys = self._key_dict_to_sequence(keys)
-        template_string = ', '.join(['%s'] * (len(keys) + 1))
-        cursor.execute(f'REPLACE INTO datasets VALUES ({template_string})',
-                       [*keys, override_path])
+        template_string = ', '.join(['%s'] * (len(keys) + 2))
+        cursor.execute(f'REPLACE INTO datasets ({", ".join(self.key_names)}, filepath, '
+                       f'band_index) VALUES ({template_string})', [*keys, override_path, band])
 
         if metadata is None and not skip_metadata:
-            metadata = self.compute_metadata(filepath)
+            metadata = self.compute_metadata(filepath, band=band)
 
         if metadata is not None:
             encoded_data = self._encode_data(metadata)
@@ -479,6 +632,8 @@ class MySQLDriver(RasterDriver):
         if not self.get_datasets(key_dict):
             raise exceptions.DatasetNotFoundError(f'No dataset found with keys {keys}')
 
+        self._clear_dataset_caches()
+
         where_string = ' AND '.join([f'{key}=%s' for key in self.key_names])
         cursor.execute(f'DELETE FROM datasets WHERE {where_string}', keys)
         cursor.execute(f'DELETE FROM metadata WHERE {where_string}', keys)
@@ -3,13 +3,20 @@
 Base class for drivers operating on physical raster files.
 """
 
-from typing import (Any, Union, Mapping, Sequence, Dict, List, Tuple,
-                    TypeVar, Optional, cast, TYPE_CHECKING)
+from typing import (Any, Callable, Union, Mapping, Sequence, Dict, List, Tuple, Iterator,
+                    NamedTuple, TypeVar, Optional, FrozenSet, cast, TYPE_CHECKING)
 from abc import abstractmethod
+from collections import OrderedDict
 from concurrent.futures import Future, Executor, ProcessPoolExecutor, ThreadPoolExecutor
 
+import os
+import math
+import struct
+import time
 import contextlib
+import concurrent.futures
 import functools
+import itertools
 import logging
 import warnings
 import threading
@@ -19,6 +26,7 @@ import cachetools
 import cachetools.keys
 
 if TYPE_CHECKING:  # pragma: no cover
+    from rasterio.crs import CRS  # noqa: F401
     from rasterio.io import DatasetReader  # noqa: F401
 
 try:
@@ -28,22 +36,568 @@ except ImportError:  # pragma: no cover
     has_crick = False
 
 from terracotta import get_settings, exceptions
-from terracotta.cache import CompressedLFUCache
-from terracotta.drivers.base import requires_connection, Driver
+from terracotta.block_index import BlockIndex
+from terracotta.cache import BlockCache, CompressedLFUCache
+from terracotta.cog_reader import COGReader
+from terracotta.coverage import TileCoverage
+from terracotta.drivers.base import (requires_connection, Driver, PRIORITY_INTERACTIVE,
+                                     PRIORITY_PREFETCH)
+from terracotta.drivers import mosaic, shared_memory
 from terracotta.profile import trace
+from terracotta.range_cache import RangeCache, RemoteFile, get_fetcher
+from terracotta.tile_matrix import find_tile_matrix_set
 
 Number = TypeVar('Number', int, float)
+T = TypeVar('T')
 
 logger = logging.getLogger(__name__)
 
-executor: Executor
 
-try:
-    # this fails on architectures without /dev/shm
-    executor = ProcessPoolExecutor(max_workers=3)
-except OSError:
-    # fall back to serial evaluation
-    executor = ThreadPoolExecutor(max_workers=1)
+def _file_signature(path: str) -> Optional[Tuple[int, int, int]]:
+    """Return a tuple that changes whenever the local file at path changes.
+
+    Returns None for paths that cannot be stat'ed (such as remote or GDAL virtual paths).
+    """
+    try:
+        stat = os.stat(path)
+    except (OSError, ValueError):
+        return None
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+class DatasetHandlePool:
+    """Bounded pool of open rasterio datasets with least-recently-used eviction.
+
+    Repeated reads from the same file skip re-parsing the file header. The given GDAL
+    options are only in effect while a dataset is in use, so they never leak into the
+    calling thread. Cached handles are reopened if the underlying (local) file changes.
+
+    Rasterio datasets must not be shared between threads, so use :func:`get_dataset_pool`
+    to retrieve the pool belonging to the current thread. Call :meth:`close` from that
+    thread when the pool is no longer needed.
+    """
+
+    def __init__(self, maxsize: int, env_options: Mapping[str, Any]) -> None:
+        self.maxsize = maxsize
+        self.env_options = dict(env_options)
+        self._handles: 'OrderedDict[str, Tuple[Any, DatasetReader]]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._handles)
+
+    def _discard(self, path: str) -> None:
+        entry = self._handles.pop(path, None)
+        if entry is not None:
+            entry[1].close()
+
+    @contextlib.contextmanager
+    def open(self, path: str) -> Iterator['DatasetReader']:
+        """Context manager that yields an open dataset for path, re-using it if possible."""
+        import rasterio
+
+        with rasterio.Env(**self.env_options):
+            with self._open(path) as src:
+                yield src
+
+    @contextlib.contextmanager
+    def _open(self, path: str) -> Iterator['DatasetReader']:
+        import rasterio
+        from rasterio.errors import RasterioError
+
+        signature = _file_signature(path)
+        entry = self._handles.get(path)
+
+        if entry is not None and (entry[0] != signature or entry[1].closed):
+            # file changed on disk -> invalidate
+            self._discard(path)
+            entry = None
+
+        if entry is None:
+            src = rasterio.open(path)
+            if self.maxsize > 0:
+                self._handles[path] = (signature, src)
+                while len(self._handles) > self.maxsize:
+                    evicted_path = next(iter(self._handles))
+                    self._discard(evicted_path)
+        else:
+            src = entry[1]
+            self._handles.move_to_end(path)
+
+        try:
+            yield src
+        except (RasterioError, OSError):
+            # handle might be in a corrupt state
+            self._discard(path)
+            raise
+        finally:
+            if self.maxsize <= 0 or path not in self._handles:
+                src.close()
+
+    def clear(self) -> None:
+        """Close all open handles."""
+        for path in list(self._handles):
+            self._discard(path)
+
+    def close(self) -> None:
+        """Close all open handles."""
+        self.clear()
+
+
+_POOL_STORE = threading.local()
+
+
+def get_dataset_pool() -> DatasetHandlePool:
+    """Return the dataset handle pool of the current worker thread (created on first use)."""
+    pool = getattr(_POOL_STORE, 'pool', None)
+
+    # do not re-use handles inherited from a parent process
+    if pool is None or _POOL_STORE.pid != os.getpid():
+        if pool is not None:
+            pool.close()
+
+        settings = get_settings()
+        pool = DatasetHandlePool(settings.RASTER_HANDLE_POOL_SIZE, RasterDriver._RIO_ENV_KEYS)
+        _POOL_STORE.pool = pool
+        _POOL_STORE.pid = os.getpid()
+
+    return pool
+
+
+class _COGReaderState:
+    readers: 'OrderedDict[str, Tuple[Any, Optional[COGReader]]]' = OrderedDict()
+    block_cache: Optional[BlockCache] = None
+    range_cache: Optional[RangeCache] = None
+    lock = threading.Lock()
+
+
+def get_range_cache() -> RangeCache:
+    """Return the cache of remote raster byte ranges of the current process.
+
+    The cache is re-created if any of the ``REMOTE_RASTER_CACHE_*`` settings change.
+    """
+    settings = get_settings()
+    memory_size = settings.REMOTE_RASTER_CACHE_MEMORY_SIZE
+    disk_size = settings.REMOTE_RASTER_CACHE_DISK_SIZE
+    disk_dir = settings.REMOTE_RASTER_CACHE_DIR if disk_size > 0 else None
+
+    with _COGReaderState.lock:
+        range_cache = _COGReaderState.range_cache
+
+        if range_cache is None or (
+            (range_cache.memory_size, range_cache.disk_dir, range_cache.disk_size)
+            != (memory_size, disk_dir, disk_size)
+        ):
+            range_cache = RangeCache(memory_size, disk_dir, disk_size)
+            _COGReaderState.range_cache = range_cache
+            # readers hold a reference to the old cache
+            _COGReaderState.readers.clear()
+
+    return range_cache
+
+
+def get_block_cache() -> Optional[BlockCache]:
+    """Return the decoded block cache of the current process (None if disabled).
+
+    The cache is re-created if ``RASTER_BLOCK_CACHE_SIZE`` changes.
+    """
+    maxsize = get_settings().RASTER_BLOCK_CACHE_SIZE
+
+    with _COGReaderState.lock:
+        block_cache = _COGReaderState.block_cache
+        current_size = block_cache.maxsize if block_cache is not None else 0
+
+        if current_size != maxsize:
+            block_cache = BlockCache(maxsize) if maxsize > 0 else None
+            _COGReaderState.block_cache = block_cache
+            # readers hold a reference to the old cache
+            _COGReaderState.readers.clear()
+
+    return block_cache
+
+
+def get_cog_reader(path: str) -> Optional[COGReader]:
+    """Return a NumPy reader for the file at path, or None if the file is not supported.
+
+    Readers are shared by all threads of a process, and so is the cache of decoded blocks
+    they read from. At most ``RASTER_NUMPY_READER_POOL_SIZE`` readers are kept, and they are
+    re-created if the underlying file changes. HTTP(S) and S3 paths are read through
+    the cache of remote byte ranges, and are assumed to never change.
+    """
+    signature: Any = _file_signature(path)
+    fetcher = None
+
+    if signature is None:
+        fetcher = get_fetcher(path)
+        if fetcher is None:
+            return None
+        signature = 'remote'
+
+    block_cache = get_block_cache()
+    range_cache = get_range_cache() if fetcher is not None else None
+
+    with _COGReaderState.lock:
+        entry = _COGReaderState.readers.get(path)
+        if entry is not None and entry[0] == signature:
+            _COGReaderState.readers.move_to_end(path)
+            return entry[1]
+
+    reader: Optional[COGReader]
+
+    try:
+        if fetcher is not None:
+            assert range_cache is not None
+            source = RemoteFile(path, fetcher, range_cache)
+            reader = COGReader(path, block_cache=block_cache, source=source)
+        else:
+            reader = COGReader(path, block_cache=block_cache)
+    except (ValueError, OSError, struct.error) as exc:
+        logger.debug(f'Reading {path} through GDAL: {exc}')
+        reader = None
+
+    maxsize = get_settings().RASTER_NUMPY_READER_POOL_SIZE
+
+    with _COGReaderState.lock:
+        _COGReaderState.readers[path] = (signature, reader)
+        while len(_COGReaderState.readers) > maxsize:
+            _COGReaderState.readers.popitem(last=False)
+
+    return reader
+
+
+@functools.lru_cache(maxsize=128)
+def _get_crs(crs: str) -> 'CRS':
+    from rasterio.crs import CRS
+    return CRS.from_user_input(crs)
+
+
+@functools.lru_cache(maxsize=128)
+def _is_same_crs(first: str, second: str) -> bool:
+    return _get_crs(first) == _get_crs(second)
+
+
+class InlineExecutor(Executor):
+    """Executor that runs every task immediately in the calling thread."""
+
+    def submit(self, fn: Callable[..., T], *args: Any,  # type: ignore[override]
+               **kwargs: Any) -> 'Future[T]':
+        future: Future[T] = Future()
+        future.set_running_or_notify_cancel()
+
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as exc:
+            future.set_exception(exc)
+        else:
+            future.set_result(result)
+
+        return future
+
+
+class _InFlightTile:
+    """A tile that is being retrieved, shared by all requests waiting for it."""
+
+    __slots__ = ('future', 'priority', 'deadline', 'requested')
+
+    def __init__(self, priority: int, deadline: Optional[float],
+                 requested: bool = True) -> None:
+        self.future: Future = Future()
+        self.priority = priority
+        self.deadline = deadline
+        # tiles of a metatile are retrieved along with another tile, and only
+        # requested once someone waits for them
+        self.requested = requested
+
+    def add_request(self, priority: int, deadline: Optional[float]) -> None:
+        # the most urgent request determines priority, the most patient one the deadline
+        self.requested = True
+        self.priority = min(self.priority, priority)
+
+        if self.deadline is None or deadline is None:
+            self.deadline = None
+        else:
+            self.deadline = max(self.deadline, deadline)
+
+
+class _ScheduledJob(NamedTuple):
+    submit: Callable[[Executor], Future]
+    tiles: Sequence[_InFlightTile]
+    future: Future
+    sequence: int
+
+    @property
+    def deadline(self) -> float:
+        if any(tile.deadline is None for tile in self.tiles):
+            return float('inf')
+        return max(cast(float, tile.deadline) for tile in self.tiles)
+
+    @property
+    def sort_key(self) -> Tuple[int, float, int]:
+        # by priority, then earliest deadline first, then first come first served
+        return min(tile.priority for tile in self.tiles), self.deadline, self.sequence
+
+
+class _ExecutorState:
+    executor: Optional[Executor] = None
+    config: Optional[Tuple[str, int, int]] = None
+    pid: Optional[int] = None
+    num_tasks: int = 0
+    num_pending: int = 0
+    queue: List[_ScheduledJob] = []
+    sequence = itertools.count()
+    lock = threading.Lock()
+
+
+class _PrefetchState:
+    num_pending: int = 0
+    pending_per_dataset: Dict[Tuple[str, ...], int] = {}
+    lock = threading.Lock()
+
+
+def _reset_after_fork() -> None:
+    # locks might be held by another thread while forking,
+    # and jobs of the parent process never finish here
+    _ExecutorState.lock = threading.Lock()
+    _ExecutorState.num_pending = 0
+    _ExecutorState.queue = []
+    _DISPATCH_STORE.active = False
+    _PrefetchState.lock = threading.Lock()
+    _PrefetchState.num_pending = 0
+    _PrefetchState.pending_per_dataset = {}
+    _COGReaderState.lock = threading.Lock()
+    _COGReaderState.readers = OrderedDict()
+    _COGReaderState.block_cache = None
+    _COGReaderState.range_cache = None
+
+
+if hasattr(os, 'register_at_fork'):  # Python >= 3.7
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _create_executor(executor_type: str, num_workers: int) -> Executor:
+    if executor_type == 'inline':
+        return InlineExecutor()
+
+    if executor_type == 'process':
+        try:
+            # this fails on architectures without /dev/shm
+            return ProcessPoolExecutor(max_workers=num_workers)
+        except OSError:
+            # fall back to threads
+            pass
+
+    return ThreadPoolExecutor(max_workers=num_workers)
+
+
+def get_executor() -> Executor:
+    """Return the executor to submit the next raster task to.
+
+    The executor is created on first use, re-created in forked child processes and when the
+    executor settings change. If RASTER_EXECUTOR_MAX_TASKS is set, the whole executor is
+    replaced after that many tasks per worker.
+    """
+    settings = get_settings()
+    config = (
+        settings.RASTER_EXECUTOR, settings.RASTER_EXECUTOR_WORKERS,
+        settings.RASTER_EXECUTOR_MAX_TASKS
+    )
+    max_tasks = settings.RASTER_EXECUTOR_MAX_TASKS * settings.RASTER_EXECUTOR_WORKERS
+    pid = os.getpid()
+
+    with _ExecutorState.lock:
+        executor = _ExecutorState.executor
+        needs_recycling = max_tasks > 0 and _ExecutorState.num_tasks >= max_tasks
+        is_inherited = _ExecutorState.pid != pid
+
+        if executor is None or is_inherited or _ExecutorState.config != config or needs_recycling:
+            if executor is not None and not is_inherited:
+                # running tasks finish in the background; executors inherited
+                # from a parent process are unusable and must not be touched
+                executor.shutdown(wait=False)
+
+            executor = _create_executor(*config[:2])
+            _ExecutorState.executor = executor
+            _ExecutorState.config = config
+            _ExecutorState.pid = pid
+            _ExecutorState.num_tasks = 0
+
+        _ExecutorState.num_tasks += 1
+
+    return executor
+
+
+def _schedule_job(submit: Callable[[Executor], Future],
+                  tiles: Sequence[_InFlightTile]) -> Future:
+    # Queue a job that retrieves the given tiles. It is submitted to the executor when a
+    # worker is idle and no more urgent job is waiting.
+    job = _ScheduledJob(submit, tiles, Future(), next(_ExecutorState.sequence))
+
+    with _ExecutorState.lock:
+        _ExecutorState.queue.append(job)
+
+    _dispatch_jobs()
+    return job.future
+
+
+_DISPATCH_STORE = threading.local()
+
+
+def _dispatch_jobs() -> None:
+    # Start the most urgent queued jobs on idle workers,
+    # and cancel all jobs whose deadline passed before they could start.
+    # Jobs that finish right away (like on the inline executor) ask the running dispatch
+    # loop of their thread for another round instead of recursing once per job.
+    if getattr(_DISPATCH_STORE, 'active', False):
+        _DISPATCH_STORE.repeat = True
+        return
+
+    _DISPATCH_STORE.active = True
+
+    try:
+        _DISPATCH_STORE.repeat = True
+        while _DISPATCH_STORE.repeat:
+            _DISPATCH_STORE.repeat = False
+            _dispatch_ready_jobs()
+    finally:
+        _DISPATCH_STORE.active = False
+
+
+def _drop_expired_jobs() -> None:
+    # Cancel all queued jobs whose deadline passed before they could start.
+    now = time.monotonic()
+
+    with _ExecutorState.lock:
+        queue = _ExecutorState.queue
+        expired_jobs = [job for job in queue if job.deadline < now]
+
+        if expired_jobs:
+            queue[:] = [job for job in queue if job.deadline >= now]
+
+    for job in expired_jobs:
+        job.future.cancel()
+
+
+def _dispatch_ready_jobs() -> None:
+    num_workers = get_settings().RASTER_EXECUTOR_WORKERS
+    _drop_expired_jobs()
+
+    with _ExecutorState.lock:
+        queue = _ExecutorState.queue
+        queue.sort(key=lambda job: job.sort_key)
+
+        num_idle = max(num_workers - _ExecutorState.num_pending, 0)
+        ready_jobs = queue[:num_idle]
+        del queue[:num_idle]
+        _ExecutorState.num_pending += len(ready_jobs)
+
+    for job in ready_jobs:
+        _start_job(job)
+
+
+def _start_job(job: _ScheduledJob) -> None:
+    def finish(task: Future) -> None:
+        with _ExecutorState.lock:
+            _ExecutorState.num_pending -= 1
+
+        # keep workers busy before handling the result
+        _dispatch_jobs()
+
+        exc = task.exception()
+        if exc is not None:
+            job.future.set_exception(exc)
+        else:
+            job.future.set_result(task.result())
+
+    try:
+        task = job.submit(get_executor())
+    except Exception as exc:
+        with _ExecutorState.lock:
+            _ExecutorState.num_pending -= 1
+        job.future.set_exception(exc)
+        return
+
+    task.add_done_callback(finish)
+
+
+def executor_is_busy() -> bool:
+    """Check whether the tile executor has no capacity left for background work."""
+    settings = get_settings()
+
+    if settings.RASTER_EXECUTOR == 'inline':
+        # would block the current request
+        return True
+
+    # jobs that will never run do not keep the executor busy
+    _drop_expired_jobs()
+
+    return bool(_ExecutorState.queue) or (
+        _ExecutorState.num_pending >= settings.RASTER_EXECUTOR_WORKERS
+    )
+
+
+def _acquire_prefetch_budget(dataset: Tuple[str, ...]) -> bool:
+    settings = get_settings()
+
+    with _PrefetchState.lock:
+        num_pending_dataset = _PrefetchState.pending_per_dataset.get(dataset, 0)
+
+        if (_PrefetchState.num_pending >= settings.PREFETCH_MAX_PENDING
+                or num_pending_dataset >= settings.PREFETCH_MAX_PENDING_PER_DATASET):
+            return False
+
+        _PrefetchState.num_pending += 1
+        _PrefetchState.pending_per_dataset[dataset] = num_pending_dataset + 1
+
+    return True
+
+
+def _release_prefetch_budget(dataset: Tuple[str, ...]) -> None:
+    with _PrefetchState.lock:
+        _PrefetchState.num_pending -= 1
+        _PrefetchState.pending_per_dataset[dataset] -= 1
+
+        if not _PrefetchState.pending_per_dataset[dataset]:
+            del _PrefetchState.pending_per_dataset[dataset]
+
+
+def _upsample_future(future: Future, window: Tuple[slice, slice], factor: int) -> Future:
+    # Resolve to the given window of a tile, enlarged by an integer factor (nearest neighbor).
+    out: Future = Future()
+
+    def upsample(_: Future) -> None:
+        try:
+            tile = future.result()[window]
+            data = np.repeat(np.repeat(tile.data, factor, axis=0), factor, axis=1)
+            mask = np.repeat(np.repeat(np.ma.getmaskarray(tile), factor, axis=0), factor, axis=1)
+        except BaseException as exc:
+            out.set_exception(exc)
+        else:
+            out.set_result(np.ma.masked_array(data, mask=mask))
+
+    future.add_done_callback(upsample)
+    return out
+
+
+class ValidityGrid(NamedTuple):
+    """Coarse grid over a raster, where each cell records whether it contains valid pixels."""
+    cells: np.ndarray
+    cell_shape: Tuple[int, int]
+
+    @classmethod
+    def for_raster(cls, shape: Tuple[int, int], cell_shape: Tuple[int, int]) -> 'ValidityGrid':
+        grid_shape = (-(-shape[0] // cell_shape[0]), -(-shape[1] // cell_shape[1]))
+        return cls(np.zeros(grid_shape, dtype='bool'), cell_shape)
+
+
+def _mark_valid_cells(grid: ValidityGrid, valid: np.ndarray, row_off: int, col_off: int) -> None:
+    # OR-pool a full resolution validity mask starting at given offset into the grid cells
+    cell_rows = np.arange(row_off, row_off + valid.shape[0]) // grid.cell_shape[0]
+    cell_cols = np.arange(col_off, col_off + valid.shape[1]) // grid.cell_shape[1]
+    row_starts = np.flatnonzero(np.diff(cell_rows, prepend=-1))
+    col_starts = np.flatnonzero(np.diff(cell_cols, prepend=-1))
+    pooled = np.logical_or.reduceat(
+        np.logical_or.reduceat(valid, row_starts, axis=0), col_starts, axis=1
+    )
+    grid.cells[np.ix_(cell_rows[row_starts], cell_cols[col_starts])] |= pooled
 
 
 class RasterDriver(Driver):
@@ -53,6 +607,10 @@ class RasterDriver(Driver):
     """
     _TARGET_CRS: str = 'epsg:3857'
     _LARGE_RASTER_THRESHOLD: int = 10980 * 10980
+    _COVERAGE_MAX_SHAPE: Tuple[int, int] = (256, 256)
+    _COVERAGE_CACHE_SIZE: int = 256
+    _MOSAIC_CACHE_SIZE: int = 256
+    _GEOREFERENCE_CACHE_SIZE: int = 1024
     _RIO_ENV_KEYS = dict(
         GDAL_TIFF_INTERNAL_MASK=True,
         GDAL_DISABLE_READDIR_ON_OPEN='EMPTY_DIR'
@@ -63,9 +621,58 @@ class RasterDriver(Driver):
         settings = get_settings()
         self._raster_cache = CompressedLFUCache(
             settings.RASTER_CACHE_SIZE,
-            compression_level=settings.RASTER_CACHE_COMPRESS_LEVEL
+            compression_level=settings.RASTER_CACHE_COMPRESS_LEVEL,
+            codec=settings.RASTER_CACHE_COMPRESSION,
+            compression_filter=settings.RASTER_CACHE_FILTER,
+            policy=settings.RASTER_CACHE_POLICY
         )
         self._cache_lock = threading.RLock()
+
+        if not settings.RASTER_NUMPY_READER:
+            default_settings = type(settings)._field_defaults
+            remote_cache_settings = [
+                key for key in settings._fields
+                if key.startswith('REMOTE_RASTER_CACHE_')
+                and getattr(settings, key) != default_settings[key]
+            ]
+            if remote_cache_settings:
+                warnings.warn(
+                    f'Setting(s) {", ".join(remote_cache_settings)} have no effect, since remote '
+                    'rasters are only cached when reading through the NumPy reader. Set '
+                    'RASTER_NUMPY_READER to enable it.',
+                    exceptions.PerformanceWarning, stacklevel=3
+                )
+
+        # (keys, tile bounds) of tiles that are known to be outside of the dataset
+        self._empty_tiles: cachetools.TTLCache = cachetools.TTLCache(
+            maxsize=settings.EMPTY_TILE_CACHE_SIZE, ttl=settings.EMPTY_TILE_CACHE_TTL
+        )
+
+        # key names in database order, known after the first key lookup
+        self._known_key_names: Optional[Tuple[str, ...]] = None
+
+        # keys -> decoded tile coverage (or None if not stored)
+        self._coverage_cache: cachetools.LRUCache = cachetools.LRUCache(
+            maxsize=self._COVERAGE_CACHE_SIZE
+        )
+
+        # keys -> spatial index of mosaic members
+        self._mosaic_cache: cachetools.LRUCache = cachetools.LRUCache(
+            maxsize=self._MOSAIC_CACHE_SIZE
+        )
+
+        # keys -> (georeference, (band, decoded block index)) of dataset (or None if not stored)
+        self._georeference_cache: cachetools.LRUCache = cachetools.LRUCache(
+            maxsize=self._GEOREFERENCE_CACHE_SIZE
+        )
+
+        # (pinned datasets, paths of their raster files) or None if not resolved yet
+        self._pinned_paths: Optional[Tuple[List[List[str]], FrozenSet[str]]] = None
+
+        # cache key -> future of running retrieval, shared by all concurrent requests
+        self._in_flight: Dict[Any, _InFlightTile] = {}
+        self._cache_stats: Dict[str, int] = dict(hits=0, misses=0, coalesced=0, prefetched=0)
+
         super().__init__(*args, **kwargs)
 
     # specify signature and docstring for insert
@@ -75,7 +682,8 @@ class RasterDriver(Driver):
                filepath: str, *,
                metadata: Mapping[str, Any] = None,
                skip_metadata: bool = False,
-               override_path: str = None) -> None:
+               override_path: str = None,
+               band: int = 1) -> None:
         """Insert a raster file into the database.
 
         Arguments:
@@ -94,10 +702,68 @@ class RasterDriver(Driver):
             override_path: Override the path to the raster file in the database. Use this option if
                 you intend to copy the data somewhere else after insertion (e.g. when moving files
                 to a cloud storage later on).
+            band: Index of the band inside the raster file that holds the dataset (starting at
+                1). Several datasets can point to different bands of the same file, which are
+                then read together when requested at the same time.
 
         """
         pass
 
+    @requires_connection
+    def insert_mosaic(self,
+                      keys: Union[Sequence[str], Mapping[str, str]],
+                      members: Sequence[Union[Sequence[str], Mapping[str, str]]], *,
+                      extra_metadata: Any = None) -> None:
+        """Insert a virtual mosaic dataset that is assembled from other datasets on the fly.
+
+        The mosaic only references its members, so no raster data is duplicated. Members can
+        be mosaics themselves. Metadata is estimated from the metadata of all members, so
+        re-insert the mosaic after changing any of them.
+
+        Arguments:
+
+            keys: Keys identifying the new mosaic dataset.
+            members: Keys of all member datasets. Where members overlap, pixels are taken
+                from the first member that has valid data.
+            extra_metadata: Any additional metadata to attach to the dataset.
+
+        """
+        keys = tuple(self._key_dict_to_sequence(keys))
+        member_keys = [tuple(self._key_dict_to_sequence(member)) for member in members]
+
+        if not member_keys:
+            raise ValueError('Mosaic must have at least one member')
+
+        # reject cycles through nested mosaics
+        to_visit = list(member_keys)
+        visited = set()
+
+        while to_visit:
+            member = to_visit.pop()
+
+            if member == keys:
+                raise ValueError(f'Mosaic {keys} cannot contain itself')
+
+            if member in visited:
+                continue
+
+            visited.add(member)
+            nested_members = self._get_mosaic_members(member)
+
+            if nested_members is not None:
+                to_visit.extend(tuple(nested['keys']) for nested in nested_members)
+
+        member_metadata = [self.get_metadata(member) for member in member_keys]
+
+        metadata = mosaic.merge_metadata(member_metadata)
+        metadata['metadata'] = extra_metadata or {}
+        metadata['mosaic_members'] = [
+            {'keys': list(member), 'bounds': list(member_meta['bounds'])}
+            for member, member_meta in zip(member_keys, member_metadata)
+        ]
+
+        self.insert(keys, mosaic.MOSAIC_PATH, metadata=metadata)
+
     # specify signature and docstring for get_datasets
     @abstractmethod
     def get_datasets(self, where: Mapping[str, str] = None,
@@ -134,11 +800,19 @@ class RasterDriver(Driver):
 
     def _key_dict_to_sequence(self, keys: Union[Mapping[str, Any], Sequence[Any]]) -> List[Any]:
         """Convert {key_name: key_value} to [key_value] with the correct key order."""
+        key_names = self._known_key_names
+        is_mapping = isinstance(keys, Mapping)
+
+        if is_mapping or key_names is None:
+            # remember key order so empty tile lookups can normalize keys without database access
+            key_names = self._known_key_names = tuple(self.key_names)
+
+        if not is_mapping:
+            return list(keys)
+
         try:
             keys_as_mapping = cast(Mapping[str, Any], keys)
-            return [keys_as_mapping[key] for key in self.key_names]
-        except TypeError:  # not a mapping
-            return list(keys)
+            return [keys_as_mapping[key] for key in key_names]
         except KeyError as exc:
             raise exceptions.InvalidKeyError('Encountered unknown key') from exc
 
@@ -174,8 +848,13 @@ class RasterDriver(Driver):
         return out
 
     @staticmethod
-    def _compute_image_stats_chunked(dataset: 'DatasetReader') -> Optional[Dict[str, Any]]:
-        """Compute statistics for the given rasterio dataset by looping over chunks."""
+    def _compute_image_stats_chunked(dataset: 'DatasetReader', band: int = 1,
+                                     valid_grids: Sequence[ValidityGrid] = ()
+                                     ) -> Optional[Dict[str, Any]]:
+        """Compute statistics for the given rasterio dataset by looping over chunks.
+
+        Cells of all given valid_grids that contain valid pixels are marked along the way.
+        """
         from rasterio import features, warp, windows
         from shapely import geometry
 
@@ -184,12 +863,17 @@ class RasterDriver(Driver):
         sstats = SummaryStats()
         convex_hull = geometry.Polygon()
 
-        block_windows = [w for _, w in dataset.block_windows(1)]
+        block_windows = [w for _, w in dataset.block_windows(band)]
 
         for w in block_windows:
             with warnings.catch_warnings():
                 warnings.filterwarnings('ignore', message='invalid value encountered.*')
-                block_data = dataset.read(1, window=w, masked=True)
+                block_data = dataset.read(band, window=w, masked=True)
+
+            if valid_grids:
+                block_valid = ~np.ma.getmaskarray(block_data)
+                for valid_grid in valid_grids:
+                    _mark_valid_cells(valid_grid, block_valid, w.row_off, w.col_off)
 
             # handle NaNs for float rasters
             block_data = np.ma.masked_invalid(block_data, copy=False)
@@ -235,8 +919,15 @@ class RasterDriver(Driver):
 
     @staticmethod
     def _compute_image_stats(dataset: 'DatasetReader',
-                             max_shape: Sequence[int] = None) -> Optional[Dict[str, Any]]:
-        """Compute statistics for the given rasterio dataset by reading it into memory."""
+                             max_shape: Sequence[int] = None,
+                             band: int = 1,
+                             valid_grids: Sequence[ValidityGrid] = ()
+                             ) -> Optional[Dict[str, Any]]:
+        """Compute statistics for the given rasterio dataset by reading it into memory.
+
+        Cells of all given valid_grids that contain valid pixels are marked along the way.
+        This requires reading at full resolution, so max_shape must not be given in that case.
+        """
         from rasterio import features, warp, transform
         from shapely import geometry
 
@@ -251,11 +942,18 @@ class RasterDriver(Driver):
         data_transform = transform.from_bounds(
             *dataset.bounds, height=out_shape[0], width=out_shape[1]
         )
-        raster_data = dataset.read(1, out_shape=out_shape, masked=True)
+        raster_data = dataset.read(band, out_shape=out_shape, masked=True)
+        nodata = dataset.nodatavals[band - 1]
 
-        if dataset.nodata is not None:
+        if valid_grids:
+            assert out_shape == (dataset.height, dataset.width)
+            raster_valid = ~np.ma.getmaskarray(raster_data)
+            for valid_grid in valid_grids:
+                _mark_valid_cells(valid_grid, raster_valid, 0, 0)
+
+        if nodata is not None:
             # nodata values might slip into output array if out_shape < dataset.shape
-            raster_data = np.ma.masked_equal(raster_data, dataset.nodata, copy=False)
+            raster_data = np.ma.masked_equal(raster_data, nodata, copy=False)
 
         # handle NaNs for float rasters
         raster_data = np.ma.masked_invalid(raster_data, copy=False)
@@ -296,7 +994,8 @@ class RasterDriver(Driver):
     def compute_metadata(cls, raster_path: str, *,  # type: ignore[override]  # noqa: F821
                          extra_metadata: Any = None,
                          use_chunks: bool = None,
-                         max_shape: Sequence[int] = None) -> Dict[str, Any]:
+                         max_shape: Sequence[int] = None,
+                         band: int = 1) -> Dict[str, Any]:
         """Read given raster file and compute metadata from it.
 
         This handles most of the heavy lifting during raster ingestion. The returned metadata can
@@ -312,7 +1011,9 @@ class RasterDriver(Driver):
             max_shape: Gives the maximum number of pixels used in each dimension to compute
                 metadata. Setting this to a relatively small size such as ``(1024, 1024)`` will
                 result in much faster metadata computation for large images, at the expense of
-                inaccurate results.
+                inaccurate results. Also skips computing which tiles and blocks of the file
+                contain data.
+            band: Index of the band to use for multi-band raster files (starting at 1).
 
         """
         import rasterio
@@ -338,7 +1039,13 @@ class RasterDriver(Driver):
                 )
 
             with rasterio.open(raster_path) as src:
-                if src.nodata is None and not cls._has_alpha_band(src):
+                if not 1 <= band <= src.count:
+                    raise ValueError(
+                        f'Raster file {raster_path} has no band {band} '
+                        f'(available: 1 to {src.count})'
+                    )
+
+                if src.nodatavals[band - 1] is None and not cls._has_alpha_band(src):
                     warnings.warn(
                         f'Raster file {raster_path} does not have a valid nodata value, '
                         'and does not contain an alpha band. No data will be masked.'
@@ -348,6 +1055,17 @@ class RasterDriver(Driver):
                     src.crs, 'epsg:4326', *src.bounds, densify_pts=21
                 )
 
+                georeference = cls._compute_georeference(src, band=band)
+
+                # filled while computing statistics, so the file is only read once
+                valid_grids: List[ValidityGrid] = []
+                block_grid = coverage_grid = None
+
+                if max_shape is None:
+                    coverage_grid = cls._get_coverage_grid(src)
+                    block_grid = cls._get_block_grid(src, band)
+                    valid_grids = [grid for grid in (coverage_grid, block_grid) if grid is not None]
+
                 if use_chunks is None and max_shape is None:
                     use_chunks = src.width * src.height > RasterDriver._LARGE_RASTER_THRESHOLD
 
@@ -366,9 +1084,26 @@ class RasterDriver(Driver):
                     use_chunks = False
 
                 if use_chunks:
-                    raster_stats = RasterDriver._compute_image_stats_chunked(src)
+                    raster_stats = RasterDriver._compute_image_stats_chunked(
+                        src, band, valid_grids=valid_grids
+                    )
                 else:
-                    raster_stats = RasterDriver._compute_image_stats(src, max_shape)
+                    raster_stats = RasterDriver._compute_image_stats(
+                        src, max_shape, band, valid_grids=valid_grids
+                    )
+
+                coverage = None
+                if coverage_grid is not None:
+                    coverage = cls._compute_coverage(src, coverage_grid)
+
+                if block_grid is not None:
+                    # overview levels are derived from the full resolution bitmap
+                    block_index = BlockIndex.from_bitmap(
+                        block_grid.cells, shape=(src.height, src.width),
+                        block_shape=src.block_shapes[band - 1],
+                        transform=tuple(src.transform)[:6], overviews=src.overviews(band)
+                    )
+                    georeference['block_index'] = dict(block_index.to_dict(), band=band)
 
         if raster_stats is None:
             raise ValueError(f'Raster file {raster_path} does not contain any valid data')
@@ -377,6 +1112,8 @@ class RasterDriver(Driver):
 
         row_data['bounds'] = bounds
         row_data['metadata'] = extra_metadata
+        row_data['georeference'] = georeference
+        row_data['coverage'] = coverage.to_dict() if coverage is not None else None
 
         return row_data
 
@@ -407,178 +1144,1388 @@ class RasterDriver(Driver):
         )
 
     @classmethod
-    @trace('get_raster_tile')
-    def _get_raster_tile(cls, path: str, *,
-                         reprojection_method: str,
-                         resampling_method: str,
-                         tile_bounds: Tuple[float, float, float, float] = None,
-                         tile_size: Tuple[int, int] = (256, 256),
-                         preserve_values: bool = False) -> np.ma.MaskedArray:
-        """Load a raster dataset from a file through rasterio.
+    def _compute_georeference(cls, src: 'DatasetReader', band: int = 1,
+                              target_crs: str = None) -> Dict[str, Any]:
+        """Compute all georeferencing information needed to read tiles from given dataset.
 
-        Heavily inspired by mapbox/rio-tiler
+        This only depends on the file itself, so it is computed once during ingestion (for the
+        default target CRS) and stored alongside the metadata.
         """
-        import rasterio
-        from rasterio import transform, windows, warp
-        from rasterio.vrt import WarpedVRT
-        from affine import Affine
+        from rasterio import warp
 
-        dst_bounds: Tuple[float, float, float, float]
+        if target_crs is None:
+            target_crs = cls._TARGET_CRS
 
-        if preserve_values:
-            reproject_enum = resampling_enum = cls._get_resampling_enum('nearest')
-        else:
-            reproject_enum = cls._get_resampling_enum(reprojection_method)
-            resampling_enum = cls._get_resampling_enum(resampling_method)
+        target_bounds = warp.transform_bounds(src.crs, target_crs, *src.bounds)
+        target_transform, _, _ = warp.calculate_default_transform(
+            src.crs, target_crs, src.width, src.height, *src.bounds
+        )
 
-        with contextlib.ExitStack() as es:
-            es.enter_context(rasterio.Env(**cls._RIO_ENV_KEYS))
-            try:
-                with trace('open_dataset'):
-                    src = es.enter_context(rasterio.open(path))
-            except OSError:
-                raise IOError('error while reading file {}'.format(path))
+        return {
+            'crs': src.crs.to_string(),
+            'target_crs': target_crs,
+            'target_bounds': list(target_bounds),
+            'target_resolution': [abs(target_transform.a), abs(target_transform.e)],
+            'overviews': src.overviews(band),
+            'dtype': src.dtypes[band - 1],
+            'nodata': src.nodatavals[band - 1],
+            'has_alpha': cls._has_alpha_band(src)
+        }
 
-            # compute buonds in target CRS
-            dst_bounds = warp.transform_bounds(src.crs, cls._TARGET_CRS, *src.bounds)
+    @classmethod
+    def _get_coverage_grid(cls, src: 'DatasetReader') -> ValidityGrid:
+        """Return an empty grid of at most ``_COVERAGE_MAX_SHAPE`` cells covering given file."""
+        cell_shape = (
+            -(-src.height // cls._COVERAGE_MAX_SHAPE[0]),
+            -(-src.width // cls._COVERAGE_MAX_SHAPE[1])
+        )
+        return ValidityGrid.for_raster((src.height, src.width), cell_shape)
 
-            if tile_bounds is None:
-                tile_bounds = dst_bounds
+    @staticmethod
+    def _compute_coverage(src: 'DatasetReader',
+                          coverage_grid: ValidityGrid) -> Optional[TileCoverage]:
+        """Compute which XYZ tiles contain valid data of given dataset.
 
-            # prevent loads of very sparse data
-            cover_ratio = (
-                (dst_bounds[2] - dst_bounds[0]) / (tile_bounds[2] - tile_bounds[0])
-                * (dst_bounds[3] - dst_bounds[1]) / (tile_bounds[3] - tile_bounds[1])
-            )
+        Every cell of the coverage grid that contains a single valid pixel at full resolution
+        is treated as valid, so no data is ever missed.
+        """
+        from rasterio import warp
 
-            if cover_ratio < 0.01:
-                raise exceptions.TileOutOfBoundsError('dataset covers less than 1% of tile')
+        if not coverage_grid.cells.any():
+            return None
 
-            # compute suggested resolution in target CRS
-            dst_transform, _, _ = warp.calculate_default_transform(
-                src.crs, cls._TARGET_CRS, src.width, src.height, *src.bounds
-            )
-            dst_res = (abs(dst_transform.a), abs(dst_transform.e))
+        # pixel offsets of cell corners, last cells might be smaller
+        cell_height, cell_width = coverage_grid.cell_shape
+        num_rows, num_cols = coverage_grid.cells.shape
+        corner_cols, corner_rows = np.meshgrid(
+            np.minimum(np.arange(num_cols + 1) * cell_width, src.width),
+            np.minimum(np.arange(num_rows + 1) * cell_height, src.height)
+        )
+        corner_x, corner_y = src.transform * (corner_cols.ravel(), corner_rows.ravel())
+        lon, lat = warp.transform(src.crs, 'epsg:4326', corner_x, corner_y)
 
-            # make sure VRT resolves the entire tile
-            tile_transform = transform.from_bounds(*tile_bounds, *tile_size)
-            tile_res = (abs(tile_transform.a), abs(tile_transform.e))
+        return TileCoverage.from_pixel_corners(
+            np.array(lon).reshape(corner_cols.shape), np.array(lat).reshape(corner_cols.shape),
+            coverage_grid.cells
+        )
 
-            if tile_res[0] < dst_res[0] or tile_res[1] < dst_res[1]:
-                dst_res = tile_res
-                resampling_enum = cls._get_resampling_enum('nearest')
+    @staticmethod
+    def _get_block_grid(src: 'DatasetReader', band: int = 1) -> Optional[ValidityGrid]:
+        """Return an empty grid with one cell per block of given band.
 
-            # pad tile bounds to prevent interpolation artefacts
+        Returns None for files that are not tiled.
+        """
+        block_height, block_width = src.block_shapes[band - 1]
+
+        if block_width >= src.width and block_height < src.height:
+            # striped layout
+            return None
+
+        return ValidityGrid.for_raster((src.height, src.width), (block_height, block_width))
+
+    @staticmethod
+    def _tile_has_data(block_index: BlockIndex, src_crs: str, target_crs: str,
+                       tile_bounds: Sequence[float], tile_size: Sequence[int]) -> bool:
+        """Check whether any block of the source file that a tile is read from contains data."""
+        from affine import Affine
+        from rasterio import warp
+        from rasterio._err import CPLE_BaseError
+
+        if _is_same_crs(src_crs, target_crs):
+            src_bounds = tuple(tile_bounds)
+        else:
+            try:
+                src_bounds = warp.transform_bounds(
+                    _get_crs(target_crs), _get_crs(src_crs), *tile_bounds, densify_pts=21
+                )
+            except CPLE_BaseError:
+                # tile cannot be projected into source CRS, let GDAL sort it out
+                return True
+
+        if not np.all(np.isfinite(src_bounds)):
+            return True
+
+        west, south, east, north = src_bounds
+        inverse_transform = ~Affine(*block_index.transform)
+        cols, rows = inverse_transform * (
+            np.array([west, east, west, east]), np.array([north, north, south, south])
+        )
+
+        # source pixels per tile pixel
+        decimation = min(
+            (cols.max() - cols.min()) / tile_size[1], (rows.max() - rows.min()) / tile_size[0]
+        )
+
+        # resampling kernels reach into neighboring pixels
+        margin = 4 * max(decimation, 1)
+
+        return block_index.window_has_data(
+            (rows.min() - margin, rows.max() + margin), (cols.min() - margin, cols.max() + margin),
+            decimation=decimation
+        )
+
+    @classmethod
+    def _compute_georeference_from_file(cls, raster_path: str, band: int = 1,
+                                        target_crs: str = None) -> Dict[str, Any]:
+        """Open given raster file and compute its georeferencing information."""
+        import rasterio
+
+        with rasterio.Env(**cls._RIO_ENV_KEYS), rasterio.open(raster_path) as src:
+            return cls._compute_georeference(src, band=band, target_crs=target_crs)
+
+    def _get_raster_source(self, keys: Sequence[str]) -> Tuple[str, int]:
+        """Retrieve path to raster file and band index for given dataset."""
+        datasets = self.get_datasets(dict(zip(self.key_names, keys)))
+        assert len(datasets) == 1
+        return datasets[tuple(keys)], 1
+
+    def _get_georeference(self, keys: Sequence[str]) -> Optional[Dict[str, Any]]:
+        """Retrieve stored georeferencing information for given dataset.
+
+        Returns None if no such information is available, in which case it is computed from the
+        raster file during every tile read.
+        """
+        return None
+
+    def _get_coverage(self, keys: Sequence[str]) -> Optional[Dict[str, Any]]:
+        """Retrieve stored tile coverage for given dataset, as returned by
+        :meth:`TileCoverage.to_dict`.
+
+        Returns None if no such information is available.
+        """
+        return None
+
+    @requires_connection
+    def get_coverage(self, keys: Union[Sequence[str], Mapping[str, str]]
+                     ) -> Optional[TileCoverage]:
+        keys = tuple(self._key_dict_to_sequence(keys))
+
+        with self._cache_lock:
+            if keys in self._coverage_cache:
+                return self._coverage_cache[keys]
+
+        encoded = self._get_coverage(keys)
+        coverage = TileCoverage.from_dict(encoded) if encoded is not None else None
+
+        with self._cache_lock:
+            self._coverage_cache[keys] = coverage
+
+        return coverage
+
+    def _get_mosaic_members(self, keys: Sequence[str]) -> Optional[List[Dict[str, Any]]]:
+        """Retrieve keys and WGS84 bounds of all members if given dataset is a mosaic.
+
+        Returns None for regular datasets.
+        """
+        return None
+
+    def _get_mosaic_index(self, keys: Tuple[str, ...]) -> mosaic.MosaicIndex:
+        with self._cache_lock:
+            if keys in self._mosaic_cache:
+                return self._mosaic_cache[keys]
+
+        members = self._get_mosaic_members(keys)
+
+        if members is None:
+            raise exceptions.InvalidDatabaseError(f'No mosaic members found for keys {keys}')
+
+        index = mosaic.MosaicIndex(members)
+
+        with self._cache_lock:
+            self._mosaic_cache[keys] = index
+
+        return index
+
+    def _get_mosaic_tile(self, keys: Tuple[str, ...], *,
+                         tile_bounds: Optional[Tuple[float, ...]],
+                         metatile: Optional[Tuple[Tuple[Tuple[float, ...], ...], ...]],
+                         target_crs: str,
+                         **kwargs: Any) -> Future:
+        # Read all members that intersect the tile concurrently, and composite them.
+        index = self._get_mosaic_index(keys)
+
+        if tile_bounds is None:
+            # members have different extents, so read all of them on a common grid
+            tile_bounds = index.target_bounds(target_crs)
+            metatile = None
+
+        members = index.query(tile_bounds, target_crs)
+
+        member_futures = []
+        if members:
+            member_futures = self.get_raster_tiles(
+                members, tile_bounds=tile_bounds, metatile=metatile, target_crs=target_crs,
+                asynchronous=True, **kwargs
+            )
+
+        return mosaic.composite_futures(member_futures)
+
+    @staticmethod
+    def _read_direct(src: 'DatasetReader', *,
+                     bands: Sequence[int],
+                     tile_bounds: Tuple[float, float, float, float],
+                     tile_size: Tuple[int, int],
+                     resampling: Any) -> List[np.ma.MaskedArray]:
+        """Read a tile from a dataset that is already in the target CRS, without warping.
+
+        Only the part of the tile that is covered by the dataset is read (GDAL picks the best
+        overview), everything else is masked. Returns one masked array per band.
+        """
+        from rasterio import windows
+        from rasterio.enums import MaskFlags, ColorInterp
+        from rasterio.errors import WindowError
+
+        out_height, out_width = tile_size
+        tile_data = [np.zeros((out_height, out_width), dtype=src.dtypes[band - 1])
+                     for band in bands]
+        mask = [np.ones((out_height, out_width), dtype='bool') for _ in bands]
+
+        tile_window = windows.from_bounds(*tile_bounds, transform=src.transform)
+        dataset_window = windows.Window(0, 0, src.width, src.height)
+
+        try:
+            read_window = windows.intersection(tile_window, dataset_window)
+        except WindowError:
+            return [np.ma.masked_array(d, mask=m) for d, m in zip(tile_data, mask)]
+
+        # find part of output tile that corresponds to read window
+        scale_x = out_width / tile_window.width
+        scale_y = out_height / tile_window.height
+        col_start = (read_window.col_off - tile_window.col_off) * scale_x
+        row_start = (read_window.row_off - tile_window.row_off) * scale_y
+        col_slice = slice(
+            int(round(col_start)),
+            max(int(round(col_start + read_window.width * scale_x)), int(round(col_start)) + 1)
+        )
+        row_slice = slice(
+            int(round(row_start)),
+            max(int(round(row_start + read_window.height * scale_y)), int(round(row_start)) + 1)
+        )
+        col_slice = slice(min(col_slice.start, out_width - 1), min(col_slice.stop, out_width))
+        row_slice = slice(min(row_slice.start, out_height - 1), min(row_slice.stop, out_height))
+        read_shape = (row_slice.stop - row_slice.start, col_slice.stop - col_slice.start)
+
+        # read alpha band (if any) together with data
+        indexes = list(bands)
+        if ColorInterp.alpha in src.colorinterp:
+            indexes.append(src.colorinterp.index(ColorInterp.alpha) + 1)
+
+        band_data = src.read(
+            indexes, window=read_window, out_shape=(len(indexes), *read_shape),
+            resampling=resampling
+        )
+        mask_flags = src.mask_flag_enums[bands[0] - 1]
+
+        if len(indexes) > len(bands):
+            shared_mask = band_data[-1] == 0
+        elif MaskFlags.per_dataset in mask_flags or MaskFlags.alpha in mask_flags:
+            # mask is stored separately
+            shared_mask = src.read_masks(
+                bands[0], window=read_window, out_shape=read_shape, resampling=resampling
+            ) == 0
+        else:
+            # nodata values are handled below
+            shared_mask = np.zeros(read_shape, dtype='bool')
+
+        for i, band in enumerate(bands):
+            data = band_data[i]
+            data_mask = shared_mask.copy()
+            nodata = src.nodatavals[band - 1]
+
+            if nodata is not None:
+                if np.isnan(nodata):
+                    data_mask |= np.isnan(data)
+                else:
+                    data_mask |= data == nodata
+
+            tile_data[i][row_slice, col_slice] = data
+            mask[i][row_slice, col_slice] = data_mask
+
+        return [np.ma.masked_array(d, mask=m) for d, m in zip(tile_data, mask)]
+
+    @classmethod
+    def _get_raster_tile(cls, path: str, *, band: int = 1, **kwargs: Any) -> np.ma.MaskedArray:
+        """Load a single band of a raster dataset from a file through rasterio.
+
+        Accepts the same arguments as :meth:`_get_raster_bands`.
+        """
+        return cls._get_raster_bands(path, bands=(band,), **kwargs)[0]
+
+    @classmethod
+    @trace('get_raster_tile')
+    def _get_raster_bands(cls, path: str, *,
+                          bands: Sequence[int],
+                          reprojection_method: str,
+                          resampling_method: str,
+                          tile_bounds: Tuple[float, float, float, float] = None,
+                          tile_size: Tuple[int, int] = (256, 256),
+                          preserve_values: bool = False,
+                          georeference: Mapping[str, Any] = None,
+                          block_index: BlockIndex = None,
+                          target_crs: str = None,
+                          warp_options: Sequence[Tuple[str, Any]] = (),
+                          numpy_reader: bool = False
+                          ) -> List[np.ma.MaskedArray]:
+        """Load several bands of a raster dataset from a file through rasterio.
+
+        All bands are read with a single warp and a single read call. Returns one masked array
+        per band. If given, georeference must be the output of :meth:`_compute_georeference`
+        for this file, and warp_options the output of :meth:`_get_warp_options`. If a
+        :class:`~terracotta.block_index.BlockIndex` of the (single) band is given, tiles
+        that only cover empty blocks are returned without reading the file. Tiles are
+        returned in target_crs (``_TARGET_CRS`` by default), and datasets that are already in
+        that CRS are read directly without warping. Only the part of the tile that is covered
+        by the dataset is warped, everything else is masked. If numpy_reader is set, tiles that
+        line up with the pixel grid of a supported file are read through
+        :class:`~terracotta.cog_reader.COGReader`.
+
+        Heavily inspired by mapbox/rio-tiler
+        """
+        from rasterio import transform, windows
+        from rasterio.crs import CRS
+        from rasterio.enums import Resampling
+        from rasterio.vrt import WarpedVRT
+        from affine import Affine
+
+        dst_bounds: Tuple[float, float, float, float]
+
+        if preserve_values:
+            reproject_enum = resampling_enum = cls._get_resampling_enum('nearest')
+        else:
+            reproject_enum = cls._get_resampling_enum(reprojection_method)
+            resampling_enum = cls._get_resampling_enum(resampling_method)
+
+        if target_crs is None:
+            target_crs = cls._TARGET_CRS
+
+        if georeference is not None and georeference.get('target_crs') != target_crs:
+            # stored values are useless for a different target CRS
+            georeference = None
+
+        with contextlib.ExitStack() as es:
+            def open_dataset() -> 'DatasetReader':
+                try:
+                    with trace('open_dataset'):
+                        return es.enter_context(get_dataset_pool().open(path))
+                except OSError:
+                    raise IOError('error while reading file {}'.format(path))
+
+            src: Optional['DatasetReader'] = None
+
+            if georeference is None:
+                src = open_dataset()
+                with trace('compute_georeference'):
+                    georeference = cls._compute_georeference(src, target_crs=target_crs)
+
+            # bounds in target CRS
+            dst_bounds = cast(Tuple[float, float, float, float],
+                              tuple(georeference['target_bounds']))
+
+            if tile_bounds is None:
+                tile_bounds = dst_bounds
+
+            # prevent loads of very sparse data
+            cover_ratio = (
+                (dst_bounds[2] - dst_bounds[0]) / (tile_bounds[2] - tile_bounds[0])
+                * (dst_bounds[3] - dst_bounds[1]) / (tile_bounds[3] - tile_bounds[1])
+            )
+
+            if cover_ratio < 0.01:
+                raise exceptions.TileOutOfBoundsError('dataset covers less than 1% of tile')
+
+            if block_index is not None and not cls._tile_has_data(
+                block_index, georeference['crs'], target_crs, tile_bounds, tile_size
+            ):
+                # all source blocks under the tile are empty, skip reading
+                nodata = georeference['nodata']
+                return [np.ma.masked_array(
+                    np.full(tile_size, nodata if nodata is not None else 0,
+                            dtype=georeference['dtype']),
+                    mask=np.ones(tile_size, dtype='bool')
+                )]
+
+            if numpy_reader and _is_same_crs(georeference['crs'], target_crs):
+                reader = get_cog_reader(path)
+
+                if reader is not None:
+                    with trace('read_numpy'):
+                        numpy_data = reader.read(bands, tile_bounds, tile_size)
+
+                    if numpy_data is not None:
+                        return numpy_data
+
+            if src is None:
+                src = open_dataset()
+
+            # suggested resolution in target CRS
+            dst_res = tuple(georeference['target_resolution'])
+
+            # make sure VRT resolves the entire tile
+            tile_transform = transform.from_bounds(*tile_bounds, *tile_size)
+            tile_res = (abs(tile_transform.a), abs(tile_transform.e))
+
+            if tile_res[0] < dst_res[0] or tile_res[1] < dst_res[1]:
+                dst_res = tile_res
+                resampling_enum = cls._get_resampling_enum('nearest')
+
+            if src.crs == CRS.from_user_input(target_crs):
+                # no reprojection necessary, skip warping
+                with warnings.catch_warnings(), trace('read_direct'):
+                    warnings.filterwarnings('ignore', message='invalid value encountered.*')
+                    return cls._read_direct(
+                        src, bands=bands, tile_bounds=tile_bounds, tile_size=tile_size,
+                        resampling=resampling_enum
+                    )
+
+            # only warp the part of the tile that is covered by the dataset
+            dataset_window = windows.from_bounds(*dst_bounds, transform=tile_transform)
+            row_slice = slice(
+                max(math.floor(dataset_window.row_off), 0),
+                min(math.ceil(dataset_window.row_off + dataset_window.height), tile_size[0])
+            )
+            col_slice = slice(
+                max(math.floor(dataset_window.col_off), 0),
+                min(math.ceil(dataset_window.col_off + dataset_window.width), tile_size[1])
+            )
+
+            if row_slice.start >= row_slice.stop or col_slice.start >= col_slice.stop:
+                return [
+                    np.ma.masked_array(
+                        np.zeros(tile_size, dtype=src.dtypes[band - 1]),
+                        mask=np.ones(tile_size, dtype='bool')
+                    ) for band in bands
+                ]
+
+            read_size = (row_slice.stop - row_slice.start, col_slice.stop - col_slice.start)
+
+            # pad tile bounds to prevent interpolation artefacts
             num_pad_pixels = 2
 
-            # compute tile VRT shape and transform
+            # compute VRT shape and transform for the whole tile
             dst_width = max(1, round((tile_bounds[2] - tile_bounds[0]) / dst_res[0]))
             dst_height = max(1, round((tile_bounds[3] - tile_bounds[1]) / dst_res[1]))
+
+            # part of the VRT grid that covers the read window
+            scale_y, scale_x = dst_height / tile_size[0], dst_width / tile_size[1]
+            read_rows = (row_slice.start * scale_y, row_slice.stop * scale_y)
+            read_cols = (col_slice.start * scale_x, col_slice.stop * scale_x)
+            vrt_row_off = math.floor(read_rows[0]) - num_pad_pixels
+            vrt_col_off = math.floor(read_cols[0]) - num_pad_pixels
+
             vrt_transform = (
                 transform.from_bounds(*tile_bounds, width=dst_width, height=dst_height)
-                * Affine.translation(-num_pad_pixels, -num_pad_pixels)
+                * Affine.translation(vrt_col_off, vrt_row_off)
             )
-            vrt_height, vrt_width = dst_height + 2 * num_pad_pixels, dst_width + 2 * num_pad_pixels
+            vrt_height = math.ceil(read_rows[1]) + num_pad_pixels - vrt_row_off
+            vrt_width = math.ceil(read_cols[1]) + num_pad_pixels - vrt_col_off
 
-            # remove padding in output
+            # remove padding in output (may be fractional, which GDAL handles when resampling)
             out_window = windows.Window(
-                col_off=num_pad_pixels, row_off=num_pad_pixels, width=dst_width, height=dst_height
+                col_off=read_cols[0] - vrt_col_off, row_off=read_rows[0] - vrt_row_off,
+                width=read_cols[1] - read_cols[0], height=read_rows[1] - read_rows[0]
             )
 
             # construct VRT
             vrt = es.enter_context(
                 WarpedVRT(
-                    src, crs=cls._TARGET_CRS, resampling=reproject_enum,
+                    src, crs=target_crs, resampling=reproject_enum,
                     transform=vrt_transform, width=vrt_width, height=vrt_height,
-                    add_alpha=not cls._has_alpha_band(src)
+                    add_alpha=not georeference['has_alpha'], **dict(warp_options)
                 )
             )
 
-            # read data
+            mask_idx = vrt.count
+
+            # the alpha mask is always resampled with nearest neighbor, so it can only be read
+            # together with the data if that gives the same result
+            read_combined = (
+                resampling_enum == Resampling.nearest
+                or (out_window.height, out_window.width) == read_size
+            )
+
             with warnings.catch_warnings(), trace('read_from_vrt'):
                 warnings.filterwarnings('ignore', message='invalid value encountered.*')
-                tile_data = vrt.read(
-                    1, resampling=resampling_enum, window=out_window, out_shape=tile_size
+
+                if read_combined:
+                    # read data and alpha band in a single request
+                    vrt_data = vrt.read(
+                        [*bands, mask_idx], resampling=resampling_enum, window=out_window,
+                        out_shape=(len(bands) + 1, *read_size)
+                    )
+                    read_data, read_mask = vrt_data[:-1], vrt_data[-1] == 0
+                else:
+                    read_data = vrt.read(
+                        list(bands), resampling=resampling_enum, window=out_window,
+                        out_shape=(len(bands), *read_size)
+                    )
+                    read_mask = vrt.read(mask_idx, window=out_window, out_shape=read_size) == 0
+
+            out: List[np.ma.MaskedArray] = []
+            for band, band_data in zip(bands, read_data):
+                band_mask = read_mask.copy()
+                nodata = src.nodatavals[band - 1]
+
+                if nodata is not None:
+                    band_mask |= band_data == nodata
+
+                if read_size != tuple(tile_size):
+                    # paste into otherwise empty tile
+                    tile_data = np.zeros(tile_size, dtype=band_data.dtype)
+                    tile_data[row_slice, col_slice] = band_data
+                    tile_mask = np.ones(tile_size, dtype='bool')
+                    tile_mask[row_slice, col_slice] = band_mask
+                    band_data, band_mask = tile_data, tile_mask
+
+                out.append(np.ma.masked_array(band_data, mask=band_mask))
+
+        return out
+
+    @classmethod
+    @trace('get_raster_metatile')
+    def _get_raster_metatile(cls, path: str, *,
+                             bands: Sequence[int],
+                             metatile: Sequence[Sequence[Tuple[float, ...]]],
+                             tile_bounds: Tuple[float, float, float, float],
+                             tile_size: Tuple[int, int] = (256, 256),
+                             **kwargs: Any) -> Dict[Tuple[float, ...], List[np.ma.MaskedArray]]:
+        """Load a whole metatile in one pass and split it into tiles.
+
+        Returns a mapping ``{tile_bounds: [band_data, ...]}`` for every tile in the metatile.
+        Falls back to loading only the tile at tile_bounds if the dataset covers too little of
+        the metatile. All other arguments are passed to :meth:`_get_raster_bands`.
+        """
+        num_rows, num_cols = len(metatile), len(metatile[0])
+        tile_height, tile_width = tile_size
+
+        # metatile rows run from north to south, columns from west to east
+        metatile_bounds = (
+            metatile[-1][0][0], metatile[-1][0][1], metatile[0][-1][2], metatile[0][-1][3]
+        )
+
+        try:
+            metatile_data = cls._get_raster_bands(
+                path, bands=bands, tile_bounds=metatile_bounds,
+                tile_size=(num_rows * tile_height, num_cols * tile_width), **kwargs
+            )
+        except exceptions.TileOutOfBoundsError:
+            return {tile_bounds: cls._get_raster_bands(
+                path, bands=bands, tile_bounds=tile_bounds, tile_size=tile_size, **kwargs
+            )}
+
+        out = {}
+        for i, row in enumerate(metatile):
+            for j, sub_bounds in enumerate(row):
+                window = (
+                    slice(i * tile_height, (i + 1) * tile_height),
+                    slice(j * tile_width, (j + 1) * tile_width)
                 )
+                out[sub_bounds] = [band_data[window].copy() for band_data in metatile_data]
+
+        return out
+
+    def _get_cached_georeference(self, keys: Tuple[str, ...], target_crs: str = None
+                                 ) -> Tuple[Optional[Dict[str, Any]],
+                                            Optional[Tuple[int, BlockIndex]]]:
+        # stored georeference of given dataset (without block index) and
+        # (band, decoded block index), so neither is fetched or decoded on every tile read;
+        # georeferences for other target CRS than the stored one are computed once instead
+        if target_crs is not None:
+            return self._get_target_georeference(keys, target_crs)
+
+        with self._cache_lock:
+            if keys in self._georeference_cache:
+                return self._georeference_cache[keys]
+
+        georeference = self._get_georeference(keys)
+
+        if georeference is None:
+            georeference = self._compute_missing_georeference(keys)
+
+        block_index = None
+        if georeference is not None and 'block_index' in georeference:
+            georeference = dict(georeference)
+            encoded_index = georeference.pop('block_index')
+            block_index = (encoded_index['band'], BlockIndex.from_dict(encoded_index))
+
+        with self._cache_lock:
+            self._georeference_cache[keys] = (georeference, block_index)
+
+        return georeference, block_index
+
+    def _get_target_georeference(self, keys: Tuple[str, ...], target_crs: str
+                                 ) -> Tuple[Optional[Dict[str, Any]],
+                                            Optional[Tuple[int, BlockIndex]]]:
+        # like _get_cached_georeference, but for given target CRS
+        georeference, block_index = self._get_cached_georeference(keys)
+
+        if georeference is None or georeference['target_crs'] == target_crs:
+            return georeference, block_index
+
+        cache_key = (keys, target_crs)
+
+        with self._cache_lock:
+            if cache_key in self._georeference_cache:
+                return self._georeference_cache[cache_key]
+
+        path, band = self._get_raster_source(keys)
+
+        try:
+            target_georeference: Optional[Dict[str, Any]] = (
+                self._compute_georeference_from_file(path, band=band, target_crs=target_crs)
+            )
+        except Exception as exc:
+            # will be computed on the fly during tile retrieval instead
+            logger.warning(f'Could not compute georeference for {path}: {exc!s}')
+            target_georeference = None
+
+        if target_georeference is not None:
+            # block index refers to the raster file, not the target CRS
+            target_georeference.pop('block_index', None)
+
+        with self._cache_lock:
+            self._georeference_cache[cache_key] = (target_georeference, block_index)
+
+        return target_georeference, block_index
+
+    def _compute_missing_georeference(self, keys: Tuple[str, ...]) -> Optional[Dict[str, Any]]:
+        # georeference of a dataset that has none stored (e.g. inserted by an older version),
+        # computed from its raster file and band once per process
+        if self._get_mosaic_members(keys) is not None:
+            return None
+
+        path, band = self._get_raster_source(keys)
+
+        try:
+            return self._compute_georeference_from_file(path, band=band)
+        except Exception as exc:
+            # will be computed on the fly during tile retrieval instead
+            logger.warning(f'Could not compute georeference for {path}: {exc!s}')
+            return None
 
-                # assemble alpha mask
-                mask_idx = vrt.count
-                mask = vrt.read(mask_idx, window=out_window, out_shape=tile_size) == 0
+    def _get_native_grid(self, keys: Tuple[str, ...], target_crs: str = None
+                         ) -> Optional[Tuple[str, Tuple[float, ...], Tuple[float, ...]]]:
+        # (target CRS, resolution, bounds) of given dataset in known georeference, if any
+        georeference, _ = self._get_cached_georeference(keys, target_crs)
 
-                if src.nodata is not None:
-                    mask |= tile_data == src.nodata
+        if georeference is None:
+            return None
+
+        return (
+            georeference['target_crs'], tuple(georeference['target_resolution']),
+            tuple(georeference['target_bounds'])
+        )
+
+    def _find_native_ancestor(self, keys: Tuple[str, ...], *,
+                              tile_bounds: Optional[Tuple[float, ...]],
+                              tile_size: Tuple[int, int],
+                              target_crs: str,
+                              **kwargs: Any
+                              ) -> Optional[Tuple[Tuple[float, ...], Tuple[slice, slice], int]]:
+        """Find the ancestor of an overzoomed tile that matches the native dataset resolution.
+
+        Returns (ancestor bounds, window of tile in ancestor, upsampling factor), or None if
+        the tile is not overzoomed by at least one zoom level or not part of a known tile
+        matrix set.
+        """
+        if tile_bounds is None:
+            return None
+
+        native_grid = self._get_native_grid(keys, target_crs)
+
+        if native_grid is None or native_grid[0] != target_crs:
+            return None
+
+        _, native_res, native_bounds = native_grid
+
+        tms = find_tile_matrix_set(target_crs)
+        tile = tms.tile_from_bounds(tile_bounds) if tms is not None else None
+
+        if tms is None or tile is None:
+            return None
+
+        tile_x, tile_y, tile_z = tile
+        tile_height, tile_width = tile_size
+        tile_res = (
+            (tile_bounds[2] - tile_bounds[0]) / tile_width,
+            (tile_bounds[3] - tile_bounds[1]) / tile_height
+        )
+
+        # ancestor must not be coarser than the dataset
+        num_levels = math.floor(math.log2(min(
+            native_res[0] / tile_res[0], native_res[1] / tile_res[1]
+        )))
+        num_levels = min(num_levels, tile_z)
+
+        while num_levels > 0:
+            factor = 2 ** num_levels
+            ancestor_bounds = tms.xy_bounds(
+                tile_x // factor, tile_y // factor, tile_z - num_levels
+            )
+
+            # ancestor must be divisible into whole pixels, and not too sparse to be read
+            cover_ratio = (
+                (native_bounds[2] - native_bounds[0]) / (ancestor_bounds[2] - ancestor_bounds[0])
+                * (native_bounds[3] - native_bounds[1]) / (ancestor_bounds[3] - ancestor_bounds[1])
+            )
+
+            if tile_height % factor == 0 and tile_width % factor == 0 and cover_ratio >= 0.01:
+                break
 
-        return np.ma.masked_array(tile_data, mask=mask)
+            num_levels -= 1
+        else:
+            return None
+
+        row_off = (tile_y % factor) * tile_height // factor
+        col_off = (tile_x % factor) * tile_width // factor
+        window = (
+            slice(row_off, row_off + tile_height // factor),
+            slice(col_off, col_off + tile_width // factor)
+        )
+        return tuple(ancestor_bounds), window, factor
 
     # return type has to be Any until mypy supports conditional return types
-    @requires_connection
     def get_raster_tile(self,
                         keys: Union[Sequence[str], Mapping[str, str]], *,
                         tile_bounds: Sequence[float] = None,
                         tile_size: Sequence[int] = None,
                         preserve_values: bool = False,
-                        asynchronous: bool = False) -> Any:
+                        asynchronous: bool = False,
+                        metatile: Sequence[Sequence[Sequence[float]]] = None,
+                        target_crs: str = None) -> Any:
+        return self.get_raster_tiles(
+            [keys], tile_bounds=tile_bounds, tile_size=tile_size,
+            preserve_values=preserve_values, asynchronous=asynchronous, metatile=metatile,
+            target_crs=target_crs
+        )[0]
+
+    @requires_connection
+    def get_raster_tiles(self,
+                         keys_list: Sequence[Union[Sequence[str], Mapping[str, str]]], *,
+                         tile_bounds: Sequence[float] = None,
+                         tile_size: Sequence[int] = None,
+                         preserve_values: bool = False,
+                         asynchronous: bool = False,
+                         metatile: Sequence[Sequence[Sequence[float]]] = None,
+                         priority: int = PRIORITY_INTERACTIVE,
+                         deadline: float = None,
+                         target_crs: str = None) -> List[Any]:
         # This wrapper handles cache interaction and asynchronous tile retrieval.
-        # The real work is done in _get_raster_tile.
+        # The real work is done in _get_raster_bands.
+        # Datasets that live in the same file are read in a single job.
+        # If a metatile is given, all of its tiles are read and cached together.
+        # Concurrent requests for a tile that is already being retrieved share its future.
+        # Jobs are queued by priority and deadline, and dropped if the deadline passes first.
+        # Mosaics are resolved to their members, which are retrieved like any other dataset.
+        # Tiles that are finer than the dataset resolution are cut from their ancestor at
+        # native resolution, so all of them are served from the same cached tile.
 
         future: Future[np.ma.MaskedArray]
-        result: np.ma.MaskedArray
+        results: List[Any] = [None] * len(keys_list)
+
+        kwargs = self._get_tile_kwargs(tile_bounds, tile_size, preserve_values, target_crs)
+
+        metatile_: Optional[Tuple[Tuple[Tuple[float, ...], ...], ...]] = None
+
+        if metatile is not None and tile_bounds is not None:
+            metatile_ = tuple(tuple(tuple(bounds) for bounds in row) for row in metatile)
+
+            if not any(kwargs['tile_bounds'] in row for row in metatile_):
+                raise ValueError('metatile must contain requested tile')
+
+        sources = []
+        mosaics = []
+        overzoomed = []
+        for i, keys in enumerate(keys_list):
+            key_tuple = tuple(self._key_dict_to_sequence(keys))
+            path, band = self._get_raster_source(key_tuple)
+
+            if path == mosaic.MOSAIC_PATH:
+                mosaics.append((i, key_tuple))
+                continue
+
+            ancestor = self._find_native_ancestor(key_tuple, **kwargs)
+
+            if ancestor is not None:
+                overzoomed.append((i, key_tuple, ancestor))
+                continue
+
+            cache_key = cachetools.keys.hashkey(path=path, band=band, **kwargs)
+            sources.append((i, key_tuple, path, band, cache_key))
+
+        # path -> ((georeference, block index), {cache key: band},
+        #          {cache key of other tile in metatile: (tile bounds, band)})
+        cache_misses: Dict[str, Tuple[Any, Dict[Any, int], Dict[Any, Any]]] = OrderedDict()
+        georeferences: Dict[str, Any] = {}
+
+        for i, key_tuple, path, band, cache_key in sources:
+            with self._cache_lock:
+                results[i] = self._get_cached_tile(cache_key, priority, deadline)
+
+            if results[i] is not None:
+                continue
 
+            if path not in georeferences:
+                # not part of the cache key, since it is a pure function of the raster file;
+                # looked up before registering the tile, so a failure leaves nothing behind
+                georeferences[path] = self._get_cached_georeference(
+                    key_tuple, kwargs['target_crs']
+                )
+
+            with self._cache_lock:
+                # tile might have been retrieved or requested by someone else in the meantime
+                if cache_key in self._raster_cache or cache_key in self._in_flight:
+                    results[i] = self._get_cached_tile(cache_key, priority, deadline)
+                else:
+                    in_flight_tile = self._in_flight[cache_key] = _InFlightTile(
+                        priority, deadline
+                    )
+                    results[i] = in_flight_tile.future
+                    self._cache_stats['misses'] += 1
+
+                    if path not in cache_misses:
+                        cache_misses[path] = (georeferences[path], OrderedDict(), OrderedDict())
+
+                    cache_misses[path][1][cache_key] = band
+
+                    if metatile_ is not None:
+                        # the other tiles of the metatile are read by the same job,
+                        # so requests for them must wait for it
+                        cache_misses[path][2].update(self._register_metatile_tiles(
+                            path, band, metatile_, priority, deadline, **kwargs
+                        ))
+
+        unsubmitted = list(cache_misses)
+
+        try:
+            for path, ((georeference, block_index), requests, siblings) in cache_misses.items():
+                self._submit_tile_job(
+                    path, requests, georeference=georeference, block_index=block_index,
+                    metatile=metatile_, siblings=siblings, **kwargs
+                )
+                unsubmitted.remove(path)
+        except Exception as exc:
+            # fail all tiles registered here that no job is going to retrieve
+            for path in unsubmitted:
+                _, requests, siblings = cache_misses[path]
+                self._finish_in_flight({**requests, **siblings}, exception=exc)
+            raise
+
+        for i, key_tuple in mosaics:
+            results[i] = self._get_mosaic_tile(
+                key_tuple, tile_bounds=kwargs['tile_bounds'], tile_size=kwargs['tile_size'],
+                preserve_values=preserve_values, metatile=metatile_, priority=priority,
+                deadline=deadline, target_crs=kwargs['target_crs']
+            )
+
+        # ancestor bounds -> [(index, keys, window, factor)], so bands of the same file
+        # are still read together
+        ancestors: Dict[Tuple[float, ...], List[Any]] = OrderedDict()
+
+        for i, key_tuple, (ancestor_bounds, window, factor) in overzoomed:
+            ancestors.setdefault(ancestor_bounds, []).append((i, key_tuple, window, factor))
+
+        for ancestor_bounds, entries in ancestors.items():
+            ancestor_futures = self.get_raster_tiles(
+                [key_tuple for _, key_tuple, _, _ in entries], tile_bounds=ancestor_bounds,
+                tile_size=kwargs['tile_size'], preserve_values=preserve_values,
+                asynchronous=True, priority=priority, deadline=deadline,
+                target_crs=kwargs['target_crs']
+            )
+
+            for (i, _, window, factor), ancestor_future in zip(entries, ancestor_futures):
+                results[i] = _upsample_future(ancestor_future, window, factor)
+
+        if asynchronous:
+            for i, result in enumerate(results):
+                if not isinstance(result, Future):
+                    # wrap cached result in a future
+                    future = Future()
+                    future.set_result(result)
+                    results[i] = future
+            return results
+
+        return [result.result() if isinstance(result, Future) else result for result in results]
+
+    @classmethod
+    def _get_tile_kwargs(cls, tile_bounds: Optional[Sequence[float]],
+                         tile_size: Optional[Sequence[int]],
+                         preserve_values: bool,
+                         target_crs: Optional[str]) -> Dict[str, Any]:
+        # tile retrieval arguments, also used as cache key
         settings = get_settings()
-        key_tuple = tuple(self._key_dict_to_sequence(keys))
-        datasets = self.get_datasets(dict(zip(self.key_names, key_tuple)))
-        assert len(datasets) == 1
-        path = datasets[key_tuple]
 
         if tile_size is None:
             tile_size = settings.DEFAULT_TILE_SIZE
 
+        if target_crs is None:
+            target_crs = cls._TARGET_CRS
+
         # make sure all arguments are hashable
-        kwargs = dict(
-            path=path,
+        return dict(
             tile_bounds=tuple(tile_bounds) if tile_bounds else None,
             tile_size=tuple(tile_size),
             preserve_values=preserve_values,
             reprojection_method=settings.REPROJECTION_METHOD,
-            resampling_method=settings.RESAMPLING_METHOD
+            resampling_method=settings.RESAMPLING_METHOD,
+            target_crs=target_crs,
+            warp_options=cls._get_warp_options(),
+            numpy_reader=settings.RASTER_NUMPY_READER
+        )
+
+    @staticmethod
+    def _get_warp_options() -> Tuple[Tuple[str, Any], ...]:
+        """Get keyword arguments for WarpedVRT from current settings, as hashable tuple."""
+        settings = get_settings()
+        num_threads = settings.WARP_NUM_THREADS
+
+        warp_options = dict(
+            settings.WARP_EXTRA_OPTIONS,
+            NUM_THREADS='ALL_CPUS' if num_threads == 0 else str(num_threads),
+            tolerance=settings.WARP_ERROR_THRESHOLD,
+            # rasterio expects MB
+            warp_mem_limit=-(-settings.WARP_MEMORY_LIMIT // 1024 ** 2)
         )
+        return tuple(sorted(warp_options.items()))
 
-        cache_key = cachetools.keys.hashkey(**kwargs)
+    @requires_connection
+    def prefetch_raster_tiles(self,
+                              keys_list: Sequence[Union[Sequence[str], Mapping[str, str]]],
+                              tile_bounds_list: Sequence[Sequence[float]], *,
+                              tile_size: Sequence[int] = None,
+                              preserve_values: bool = False,
+                              deadline: float = None,
+                              target_crs: str = None) -> int:
+        # Tiles are only scheduled while the executor has idle workers and the prefetch
+        # budgets allow it. Errors are logged and swallowed, since nobody asked for these tiles.
+        num_scheduled = 0
 
         try:
-            with self._cache_lock:
-                result = self._raster_cache[cache_key]
-        except KeyError:
-            pass
+            sources = []
+            for keys in keys_list:
+                key_tuple = tuple(self._key_dict_to_sequence(keys))
+                sources.append((key_tuple, *self._get_raster_source(key_tuple)))
+
+            for tile_bounds in tile_bounds_list:
+                kwargs = self._get_tile_kwargs(tile_bounds, tile_size, preserve_values,
+                                               target_crs)
+
+                for key_tuple, path, band in sources:
+                    if executor_is_busy():
+                        return num_scheduled
+
+                    if path == mosaic.MOSAIC_PATH:
+                        members = self._get_mosaic_index(key_tuple).query(
+                            kwargs['tile_bounds'], kwargs['target_crs']
+                        )
+                        num_scheduled += self.prefetch_raster_tiles(
+                            members, [tile_bounds], tile_size=tile_size,
+                            preserve_values=preserve_values, deadline=deadline,
+                            target_crs=target_crs
+                        )
+                        continue
+
+                    tile_kwargs = kwargs
+                    ancestor = self._find_native_ancestor(key_tuple, **kwargs)
+
+                    if ancestor is not None:
+                        # overzoomed tiles are served from their ancestor
+                        tile_kwargs = dict(kwargs, tile_bounds=ancestor[0])
+
+                    cache_key = cachetools.keys.hashkey(path=path, band=band, **tile_kwargs)
+
+                    # nothing that may raise must happen between acquiring the budget and
+                    # registering its release, or the budget leaks
+                    if not _acquire_prefetch_budget(key_tuple):
+                        continue
+
+                    with self._cache_lock:
+                        is_known = cache_key in self._raster_cache or cache_key in self._in_flight
+
+                        if not is_known:
+                            in_flight_tile = _InFlightTile(PRIORITY_PREFETCH, deadline)
+                            self._in_flight[cache_key] = in_flight_tile
+                            self._cache_stats['prefetched'] += 1
+
+                    if is_known:
+                        _release_prefetch_budget(key_tuple)
+                        continue
+
+                    def release_budget(_: Future, dataset: Tuple[str, ...] = key_tuple) -> None:
+                        _release_prefetch_budget(dataset)
+
+                    in_flight_tile.future.add_done_callback(release_budget)
+
+                    try:
+                        georeference, block_index = self._get_cached_georeference(
+                            key_tuple, tile_kwargs['target_crs']
+                        )
+                        self._submit_tile_job(
+                            path, {cache_key: band}, georeference=georeference,
+                            block_index=block_index, metatile=None, **tile_kwargs
+                        )
+                    except Exception as exc:
+                        self._finish_in_flight({cache_key: band}, exception=exc)
+                        raise
+
+                    num_scheduled += 1
+
+        except Exception as exc:
+            logger.debug(f'Prefetching tiles failed: {exc!r}')
+
+        return num_scheduled
+
+    def _register_metatile_tiles(self, path: str, band: int,
+                                 metatile: Tuple[Tuple[Tuple[float, ...], ...], ...],
+                                 priority: int, deadline: Optional[float],
+                                 **kwargs: Any) -> Dict[Any, Tuple[Tuple[float, ...], int]]:
+        # Register all tiles of a metatile besides the requested one as in flight, unless they
+        # are cached or retrieved already. Returns {cache key: (tile bounds, band)} of them.
+        # Must be called while holding the cache lock.
+        registered = {}
+
+        for row in metatile:
+            for sub_bounds in row:
+                if sub_bounds == kwargs['tile_bounds']:
+                    continue
+
+                sub_kwargs = dict(kwargs, tile_bounds=sub_bounds)
+                sub_cache_key = cachetools.keys.hashkey(path=path, band=band, **sub_kwargs)
+
+                if sub_cache_key in self._raster_cache or sub_cache_key in self._in_flight:
+                    continue
+
+                self._in_flight[sub_cache_key] = _InFlightTile(
+                    priority, deadline, requested=False
+                )
+                registered[sub_cache_key] = (sub_bounds, band)
+
+        return registered
+
+    def _submit_tile_job(self, path: str, requests: Mapping[Any, int], *,
+                         georeference: Optional[Dict[str, Any]],
+                         block_index: Optional[Tuple[int, BlockIndex]],
+                         metatile: Optional[Tuple[Tuple[Tuple[float, ...], ...], ...]],
+                         siblings: Mapping[Any, Tuple[Tuple[float, ...], int]] = None,
+                         **kwargs: Any) -> None:
+        # Read all bands of a file that are requested as {cache key: band} in a single job,
+        # and resolve the corresponding in-flight futures when it is done. In-flight tiles of
+        # the same metatile are given as {cache key: (tile bounds, band)} and resolved too.
+        bands = tuple(OrderedDict.fromkeys(requests.values()))
+        siblings = dict(siblings or {})
+        pinned = path in self._get_pinned_paths()
+
+        band_index: Optional[BlockIndex] = None
+        if block_index is not None and bands == (block_index[0],):
+            # only valid for the band it was computed for
+            band_index = block_index[1]
+
+        retrieve_tiles: Callable[[], Any]
+
+        if metatile is None:
+            retrieve_tiles = functools.partial(
+                self._get_raster_bands, path, bands=bands, georeference=georeference,
+                block_index=band_index, **kwargs
+            )
         else:
-            if asynchronous:
-                # wrap result in a future
-                future = Future()
-                future.set_result(result)
-                return future
+            retrieve_tiles = functools.partial(
+                self._get_raster_metatile, path, bands=bands, metatile=metatile,
+                georeference=georeference, block_index=band_index, **kwargs
+            )
+
+        # (allocator, allocation) of shared memory slot, if used
+        shared_memory_slot: List[Tuple[shared_memory.SlabAllocator, Tuple[int, int]]] = []
+
+        def submit(executor: Executor) -> Future:
+            task = retrieve_tiles
+
+            if isinstance(executor, concurrent.futures.ProcessPoolExecutor):
+                # let worker processes return tiles through shared memory
+                allocator = shared_memory.get_allocator()
+                allocation = None
+
+                if allocator is not None:
+                    num_tiles = 1 if metatile is None else sum(len(row) for row in metatile)
+                    allocation = allocator.allocate(
+                        shared_memory.estimate_size(kwargs['tile_size'], num_tiles * len(bands))
+                    )
+
+                if allocator is not None and allocation is not None:
+                    shared_memory_slot.append((allocator, allocation))
+                    task = functools.partial(
+                        shared_memory.run_in_shared_memory, retrieve_tiles, allocator.name,
+                        *allocation
+                    )
+
+            return executor.submit(task)
+
+        def distribute_results(job: Future) -> None:
+            # insert results into global cache if execution was successful
+            exc: Optional[BaseException]
+
+            if job.cancelled():
+                exc = exceptions.DeadlineExceededError(
+                    f'Tile request for {path} was dropped because its deadline passed'
+                )
             else:
-                return result
+                exc = job.exception()
 
-        retrieve_tile = functools.partial(self._get_raster_tile, **kwargs)
+            if exc is not None:
+                for allocator, allocation in shared_memory_slot:
+                    allocator.release(*allocation)
 
-        future = executor.submit(retrieve_tile)
+                self._finish_in_flight({**requests, **siblings}, exception=exc)
+                return
 
-        def cache_callback(future: Future) -> None:
-            # insert result into global cache if execution was successful
-            if future.exception() is None:
-                self._add_to_cache(cache_key, future.result())
+            result = job.result()
 
-        if asynchronous:
-            future.add_done_callback(cache_callback)
-            return future
+            for allocator, allocation in shared_memory_slot:
+                # wrap shared memory without copying, slot is recycled once arrays are gone
+                result = allocator.unpack(result, *allocation)
+
+            if metatile is None:
+                tiles = {kwargs['tile_bounds']: result}
+            else:
+                tiles = result
+
+            for sub_bounds, tile_data in tiles.items():
+                if sub_bounds == kwargs['tile_bounds']:
+                    continue
+
+                sub_kwargs = dict(kwargs, tile_bounds=sub_bounds)
+                for band, band_data in zip(bands, tile_data):
+                    sub_cache_key = cachetools.keys.hashkey(path=path, band=band, **sub_kwargs)
+                    self._add_to_cache(sub_cache_key, band_data, pinned=pinned)
+
+            tile_data = tiles[kwargs['tile_bounds']]
+            band_results = {}
+
+            for cache_key, band in requests.items():
+                band_results[cache_key] = band_data = tile_data[bands.index(band)]
+                self._add_to_cache(cache_key, band_data, pinned=pinned)
+
+            missing_siblings = {}
+
+            for cache_key, (sub_bounds, band) in siblings.items():
+                if sub_bounds in tiles:
+                    band_results[cache_key] = tiles[sub_bounds][bands.index(band)]
+                else:
+                    missing_siblings[cache_key] = (sub_bounds, band)
+
+            self._finish_in_flight(band_results)
+
+            if missing_siblings:
+                self._retry_metatile_tiles(
+                    path, missing_siblings, georeference=georeference,
+                    block_index=block_index, **kwargs
+                )
+
+        with self._cache_lock:
+            in_flight_tiles = [
+                self._in_flight[cache_key] for cache_key in (*requests, *siblings)
+            ]
+
+        _schedule_job(submit, in_flight_tiles).add_done_callback(distribute_results)
+
+    def _retry_metatile_tiles(self, path: str,
+                              siblings: Mapping[Any, Tuple[Tuple[float, ...], int]], *,
+                              georeference: Optional[Dict[str, Any]],
+                              block_index: Optional[Tuple[int, BlockIndex]],
+                              **kwargs: Any) -> None:
+        # Tiles of a metatile that were only read on their own. Those that nobody waits for
+        # are dropped, the others are retrieved in separate jobs.
+        dropped = []
+        # tile bounds -> {cache key: band}
+        retries: Dict[Tuple[float, ...], Dict[Any, int]] = OrderedDict()
+
+        with self._cache_lock:
+            for cache_key, (sub_bounds, band) in siblings.items():
+                if self._in_flight[cache_key].requested:
+                    retries.setdefault(sub_bounds, OrderedDict())[cache_key] = band
+                else:
+                    dropped.append(self._in_flight.pop(cache_key).future)
+
+        for future in dropped:
+            future.cancel()
+
+        for sub_bounds, requests in retries.items():
+            try:
+                self._submit_tile_job(
+                    path, requests, georeference=georeference, block_index=block_index,
+                    metatile=None, **dict(kwargs, tile_bounds=sub_bounds)
+                )
+            except Exception as exc:
+                self._finish_in_flight(requests, exception=exc)
+
+    def _get_cached_tile(self, cache_key: Any, priority: int,
+                         deadline: Optional[float]) -> Any:
+        # Return cached tile, or future of the tile if it is already being retrieved,
+        # or None if neither. Must be called while holding the cache lock.
+        try:
+            result = self._raster_cache[cache_key]
+        except KeyError:
+            pass
         else:
-            result = future.result()
-            cache_callback(future)
+            self._cache_stats['hits'] += 1
             return result
 
-    def _add_to_cache(self, key: Any, value: Any) -> None:
+        if cache_key in self._in_flight:
+            # tile is already being retrieved, wait for that instead
+            in_flight_tile = self._in_flight[cache_key]
+            in_flight_tile.add_request(priority, deadline)
+            self._cache_stats['coalesced'] += 1
+            return in_flight_tile.future
+
+        return None
+
+    def _finish_in_flight(self, results: Mapping[Any, Any],
+                          exception: BaseException = None) -> None:
+        # Remove retrieved tiles from in-flight table and hand them to all waiting requests.
+        # Results must be cached before, so new requests never miss both cache and table.
+        with self._cache_lock:
+            futures = [self._in_flight.pop(cache_key).future for cache_key in results]
+
+        for future, result in zip(futures, results.values()):
+            if exception is not None:
+                future.set_exception(exception)
+            else:
+                future.set_result(result)
+
+    def get_cache_stats(self) -> Dict[str, float]:
+        """Return a snapshot of the statistics of the raster cache since driver creation.
+
+        Counts tile requests that were served from the cache (``hits``) and that had to be
+        retrieved (``misses``). Requests that missed the cache while the same tile was
+        already being retrieved wait for that retrieval and are counted as ``coalesced``.
+        Tiles retrieved in the background are counted as ``prefetched``.
+
+        Also counts tiles that were stored (``inserts``) and ``evictions``, tiles that were
+        ``rejected`` because they are larger than the whole cache, and reports the number of
+        ``entries``, their total ``size`` in bytes (including keys and bookkeeping overhead),
+        ``maxsize`` (``RASTER_CACHE_SIZE``), the number and size of ``pinned`` entries
+        (``pinned_size``), and the total time spent compressing and decompressing tiles in
+        seconds (``compress_time`` and ``decompress_time``).
+        """
+        with self._cache_lock:
+            return dict(
+                self._raster_cache.get_stats(), **self._cache_stats,
+                in_flight=len(self._in_flight)
+            )
+
+    @staticmethod
+    def get_block_cache_stats() -> Dict[str, int]:
+        """Return statistics of the decoded block cache of the NumPy reader in this process.
+
+        Counts ``hits``, ``misses``, decoded bytes served from the cache (``hit_bytes``),
+        and ``evictions``, and reports the current ``size`` and ``maxsize`` in bytes. Tiles
+        are read in worker processes if ``RASTER_EXECUTOR`` is ``process``, and every worker
+        has its own cache.
+        """
+        block_cache = get_block_cache()
+
+        if block_cache is None:
+            return dict(hits=0, misses=0, hit_bytes=0, evictions=0, blocks=0, size=0, maxsize=0)
+
+        return block_cache.get_stats()
+
+    @staticmethod
+    def get_remote_cache_stats() -> Dict[str, int]:
+        """Return statistics of the cache of remote raster byte ranges in this process.
+
+        Counts chunks served from memory (``memory_hits``) and disk (``disk_hits``), chunks
+        that had to be fetched (``misses``), and the number of range ``requests`` and
+        ``bytes_fetched`` they took.
+        """
+        return get_range_cache().get_stats()
+
+    def _empty_tile_key(self, keys: Union[Sequence[str], Mapping[str, str]],
+                        tile_bounds: Sequence[float]
+                        ) -> Optional[Tuple[Tuple, Tuple[float, ...]]]:
+        """Normalize keys to key order without database access.
+
+        Returns None for mappings whose key order is not known yet (i.e., before the first
+        dataset access through this driver) or that contain unknown keys.
+        """
+        if not isinstance(keys, Mapping):
+            return tuple(keys), tuple(tile_bounds)
+
+        key_names = self._known_key_names
+        if key_names is None:
+            return None
+
+        try:
+            return tuple(keys[key] for key in key_names), tuple(tile_bounds)
+        except KeyError:
+            return None
+
+    def is_empty_tile(self, keys: Union[Sequence[str], Mapping[str, str]],
+                      tile_bounds: Sequence[float]) -> bool:
+        cache_key = self._empty_tile_key(keys, tile_bounds)
+        if cache_key is None:
+            return False
+
+        with self._cache_lock:
+            return cache_key in self._empty_tiles
+
+    def add_empty_tile(self, keys: Union[Sequence[str], Mapping[str, str]],
+                       tile_bounds: Sequence[float]) -> None:
+        cache_key = self._empty_tile_key(keys, tile_bounds)
+        if cache_key is None:
+            return
+
+        try:
+            with self._cache_lock:
+                self._empty_tiles[cache_key] = True
+        except ValueError:  # cache disabled
+            pass
+
+    def _clear_dataset_caches(self) -> None:
+        # datasets changed, so previously empty tiles might not be anymore
+        # (only in this process; other processes rely on EMPTY_TILE_CACHE_TTL)
+        with self._cache_lock:
+            self._empty_tiles.clear()
+            self._coverage_cache.clear()
+            self._mosaic_cache.clear()
+            self._georeference_cache.clear()
+            self._pinned_paths = None
+
+    def _get_pinned_paths(self) -> FrozenSet[str]:
+        """Paths of all raster files whose tiles are pinned in the raster cache.
+
+        Resolves ``RASTER_CACHE_PINNED_DATASETS``, including all members of pinned mosaics.
+        Datasets that do not exist are ignored.
+        """
+        pinned_datasets = get_settings().RASTER_CACHE_PINNED_DATASETS
+
+        with self._cache_lock:
+            if self._pinned_paths is not None and self._pinned_paths[0] == pinned_datasets:
+                return self._pinned_paths[1]
+
+        paths = set()
+
+        def add_paths(key_tuple: Tuple[str, ...]) -> None:
+            path = self.get_datasets(dict(zip(self.key_names, key_tuple))).get(key_tuple)
+
+            if path == mosaic.MOSAIC_PATH:
+                for member in self._get_mosaic_index(key_tuple).members:
+                    add_paths(member)
+            elif path is not None:
+                paths.add(path)
+
+        for keys in pinned_datasets:
+            add_paths(tuple(keys))
+
+        pinned_paths = frozenset(paths)
+
+        with self._cache_lock:
+            self._pinned_paths = (pinned_datasets, pinned_paths)
+
+        return pinned_paths
+
+    def _add_to_cache(self, key: Any, value: Any, pinned: bool = False) -> None:
         try:
             with self._cache_lock:
                 self._raster_cache[key] = value
+                if pinned:
+                    self._raster_cache.pin(key)
         except ValueError:  # value too large
             pass
@@ -0,0 +1,244 @@
+"""drivers/shared_memory.py
+
+Transfer raster tiles from worker processes through shared memory instead of pickling them.
+
+The parent process owns a single shared memory block (the slab) and hands out regions of it
+to tile jobs. Workers copy their results into the region and only send back small references.
+The parent wraps the region as arrays without copying, and the region is recycled as soon as
+all arrays that point into it have been garbage collected.
+"""
+
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import os
+import atexit
+import logging
+import threading
+import weakref
+
+import numpy as np
+
+try:
+    from multiprocessing import shared_memory
+    has_shared_memory = True
+except ImportError:  # pragma: no cover
+    # Python < 3.8
+    has_shared_memory = False
+
+from terracotta import get_settings
+
+logger = logging.getLogger(__name__)
+
+# all arrays start at a multiple of this many bytes
+_ALIGNMENT = 64
+
+# item size of float64
+_MAX_ITEMSIZE = 8
+
+
+def _align(nbytes: int) -> int:
+    return -(-nbytes // _ALIGNMENT) * _ALIGNMENT
+
+
+class SharedArrayRef(NamedTuple):
+    """Location of a masked array inside the shared memory slab."""
+    offset: int
+    mask_offset: int
+    dtype: str
+    shape: Tuple[int, ...]
+
+
+def _map_arrays(obj: Any, fun: Callable[[Any], Any], array_type: type) -> Any:
+    """Apply fun to all objects of given type in nested lists, tuples, and dict values."""
+    if isinstance(obj, array_type):
+        return fun(obj)
+
+    if isinstance(obj, dict):
+        return {key: _map_arrays(val, fun, array_type) for key, val in obj.items()}
+
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_map_arrays(val, fun, array_type) for val in obj)
+
+    return obj
+
+
+def _packed_size(arr: np.ma.MaskedArray) -> int:
+    return _align(arr.nbytes) + _align(arr.size)
+
+
+def estimate_size(shape: Tuple[int, ...], num_arrays: int) -> int:
+    """Slab space needed for num_arrays masked arrays of given shape.
+
+    Data types may change while reading, so this assumes the largest real raster data type.
+    Larger results are transferred by pickling instead.
+    """
+    num_pixels = int(np.prod(shape))
+    return num_arrays * (_align(num_pixels * _MAX_ITEMSIZE) + _align(num_pixels))
+
+
+class SlabAllocator:
+    """First-fit allocator for regions of a shared memory block.
+
+    Lives in the parent process; workers only attach to the block by name.
+    """
+
+    def __init__(self, size: int) -> None:
+        self._shm = shared_memory.SharedMemory(create=True, size=size)
+        self._pid = os.getpid()
+        self.name = self._shm.name
+        self.size = size
+
+        # sorted list of free regions as (offset, size)
+        self._free: List[Tuple[int, int]] = [(0, size)]
+        # finalizers may fire during garbage collection while the lock is held
+        self._lock = threading.RLock()
+
+    @property
+    def free_bytes(self) -> int:
+        with self._lock:
+            return sum(size for _, size in self._free)
+
+    def allocate(self, nbytes: int) -> Optional[Tuple[int, int]]:
+        """Reserve a region of at least nbytes. Returns (offset, size), or None if full."""
+        nbytes = _align(max(nbytes, 1))
+
+        with self._lock:
+            for i, (offset, size) in enumerate(self._free):
+                if size < nbytes:
+                    continue
+
+                if size == nbytes:
+                    del self._free[i]
+                else:
+                    self._free[i] = (offset + nbytes, size - nbytes)
+
+                return offset, nbytes
+
+        return None
+
+    def release(self, offset: int, nbytes: int) -> None:
+        """Return a region to the pool, merging it with adjacent free regions."""
+        with self._lock:
+            free = self._free
+            i = 0
+            while i < len(free) and free[i][0] < offset:
+                i += 1
+
+            free.insert(i, (offset, nbytes))
+
+            # merge with successor, then with predecessor
+            if i + 1 < len(free) and offset + nbytes == free[i + 1][0]:
+                free[i] = (offset, nbytes + free[i + 1][1])
+                del free[i + 1]
+
+            if i > 0 and free[i - 1][0] + free[i - 1][1] == free[i][0]:
+                free[i - 1] = (free[i - 1][0], free[i - 1][1] + free[i][1])
+                del free[i]
+
+    def unpack(self, result: Any, offset: int, nbytes: int) -> Any:
+        """Replace all array references in a job result by arrays pointing into the slab.
+
+        The region is released once none of the returned arrays are referenced anymore
+        (immediately if the result does not contain any references).
+        """
+        region: np.ndarray = np.ndarray(
+            (nbytes,), dtype='uint8', buffer=self._shm.buf, offset=offset
+        )
+        weakref.finalize(region, self.release, offset, nbytes)
+
+        def to_array(ref: SharedArrayRef) -> np.ma.MaskedArray:
+            num_bytes = int(np.prod(ref.shape)) * np.dtype(ref.dtype).itemsize
+            start, mask_start = ref.offset - offset, ref.mask_offset - offset
+            data = region[start:start + num_bytes].view(ref.dtype).reshape(ref.shape)
+            mask = region[mask_start:mask_start + data.size].view('bool').reshape(ref.shape)
+            return np.ma.masked_array(data, mask=mask)
+
+        return _map_arrays(result, to_array, SharedArrayRef)
+
+    def close(self) -> None:
+        if os.getpid() != self._pid:
+            # inherited by a forked process, parent is still using it
+            return
+
+        self._shm.unlink()
+
+        try:
+            self._shm.close()
+        except BufferError:
+            # arrays still point into the slab, memory is freed on exit
+            pass
+
+
+_ALLOCATOR_STORE: Dict[str, Any] = {}
+
+
+def get_allocator() -> Optional[SlabAllocator]:
+    """Return the slab allocator of the current process (created on first use).
+
+    Returns None if shared memory is disabled or unavailable.
+    """
+    slab_size = get_settings().RASTER_SHARED_MEMORY_SIZE
+
+    if not has_shared_memory or slab_size <= 0:
+        return None
+
+    pid = os.getpid()
+    if _ALLOCATOR_STORE.get('pid') != pid or _ALLOCATOR_STORE.get('size') != slab_size:
+        allocator: Optional[SlabAllocator]
+
+        try:
+            allocator = SlabAllocator(slab_size)
+        except OSError as exc:
+            # e.g. no /dev/shm available
+            logger.warning(f'Could not create shared memory, falling back to pickling: {exc!s}')
+            allocator = None
+        else:
+            atexit.register(allocator.close)
+
+        _ALLOCATOR_STORE.update(pid=pid, size=slab_size, allocator=allocator)
+
+    return _ALLOCATOR_STORE['allocator']
+
+
+_ATTACHED_BLOCKS: Dict[str, Any] = {}
+
+
+def _attach(name: str) -> 'shared_memory.SharedMemory':
+    shm = _ATTACHED_BLOCKS.get(name)
+    if shm is None:
+        shm = _ATTACHED_BLOCKS[name] = shared_memory.SharedMemory(name=name)
+    return shm
+
+
+def pack_result(result: Any, name: str, offset: int, nbytes: int) -> Any:
+    """Copy all masked arrays in result to the given slab region and replace them by references.
+
+    Returns result unchanged if it does not fit into the region.
+    """
+    arrays: List[np.ma.MaskedArray] = []
+    _map_arrays(result, arrays.append, np.ma.MaskedArray)
+
+    if not arrays or sum(map(_packed_size, arrays)) > nbytes:
+        return result
+
+    buf = _attach(name).buf
+    position = offset
+
+    def to_ref(arr: np.ma.MaskedArray) -> SharedArrayRef:
+        nonlocal position
+        data_offset = position
+        mask_offset = data_offset + _align(arr.nbytes)
+        position = mask_offset + _align(arr.size)
+
+        np.ndarray(arr.shape, dtype=arr.dtype, buffer=buf, offset=data_offset)[...] = arr.data
+        np.ndarray(arr.shape, dtype='bool', buffer=buf, offset=mask_offset)[...] = (
+            np.ma.getmaskarray(arr)
+        )
+        return SharedArrayRef(data_offset, mask_offset, arr.dtype.str, arr.shape)
+
+    return _map_arrays(result, to_ref, np.ma.MaskedArray)
+
+
+def run_in_shared_memory(fun: Callable[[], Any], name: str, offset: int, nbytes: int) -> Any:
+    """Call fun (in a worker process) and transfer its result through shared memory."""
+    return pack_result(fun(), name, offset, nbytes)
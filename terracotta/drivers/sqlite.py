@@ -4,7 +4,8 @@ SQLite-backed raster driver. Metadata is stored in an SQLite database, raster da
 to be present on disk.
 """
 
-from typing import Any, Sequence, Mapping, Tuple, Union, Iterator, Dict, cast
+from typing import (Any, Sequence, Mapping, Tuple, Union, Iterator, Dict, List, Optional,
+                    FrozenSet, cast)
 import os
 import contextlib
 from contextlib import AbstractContextManager
@@ -57,8 +58,10 @@ class SQLiteDriver(RasterDriver):
 
     - ``terracotta``: Metadata about the database itself.
     - ``keys``: Contains two columns holding all available keys and their description.
-    - ``datasets``: Maps key values to physical raster path.
+    - ``datasets``: Maps key values to physical raster path and band index.
     - ``metadata``: Contains actual metadata as separate columns. Indexed via key values.
+      Also stores georeferencing information used during tile retrieval, and the members
+      of mosaic datasets.
 
     This driver caches raster data, but not metadata.
 
@@ -83,6 +86,14 @@ class SQLiteDriver(RasterDriver):
         ('percentiles', 'BLOB'),
         ('metadata', 'VARCHAR[max]')
     )
+    # internal, not part of the public metadata
+    _COVERAGE_COLUMN_TYPE: str = 'VARCHAR[max]'
+    _MOSAIC_COLUMN_TYPE: str = 'VARCHAR[max]'
+    _GEOREFERENCE_COLUMN_TYPE: str = 'VARCHAR[max]'
+    # columns that are missing in databases created by older versions
+    _OPTIONAL_COLUMNS: FrozenSet[str] = frozenset(
+        ('band_index', 'georeference', 'coverage', 'mosaic_members')
+    )
 
     def __init__(self, path: Union[str, Path]) -> None:
         """Initialize the SQLiteDriver.
@@ -102,6 +113,7 @@ class SQLiteDriver(RasterDriver):
 
         self._connection: Connection
         self._connected = False
+        self._columns: FrozenSet[str] = frozenset()
 
         super().__init__(os.path.realpath(path))
 
@@ -164,6 +176,17 @@ class SQLiteDriver(RasterDriver):
                 f'but this is v{current_version}'
             )
 
+        self._columns = self._get_columns()
+
+    @convert_exceptions(_ERROR_ON_CONNECT)
+    def _get_columns(self) -> FrozenSet[str]:
+        """Names of all columns of the datasets and metadata tables"""
+        conn = self._connection
+        return frozenset(
+            row['name'] for table in ('datasets', 'metadata')
+            for row in conn.execute(f'PRAGMA table_info({table})')
+        )
+
     def _get_key_names(self) -> Tuple[str, ...]:
         """Names of all keys defined by the database"""
         return tuple(self.get_keys().keys())
@@ -212,13 +235,47 @@ class SQLiteDriver(RasterDriver):
 
             key_string = ', '.join([f'{key} {self._KEY_TYPE}' for key in keys])
             conn.execute(f'CREATE TABLE datasets ({key_string}, filepath VARCHAR[8000], '
-                         f'PRIMARY KEY({", ".join(keys)}))')
+                         f'band_index INTEGER DEFAULT 1, PRIMARY KEY({", ".join(keys)}))')
 
             column_string = ', '.join(f'{col} {col_type}' for col, col_type
                                       in self._METADATA_COLUMNS)
             conn.execute(f'CREATE TABLE metadata ({key_string}, {column_string}, '
+                         f'georeference {self._GEOREFERENCE_COLUMN_TYPE}, '
+                         f'coverage {self._COVERAGE_COLUMN_TYPE}, '
+                         f'mosaic_members {self._MOSAIC_COLUMN_TYPE}, '
                          f'PRIMARY KEY ({", ".join(keys)}))')
 
+    @requires_connection
+    def _upgrade_schema(self) -> None:
+        """Add columns introduced after the database was created.
+
+        Georeferences of existing datasets are computed when they are first read.
+        """
+        conn = self._connection
+        columns = self._columns
+
+        if self._OPTIONAL_COLUMNS <= columns:
+            return
+
+        if 'band_index' not in columns:
+            conn.execute('ALTER TABLE datasets ADD COLUMN band_index INTEGER DEFAULT 1')
+
+        if 'coverage' not in columns:
+            # only computed during ingestion, until then tiles are checked against dataset bounds
+            conn.execute(f'ALTER TABLE metadata ADD COLUMN coverage {self._COVERAGE_COLUMN_TYPE}')
+
+        if 'mosaic_members' not in columns:
+            conn.execute(
+                f'ALTER TABLE metadata ADD COLUMN mosaic_members {self._MOSAIC_COLUMN_TYPE}'
+            )
+
+        if 'georeference' not in columns:
+            conn.execute(
+                f'ALTER TABLE metadata ADD COLUMN georeference {self._GEOREFERENCE_COLUMN_TYPE}'
+            )
+
+        self._columns = self._get_columns()
+
     @requires_connection
     @convert_exceptions('Could not retrieve keys from database')
     def get_keys(self) -> OrderedDict:
@@ -280,6 +337,17 @@ class SQLiteDriver(RasterDriver):
             'percentiles': np.array(decoded['percentiles'], dtype='float32').tobytes(),
             'metadata': json.dumps(decoded['metadata'])
         }
+
+        georeference = decoded.get('georeference')
+        if georeference is not None:
+            encoded['georeference'] = json.dumps(georeference)
+
+        if 'coverage' in decoded:
+            encoded['coverage'] = json.dumps(decoded['coverage'])
+
+        if 'mosaic_members' in decoded:
+            encoded['mosaic_members'] = json.dumps(decoded['mosaic_members'])
+
         return encoded
 
     @staticmethod
@@ -319,8 +387,10 @@ class SQLiteDriver(RasterDriver):
                 raise exceptions.DatasetNotFoundError(f'No dataset found for given keys {keys}')
 
             # compute metadata and try again
-            metadata = self.compute_metadata(filepath[keys], max_shape=self.LAZY_LOADING_MAX_SHAPE)
-            self.insert(keys, filepath[keys], metadata=metadata)
+            _, band = self._get_raster_source(keys)
+            metadata = self.compute_metadata(filepath[keys], max_shape=self.LAZY_LOADING_MAX_SHAPE,
+                                             band=band)
+            self.insert(keys, filepath[keys], metadata=metadata, band=band)
             row = conn.execute(f'SELECT * FROM metadata WHERE {where_string}', keys).fetchone()
 
         assert row
@@ -329,6 +399,74 @@ class SQLiteDriver(RasterDriver):
         encoded_data = {col: row[col] for col in self.key_names + data_columns}
         return self._decode_data(encoded_data)
 
+    @requires_connection
+    @convert_exceptions('Could not retrieve datasets')
+    def _get_raster_source(self, keys: Sequence[str]) -> Tuple[str, int]:
+        conn = self._connection
+        where_string = ' AND '.join([f'{key}=?' for key in self.key_names])
+
+        # database might not have been upgraded yet
+        band_column = 'band_index' if 'band_index' in self._columns else '1 AS band_index'
+        row = conn.execute(
+            f'SELECT filepath, {band_column} FROM datasets WHERE {where_string}', keys
+        ).fetchone()
+
+        if row is None:
+            raise exceptions.DatasetNotFoundError(f'No dataset found for given keys {keys}')
+
+        return row['filepath'], row['band_index']
+
+    @requires_connection
+    def _get_georeference(self, keys: Sequence[str]) -> Optional[Dict[str, Any]]:
+        if 'georeference' not in self._columns:
+            # database has not been upgraded yet
+            return None
+
+        conn = self._connection
+        where_string = ' AND '.join([f'{key}=?' for key in self.key_names])
+        row = conn.execute(
+            f'SELECT georeference FROM metadata WHERE {where_string}', keys
+        ).fetchone()
+
+        if row is None or row['georeference'] is None:
+            return None
+
+        return json.loads(row['georeference'])
+
+    @requires_connection
+    def _get_coverage(self, keys: Sequence[str]) -> Optional[Dict[str, Any]]:
+        if 'coverage' not in self._columns:
+            # database has not been upgraded yet
+            return None
+
+        conn = self._connection
+        where_string = ' AND '.join([f'{key}=?' for key in self.key_names])
+        row = conn.execute(
+            f'SELECT coverage FROM metadata WHERE {where_string}', keys
+        ).fetchone()
+
+        if row is None or row['coverage'] is None:
+            return None
+
+        return json.loads(row['coverage'])
+
+    @requires_connection
+    def _get_mosaic_members(self, keys: Sequence[str]) -> Optional[List[Dict[str, Any]]]:
+        if 'mosaic_members' not in self._columns:
+            # database has not been upgraded yet
+            return None
+
+        conn = self._connection
+        where_string = ' AND '.join([f'{key}=?' for key in self.key_names])
+        row = conn.execute(
+            f'SELECT mosaic_members FROM metadata WHERE {where_string}', keys
+        ).fetchone()
+
+        if row is None or row['mosaic_members'] is None:
+            return None
+
+        return json.loads(row['mosaic_members'])
+
     @trace('insert')
     @requires_connection
     @convert_exceptions('Could not write to database')
@@ -337,7 +475,8 @@ class SQLiteDriver(RasterDriver):
                filepath: str, *,
                metadata: Mapping[str, Any] = None,
                skip_metadata: bool = False,
-               override_path: str = None) -> None:
+               override_path: str = None,
+               band: int = 1) -> None:
         conn = self._connection
 
         if len(keys) != len(self.key_names):
@@ -348,13 +487,16 @@ class SQLiteDriver(RasterDriver):
         if override_path is None:
             override_path = filepath
 
+        self._upgrade_schema()
+        self._clear_dataset_caches()
+
         keys = self._key_dict_to_sequence(keys)
-        template_string = ', '.join(['?'] * (len(keys) + 1))
-        conn.execute(f'INSERT OR REPLACE INTO datasets VALUES ({template_string})',
-                     [*keys, override_path])
+        template_string = ', '.join(['?'] * (len(keys) + 2))
+        conn.execute(f'INSERT OR REPLACE INTO datasets ({", ".join(self.key_names)}, filepath, '
+                     f'band_index) VALUES ({template_string})', [*keys, override_path, band])
 
         if metadata is None and not skip_metadata:
-            metadata = self.compute_metadata(filepath)
+            metadata = self.compute_metadata(filepath, band=band)
 
         if metadata is not None:
             encoded_data = self._encode_data(metadata)
@@ -380,6 +522,8 @@ class SQLiteDriver(RasterDriver):
         if not self.get_datasets(key_dict):
             raise exceptions.DatasetNotFoundError(f'No dataset found with keys {keys}')
 
+        self._clear_dataset_caches()
+
         where_string = ' AND '.join([f'{key}=?' for key in self.key_names])
         conn.execute(f'DELETE FROM datasets WHERE {where_string}', keys)
         conn.execute(f'DELETE FROM metadata WHERE {where_string}', keys)
@@ -21,7 +21,9 @@ def compute(expression: str,
             stretch_range: Tuple[Number, Number],
             tile_xyz: Tuple[int, int, int] = None, *,
             colormap: str = None,
-            tile_size: Tuple[int, int] = None) -> BinaryIO:
+            tile_size: Tuple[int, int] = None,
+            deadline: float = None,
+            tile_matrix_set: str = None) -> BinaryIO:
     """Return singleband image computed from one or more images as PNG
 
     Expects a Python expression that returns a NumPy array. Operands in
@@ -42,6 +44,9 @@ def compute(expression: str,
     """
     from terracotta.expressions import evaluate_expression
 
+    if deadline is None:
+        deadline = xyz.get_deadline()
+
     if not stretch_range[1] > stretch_range[0]:
         raise exceptions.InvalidArgumentsError(
             'Upper stretch bounds must be larger than lower bounds'
@@ -56,19 +61,27 @@ def compute(expression: str,
 
     driver = get_driver(settings.DRIVER_PATH, provider=settings.DRIVER_PROVIDER)
 
+    if tile_xyz is not None:
+        # skip database and file access for tiles that are known to be empty
+        xyz.raise_if_empty_tile(
+            driver, [(*some_keys, key) for key in operand_keys.values()], tile_xyz,
+            tile_matrix_set=tile_matrix_set
+        )
+
     with driver.connect():
         key_names = driver.key_names
 
         if len(some_keys) != len(key_names) - 1:
             raise exceptions.InvalidArgumentsError('must specify all keys except last one')
 
-        def get_band_future(band_key: str) -> Future:
-            band_keys = (*some_keys, band_key)
-            return xyz.get_tile_data(driver, band_keys, tile_xyz=tile_xyz,
-                                     tile_size=tile_size_, asynchronous=True)
-
-        futures = {var: get_band_future(key) for var, key in operand_keys.items()}
-        operand_data = {var: future.result() for var, future in futures.items()}
+        # operands stored in the same file are read together
+        operand_vars = list(operand_keys.keys())
+        futures: Sequence[Future] = xyz.get_tile_data_multi(
+            driver, [(*some_keys, operand_keys[var]) for var in operand_vars],
+            tile_xyz=tile_xyz, tile_size=tile_size_, asynchronous=True, deadline=deadline,
+            tile_matrix_set=tile_matrix_set, check_empty_tile=False
+        )
+        operand_data = {var: future.result() for var, future in zip(operand_vars, futures)}
 
     try:
         out = evaluate_expression(expression, operand_data)
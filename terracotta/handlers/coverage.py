@@ -0,0 +1,33 @@
+"""handlers/coverage.py
+
+Handle /coverage API endpoint.
+"""
+
+from typing import Mapping, Sequence, Dict, Any, Union
+from collections import OrderedDict
+
+from terracotta import get_settings, get_driver
+from terracotta.profile import trace
+
+
+@trace('coverage_handler')
+def coverage(keys: Union[Sequence[str], Mapping[str, str]]) -> Dict[str, Any]:
+    """Returns the XYZ tiles that contain data of a single dataset"""
+    settings = get_settings()
+    driver = get_driver(settings.DRIVER_PATH, provider=settings.DRIVER_PROVIDER)
+
+    with driver.connect():
+        # raises if dataset does not exist
+        bounds = driver.get_metadata(keys)['bounds']
+        tile_coverage = driver.get_coverage(keys)
+
+    payload: Dict[str, Any] = OrderedDict()
+    payload['keys'] = OrderedDict(zip(driver.key_names, keys))
+    payload['bounds'] = bounds
+
+    if tile_coverage is None:
+        payload.update(max_zoom=None, levels=[])
+    else:
+        payload.update(tile_coverage.to_dict())
+
+    return payload
@@ -19,7 +19,9 @@ def rgb(some_keys: Sequence[str],
         rgb_values: Sequence[str],
         tile_xyz: Tuple[int, int, int] = None, *,
         stretch_ranges: ListOfRanges = None,
-        tile_size: Tuple[int, int] = None) -> BinaryIO:
+        tile_size: Tuple[int, int] = None,
+        deadline: float = None,
+        tile_matrix_set: str = None) -> BinaryIO:
     """Return RGB image as PNG
 
     Red, green, and blue channels correspond to the given values `rgb_values` of the key
@@ -27,6 +29,9 @@ def rgb(some_keys: Sequence[str],
     """
     import numpy as np
 
+    if deadline is None:
+        deadline = xyz.get_deadline()
+
     # make sure all stretch ranges contain two values
     if stretch_ranges is None:
         stretch_ranges = [None, None, None]
@@ -48,18 +53,25 @@ def rgb(some_keys: Sequence[str],
 
     driver = get_driver(settings.DRIVER_PATH, provider=settings.DRIVER_PROVIDER)
 
+    if tile_xyz is not None:
+        # skip database and file access for tiles that are known to be empty
+        xyz.raise_if_empty_tile(
+            driver, [(*some_keys, key) for key in rgb_values], tile_xyz,
+            tile_matrix_set=tile_matrix_set
+        )
+
     with driver.connect():
         key_names = driver.key_names
 
         if len(some_keys) != len(key_names) - 1:
             raise exceptions.InvalidArgumentsError('must specify all keys except last one')
 
-        def get_band_future(band_key: str) -> Future:
-            band_keys = (*some_keys, band_key)
-            return xyz.get_tile_data(driver, band_keys, tile_xyz=tile_xyz,
-                                     tile_size=tile_size_, asynchronous=True)
-
-        futures = [get_band_future(key) for key in rgb_values]
+        # bands stored in the same file are read together
+        futures: Sequence[Future] = xyz.get_tile_data_multi(
+            driver, [(*some_keys, key) for key in rgb_values], tile_xyz=tile_xyz,
+            tile_size=tile_size_, asynchronous=True, deadline=deadline,
+            tile_matrix_set=tile_matrix_set, check_empty_tile=False
+        )
         band_items = zip(rgb_values, stretch_ranges_, futures)
 
         out_arrays = []
@@ -20,7 +20,9 @@ def singleband(keys: Union[Sequence[str], Mapping[str, str]],
                tile_xyz: Tuple[int, int, int] = None, *,
                colormap: Union[str, Mapping[Number, RGBA], None] = None,
                stretch_range: Tuple[Number, Number] = None,
-               tile_size: Tuple[int, int] = None) -> BinaryIO:
+               tile_size: Tuple[int, int] = None,
+               deadline: float = None,
+               tile_matrix_set: str = None) -> BinaryIO:
     """Return singleband image as PNG"""
 
     cmap_or_palette: Union[str, Sequence[RGBA], None]
@@ -32,17 +34,25 @@ def singleband(keys: Union[Sequence[str], Mapping[str, str]],
 
     preserve_values = isinstance(colormap, collections.Mapping)
 
+    if deadline is None:
+        deadline = xyz.get_deadline()
+
     settings = get_settings()
     if tile_size is None:
         tile_size = settings.DEFAULT_TILE_SIZE
 
     driver = get_driver(settings.DRIVER_PATH, provider=settings.DRIVER_PROVIDER)
 
+    if tile_xyz is not None:
+        # skip database and file access for tiles that are known to be empty
+        xyz.raise_if_empty_tile(driver, [keys], tile_xyz, tile_matrix_set=tile_matrix_set)
+
     with driver.connect():
         metadata = driver.get_metadata(keys)
         tile_data = xyz.get_tile_data(
             driver, keys, tile_xyz,
-            tile_size=tile_size, preserve_values=preserve_values
+            tile_size=tile_size, preserve_values=preserve_values, deadline=deadline,
+            tile_matrix_set=tile_matrix_set, check_empty_tile=False
         )
 
     if preserve_values:
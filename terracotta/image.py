@@ -7,6 +7,7 @@ from typing import Sequence, Tuple, TypeVar, Union
 from typing.io import BinaryIO
 
 from io import BytesIO
+import functools
 
 import numpy as np
 from PIL import Image
@@ -114,14 +115,17 @@ def array_to_png(img_data: Array,
 def empty_image(size: Tuple[int, int]) -> BinaryIO:
     """Return a fully transparent PNG image of given size"""
     settings = get_settings()
-    compress_level = settings.PNG_COMPRESS_LEVEL
+    return BytesIO(_encode_empty_image(tuple(size), settings.PNG_COMPRESS_LEVEL))
+
 
+@functools.lru_cache(maxsize=16)
+def _encode_empty_image(size: Tuple[int, int], compress_level: int) -> bytes:
+    # empty tiles are served often, so only encode them once
     img = Image.new(mode='P', size=size, color=0)
 
     sio = BytesIO()
     img.save(sio, 'png', compress_level=compress_level, transparency=0)
-    sio.seek(0)
-    return sio
+    return sio.getvalue()
 
 
 @trace('contrast_stretch')
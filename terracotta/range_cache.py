@@ -0,0 +1,334 @@
+"""range_cache.py
+
+Local cache for byte ranges of remote raster files, backed by memory and disk.
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import hashlib
+import os
+import threading
+import urllib.parse as urlparse
+import urllib.request
+
+from cachetools import LRUCache
+
+#: size of the chunks that remote files are fetched and cached in
+CHUNK_SIZE = 64 * 1024
+
+# timeout of a single HTTP request in seconds
+_REQUEST_TIMEOUT = 30
+
+# maximum number of file headers that are kept in memory
+_MAX_PINNED_HEADERS = 256
+
+Fetcher = Callable[[int, int], bytes]
+
+
+class RangeCache:
+    """Cache for fixed-size chunks of remote files, with an in-memory and an on-disk tier.
+
+    Both tiers evict the least recently used chunks first when they exceed their size limit
+    in bytes (0 disables a tier). The first chunk of every file holds its header (and, for
+    cloud-optimized GeoTIFFs, all image file directories), so it is kept separately: on
+    disk it is never evicted, and in memory the headers of the most recently used
+    files are kept regardless of the memory size.
+
+    The disk tier can be shared by several processes. Remote files are assumed to never
+    change; delete the cache directory after modifying them.
+    """
+
+    def __init__(self, memory_size: int, disk_dir: Optional[str] = None,
+                 disk_size: int = 0) -> None:
+        self.memory_size = memory_size
+        self.disk_dir = disk_dir if disk_size > 0 else None
+        self.disk_size = disk_size
+
+        self._memory: LRUCache = LRUCache(max(memory_size, 1), getsizeof=len)
+        self._pinned: LRUCache = LRUCache(_MAX_PINNED_HEADERS)
+        self._disk_usage: Optional[int] = None
+        self._evicting = False
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = dict(
+            memory_hits=0, disk_hits=0, misses=0, requests=0, bytes_fetched=0
+        )
+
+        if self.disk_dir is not None:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    def _get_disk_path(self, file_key: str, chunk_idx: int) -> str:
+        assert self.disk_dir is not None
+        extension = 'header' if chunk_idx == 0 else 'chunk'
+        return os.path.join(self.disk_dir, f'{file_key}-{chunk_idx}.{extension}')
+
+    def get(self, file_key: str, chunk_idx: int) -> Optional[bytes]:
+        """Return given chunk of a file, or None if it is not cached."""
+        with self._lock:
+            if chunk_idx == 0:
+                data = self._pinned.get(file_key)
+            else:
+                data = self._memory.get((file_key, chunk_idx))
+
+            if data is not None:
+                self._stats['memory_hits'] += 1
+                return data
+
+        if self.disk_dir is None:
+            return None
+
+        disk_path = self._get_disk_path(file_key, chunk_idx)
+
+        try:
+            with open(disk_path, 'rb') as f:
+                data = f.read()
+            # mark as recently used
+            os.utime(disk_path)
+        except FileNotFoundError:
+            # not cached or evicted by another process
+            return None
+
+        with self._lock:
+            self._stats['disk_hits'] += 1
+            self._put_memory(file_key, chunk_idx, data)
+
+        return data
+
+    def put(self, file_key: str, chunk_idx: int, data: bytes) -> None:
+        """Store given chunk of a file in all tiers."""
+        with self._lock:
+            self._put_memory(file_key, chunk_idx, data)
+
+        if self.disk_dir is not None:
+            self._put_disk(file_key, chunk_idx, data)
+
+    def _put_memory(self, file_key: str, chunk_idx: int, data: bytes) -> None:
+        if chunk_idx == 0:
+            self._pinned[file_key] = data
+        elif 0 < len(data) <= self.memory_size:
+            self._memory[(file_key, chunk_idx)] = data
+
+    def _put_disk(self, file_key: str, chunk_idx: int, data: bytes) -> None:
+        disk_path = self._get_disk_path(file_key, chunk_idx)
+
+        # write to temporary file first so other processes never see partial chunks
+        tmp_path = f'{disk_path}.{os.getpid()}-{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, disk_path)
+
+        if chunk_idx == 0:
+            return
+
+        with self._lock:
+            if self._disk_usage is not None:
+                self._disk_usage += len(data)
+
+            # only one thread scans the cache directory at a time
+            must_evict = not self._evicting and (
+                self._disk_usage is None or self._disk_usage > self.disk_size
+            )
+            if must_evict:
+                self._evicting = True
+
+        if not must_evict:
+            return
+
+        # scan without holding the lock, so other threads can keep reading
+        try:
+            disk_usage = self._evict_disk()
+        finally:
+            with self._lock:
+                self._evicting = False
+
+        with self._lock:
+            # chunks written during the scan are counted again by the next one
+            self._disk_usage = disk_usage
+
+    def _evict_disk(self) -> int:
+        # delete least recently used chunks (of all processes) until cache fits again,
+        # return remaining disk usage
+        assert self.disk_dir is not None
+        chunks = []
+
+        for entry in os.scandir(self.disk_dir):
+            if not entry.name.endswith('.chunk'):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            chunks.append((stat.st_mtime_ns, stat.st_size, entry.path))
+
+        chunks.sort()
+        disk_usage = sum(size for _, size, _ in chunks)
+
+        for _, size, path in chunks:
+            if disk_usage <= self.disk_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            disk_usage -= size
+
+        return disk_usage
+
+    def record_request(self, num_bytes: int, num_chunks: int) -> None:
+        with self._lock:
+            self._stats['requests'] += 1
+            self._stats['misses'] += num_chunks
+            self._stats['bytes_fetched'] += num_bytes
+
+    def get_stats(self) -> Dict[str, int]:
+        """Return number of chunks served from memory and disk, and of remote requests."""
+        with self._lock:
+            return dict(self._stats, memory_size=int(self._memory.currsize))
+
+
+class RemoteFile:
+    """Remote file that is read in chunks through a :class:`RangeCache`.
+
+    All chunks that are needed for a read and not cached yet are fetched at once, and
+    consecutive chunks are fetched in a single range request.
+    """
+
+    def __init__(self, url: str, fetch: Fetcher, cache: RangeCache) -> None:
+        self.url = _normalize_url(url)
+        #: identifies this file in block cache keys
+        self.file_id: Tuple[str, ...] = (self.url,)
+        self._fetch = fetch
+        self._cache = cache
+        self._file_key = hashlib.sha256(self.url.encode('utf-8')).hexdigest()[:32]
+
+    def _get_chunks(self, chunk_indices: Sequence[int]) -> Dict[int, bytes]:
+        chunks: Dict[int, bytes] = {}
+        missing: List[int] = []
+
+        for chunk_idx in sorted(set(chunk_indices)):
+            data = self._cache.get(self._file_key, chunk_idx)
+            if data is None:
+                missing.append(chunk_idx)
+            else:
+                chunks[chunk_idx] = data
+
+        # group missing chunks into runs of consecutive chunks
+        runs: List[List[int]] = []
+        for chunk_idx in missing:
+            if runs and runs[-1][-1] == chunk_idx - 1:
+                runs[-1].append(chunk_idx)
+            else:
+                runs.append([chunk_idx])
+
+        for run in runs:
+            start, stop = run[0] * CHUNK_SIZE, (run[-1] + 1) * CHUNK_SIZE
+            data = self._fetch(start, stop)
+            self._cache.record_request(len(data), len(run))
+
+            for i, chunk_idx in enumerate(run):
+                chunk_data = data[i * CHUNK_SIZE:(i + 1) * CHUNK_SIZE]
+                # reads past the end of the file return empty chunks, which are not cached
+                if chunk_data:
+                    self._cache.put(self._file_key, chunk_idx, chunk_data)
+                chunks[chunk_idx] = chunk_data
+
+        return chunks
+
+    def read_ranges(self, ranges: Sequence[Tuple[int, int]]) -> List[bytes]:
+        """Read several ranges given as (offset, size), with as few requests as possible."""
+        chunk_indices = [
+            chunk_idx
+            for offset, size in ranges if size > 0
+            for chunk_idx in range(offset // CHUNK_SIZE, (offset + size - 1) // CHUNK_SIZE + 1)
+        ]
+        chunks = self._get_chunks(chunk_indices)
+
+        out = []
+        for offset, size in ranges:
+            if size <= 0:
+                out.append(b'')
+                continue
+
+            first_chunk = offset // CHUNK_SIZE
+            last_chunk = (offset + size - 1) // CHUNK_SIZE
+            data = b''.join(chunks[idx] for idx in range(first_chunk, last_chunk + 1))
+            start = offset - first_chunk * CHUNK_SIZE
+            out.append(data[start:start + size])
+
+        return out
+
+    def read(self, offset: int, size: int) -> bytes:
+        return self.read_ranges([(offset, size)])[0]
+
+
+def _fetch_http(url: str, start: int, stop: int) -> bytes:
+    request = urllib.request.Request(url, headers={'Range': f'bytes={start}-{stop - 1}'})
+
+    with urllib.request.urlopen(request, timeout=_REQUEST_TIMEOUT) as response:
+        if response.status != 206:
+            # server ignored range request, which is only fine if the range is the whole file
+            content_length = response.headers.get('Content-Length')
+
+            if start > 0 or content_length is None or int(content_length) > stop:
+                raise OSError(f'server does not support range requests for {url}')
+
+        return response.read()
+
+
+class _S3ClientStore:
+    client: Any = None
+    pid: Optional[int] = None
+    lock = threading.Lock()
+
+
+def _fetch_s3(bucket: str, key: str, start: int, stop: int) -> bytes:
+    import boto3
+    from botocore.exceptions import BotoCoreError, ClientError
+
+    with _S3ClientStore.lock:
+        # clients must not be shared with child processes
+        if _S3ClientStore.client is None or _S3ClientStore.pid != os.getpid():
+            _S3ClientStore.client = boto3.client('s3')
+            _S3ClientStore.pid = os.getpid()
+
+        client = _S3ClientStore.client
+
+    try:
+        response = client.get_object(Bucket=bucket, Key=key, Range=f'bytes={start}-{stop - 1}')
+        return response['Body'].read()
+    except (BotoCoreError, ClientError) as exc:
+        raise OSError(f'could not read s3://{bucket}/{key}: {exc}') from exc
+
+
+def _normalize_url(path: str) -> str:
+    # translate GDAL virtual file system paths to URLs
+    if path.startswith('/vsicurl/'):
+        return path[len('/vsicurl/'):]
+    if path.startswith('/vsis3/'):
+        return 's3://' + path[len('/vsis3/'):]
+    return path
+
+
+def get_fetcher(path: str) -> Optional[Fetcher]:
+    """Return a function that fetches byte ranges (start, stop) of a remote raster path.
+
+    Supports HTTP(S) and S3 URLs, also in their GDAL virtual file system form
+    (``/vsicurl/`` and ``/vsis3/``). Returns None for all other paths, and for S3 if
+    boto3 is not installed.
+    """
+    path = _normalize_url(path)
+    parts = urlparse.urlparse(path)
+
+    if parts.scheme in ('http', 'https'):
+        return lambda start, stop: _fetch_http(path, start, stop)
+
+    if parts.scheme == 's3' and parts.netloc and parts.path.strip('/'):
+        try:
+            import boto3  # noqa: F401
+        except ImportError:
+            # leave it to GDAL
+            return None
+
+        bucket, key = parts.netloc, parts.path.lstrip('/')
+        return lambda start, stop: _fetch_s3(bucket, key, start, stop)
+
+    return None
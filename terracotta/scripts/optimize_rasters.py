@@ -3,7 +3,7 @@
 Convert some raster files to cloud-optimized GeoTiff for use with Terracotta.
 """
 
-from typing import Sequence, Iterator, Union
+from typing import Sequence, Iterator, Union, Tuple
 import os
 import math
 import warnings
@@ -23,8 +23,10 @@ from rasterio.vrt import WarpedVRT
 from rasterio.enums import Resampling
 from rasterio.env import GDALVersion
 from rasterio.warp import calculate_default_transform
+from affine import Affine
 
 from terracotta.scripts.click_types import GlobbityGlob, PathlibPath
+from terracotta.tile_matrix import TILE_MATRIX_SETS, TileMatrixSet
 
 logger = logging.getLogger(__name__)
 
@@ -82,15 +84,52 @@ def _prefered_compression_method() -> str:
     return 'DEFLATE'
 
 
-def _get_vrt(src: DatasetReader, rs_method: int) -> WarpedVRT:
+def _align_to_grid(vrt_transform: Affine, vrt_width: int, vrt_height: int,
+                   tile_matrix_set: TileMatrixSet) -> Tuple[Affine, int, int]:
+    """Snap raster to the pixel grid of the closest zoom level of given tile matrix set.
+
+    This way, the raster and its overviews line up with the tiles of consecutive zoom levels.
+    """
+    west, _, east, north = tile_matrix_set.extent
+
+    # resolution of 256x256 tiles at zoom level 0
+    base_res = (east - west) / 256
+    zoom = max(0, round(math.log2(base_res / vrt_transform.a)))
+    res = base_res / 2 ** zoom
+
+    left, top = vrt_transform.c, vrt_transform.f
+    right = left + vrt_width * vrt_transform.a
+    bottom = top + vrt_height * vrt_transform.e
+
+    left = west + math.floor((left - west) / res) * res
+    top = north - math.floor((north - top) / res) * res
+    width = math.ceil((right - left) / res)
+    height = math.ceil((top - bottom) / res)
+
+    return Affine(res, 0, left, 0, -res, top), width, height
+
+
+def _get_vrt(src: DatasetReader, rs_method: int,
+             tile_matrix_set: TileMatrixSet = None) -> WarpedVRT:
     from terracotta.drivers.raster_base import RasterDriver
-    target_crs = RasterDriver._TARGET_CRS
+
+    if tile_matrix_set is None:
+        target_crs = RasterDriver._TARGET_CRS
+    else:
+        target_crs = tile_matrix_set.crs
+
     vrt_transform, vrt_width, vrt_height = calculate_default_transform(
         src.crs, target_crs, src.width, src.height, *src.bounds
     )
+
+    if tile_matrix_set is not None:
+        vrt_transform, vrt_width, vrt_height = _align_to_grid(
+            vrt_transform, vrt_width, vrt_height, tile_matrix_set
+        )
+
     vrt = WarpedVRT(
         src, crs=target_crs, resampling=rs_method, transform=vrt_transform,
-        width=vrt_width, height=vrt_height
+        width=vrt_width, height=vrt_height, **dict(RasterDriver._get_warp_options())
     )
     return vrt
 
@@ -129,6 +168,11 @@ TemporaryRasterFile = _named_tempfile
     '--reproject', is_flag=True, default=False, show_default=True,
     help='Reproject raster file to Web Mercator for faster access'
 )
+@click.option(
+    '--tile-matrix-set', type=click.Choice(list(TILE_MATRIX_SETS)), default=None,
+    help='Reproject raster file to the CRS of given tile matrix set and align it to its tile '
+         'grid, so tiles in that grid can be read without warping (implies --reproject)'
+)
 @click.option(
     '--in-memory/--no-in-memory', default=None,
     help='Force processing raster in memory / not in memory [default: process in memory '
@@ -147,6 +191,7 @@ def optimize_rasters(raster_files: Sequence[Sequence[Path]],
                      overwrite: bool = False,
                      resampling_method: str = 'average',
                      reproject: bool = False,
+                     tile_matrix_set: str = None,
                      in_memory: bool = None,
                      compression: str = 'auto',
                      quiet: bool = False) -> None:
@@ -168,6 +213,11 @@ def optimize_rasters(raster_files: Sequence[Sequence[Path]],
 
     rs_method = RESAMPLING_METHODS[resampling_method]
 
+    target_grid = None
+    if tile_matrix_set is not None:
+        target_grid = TILE_MATRIX_SETS[tile_matrix_set]
+        reproject = True
+
     if compression == 'auto':
         compression = _prefered_compression_method()
 
@@ -225,7 +275,9 @@ def optimize_rasters(raster_files: Sequence[Sequence[Path]],
                 src = es.enter_context(rasterio.open(str(input_file)))
 
                 if reproject:
-                    vrt = es.enter_context(_get_vrt(src, rs_method=rs_method))
+                    vrt = es.enter_context(
+                        _get_vrt(src, rs_method=rs_method, tile_matrix_set=target_grid)
+                    )
                 else:
                     vrt = src
 
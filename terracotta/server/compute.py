@@ -11,6 +11,7 @@ from marshmallow import (Schema, fields, validate,
 from flask import request, send_file
 
 from terracotta.server.flask_api import convert_exceptions, TILE_API
+from terracotta.tile_matrix import TILE_MATRIX_SETS
 from terracotta.cmaps import AVAILABLE_CMAPS
 
 
@@ -51,6 +52,12 @@ class ComputeOptionSchema(Schema):
         description='Pixel dimensions of the returned PNG image as JSON list.'
     )
 
+    tile_matrix_set = fields.String(
+        validate=validate.OneOf(TILE_MATRIX_SETS), example='WebMercatorQuad',
+        description='Tile grid that tile coordinates refer to, and projection of the returned '
+                    'image [default: WebMercatorQuad].'
+    )
+
     v1 = _operator_field(1)
     v2 = _operator_field(2)
     v3 = _operator_field(3)
@@ -0,0 +1,68 @@
+"""server/coverage.py
+
+Flask route to handle /coverage calls.
+"""
+
+from marshmallow import Schema, fields, validate
+from flask import jsonify, Response
+
+from terracotta.server.flask_api import convert_exceptions, METADATA_API
+
+
+class CoverageLevelSchema(Schema):
+    class Meta:
+        ordered = True
+
+    zoom = fields.Integer(description='Zoom level', required=True)
+    window = fields.List(fields.Integer(), validate=validate.Length(equal=4), required=True,
+                         description='x offset, y offset, width, and height of the bitmap in '
+                                     'the XYZ tile grid; tiles outside contain no data')
+    bitmap = fields.String(description='Base64-encoded, zlib-compressed bitmap with one bit per '
+                                       'tile (rows north to south, most significant bit first)',
+                           required=True)
+
+
+class CoverageSchema(Schema):
+    class Meta:
+        ordered = True
+
+    keys = fields.Dict(keys=fields.String(), values=fields.String(),
+                       description='Keys identifying dataset', required=True)
+    bounds = fields.List(fields.Number(), validate=validate.Length(equal=4), required=True,
+                         description='Physical bounds of dataset in WGS84 projection')
+    max_zoom = fields.Integer(allow_none=True, required=True,
+                              description='Deepest zoom level with a bitmap; deeper tiles contain '
+                                          'data only if their ancestor at this level does')
+    levels = fields.List(fields.Nested(CoverageLevelSchema), required=True,
+                         description='Tile bitmaps for all zoom levels up to max_zoom (empty if '
+                                     'coverage is unknown)')
+
+
+@METADATA_API.route('/coverage/<path:keys>', methods=['GET'])
+@convert_exceptions
+def get_coverage(keys: str) -> Response:
+    """Get XYZ tiles that contain data of given dataset
+    ---
+    get:
+        summary: /coverage
+        description:
+            Retrieve bitmaps of the XYZ tiles that contain data of given dataset (identified by
+            keys). Clients can use this to skip requesting empty tiles.
+        parameters:
+          - name: keys
+            in: path
+            description: Keys of dataset to retrieve coverage for (e.g. 'value1/value2')
+            type: path
+            required: true
+        responses:
+            200:
+                description: Tile coverage of given dataset
+                schema: CoverageSchema
+            404:
+                description: No dataset found for given key combination
+    """
+    from terracotta.handlers.coverage import coverage
+    parsed_keys = [key for key in keys.split('/') if key]
+    payload = coverage(parsed_keys)
+    schema = CoverageSchema()
+    return jsonify(schema.load(payload))
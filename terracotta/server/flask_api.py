@@ -67,6 +67,12 @@ def convert_exceptions(fun: Callable) -> Callable:
                 raise
             return abort(400, str(exc))
 
+        except exceptions.DeadlineExceededError as exc:
+            # server too busy -> 503
+            if current_app.debug:
+                raise
+            return abort(503, str(exc))
+
     return inner
 
 
@@ -77,6 +83,7 @@ def create_app(debug: bool = False, profile: bool = False) -> Flask:
     import terracotta.server.keys
     import terracotta.server.colormap
     import terracotta.server.metadata
+    import terracotta.server.coverage
     import terracotta.server.rgb
     import terracotta.server.singleband
     import terracotta.server.compute
@@ -105,6 +112,7 @@ def create_app(debug: bool = False, profile: bool = False) -> Flask:
         SPEC.path(view=terracotta.server.keys.get_keys)
         SPEC.path(view=terracotta.server.colormap.get_colormap)
         SPEC.path(view=terracotta.server.metadata.get_metadata)
+        SPEC.path(view=terracotta.server.coverage.get_coverage)
         SPEC.path(view=terracotta.server.rgb.get_rgb)
         SPEC.path(view=terracotta.server.rgb.get_rgb_preview)
         SPEC.path(view=terracotta.server.singleband.get_singleband)
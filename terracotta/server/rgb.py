@@ -10,6 +10,7 @@ from marshmallow import Schema, fields, validate, pre_load, ValidationError, EXC
 from flask import request, send_file
 
 from terracotta.server.flask_api import convert_exceptions, TILE_API
+from terracotta.tile_matrix import TILE_MATRIX_SETS
 
 
 class RGBQuerySchema(Schema):
@@ -43,6 +44,12 @@ class RGBOptionSchema(Schema):
         description='Pixel dimensions of the returned PNG image as JSON list.'
     )
 
+    tile_matrix_set = fields.String(
+        validate=validate.OneOf(TILE_MATRIX_SETS), example='WebMercatorQuad',
+        description='Tile grid that tile coordinates refer to, and projection of the returned '
+                    'image [default: WebMercatorQuad].'
+    )
+
     @pre_load
     def process_ranges(self, data: Mapping[str, Any], **kwargs: Any) -> Dict[str, Any]:
         data = dict(data.items())
@@ -11,6 +11,7 @@ from marshmallow import (Schema, fields, validate, validates_schema,
 from flask import request, send_file
 
 from terracotta.server.flask_api import convert_exceptions, TILE_API
+from terracotta.tile_matrix import TILE_MATRIX_SETS
 from terracotta.cmaps import AVAILABLE_CMAPS
 
 
@@ -51,6 +52,12 @@ class SinglebandOptionSchema(Schema):
         description='Pixel dimensions of the returned PNG image as JSON list.'
     )
 
+    tile_matrix_set = fields.String(
+        validate=validate.OneOf(TILE_MATRIX_SETS), example='WebMercatorQuad',
+        description='Tile grid that tile coordinates refer to, and projection of the returned '
+                    'image [default: WebMercatorQuad].'
+    )
+
     @validates_schema
     def validate_cmap(self, data: Mapping[str, Any], **kwargs: Any) -> None:
         if data.get('colormap', '') == 'explicit' and not data.get('explicit_color_map'):
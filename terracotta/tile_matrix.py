@@ -0,0 +1,143 @@
+"""tile_matrix.py
+
+Tile matrix sets (tile grids) that XYZ tiles can be addressed in.
+"""
+
+from typing import Dict, Optional, Sequence, Tuple
+
+import math
+import functools
+
+import mercantile
+
+from terracotta import exceptions
+
+Bounds = Tuple[float, float, float, float]
+
+
+class TileMatrixSet:
+    """Quadtree of square tiles in a projected CRS, with a single tile at zoom level 0.
+
+    Tiles are numbered from west to east and from north to south, like XYZ tiles in
+    Web Mercator.
+    """
+
+    def __init__(self, name: str, crs: str, extent: Bounds) -> None:
+        self.name = name
+        self.crs = crs
+        #: (west, south, east, north) of the zoom level 0 tile in the CRS of the tile matrix set
+        self.extent = extent
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({self.name!r}, {self.crs!r}, {self.extent!r})'
+
+    def is_valid_tile(self, tile_x: int, tile_y: int, tile_z: int) -> bool:
+        """Check if the given tile indices exist in the tile matrix set."""
+        return tile_z >= 0 and 0 <= tile_x < 2 ** tile_z and 0 <= tile_y < 2 ** tile_z
+
+    def xy_bounds(self, tile_x: int, tile_y: int, tile_z: int) -> Bounds:
+        """Physical bounds of given tile in the CRS of the tile matrix set."""
+        west, south, east, north = self.extent
+        tile_width = (east - west) / 2 ** tile_z
+        tile_height = (north - south) / 2 ** tile_z
+        return (
+            west + tile_x * tile_width,
+            north - (tile_y + 1) * tile_height,
+            west + (tile_x + 1) * tile_width,
+            north - tile_y * tile_height
+        )
+
+    def tile_from_bounds(self, bounds: Sequence[float]) -> Optional[Tuple[int, int, int]]:
+        """Find the tile with given physical bounds.
+
+        Returns (x, y, z), or None if the bounds do not belong to a tile of this tile matrix set.
+        """
+        west, south, east, north = self.extent
+        tile_width = bounds[2] - bounds[0]
+
+        if tile_width <= 0:
+            return None
+
+        tile_z = round(math.log2((east - west) / tile_width))
+        if tile_z < 0:
+            return None
+
+        tile_x = round((bounds[0] - west) / (east - west) * 2 ** tile_z)
+        tile_y = round((north - bounds[3]) / (north - south) * 2 ** tile_z)
+        tolerance = 1e-6 * tile_width
+
+        if not all(abs(a - b) <= tolerance
+                   for a, b in zip(self.xy_bounds(tile_x, tile_y, tile_z), bounds)):
+            return None
+
+        return tile_x, tile_y, tile_z
+
+    def tile_intersects(self, wgs_bounds: Sequence[float],
+                        tile_x: int, tile_y: int, tile_z: int) -> bool:
+        """Check if given tile intersects the given WGS84 bounds."""
+        west, south, east, north = _transform_bounds(self.crs, tuple(wgs_bounds))
+        tile_west, tile_south, tile_east, tile_north = self.xy_bounds(tile_x, tile_y, tile_z)
+        return (
+            tile_west < east and west < tile_east
+            and tile_south < north and south < tile_north
+        )
+
+
+class _WebMercatorQuad(TileMatrixSet):
+    # delegate to mercantile so tile bounds match the rest of the ecosystem exactly
+
+    def xy_bounds(self, tile_x: int, tile_y: int, tile_z: int) -> Bounds:
+        return tuple(mercantile.xy_bounds(mercantile.Tile(x=tile_x, y=tile_y, z=tile_z)))
+
+    def tile_intersects(self, wgs_bounds: Sequence[float],
+                        tile_x: int, tile_y: int, tile_z: int) -> bool:
+        mintile = mercantile.tile(wgs_bounds[0], wgs_bounds[3], tile_z)
+        maxtile = mercantile.tile(wgs_bounds[2], wgs_bounds[1], tile_z)
+        return mintile.x <= tile_x <= maxtile.x and mintile.y <= tile_y <= maxtile.y
+
+
+@functools.lru_cache(256)
+def _transform_bounds(crs: str, wgs_bounds: Bounds) -> Bounds:
+    # densified, so the result contains the whole area (and possibly some more)
+    from rasterio import warp
+    return warp.transform_bounds('epsg:4326', crs, *wgs_bounds, densify_pts=21)
+
+
+WEB_MERCATOR_QUAD = _WebMercatorQuad(
+    'WebMercatorQuad', 'epsg:3857',
+    (-20037508.342789244, -20037508.342789244, 20037508.342789244, 20037508.342789244)
+)
+
+# Antarctic Polar Stereographic, zoom level 0 resolution is 2^15 m for 256x256 tiles
+EPSG3031_QUAD = TileMatrixSet(
+    'EPSG3031Quad', 'epsg:3031',
+    (-4194304., -4194304., 4194304., 4194304.)
+)
+
+TILE_MATRIX_SETS: Dict[str, TileMatrixSet] = {
+    tms.name: tms for tms in (WEB_MERCATOR_QUAD, EPSG3031_QUAD)
+}
+
+DEFAULT_TILE_MATRIX_SET = WEB_MERCATOR_QUAD.name
+
+
+def find_tile_matrix_set(crs: str) -> Optional[TileMatrixSet]:
+    """Return the first tile matrix set in the given CRS, if any."""
+    for tms in TILE_MATRIX_SETS.values():
+        if tms.crs == crs:
+            return tms
+
+    return None
+
+
+def get_tile_matrix_set(name: str = None) -> TileMatrixSet:
+    """Return the tile matrix set of given name (Web Mercator by default)."""
+    if name is None:
+        name = DEFAULT_TILE_MATRIX_SET
+
+    try:
+        return TILE_MATRIX_SETS[name]
+    except KeyError:
+        raise exceptions.InvalidArgumentsError(
+            f'Unknown tile matrix set {name} (available: {", ".join(TILE_MATRIX_SETS)})'
+        ) from None
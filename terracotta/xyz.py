@@ -1,14 +1,22 @@
 """xyz.py
 
-Utilities to work with XYZ Mercator tiles.
+Utilities to work with XYZ tiles.
+
+Tiles are addressed in Web Mercator by default, or in any other of the tile matrix sets in
+:mod:`terracotta.tile_matrix`.
 """
 
-from typing import Sequence, Union, Mapping, Tuple, Any
+from typing import Sequence, Union, Mapping, Tuple, List, Any, Optional
+from concurrent.futures import Future
+
+import time
 
 import mercantile
 
-from terracotta import exceptions
-from terracotta.drivers.base import Driver
+from terracotta import get_settings, exceptions
+from terracotta.coverage import TileCoverage
+from terracotta.drivers.base import Driver, PRIORITY_INTERACTIVE, PRIORITY_PREVIEW
+from terracotta.tile_matrix import get_tile_matrix_set, WEB_MERCATOR_QUAD
 
 
 # TODO: add accurate signature if mypy ever supports conditional return types
@@ -17,39 +25,214 @@ def get_tile_data(driver: Driver,
                   tile_xyz: Tuple[int, int, int] = None,
                   *, tile_size: Tuple[int, int] = (256, 256),
                   preserve_values: bool = False,
-                  asynchronous: bool = False) -> Any:
-    """Retrieve raster image from driver for given XYZ tile and keys"""
+                  asynchronous: bool = False,
+                  deadline: float = None,
+                  tile_matrix_set: str = None,
+                  check_empty_tile: bool = True) -> Any:
+    """Retrieve raster image from driver for given XYZ tile and keys
+
+    If :attr:`~terracotta.config.TerracottaSettings.METATILE_SIZE` is larger than 1,
+    the surrounding metatile is read and cached alongside the requested tile.
+
+    Reads that have not started before ``deadline`` (as returned by :func:`time.monotonic`,
+    defaults to :attr:`~terracotta.config.TerracottaSettings.TILE_TIMEOUT` seconds from now)
+    are dropped.
+
+    Tiles are addressed in the given tile matrix set (Web Mercator by default). Previews
+    (no ``tile_xyz``) are returned in its CRS.
+
+    Pass ``check_empty_tile=False`` if :func:`raise_if_empty_tile` has already been called
+    for this tile.
+    """
+    return get_tile_data_multi(
+        driver, [keys], tile_xyz, tile_size=tile_size,
+        preserve_values=preserve_values, asynchronous=asynchronous, deadline=deadline,
+        tile_matrix_set=tile_matrix_set, check_empty_tile=check_empty_tile
+    )[0]
+
+
+def get_tile_data_multi(driver: Driver,
+                        keys_list: Sequence[Union[Sequence[str], Mapping[str, str]]],
+                        tile_xyz: Tuple[int, int, int] = None,
+                        *, tile_size: Tuple[int, int] = (256, 256),
+                        preserve_values: bool = False,
+                        asynchronous: bool = False,
+                        deadline: float = None,
+                        tile_matrix_set: str = None,
+                        check_empty_tile: bool = True) -> List[Any]:
+    """Retrieve raster images from driver for given XYZ tile and several datasets at once"""
+    settings = get_settings()
+    tms = get_tile_matrix_set(tile_matrix_set)
+
+    if deadline is None:
+        deadline = get_deadline()
 
     if tile_xyz is None:
         # read whole dataset
-        return driver.get_raster_tile(
-            keys, tile_size=tile_size, preserve_values=preserve_values,
-            asynchronous=asynchronous
+        return driver.get_raster_tiles(
+            keys_list, tile_size=tile_size, preserve_values=preserve_values,
+            asynchronous=asynchronous, priority=PRIORITY_PREVIEW, deadline=deadline,
+            target_crs=tms.crs
         )
 
+    tile_x, tile_y, tile_z = tile_xyz
+
+    if check_empty_tile:
+        raise_if_empty_tile(driver, keys_list, tile_xyz, tile_matrix_set=tms.name)
+
+    target_bounds = tms.xy_bounds(tile_x, tile_y, tile_z)
+
     # determine bounds for given tile
-    metadata = driver.get_metadata(keys)
-    wgs_bounds = metadata['bounds']
+    dataset_bounds = []
+    for keys in keys_list:
+        metadata = driver.get_metadata(keys)
+        wgs_bounds = metadata['bounds']
+
+        # stored coverage refers to Web Mercator tiles, other grids only check bounds
+        # TODO: store coverage per tile matrix set during ingestion
+        coverage = driver.get_coverage(keys) if tms is WEB_MERCATOR_QUAD else None
+
+        if not tile_exists(wgs_bounds, tile_x, tile_y, tile_z, coverage=coverage,
+                           tile_matrix_set=tms.name):
+            driver.add_empty_tile(keys, target_bounds)
+            raise exceptions.TileOutOfBoundsError(
+                f'Tile {tile_z}/{tile_x}/{tile_y} is outside image bounds'
+            )
+
+        dataset_bounds.append((wgs_bounds, coverage))
+
+    metatile_size = settings.METATILE_SIZE
+    if metatile_size > 1:
+        metatile = metatile_bounds(tile_x, tile_y, tile_z, metatile_size,
+                                   tile_matrix_set=tms.name)
+    else:
+        metatile = None
+
+    tile_data = driver.get_raster_tiles(
+        keys_list, tile_bounds=target_bounds, tile_size=tile_size,
+        preserve_values=preserve_values, asynchronous=True,
+        metatile=metatile, priority=PRIORITY_INTERACTIVE, deadline=deadline,
+        target_crs=tms.crs
+    )
+
+    for keys, future in zip(keys_list, tile_data):
+        # remember tiles that turned out to contain too little data
+        def add_if_empty(future: Future, keys: Union[Sequence[str], Mapping[str, str]] = keys
+                         ) -> None:
+            if not future.cancelled() and isinstance(
+                future.exception(), exceptions.TileOutOfBoundsError
+            ):
+                driver.add_empty_tile(keys, target_bounds)
+
+        future.add_done_callback(add_if_empty)
+
+    if settings.PREFETCH_TILES:
+        # requested tiles are already queued, so prefetching can only use idle workers
+        prefetch_bounds = []
+
+        for tile in prefetch_candidates(tile_x, tile_y, tile_z):
+            bounds = tms.xy_bounds(tile.x, tile.y, tile.z)
+            if all(tile_exists(wgs_bounds, tile.x, tile.y, tile.z, coverage=coverage,
+                               tile_matrix_set=tms.name)
+                   and not driver.is_empty_tile(keys, bounds)
+                   for keys, (wgs_bounds, coverage) in zip(keys_list, dataset_bounds)):
+                prefetch_bounds.append(bounds)
 
+        driver.prefetch_raster_tiles(
+            keys_list, prefetch_bounds, tile_size=tile_size, preserve_values=preserve_values,
+            deadline=deadline, target_crs=tms.crs
+        )
+
+    if asynchronous:
+        return tile_data
+
+    return [future.result() for future in tile_data]
+
+
+def raise_if_empty_tile(driver: Driver,
+                        keys_list: Sequence[Union[Sequence[str], Mapping[str, str]]],
+                        tile_xyz: Tuple[int, int, int], *,
+                        tile_matrix_set: str = None) -> None:
+    """Raise TileOutOfBoundsError if given tile does not exist or is known to be empty.
+
+    Does not access the database or raster files, so this can be called before connecting.
+    """
     tile_x, tile_y, tile_z = tile_xyz
+    tms = get_tile_matrix_set(tile_matrix_set)
 
-    if not tile_exists(wgs_bounds, tile_x, tile_y, tile_z):
+    if not tms.is_valid_tile(tile_x, tile_y, tile_z):
         raise exceptions.TileOutOfBoundsError(
-            f'Tile {tile_z}/{tile_x}/{tile_y} is outside image bounds'
+            f'Tile {tile_z}/{tile_x}/{tile_y} does not exist in tile matrix set {tms.name}'
         )
 
-    mercator_tile = mercantile.Tile(x=tile_x, y=tile_y, z=tile_z)
-    target_bounds = mercantile.xy_bounds(mercator_tile)
+    target_bounds = tms.xy_bounds(tile_x, tile_y, tile_z)
 
-    return driver.get_raster_tile(
-        keys, tile_bounds=target_bounds, tile_size=tile_size,
-        preserve_values=preserve_values, asynchronous=asynchronous
-    )
+    for keys in keys_list:
+        if driver.is_empty_tile(keys, target_bounds):
+            raise exceptions.TileOutOfBoundsError(
+                f'Tile {tile_z}/{tile_x}/{tile_y} is outside image bounds'
+            )
+
+
+def get_deadline() -> Optional[float]:
+    """Return the deadline for a tile request that starts now, if any."""
+    timeout = get_settings().TILE_TIMEOUT
+
+    if not timeout:
+        return None
+
+    return time.monotonic() + timeout
+
+
+def metatile_bounds(tile_x: int, tile_y: int, tile_z: int,
+                    metatile_size: int, *,
+                    tile_matrix_set: str = None) -> List[List[Tuple[float, ...]]]:
+    """Compute physical bounds of all tiles in the metatile containing given XYZ tile.
+
+    Metatiles are aligned to multiples of ``metatile_size`` and clipped to the tile grid.
+    Returns a list of rows (north to south), each holding the tile bounds from west to east.
+    """
+    tms = get_tile_matrix_set(tile_matrix_set)
+    num_tiles = 2 ** tile_z
+    start_x = tile_x - tile_x % metatile_size
+    start_y = tile_y - tile_y % metatile_size
+
+    return [
+        [tms.xy_bounds(x, y, tile_z)
+         for x in range(start_x, min(start_x + metatile_size, num_tiles))]
+        for y in range(start_y, min(start_y + metatile_size, num_tiles))
+    ]
+
+
+def prefetch_candidates(tile_x: int, tile_y: int, tile_z: int) -> List[mercantile.Tile]:
+    """Return the XYZ tiles that are likely requested after the given one.
+
+    These are the neighbors at the same zoom level, followed by the children at the next one.
+    """
+    num_tiles = 2 ** tile_z
+
+    neighbors = [
+        mercantile.Tile(x=x, y=y, z=tile_z)
+        for y in range(max(tile_y - 1, 0), min(tile_y + 2, num_tiles))
+        for x in range(max(tile_x - 1, 0), min(tile_x + 2, num_tiles))
+        if (x, y) != (tile_x, tile_y)
+    ]
+
+    return neighbors + mercantile.children(mercantile.Tile(x=tile_x, y=tile_y, z=tile_z))
+
+
+def tile_exists(bounds: Sequence[float], tile_x: int, tile_y: int, tile_z: int, *,
+                coverage: TileCoverage = None, tile_matrix_set: str = None) -> bool:
+    """Check if an XYZ tile is inside the given physical bounds (in WGS84).
+
+    If given, the tile coverage computed during ingestion is consulted first.
+    """
+    tms = get_tile_matrix_set(tile_matrix_set)
 
+    if not tms.is_valid_tile(tile_x, tile_y, tile_z):
+        return False
 
-def tile_exists(bounds: Sequence[float], tile_x: int, tile_y: int, tile_z: int) -> bool:
-    """Check if an XYZ tile is inside the given physical bounds."""
-    mintile = mercantile.tile(bounds[0], bounds[3], tile_z)
-    maxtile = mercantile.tile(bounds[2], bounds[1], tile_z)
+    if coverage is not None and not coverage.tile_has_data(tile_x, tile_y, tile_z):
+        return False
 
-    return mintile.x <= tile_x <= maxtile.x and mintile.y <= tile_y <= maxtile.y
+    return tms.tile_intersects(bounds, tile_x, tile_y, tile_z)
@@ -3,6 +3,7 @@
 Run separately via `pytest tests/benchmarks.py`.
 """
 
+import numpy as np
 import pytest
 from click.testing import CliRunner
 
@@ -15,7 +16,8 @@ ZOOM_XYZ = {
 
 
 @pytest.fixture(scope='session')
-def benchmark_database(big_raster_file_nodata, big_raster_file_mask, tmpdir_factory):
+def benchmark_database(big_raster_file_nodata, big_raster_file_mask, big_raster_file_mercator,
+                       tmpdir_factory):
     from terracotta import get_driver, update_settings
 
     keys = ['type', 'band']
@@ -33,6 +35,7 @@ def benchmark_database(big_raster_file_nodata, big_raster_file_mask, tmpdir_fact
         driver.insert(['nodata', '2'], str(big_raster_file_nodata), metadata=mtd)
         driver.insert(['nodata', '3'], str(big_raster_file_nodata), metadata=mtd)
         driver.insert(['mask', '1'], str(big_raster_file_mask), metadata=mtd)
+        driver.insert(['mercator', '1'], str(big_raster_file_mercator))
 
     return dbpath
 
@@ -117,6 +120,73 @@ def test_bench_singleband(benchmark, zoom, resampling, big_raster_file_nodata, b
     assert not len(get_driver(str(benchmark_database))._raster_cache)
 
 
+@pytest.mark.parametrize('raster_type', ['nodata', 'mercator'])
+@pytest.mark.parametrize('zoom', ZOOM_XYZ.keys())
+def test_bench_singleband_reprojection(benchmark, zoom, raster_type, big_raster_file_nodata,
+                                       benchmark_database):
+    """Compare rasters that need to be warped to rasters that are already in Web Mercator"""
+    from terracotta.server import create_app
+    from terracotta import update_settings
+
+    update_settings(DRIVER_PATH=str(benchmark_database))
+
+    zoom_level = ZOOM_XYZ[zoom]
+
+    flask_app = create_app()
+    with flask_app.test_client() as client:
+        if zoom_level is not None:
+            x, y, z = get_xyz(big_raster_file_nodata, zoom_level)
+            rv = benchmark(client.get, f'/singleband/{raster_type}/1/{z}/{x}/{y}.png')
+        else:
+            rv = benchmark(client.get, f'/singleband/{raster_type}/1/preview.png')
+
+    assert rv.status_code == 200
+
+
+@pytest.mark.parametrize('metatile_size', [1, 4])
+def test_bench_metatile_pan(benchmark, metatile_size, big_raster_file_nodata, benchmark_database):
+    """Read a full 4x4 block of tiles with an empty cache, as when panning a map"""
+    from terracotta import update_settings
+    from terracotta.drivers.sqlite import SQLiteDriver
+    from terracotta.xyz import get_tile_data, metatile_bounds
+
+    update_settings(METATILE_SIZE=metatile_size, RASTER_CACHE_SIZE=1024 * 1024 * 100)
+
+    # bypass driver cache to get a driver with non-zero raster cache
+    driver = SQLiteDriver(str(benchmark_database))
+
+    x, y, z = get_xyz(big_raster_file_nodata, 14)
+    start_x, start_y = x - x % 4, y - y % 4
+    assert len(metatile_bounds(x, y, z, 4)) == 4
+
+    def read_block():
+        with driver.connect():
+            for tile_y in range(start_y, start_y + 4):
+                for tile_x in range(start_x, start_x + 4):
+                    get_tile_data(driver, ['nodata', '1'], (tile_x, tile_y, z))
+
+    benchmark.pedantic(read_block, setup=driver._raster_cache.clear, rounds=5)
+    assert len(driver._raster_cache) == 16
+
+
+@pytest.mark.parametrize('executor_type', ['process', 'thread', 'inline'])
+@pytest.mark.parametrize('zoom', ['birds-eye', 'balanced'])
+def test_bench_executor(benchmark, zoom, executor_type, big_raster_file_nodata,
+                        benchmark_database):
+    from terracotta.server import create_app
+    from terracotta import update_settings
+
+    update_settings(DRIVER_PATH=str(benchmark_database), RASTER_EXECUTOR=executor_type)
+
+    x, y, z = get_xyz(big_raster_file_nodata, ZOOM_XYZ[zoom])
+
+    flask_app = create_app()
+    with flask_app.test_client() as client:
+        rv = benchmark(client.get, f'/rgb/nodata/{z}/{x}/{y}.png?r=1&g=2&b=3')
+
+    assert rv.status_code == 200
+
+
 def test_bench_singleband_out_of_bounds(benchmark, benchmark_database):
     from terracotta.server import create_app
     from terracotta import update_settings
@@ -144,6 +214,237 @@ def test_bench_compute_metadata(benchmark, big_raster_file_nodata, big_raster_fi
     benchmark(RasterDriver.compute_metadata, str(raster_file), use_chunks=chunks)
 
 
+@pytest.mark.parametrize('read_mode', ['separate', 'combined'])
+@pytest.mark.parametrize('raster_type', ['nodata', 'masked'])
+@pytest.mark.parametrize('zoom', ['birds-eye', 'balanced'])
+def test_bench_read_vrt_mask(benchmark, big_raster_file_nodata, big_raster_file_mask, zoom,
+                             raster_type, read_mode):
+    """Compare reading data and alpha band from a warped VRT in one or two requests"""
+    import mercantile
+    import rasterio
+    from rasterio import transform, warp
+    from rasterio.vrt import WarpedVRT
+
+    if raster_type == 'nodata':
+        raster_file = big_raster_file_nodata
+    elif raster_type == 'masked':
+        raster_file = big_raster_file_mask
+
+    x, y, z = get_xyz(big_raster_file_nodata, ZOOM_XYZ[zoom])
+    tile_bounds = mercantile.xy_bounds(x, y, z)
+    tile_size = (256, 256)
+
+    with rasterio.open(str(raster_file)) as src:
+        vrt_transform, _, _ = warp.calculate_default_transform(
+            src.crs, 'epsg:3857', src.width, src.height, *src.bounds
+        )
+
+    # warp at native resolution, like the driver
+    tile_res = (tile_bounds[2] - tile_bounds[0]) / tile_size[1]
+    vrt_res = min(vrt_transform.a, tile_res)
+    vrt_width = round((tile_bounds[2] - tile_bounds[0]) / vrt_res)
+    vrt_height = round((tile_bounds[3] - tile_bounds[1]) / vrt_res)
+    vrt_transform = transform.from_bounds(*tile_bounds, vrt_width, vrt_height)
+
+    def read_tile():
+        with rasterio.open(str(raster_file)) as src, WarpedVRT(
+            src, crs='epsg:3857', transform=vrt_transform, width=vrt_width, height=vrt_height,
+            add_alpha=True
+        ) as vrt:
+            mask_idx = vrt.count
+
+            if read_mode == 'separate':
+                vrt.read(1, out_shape=tile_size)
+                vrt.read(mask_idx, out_shape=tile_size)
+            else:
+                vrt.read([1, mask_idx], out_shape=(2, *tile_size))
+
+    benchmark(read_tile)
+
+
+@pytest.mark.parametrize('warp_settings', [
+    {},
+    {'WARP_NUM_THREADS': 0},
+    {'WARP_ERROR_THRESHOLD': 0.001},
+    {'WARP_MEMORY_LIMIT': 1024 * 1024},
+], ids=['default', 'all-cpus', 'near-exact', 'low-memory'])
+@pytest.mark.parametrize('zoom', [6, 10])
+def test_bench_warp_options_polar(benchmark, raster_file_polar, zoom, warp_settings):
+    """Warp tiles of a polar stereographic raster to Web Mercator with different warp settings"""
+    import mercantile
+    import rasterio
+    import rasterio.warp
+    from terracotta import update_settings
+    from terracotta.drivers.raster_base import RasterDriver
+
+    update_settings(**warp_settings)
+
+    with rasterio.open(str(raster_file_polar)) as src:
+        # somewhere in the valid half of the raster
+        x, y = src.transform * (750, 100)
+        (lon,), (lat,) = rasterio.warp.transform(src.crs, 'epsg:4326', [x], [y])
+
+    tile_bounds = mercantile.xy_bounds(mercantile.tile(lon, lat, zoom))
+
+    data = benchmark(
+        RasterDriver._get_raster_tile, str(raster_file_polar), tile_bounds=tile_bounds,
+        reprojection_method='linear', resampling_method='average',
+        warp_options=RasterDriver._get_warp_options()
+    )
+    assert not data.mask.all()
+
+
+@pytest.mark.parametrize('reader', ['gdal', 'numpy', 'numpy-block-cache'])
+@pytest.mark.parametrize('zoom', [12, 14])
+def test_bench_numpy_reader(benchmark, raster_file_mercator_aligned, zoom, reader):
+    """Read tiles that line up with the pixel grid of the file (14 is full resolution)"""
+    import mercantile
+    from terracotta import update_settings
+    from terracotta.drivers.raster_base import RasterDriver
+
+    if reader != 'numpy-block-cache':
+        update_settings(RASTER_BLOCK_CACHE_SIZE=0)
+
+    georef = RasterDriver._compute_georeference_from_file(str(raster_file_mercator_aligned))
+    tile_bounds = mercantile.xy_bounds(mercantile.tile(10, 50, zoom))
+
+    data = benchmark(
+        RasterDriver._get_raster_tile, str(raster_file_mercator_aligned), tile_bounds=tile_bounds,
+        reprojection_method='linear', resampling_method='average', georeference=georef,
+        numpy_reader=reader != 'gdal'
+    )
+    assert not data.mask.all()
+
+
+@pytest.mark.parametrize('cache', ['cold', 'disk', 'memory'])
+def test_bench_remote_reader(benchmark, raster_file_mercator_aligned, range_server, tmpdir,
+                             cache):
+    """Read a tile over HTTP from a local server, with blocks cached in different tiers"""
+    import shutil
+    import mercantile
+    from terracotta.cog_reader import COGReader
+    from terracotta.range_cache import RangeCache, RemoteFile, get_fetcher
+
+    base_url, serve_dir, _ = range_server
+    shutil.copy(str(raster_file_mercator_aligned), str(serve_dir.join('img.tif')))
+
+    url = f'{base_url}/img.tif'
+    cache_dir = str(tmpdir.mkdir('cache'))
+    tile_bounds = mercantile.xy_bounds(mercantile.tile(10, 50, 12))
+
+    def get_reader(memory_size, disk_size):
+        range_cache = RangeCache(memory_size, disk_dir=cache_dir, disk_size=disk_size)
+        return COGReader(url, source=RemoteFile(url, get_fetcher(url), range_cache))
+
+    warm_reader = get_reader(1024 * 1024 * 32, 1024 * 1024 * 32)
+    warm_reader.read([1], tile_bounds, (256, 256))
+
+    if cache == 'memory':
+        def setup():
+            return (warm_reader,), {}
+    elif cache == 'disk':
+        def setup():
+            return (get_reader(0, 1024 * 1024 * 32),), {}
+    else:
+        def setup():
+            return (get_reader(1024 * 1024 * 32, 0),), {}
+
+    data = benchmark.pedantic(
+        lambda reader: reader.read([1], tile_bounds, (256, 256)), setup=setup, rounds=200
+    )
+    assert not data[0].mask.all()
+
+
+@pytest.mark.parametrize('operation', ['insert', 'hit'])
+@pytest.mark.parametrize('compression_filter', ['none', 'shuffle', 'delta'])
+@pytest.mark.parametrize('codec', ['none', 'zlib', 'lz4', 'zstd'])
+@pytest.mark.parametrize('raster_type', ['int', 'float'])
+def test_bench_raster_cache_codec(benchmark, raster_file_mercator_aligned, raster_file_float,
+                                  raster_type, codec, compression_filter, operation):
+    """Insert tiles into and retrieve them from the raster cache
+
+    The compression ratio is stored in the extra info of each benchmark.
+    """
+    import rasterio
+    from rasterio.windows import Window
+    from terracotta.cache import CODECS, CompressedLFUCache
+
+    if codec not in CODECS:
+        pytest.skip(f'{codec} is not installed')
+
+    # both windows include nodata and valid pixels
+    if raster_type == 'int':
+        raster_file, window = raster_file_mercator_aligned, Window(200, 200, 256, 256)
+    else:
+        raster_file, window = raster_file_float, Window(0, 0, 256, 256)
+
+    with rasterio.open(str(raster_file)) as src:
+        tile = src.read(1, window=window, masked=True)
+
+    cache = CompressedLFUCache(
+        1024 * 1024 * 32, compression_level=1, codec=codec,
+        compression_filter=compression_filter
+    )
+    compressed_data, *_ = cache._compress_ma(tile)
+    benchmark.extra_info['compression_ratio'] = tile.data.nbytes / len(compressed_data)
+
+    if operation == 'insert':
+        benchmark(cache.__setitem__, 'tile', tile)
+    else:
+        cache['tile'] = tile
+        benchmark(cache.__getitem__, 'tile')
+
+
+def _synthetic_tile_log(num_tiles, num_requests):
+    # Zipf-distributed hot set, interrupted by a seeding crawl, after which popularity shifts
+    np.random.seed(0)
+
+    def zipf_requests(prefix, size):
+        ranks = np.random.zipf(1.2, size=size)
+        return [f'{prefix}-{rank}' for rank in ranks[ranks <= num_tiles]]
+
+    return [
+        *zipf_requests('old', num_requests),
+        *(f'crawl-{i}' for i in range(num_tiles)),
+        *zipf_requests('old', num_requests // 2),
+        *zipf_requests('new', num_requests),
+    ]
+
+
+@pytest.mark.parametrize('policy', ['lfu', 'tinylfu'])
+def test_bench_raster_cache_policy(benchmark, policy):
+    """Replay a synthetic tile log through the raster cache
+
+    The hit ratio is stored in the extra info of each benchmark.
+    """
+    from terracotta.cache import CompressedLFUCache
+
+    tile = np.ma.masked_array(np.zeros((16, 16), dtype='uint8'))
+    requests = _synthetic_tile_log(num_tiles=10000, num_requests=20000)
+
+    # room for 200 tiles
+    probe = CompressedLFUCache(1024 * 1024, compression_level=1, codec='none')
+    probe['tile'] = tile
+    cache_size = 200 * probe.get_stats()['size']
+
+    def replay():
+        cache = CompressedLFUCache(
+            cache_size, compression_level=1, codec='none', policy=policy
+        )
+        hits = 0
+        for key in requests:
+            try:
+                cache[key]
+            except KeyError:
+                cache[key] = tile
+            else:
+                hits += 1
+        return hits
+
+    hits = benchmark.pedantic(replay, rounds=1, iterations=1)
+    benchmark.extra_info['hit_ratio'] = hits / len(requests)
+
+
 @pytest.mark.parametrize('in_memory', [False, True])
 def test_bench_optimize_rasters(benchmark, unoptimized_raster_file, tmpdir, in_memory):
     from terracotta.scripts import cli
@@ -54,7 +54,6 @@ def cloud_optimize(raster_file, outfile, create_mask=False, remove_nodata=False)
     import rasterio.shutil
 
     COG_PROFILE = {
-        'count': 1,
         'driver': 'GTiff',
         'interleave': 'pixel',
         'tiled': True,
@@ -97,6 +96,33 @@ def cloud_optimize(raster_file, outfile, create_mask=False, remove_nodata=False)
         rasterio.shutil.copy(dst, str(outfile), copy_src_overviews=True, **COG_PROFILE)
 
 
+def reproject_raster(raster_file, outfile, crs):
+    import contextlib
+    import rasterio
+    from rasterio.enums import Resampling
+    from rasterio.vrt import WarpedVRT
+    from rasterio.warp import calculate_default_transform
+
+    with contextlib.ExitStack() as es:
+        src = es.enter_context(rasterio.open(str(raster_file)))
+        transform, width, height = calculate_default_transform(
+            src.crs, crs, src.width, src.height, *src.bounds
+        )
+        vrt = es.enter_context(WarpedVRT(
+            src, crs=crs, transform=transform, width=width, height=height,
+            resampling=Resampling.nearest
+        ))
+
+        profile = src.profile.copy()
+        profile.update(crs=crs, transform=transform, width=width, height=height)
+
+        unoptimized_raster = outfile.dirpath(outfile.purebasename + '-raw.tif')
+        with rasterio.open(str(unoptimized_raster), 'w', **profile) as dst:
+            dst.write(vrt.read())
+
+    cloud_optimize(unoptimized_raster, outfile)
+
+
 @pytest.fixture(scope='session')
 def raster_file(tmpdir_factory):
     import affine
@@ -153,6 +179,31 @@ def raster_file_float(raster_file, tmpdir_factory):
     return optimized_raster
 
 
+@pytest.fixture(scope='session')
+def multiband_raster_file(raster_file, tmpdir_factory):
+    with rasterio.open(str(raster_file)) as src:
+        raster_data = src.read(1)
+        profile = src.profile.copy()
+
+    nodata = raster_data == profile['nodata']
+    band_data = np.stack([
+        raster_data,
+        np.where(nodata, raster_data, raster_data // 2),
+        np.flipud(raster_data)
+    ])
+    profile.update(count=3)
+
+    outpath = tmpdir_factory.mktemp('raster-multiband')
+    unoptimized_raster = outpath.join('img-raw.tif')
+    with rasterio.open(str(unoptimized_raster), 'w', **profile) as dst:
+        dst.write(band_data)
+
+    optimized_raster = outpath.join('img.tif')
+    cloud_optimize(unoptimized_raster, optimized_raster)
+
+    return optimized_raster
+
+
 @pytest.fixture(scope='session')
 def big_raster_file_nodata(tmpdir_factory):
     import affine
@@ -212,6 +263,140 @@ def big_raster_file_nomask(tmpdir_factory, big_raster_file_nodata):
     return optimized_raster
 
 
+@pytest.fixture(scope='session')
+def raster_file_mercator(tmpdir_factory, raster_file):
+    outpath = tmpdir_factory.mktemp('raster')
+    optimized_raster = outpath.join('img-mercator.tif')
+    reproject_raster(raster_file, optimized_raster, 'epsg:3857')
+    return optimized_raster
+
+
+@pytest.fixture(scope='session')
+def big_raster_file_mercator(tmpdir_factory, big_raster_file_nodata):
+    outpath = tmpdir_factory.mktemp('raster')
+    optimized_raster = outpath.join('img-mercator.tif')
+    reproject_raster(big_raster_file_nodata, optimized_raster, 'epsg:3857')
+    return optimized_raster
+
+
+@pytest.fixture(scope='session')
+def multiband_raster_file_mercator(tmpdir_factory, multiband_raster_file):
+    outpath = tmpdir_factory.mktemp('raster-multiband-mercator')
+    outfile = outpath.join('img.tif')
+    reproject_raster(multiband_raster_file, outfile, 'epsg:3857')
+    return outfile
+
+
+@pytest.fixture(scope='session')
+def raster_file_polar(tmpdir_factory):
+    """Half-empty raster in Antarctic Polar Stereographic projection (EPSG:3031)"""
+    import affine
+
+    raster_data = np.arange(1000 * 1000, dtype='uint16').reshape(1000, 1000) % 1000 + 1
+    raster_data[:, :500] = 0
+
+    profile = {
+        'driver': 'GTiff',
+        'dtype': 'uint16',
+        'nodata': 0,
+        'width': raster_data.shape[1],
+        'height': raster_data.shape[0],
+        'count': 1,
+        'crs': {'init': 'epsg:3031'},
+        'transform': affine.Affine(
+            100.0, 0.0, 500000.0,
+            0.0, -100.0, 1000000.0
+        )
+    }
+
+    outpath = tmpdir_factory.mktemp('raster')
+    unoptimized_raster = outpath.join('img-raw.tif')
+    with rasterio.open(str(unoptimized_raster), 'w', **profile) as dst:
+        dst.write(raster_data, 1)
+
+    optimized_raster = outpath.join('img-polar.tif')
+    cloud_optimize(unoptimized_raster, optimized_raster)
+
+    return optimized_raster
+
+
+@pytest.fixture(scope='session')
+def raster_file_mercator_aligned(tmpdir_factory):
+    """Raster in Web Mercator whose pixels line up with XYZ tiles of zoom 14 (12 and 13 for
+    overviews)"""
+    import affine
+    import mercantile
+
+    raster_data = (np.arange(700 * 1000, dtype='int16') % 1000).reshape(700, 1000)
+    raster_data[:260, :300] = 0
+
+    # top left corner of dataset is offset from tile grid by whole pixels
+    tile_bounds = mercantile.xy_bounds(mercantile.tile(10, 50, 14))
+    res = (tile_bounds.right - tile_bounds.left) / 256
+
+    profile = {
+        'driver': 'GTiff',
+        'dtype': 'int16',
+        'nodata': 0,
+        'width': raster_data.shape[1],
+        'height': raster_data.shape[0],
+        'count': 1,
+        'crs': {'init': 'epsg:3857'},
+        'transform': affine.Affine(
+            res, 0.0, tile_bounds.left - 100 * res,
+            0.0, -res, tile_bounds.top + 60 * res
+        )
+    }
+
+    outpath = tmpdir_factory.mktemp('raster')
+    unoptimized_raster = outpath.join('img-raw.tif')
+    with rasterio.open(str(unoptimized_raster), 'w', **profile) as dst:
+        dst.write(raster_data, 1)
+
+    optimized_raster = outpath.join('img-aligned.tif')
+    cloud_optimize(unoptimized_raster, optimized_raster)
+
+    return optimized_raster
+
+
+@pytest.fixture(scope='session')
+def mosaic_member_files(raster_file, tmpdir_factory):
+    """Western and eastern part of raster_file that overlap, with different nodata pixels"""
+    from rasterio.windows import Window
+
+    outpath = tmpdir_factory.mktemp('raster')
+    out = []
+
+    with rasterio.open(str(raster_file)) as src:
+        raster_data = src.read(1)
+
+        # nodata in every 7th pixel instead of every 5th
+        other_data = np.arange(-128 * 256, 128 * 256, dtype='int16').reshape(256, 256)
+
+        for name, col_off, width in (('west', 0, 160), ('east', 96, 160)):
+            window = Window(col_off, 0, width, src.height)
+
+            if name == 'west':
+                member_data = raster_data[:, col_off:col_off + width].copy()
+            else:
+                member_data = other_data[:, col_off:col_off + width].copy()
+                member_data.flat[::7] = src.nodata
+
+            profile = src.profile.copy()
+            profile.update(
+                width=width, transform=src.window_transform(window), tiled=False
+            )
+            unoptimized_raster = outpath.join(f'img-{name}-raw.tif')
+            with rasterio.open(str(unoptimized_raster), 'w', **profile) as dst:
+                dst.write(member_data, 1)
+
+            optimized_raster = outpath.join(f'img-{name}.tif')
+            cloud_optimize(unoptimized_raster, optimized_raster)
+            out.append(optimized_raster)
+
+    return out
+
+
 @pytest.fixture(scope='session')
 def unoptimized_raster_file(tmpdir_factory):
     import affine
@@ -371,6 +556,70 @@ def test_server(testdb):
         assert not server_proc.is_alive()
 
 
+@pytest.fixture()
+def range_server(tmpdir):
+    """Serve files in a temporary directory over HTTP with support for range requests
+
+    Yields base URL, served directory, and a list of all requested (path, range header).
+    Range headers are ignored for paths starting with ``/no-range/``.
+    """
+    import re
+    import threading
+    import socketserver
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+    serve_dir = tmpdir.mkdir('served')
+    requests = []
+
+    class RangeRequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests.append((self.path, self.headers.get('Range')))
+
+            path = self.path.lstrip('/')
+            supports_range = not path.startswith('no-range/')
+            if not supports_range:
+                path = path[len('no-range/'):]
+
+            try:
+                with open(str(serve_dir.join(path)), 'rb') as f:
+                    content = f.read()
+            except FileNotFoundError:
+                self.send_error(404)
+                return
+
+            match = re.match(r'bytes=(\d+)-(\d+)', self.headers.get('Range') or '')
+            if match is None or not supports_range:
+                self.send_response(200)
+                body = content
+            else:
+                start, stop = int(match.group(1)), int(match.group(2)) + 1
+                body = content[start:stop]
+                self.send_response(206)
+                self.send_header(
+                    'Content-Range', f'bytes {start}-{start + len(body) - 1}/{len(content)}'
+                )
+
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    class ThreadingServer(socketserver.ThreadingMixIn, HTTPServer):
+        daemon_threads = True
+
+    server = ThreadingServer(('localhost', 0), RangeRequestHandler)
+    server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+    server_thread.start()
+
+    try:
+        yield f'http://localhost:{server.server_address[1]}', serve_dir, requests
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
 @pytest.fixture()
 def driver_path(provider, tmpdir, mysql_server):
     """Get a valid, uninitialized driver path for given provider"""
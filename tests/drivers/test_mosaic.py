@@ -0,0 +1,153 @@
+from concurrent.futures import Future
+
+import pytest
+import numpy as np
+
+
+def _resolved(result=None, exception=None):
+    future = Future()
+    if exception is not None:
+        future.set_exception(exception)
+    else:
+        future.set_result(result)
+    return future
+
+
+@pytest.mark.parametrize('num_boxes', [0, 1, 15, 1000])
+def test_rtree_query(num_boxes):
+    from terracotta.drivers.mosaic import RTree
+
+    np.random.seed(0)
+    lower = np.random.uniform(-100, 100, size=(num_boxes, 2))
+    boxes = np.concatenate([lower, lower + np.random.uniform(0, 10, size=(num_boxes, 2))], axis=1)
+
+    tree = RTree(boxes, node_capacity=4)
+    assert len(tree) == num_boxes
+
+    for query in ([-5, -5, 5, 5], [-200, -200, 200, 200], [500, 500, 501, 501]):
+        expected = np.flatnonzero(
+            (boxes[:, 0] < query[2]) & (query[0] < boxes[:, 2])
+            & (boxes[:, 1] < query[3]) & (query[1] < boxes[:, 3])
+        ).tolist()
+        assert tree.query(query) == expected
+
+
+def test_rtree_invalid_capacity():
+    from terracotta.drivers.mosaic import RTree
+
+    with pytest.raises(ValueError):
+        RTree([[0, 0, 1, 1]], node_capacity=1)
+
+
+def test_mosaic_index_antimeridian():
+    from terracotta.drivers.mosaic import MosaicIndex
+
+    index = MosaicIndex([
+        {'keys': ['dateline'], 'bounds': [170., -10., -170., 10.]},
+        {'keys': ['greenwich'], 'bounds': [-10., -10., 10., 10.]},
+    ])
+    assert index.bounds == (-180., -10., 180., 10.)
+
+    # tile bounds in Web Mercator
+    assert index.query([-20037508.34, -1e5, -19e6, 1e5], 'epsg:3857') == [('dateline',)]
+    assert index.query([19e6, -1e5, 20037508.34, 1e5], 'epsg:3857') == [('dateline',)]
+    assert index.query([-1e5, -1e5, 1e5, 1e5], 'epsg:3857') == [('greenwich',)]
+    assert index.query([-1e5, 5e6, 1e5, 6e6], 'epsg:3857') == []
+
+
+def test_composite():
+    from terracotta.drivers.mosaic import composite
+
+    first = np.ma.masked_array(
+        np.array([[1, 2], [3, 4]], dtype='uint8'), mask=[[False, True], [True, True]]
+    )
+    second = np.ma.masked_array(
+        np.array([[10., 20.], [30., 40.]], dtype='float32'), mask=[[False, False], [True, False]]
+    )
+
+    out = composite([first, second])
+    assert out.dtype == np.float32
+    np.testing.assert_array_equal(out.mask, [[False, False], [True, False]])
+    np.testing.assert_array_equal(out.compressed(), [1., 20., 40.])
+
+    # inputs are not modified
+    assert first.mask.sum() == 3
+
+
+def test_composite_futures():
+    from terracotta import exceptions
+    from terracotta.drivers.mosaic import composite_futures
+
+    tile = np.ma.masked_array(np.ones((2, 2)), mask=[[True, False], [False, False]])
+    out = composite_futures([
+        _resolved(exception=exceptions.TileOutOfBoundsError('out')), _resolved(tile)
+    ])
+    np.testing.assert_array_equal(out.result().mask, tile.mask)
+
+    out = composite_futures([_resolved(exception=exceptions.TileOutOfBoundsError('out'))])
+    with pytest.raises(exceptions.TileOutOfBoundsError):
+        out.result()
+
+    out = composite_futures([])
+    with pytest.raises(exceptions.TileOutOfBoundsError):
+        out.result()
+
+    out = composite_futures([_resolved(tile), _resolved(exception=IOError('broken'))])
+    with pytest.raises(IOError):
+        out.result()
+
+
+def test_composite_futures_pending():
+    from terracotta.drivers.mosaic import composite_futures
+
+    first, second = Future(), Future()
+    out = composite_futures([first, second])
+
+    second.set_result(np.ma.masked_array(np.full((2, 2), 2)))
+    assert not out.done()
+
+    first.set_result(np.ma.masked_array(np.ones((2, 2)), mask=[[True, False], [False, False]]))
+    np.testing.assert_array_equal(out.result(), [[2, 1], [1, 1]])
+
+
+def test_merge_metadata():
+    from terracotta.drivers.mosaic import merge_metadata
+
+    hull = {'type': 'Polygon', 'coordinates': [[[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]]]}
+    member = {
+        'bounds': (0., 0., 1., 1.),
+        'convex_hull': hull,
+        'valid_percentage': 50.,
+        'range': (0., 10.),
+        'mean': 5.,
+        'stdev': 2.,
+        'percentiles': list(np.linspace(0, 10, 99)),
+        'metadata': {}
+    }
+
+    # identical members yield identical statistics
+    merged = merge_metadata([member, member])
+    assert merged['bounds'] == member['bounds']
+    assert merged['range'] == member['range']
+    assert merged['mean'] == pytest.approx(5.)
+    assert merged['stdev'] == pytest.approx(2.)
+    assert merged['valid_percentage'] == pytest.approx(100.)
+    np.testing.assert_allclose(merged['percentiles'], member['percentiles'], atol=0.1)
+
+    shifted = dict(
+        member, bounds=(1., 0., 2., 1.), valid_percentage=100., range=(10., 20.), mean=15.,
+        percentiles=list(np.linspace(10, 20, 99)),
+        convex_hull={'type': 'Polygon', 'coordinates': [
+            [[1, 0], [2, 0], [2, 1], [1, 1], [1, 0]]
+        ]}
+    )
+    merged = merge_metadata([member, shifted])
+    assert merged['bounds'] == (0., 0., 2., 1.)
+    assert merged['range'] == (0., 20.)
+    assert merged['valid_percentage'] == pytest.approx(75., rel=1e-3)
+
+    # second member has twice the valid area
+    assert merged['mean'] == pytest.approx((5. + 2 * 15.) / 3, rel=1e-3)
+    assert merged['stdev'] > 2.
+    assert merged['percentiles'][50] > 10.
+    assert np.all(np.diff(merged['percentiles']) >= 0)
@@ -344,20 +344,1430 @@ def test_raster_cache_fail(driver_path, provider, raster_file, asynchronous):
     assert len(db._raster_cache) == 0
 
 
+@pytest.mark.parametrize('provider', DRIVERS)
+def test_raster_coalescing(driver_path, provider, raster_file, monkeypatch):
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    from terracotta import drivers
+    import terracotta.drivers.raster_base
+
+    db = drivers.get_driver(driver_path, provider=provider)
+    keys = ('some', 'keynames')
+
+    db.create(keys)
+    db.insert(['some', 'value'], str(raster_file))
+
+    job_started = threading.Event()
+
+    class BlockingExecutor(ThreadPoolExecutor):
+        num_jobs = 0
+
+        def submit(self, fn, *args, **kwargs):
+            BlockingExecutor.num_jobs += 1
+
+            def blocked_fn(*args, **kwargs):
+                assert job_started.wait(10)
+                return fn(*args, **kwargs)
+
+            return super().submit(blocked_fn, *args, **kwargs)
+
+    blocking_executor = BlockingExecutor(1)
+    monkeypatch.setattr(terracotta.drivers.raster_base, 'get_executor', lambda: blocking_executor)
+
+    futures = [
+        db.get_raster_tile(['some', 'value'], tile_size=(256, 256), asynchronous=True)
+        for _ in range(3)
+    ]
+    assert BlockingExecutor.num_jobs == 1
+    counters = ('hits', 'misses', 'coalesced', 'prefetched', 'in_flight')
+    stats = db.get_cache_stats()
+    assert {key: stats[key] for key in counters} == dict(
+        hits=0, misses=1, coalesced=2, prefetched=0, in_flight=1
+    )
+
+    job_started.set()
+    results = [future.result() for future in futures]
+    time.sleep(1)  # allow callback to finish
+
+    for result in results[1:]:
+        np.testing.assert_array_equal(result, results[0])
+
+    db.get_raster_tile(['some', 'value'], tile_size=(256, 256))
+    assert BlockingExecutor.num_jobs == 1
+    stats = db.get_cache_stats()
+    assert {key: stats[key] for key in counters} == dict(
+        hits=1, misses=1, coalesced=2, prefetched=0, in_flight=0
+    )
+
+
+@pytest.mark.parametrize('provider', DRIVERS)
+def test_raster_coalescing_fail(driver_path, provider, raster_file, monkeypatch):
+    from terracotta import drivers, update_settings
+    from terracotta.drivers.raster_base import RasterDriver
+
+    update_settings(RASTER_EXECUTOR='thread')
+
+    db = drivers.get_driver(driver_path, provider=provider)
+    keys = ('some', 'keynames')
+
+    db.create(keys)
+    db.insert(['some', 'value'], str(raster_file))
+
+    def dummy(*args, **kwargs):
+        raise RuntimeError('monkeypatched')
+
+    with monkeypatch.context() as m:
+        m.setattr(RasterDriver, '_get_raster_bands', staticmethod(dummy))
+
+        with pytest.raises(RuntimeError):
+            db.get_raster_tile(['some', 'value'], tile_size=(256, 256))
+
+    time.sleep(1)  # allow callback to finish
+    assert db.get_cache_stats()['in_flight'] == 0
+
+    # failed retrievals are not shared with later requests
+    data = db.get_raster_tile(['some', 'value'], tile_size=(256, 256))
+    assert data.shape == (256, 256)
+
+
+@pytest.mark.parametrize('provider', DRIVERS)
+def test_raster_coalescing_submit_fail(driver_path, provider, raster_file, raster_file_float,
+                                       monkeypatch):
+    from terracotta import drivers, update_settings
+
+    update_settings(RASTER_EXECUTOR='thread')
+
+    db = drivers.get_driver(driver_path, provider=provider)
+    keys = ('some', 'keynames')
+
+    db.create(keys)
+    db.insert(['some', 'value'], str(raster_file))
+    db.insert(['some', 'other_value'], str(raster_file_float))
+
+    def dummy(*args, **kwargs):
+        raise RuntimeError('monkeypatched')
+
+    # transient error while looking up the georeference
+    with monkeypatch.context() as m:
+        m.setattr(db, '_get_georeference', dummy)
+
+        with pytest.raises(RuntimeError):
+            db.get_raster_tile(['some', 'value'], tile_size=(256, 256))
+
+    assert db.get_cache_stats()['in_flight'] == 0
+
+    future = db.get_raster_tile(['some', 'value'], tile_size=(256, 256), asynchronous=True)
+    assert future.result(timeout=10).shape == (256, 256)
+
+    # submitting the first of several jobs fails
+    with monkeypatch.context() as m:
+        m.setattr(db, '_submit_tile_job', dummy)
+
+        with pytest.raises(RuntimeError):
+            db.get_raster_tiles([['some', 'value'], ['some', 'other_value']], tile_size=(128, 128))
+
+    assert db.get_cache_stats()['in_flight'] == 0
+
+    futures = db.get_raster_tiles(
+        [['some', 'value'], ['some', 'other_value']], tile_size=(128, 128), asynchronous=True
+    )
+    assert all(future.result(timeout=10).shape == (128, 128) for future in futures)
+
+
+@pytest.mark.parametrize('provider', DRIVERS)
+def test_raster_cache_stats(driver_path, provider, raster_file):
+    from terracotta import drivers, update_settings
+
+    update_settings(RASTER_CACHE_SIZE=1024 * 1024)
+
+    db = drivers.get_driver(driver_path, provider=provider)
+    keys = ('some', 'keynames')
+
+    db.create(keys)
+    db.insert(['some', 'value'], str(raster_file))
+
+    assert db.get_cache_stats() == dict(
+        hits=0, misses=0, coalesced=0, prefetched=0, in_flight=0, inserts=0, evictions=0,
+        rejected=0, compress_time=0., decompress_time=0., entries=0, size=0,
+        maxsize=1024 * 1024, pinned=0, pinned_size=0
+    )
+
+    data = db.get_raster_tile(['some', 'value'], tile_size=(256, 256))
+    db.get_raster_tile(['some', 'value'], tile_size=(256, 256))
+
+    stats = db.get_cache_stats()
+    assert stats['inserts'] == stats['entries'] == 1
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+    assert stats['compress_time'] > 0
+    assert 0 < stats['size'] < data.nbytes
+
+    # tiles that are larger than the cache are rejected
+    db.get_raster_tile(['some', 'value'], tile_size=(2048, 2048))
+    assert db.get_cache_stats()['rejected'] == 1
+
+
+@pytest.mark.parametrize('policy', ['lfu', 'tinylfu'])
+@pytest.mark.parametrize('provider', DRIVERS)
+def test_raster_cache_pinning(driver_path, provider, policy, raster_file, raster_file_float,
+                              mosaic_member_files):
+    from terracotta import drivers, update_settings
+
+    update_settings(
+        RASTER_CACHE_SIZE=1024 * 1024, RASTER_CACHE_POLICY=policy,
+        RASTER_CACHE_PINNED_DATASETS=[['pinned']]
+    )
+
+    db = drivers.get_driver(driver_path, provider=provider)
+    db.create(('name',))
+    db.insert(['pinned'], str(raster_file))
+    db.insert(['other'], str(raster_file_float))
+
+    db.get_raster_tile(['pinned'], tile_size=(256, 256))
+
+    # fill cache with other tiles
+    for tile_size in range(200, 250):
+        db.get_raster_tile(['other'], tile_size=(tile_size, tile_size))
+
+    stats = db.get_cache_stats()
+    assert stats['evictions'] > 0
+    assert stats['pinned'] == 1
+
+    num_misses = db.get_cache_stats()['misses']
+    db.get_raster_tile(['pinned'], tile_size=(256, 256))
+    assert db.get_cache_stats()['misses'] == num_misses
+
+    # members of pinned mosaics are pinned, too
+    west_file, east_file = mosaic_member_files
+    db.insert(['west'], str(west_file))
+    db.insert(['east'], str(east_file))
+    db.insert_mosaic(['all'], [['west'], ['east']])
+    db.insert_mosaic(['nested'], [['all']])
+
+    update_settings(RASTER_CACHE_PINNED_DATASETS=[['nested'], ['missing']])
+    with db.connect():
+        assert db._get_pinned_paths() == {str(west_file), str(east_file)}
+
+
+@pytest.mark.parametrize('provider', DRIVERS)
+def test_raster_overzoom(driver_path, provider, raster_file):
+    import mercantile
+    from terracotta import drivers
+
+    db = drivers.get_driver(driver_path, provider=provider)
+    keys = ('some', 'keynames')
+
+    db.create(keys)
+    db.insert(['some', 'value'], str(raster_file))
+
+    with rasterio.open(str(raster_file)) as src:
+        x, y = src.transform * (128, 128)
+        (lon,), (lat,) = rasterio.warp.transform(src.crs, 'epsg:4326', [x], [y])
+
+    # zoom 17 matches the native resolution of the raster
+    ancestor = mercantile.parent(mercantile.tile(lon, lat, 19), zoom=17)
+    ancestor_data = db.get_raster_tile(
+        ['some', 'value'], tile_bounds=mercantile.xy_bounds(ancestor)
+    )
+    assert db.get_cache_stats()['misses'] == 1
+
+    for tile in mercantile.children(ancestor, zoom=19):
+        data = db.get_raster_tile(['some', 'value'], tile_bounds=mercantile.xy_bounds(tile))
+        assert data.shape == (256, 256)
+
+        row_off = (tile.y % 4) * 64
+        col_off = (tile.x % 4) * 64
+        expected = ancestor_data[row_off:row_off + 64, col_off:col_off + 64]
+        np.testing.assert_array_equal(data[::4, ::4].mask, expected.mask)
+        np.testing.assert_array_equal(data[::4, ::4].data, expected.data)
+        np.testing.assert_array_equal(data[3::4, 3::4], data[::4, ::4])
+
+    # all tiles are cut from the cached ancestor
+    assert db.get_cache_stats()['misses'] == 1
+    assert db.get_cache_stats()['hits'] == 16
+
+    # tiles that are not overzoomed are read directly
+    db.get_raster_tile(['some', 'value'], tile_bounds=mercantile.xy_bounds(
+        mercantile.parent(ancestor)
+    ))
+    assert db.get_cache_stats()['misses'] == 2
+
+
+@pytest.mark.parametrize('provider', DRIVERS)
+def test_raster_overzoom_multiband(driver_path, provider, multiband_raster_file, monkeypatch):
+    import mercantile
+    from terracotta import drivers, update_settings
+    from terracotta.drivers.raster_base import RasterDriver
+
+    update_settings(RASTER_EXECUTOR='thread')
+
+    db = drivers.get_driver(driver_path, provider=provider)
+    keys = ('some', 'band')
+    path = str(multiband_raster_file)
+
+    db.create(keys)
+    for band in (1, 2, 3):
+        db.insert(['some', f'b{band}'], path, band=band)
+
+    get_raster_bands = RasterDriver._get_raster_bands
+    calls = []
+
+    def counting_get_raster_bands(path, **kwargs):
+        calls.append(kwargs['bands'])
+        return get_raster_bands(path, **kwargs)
+
+    monkeypatch.setattr(RasterDriver, '_get_raster_bands', staticmethod(counting_get_raster_bands))
+
+    with rasterio.open(path) as src:
+        x, y = src.transform * (128, 128)
+        (lon,), (lat,) = rasterio.warp.transform(src.crs, 'epsg:4326', [x], [y])
+
+    # zoom 17 matches the native resolution of the raster
+    tile = mercantile.tile(lon, lat, 19)
+    band_keys = [['some', 'b1'], ['some', 'b2'], ['some', 'b3']]
+    tiles = db.get_raster_tiles(band_keys, tile_bounds=mercantile.xy_bounds(tile))
+
+    assert [data.shape for data in tiles] == [(256, 256)] * 3
+    # all bands of the ancestor are read in a single pass
+    assert calls == [(1, 2, 3)]
+
+
+@pytest.mark.parametrize('provider', DRIVERS)
+def test_stored_georeference(driver_path, provider, raster_file):
+    from terracotta import drivers
+    db = drivers.get_driver(driver_path, provider=provider)
+    keys = ('some', 'keynames')
+
+    db.create(keys)
+    db.insert(['some', 'value'], str(raster_file))
+
+    with db.connect():
+        georef = db._get_georeference(('some', 'value'))
+        metadata = db.get_metadata(('some', 'value'))
+
+    assert 'georeference' not in metadata
+
+    with rasterio.open(str(raster_file)) as src:
+        assert rasterio.crs.CRS.from_user_input(georef['crs']) == src.crs
+        assert georef['overviews'] == src.overviews(1)
+        assert georef['dtype'] == src.dtypes[0]
+        assert georef['nodata'] == src.nodata
+        assert georef['has_alpha'] is False
+
+        dst_bounds = rasterio.warp.transform_bounds(src.crs, 'epsg:3857', *src.bounds)
+
+    assert georef['target_crs'] == 'epsg:3857'
+    np.testing.assert_allclose(georef['target_bounds'], dst_bounds)
+
+
+@pytest.mark.parametrize('provider', DRIVERS)
+def test_cached_georeference(driver_path, provider, big_raster_file_nodata, monkeypatch):
+    import mercantile
+    from terracotta import drivers, update_settings
+    from terracotta.block_index import BlockIndex
+
+    update_settings(RASTER_EXECUTOR='thread')
+
+    db = drivers.get_driver(driver_path, provider=provider)
+    keys = ('some', 'keynames')
+
+    db.create(keys)
+    db.insert(['some', 'value'], str(big_raster_file_nodata))
+
+    calls = dict(get_georeference=0, from_dict=0)
+    get_georeference, from_dict = db._get_georeference, BlockIndex.from_dict
+
+    def count(name, func):
+        def wrapped(*args, **kwargs):
+            calls[name] += 1
+            return func(*args, **kwargs)
+        return wrapped
+
+    monkeypatch.setattr(db, '_get_georeference', count('get_georeference', get_georeference))
+    monkeypatch.setattr(BlockIndex, 'from_dict', count('from_dict', from_dict))
+
+    with db.connect():
+        georef, (band, block_index) = db._get_cached_georeference(('some', 'value'))
+        metadata = db.get_metadata(('some', 'value'))
+
+    assert 'block_index' not in georef
+    assert band == 1
+    assert isinstance(block_index, BlockIndex)
+
+    lon, lat = (metadata['bounds'][0] + metadata['bounds'][2]) / 2, metadata['bounds'][1]
+    for tile in mercantile.children(mercantile.tile(lon, lat, 12)):
+        assert db.get_raster_tile(
+            ['some', 'value'], tile_bounds=mercantile.xy_bounds(tile), tile_size=(64, 64)
+        ).shape == (64, 64)
+
+    assert calls == dict(get_georeference=1, from_dict=1)
+
+    # inserting datasets invalidates the cache
+    db.insert(['some', 'value'], str(big_raster_file_nodata))
+
+    with db.connect():
+        db._get_cached_georeference(('some', 'value'))
+
+    assert calls == dict(get_georeference=2, from_dict=2)
+
+
+@pytest.mark.parametrize('provider', DRIVERS)
+def test_stored_coverage(driver_path, provider, raster_file_polar):
+    import mercantile
+    from terracotta import drivers, exceptions
+
+    # in polar stereographic projection, bounds are a poor footprint
+    db = drivers.get_driver(driver_path, provider=provider)
+    db.create(('some', 'keynames'))
+    db.insert(['some', 'value'], str(raster_file_polar))
+
+    with db.connect():
+        metadata = db.get_metadata(('some', 'value'))
+        coverage = db.get_coverage(('some', 'value'))
+
+    assert 'coverage' not in metadata
+    assert coverage is not None
+
+    num_skipped = 0
+    for tile in mercantile.tiles(*metadata['bounds'], zooms=[7, 8, 9]):
+        if coverage.tile_has_data(*tile):
+            continue
+
+        num_skipped += 1
+        try:
+            data = db.get_raster_tile(('some', 'value'),
+                                      tile_bounds=mercantile.xy_bounds(tile), tile_size=(64, 64))
+        except exceptions.TileOutOfBoundsError:
+            continue
+        assert data.mask.all()
+
+    assert num_skipped > 0
+
+
+def test_raster_retrieval_native_crs(raster_file_polar, monkeypatch):
+    import rasterio.vrt
+    from terracotta.drivers.raster_base import RasterDriver
+    from terracotta.tile_matrix import EPSG3031_QUAD
+
+    tile_args = dict(reprojection_method='nearest', resampling_method='nearest')
+
+    # tile at zoom level 8 that is half-covered by data
+    tile_bounds = EPSG3031_QUAD.xy_bounds(144, 97, 8)
+    assert tile_bounds[0] < 550000 < tile_bounds[2]
+
+    def throw(*args, **kwargs):
+        raise AssertionError('raster in target CRS should not be warped')
+
+    with monkeypatch.context() as m:
+        m.setattr(rasterio.vrt, 'WarpedVRT', throw)
+        data = RasterDriver._get_raster_tile(
+            str(raster_file_polar), tile_bounds=tile_bounds, tile_size=(256, 256),
+            target_crs='epsg:3031', **tile_args
+        )
+
+    assert data.shape == (256, 256)
+    assert 0 < np.count_nonzero(~data.mask) < data.size
+
+    def column(x):
+        return int((x - tile_bounds[0]) / (tile_bounds[2] - tile_bounds[0]) * 256)
+
+    def row(y):
+        return int((tile_bounds[3] - y) / (tile_bounds[3] - tile_bounds[1]) * 256)
+
+    # left half of the dataset is nodata, right half is valid
+    assert data.mask[:, :column(550000)].all()
+    assert data.mask[:row(1000000)].all()
+    assert not data.mask[row(1000000) + 1:, column(550000) + 1:column(600000) - 1].any()
+
+
+@pytest.mark.parametrize('provider', DRIVERS)
+def test_raster_native_crs_georeference(driver_path, provider, raster_file_polar, monkeypatch):
+    from terracotta import drivers, update_settings
+    from terracotta.drivers.raster_base import RasterDriver
+    from terracotta.tile_matrix import EPSG3031_QUAD
+
+    update_settings(RASTER_EXECUTOR='thread')
+
+    db = drivers.get_driver(driver_path, provider=provider)
+    db.create(('some', 'keynames'))
+    db.insert(['some', 'value'], str(raster_file_polar))
+
+    compute_georeference = RasterDriver._compute_georeference
+    computed = []
+
+    def counting_compute_georeference(src, **kwargs):
+        computed.append(kwargs.get('target_crs'))
+        return compute_georeference(src, **kwargs)
+
+    monkeypatch.setattr(
+        RasterDriver, '_compute_georeference', staticmethod(counting_compute_georeference)
+    )
+
+    tile_args = dict(tile_size=(64, 64), target_crs='epsg:3031')
+    data = db.get_raster_tile(
+        ['some', 'value'], tile_bounds=EPSG3031_QUAD.xy_bounds(144, 97, 8), **tile_args
+    )
+    assert data.shape == (64, 64)
+    assert computed == ['epsg:3031']
+
+    # georeference in target CRS is only computed once per dataset
+    data = db.get_raster_tile(
+        ['some', 'value'], tile_bounds=EPSG3031_QUAD.xy_bounds(145, 97, 8), **tile_args
+    )
+    assert data.shape == (64, 64)
+    assert computed == ['epsg:3031']
+
+
+def test_raster_retrieval_stored_georeference(raster_file, monkeypatch):
+    import terracotta
+    from terracotta.drivers.raster_base import RasterDriver
+
+    georef = RasterDriver._compute_georeference_from_file(str(raster_file))
+    tile_args = dict(reprojection_method='nearest', resampling_method='nearest')
+    expected = RasterDriver._get_raster_tile(str(raster_file), **tile_args)
+
+    def throw(*args, **kwargs):
+        raise AssertionError('georeference should not be recomputed')
+
+    with monkeypatch.context() as m:
+        m.setattr(rasterio.warp, 'transform_bounds', throw)
+        m.setattr(rasterio.warp, 'calculate_default_transform', throw)
+        result = RasterDriver._get_raster_tile(str(raster_file), georeference=georef, **tile_args)
+
+    np.testing.assert_array_equal(result.data, expected.data)
+    np.testing.assert_array_equal(result.mask, expected.mask)
+
+    # out-of-bounds tiles are rejected without opening the file
+    with monkeypatch.context() as m:
+        m.setattr(terracotta.drivers.raster_base, 'get_dataset_pool', throw)
+        with pytest.raises(terracotta.exceptions.TileOutOfBoundsError):
+            RasterDriver._get_raster_tile(
+                str(raster_file), georeference=georef,
+                tile_bounds=(0, 0, 1e7, 1e7), **tile_args
+            )
+
+
+def test_raster_retrieval_empty_blocks(big_raster_file_nodata, monkeypatch):
+    import mercantile
+    import terracotta
+    from terracotta.block_index import BlockIndex
+    from terracotta.drivers.raster_base import RasterDriver
+
+    metadata = RasterDriver.compute_metadata(str(big_raster_file_nodata))
+    georef = metadata['georeference']
+    assert georef['block_index']['band'] == 1
+    block_index = BlockIndex.from_dict(georef['block_index'])
+
+    with rasterio.open(str(big_raster_file_nodata)) as src:
+        # top left block is outside of the valid circle, center block is inside
+        empty_point = src.transform * (50, 50)
+        valid_point = src.transform * (1024, 1024)
+        points = rasterio.warp.transform(src.crs, 'epsg:4326', *zip(empty_point, valid_point))
+
+    tile_args = dict(reprojection_method='nearest', resampling_method='nearest')
+    empty_tile, valid_tile = (
+        mercantile.xy_bounds(mercantile.tile(lon, lat, 15)) for lon, lat in zip(*points)
+    )
+
+    expected = RasterDriver._get_raster_tile(
+        str(big_raster_file_nodata), tile_bounds=empty_tile, **tile_args
+    )
+    assert expected.mask.all()
+
+    def throw(*args, **kwargs):
+        raise AssertionError('file should not be read')
+
+    with monkeypatch.context() as m:
+        m.setattr(terracotta.drivers.raster_base, 'get_dataset_pool', throw)
+        result = RasterDriver._get_raster_tile(
+            str(big_raster_file_nodata), georeference=georef, block_index=block_index,
+            tile_bounds=empty_tile, **tile_args
+        )
+
+    assert result.shape == expected.shape
+    assert result.dtype == expected.dtype
+    assert result.mask.all()
+
+    expected = RasterDriver._get_raster_tile(
+        str(big_raster_file_nodata), tile_bounds=valid_tile, **tile_args
+    )
+    result = RasterDriver._get_raster_tile(
+        str(big_raster_file_nodata), georeference=georef, block_index=block_index,
+        tile_bounds=valid_tile, **tile_args
+    )
+    assert not expected.mask.all()
+    np.testing.assert_array_equal(result.data, expected.data)
+    np.testing.assert_array_equal(result.mask, expected.mask)
+
+
+@pytest.mark.parametrize('use_chunks', [True, False])
+def test_compute_block_index(tmpdir, monkeypatch, use_chunks):
+    import affine
+    from terracotta.block_index import BlockIndex
+    from terracotta.drivers.raster_base import RasterDriver
+
+    profile = {
+        'driver': 'GTiff',
+        'dtype': 'uint16',
+        'nodata': 0,
+        'width': 1024,
+        'height': 512,
+        'count': 1,
+        'crs': 'epsg:32637',
+        'transform': affine.Affine(10., 0., 694920., 0., -10., 2055666.),
+        'tiled': True,
+        'blockxsize': 256,
+        'blockysize': 256,
+        'sparse_ok': True
+    }
+
+    outfile = str(tmpdir.join('sparse.tif'))
+    with rasterio.open(outfile, 'w', **profile) as dst:
+        # only two blocks are written, GDAL drops the one that only contains nodata
+        dst.write(np.ones((256, 256), dtype='uint16'), 1,
+                  window=rasterio.windows.Window(0, 0, 256, 256))
+        dst.write(np.zeros((256, 256), dtype='uint16'), 1,
+                  window=rasterio.windows.Window(256, 256, 256, 256))
+
+    # number of pixels read at full resolution
+    num_pixels_read = 0
+
+    class CountingReader:
+        def __init__(self, src):
+            self._src = src
+
+        def __getattr__(self, attr):
+            return getattr(self._src, attr)
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *args):
+            return self._src.__exit__(*args)
+
+        def _count(self, window, out_shape):
+            nonlocal num_pixels_read
+            if window is not None:
+                num_pixels_read += int(window.width * window.height)
+            elif out_shape is None or tuple(out_shape) == self._src.shape:
+                num_pixels_read += self._src.width * self._src.height
+
+        def read(self, *args, window=None, out_shape=None, **kwargs):
+            self._count(window, out_shape)
+            return self._src.read(*args, window=window, out_shape=out_shape, **kwargs)
+
+        def read_masks(self, *args, window=None, out_shape=None, **kwargs):
+            self._count(window, out_shape)
+            return self._src.read_masks(*args, window=window, out_shape=out_shape, **kwargs)
+
+    rasterio_open = rasterio.open
+    monkeypatch.setattr(rasterio, 'open', lambda *a, **kw: CountingReader(rasterio_open(*a, **kw)))
+
+    metadata = RasterDriver.compute_metadata(outfile, use_chunks=use_chunks)
+
+    # block index is computed during the same pass as statistics
+    assert num_pixels_read == 1024 * 512
+
+    block_index = BlockIndex.from_dict(metadata['georeference']['block_index'])
+    assert block_index.window_has_data((0, 10), (0, 10))
+    assert not block_index.window_has_data((300, 310), (300, 310))
+    assert not block_index.window_has_data((0, 512), (256, 1024))
+    assert block_index.window_has_data((0, 512), (0, 1024), decimation=4)
+
+
+@pytest.mark.parametrize('use_chunks', [True, False])
+def test_compute_coverage_single_pixel(tmpdir, monkeypatch, use_chunks):
+    import affine
+    import mercantile
+    import rasterio
+    from rasterio import warp
+    from rasterio.enums import Resampling
+    from terracotta.coverage import TileCoverage
+    from terracotta.drivers.raster_base import RasterDriver
+
+    # each coverage cell spans 64x64 pixels
+    monkeypatch.setattr(RasterDriver, '_COVERAGE_MAX_SHAPE', (16, 16))
+
+    profile = {
+        'driver': 'GTiff',
+        'dtype': 'uint16',
+        'nodata': 0,
+        'width': 1024,
+        'height': 1024,
+        'count': 1,
+        'crs': 'epsg:32637',
+        'transform': affine.Affine(10., 0., 694920., 0., -10., 2055666.),
+        'tiled': True,
+        'blockxsize': 256,
+        'blockysize': 256
+    }
+
+    data = np.zeros((1024, 1024), dtype='uint16')
+    data[300, 700] = 1
+
+    outfile = str(tmpdir.join('single-pixel.tif'))
+    with rasterio.open(outfile, 'w', **profile) as dst:
+        dst.write(data, 1)
+        # the pixel does not survive in any overview
+        dst.build_overviews([2, 4, 8, 16, 32, 64], Resampling.nearest)
+
+    metadata = RasterDriver.compute_metadata(outfile, use_chunks=use_chunks)
+    coverage = TileCoverage.from_dict(metadata['coverage'])
+
+    x, y = profile['transform'] * (700.5, 300.5)
+    (lon,), (lat,) = warp.transform(profile['crs'], 'epsg:4326', [x], [y])
+
+    # a single valid pixel marks its whole cell
+    for zoom in (coverage.max_zoom, 18):
+        assert coverage.tile_has_data(*mercantile.tile(lon, lat, zoom))
+
+    (lon,), (lat,) = warp.transform(profile['crs'], 'epsg:4326', [x - 5000], [y + 5000])
+    assert not coverage.tile_has_data(*mercantile.tile(lon, lat, coverage.max_zoom))
+
+
+def test_schema_migration(tmpdir, raster_file, monkeypatch):
+    import sqlite3
+    from terracotta import drivers
+
+    dbfile = tmpdir.join('old.sqlite')
+    db = drivers.get_driver(str(dbfile), provider='sqlite')
+    keys = ('some', 'keynames')
+
+    db.create(keys)
+    metadata = db.compute_metadata(str(raster_file))
+    encoded = db._encode_data(metadata)
+    del encoded['georeference'], encoded['coverage']
+
+    # emulate a database created before the georeference and band_index columns existed
+    conn = sqlite3.connect(str(dbfile))
+    conn.execute('DROP TABLE datasets')
+    conn.execute('DROP TABLE metadata')
+    conn.execute('CREATE TABLE datasets (some VARCHAR[256], keynames VARCHAR[256], '
+                 'filepath VARCHAR[8000], PRIMARY KEY (some, keynames))')
+    column_string = ', '.join(f'{col} {col_type}' for col, col_type in db._METADATA_COLUMNS)
+    conn.execute(f'CREATE TABLE metadata (some VARCHAR[256], keynames VARCHAR[256], '
+                 f'{column_string}, PRIMARY KEY (some, keynames))')
+    conn.execute('INSERT INTO datasets VALUES (?, ?, ?)', ['some', 'value', str(raster_file)])
+    conn.execute(f'INSERT INTO metadata (some, keynames, {", ".join(encoded.keys())}) '
+                 f'VALUES ({", ".join(["?"] * (len(encoded) + 2))})',
+                 ['some', 'value', *encoded.values()])
+    conn.commit()
+    conn.close()
+
+    computed = []
+    compute_georeference = db._compute_georeference_from_file
+
+    def counting_compute_georeference(path, band=1):
+        computed.append((path, band))
+        return compute_georeference(path, band=band)
+
+    monkeypatch.setattr(db, '_compute_georeference_from_file', counting_compute_georeference)
+
+    # missing georeference is computed once on first read, without block index
+    expected_georeference = {
+        key: val for key, val in metadata['georeference'].items() if key != 'block_index'
+    }
+
+    with db.connect():
+        assert db._get_georeference(('some', 'value')) is None
+        assert db._get_raster_source(('some', 'value')) == (str(raster_file), 1)
+        assert db.get_raster_tile(('some', 'value')).shape == (256, 256)
+        assert db.get_raster_tile(('some', 'value'), tile_size=(64, 64)).shape == (64, 64)
+        assert db._get_cached_georeference(('some', 'value')) == (expected_georeference, None)
+
+    assert computed == [(str(raster_file), 1)]
+
+    # upgrading the schema does not touch existing datasets
+    db.insert(['some', 'other_value'], str(raster_file))
+    assert len(computed) == 1
+
+    with db.connect():
+        assert db._get_georeference(('some', 'value')) is None
+        assert db._get_cached_georeference(('some', 'value')) == (expected_georeference, None)
+        assert db._get_georeference(('some', 'other_value')) == metadata['georeference']
+        assert db.get_metadata(('some', 'value'))['bounds'] == metadata['bounds']
+
+    # database errors are not mistaken for an outdated schema
+    class LockedConnection:
+        def __init__(self, conn):
+            self._conn = conn
+
+        def execute(self, sql, *args):
+            if sql.startswith('SELECT georeference'):
+                raise sqlite3.OperationalError('database is locked')
+            return self._conn.execute(sql, *args)
+
+        def __getattr__(self, attr):
+            return getattr(self._conn, attr)
+
+    with db.connect():
+        db._connection = LockedConnection(db._connection)
+
+        with pytest.raises(sqlite3.OperationalError):
+            db._get_georeference(('some', 'value'))
+
+
+@pytest.mark.parametrize('provider', DRIVERS)
+def test_multiband_retrieval(driver_path, provider, multiband_raster_file, monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+    import terracotta
+    from terracotta import drivers
+    from terracotta.drivers.raster_base import RasterDriver
+
+    db = drivers.get_driver(driver_path, provider=provider)
+    keys = ('some', 'band')
+    path = str(multiband_raster_file)
+
+    db.create(keys)
+    for band in (1, 2, 3):
+        db.insert(['some', f'b{band}'], path, band=band)
+
+    assert db.get_datasets() == {('some', f'b{band}'): path for band in (1, 2, 3)}
+
+    with db.connect():
+        assert db._get_raster_source(('some', 'b2')) == (path, 2)
+        mtd1, mtd2 = db.get_metadata(['some', 'b1']), db.get_metadata(['some', 'b2'])
+
+    assert mtd2['range'][1] == mtd1['range'][1] // 2
+
+    class CountingExecutor(ThreadPoolExecutor):
+        num_jobs = 0
+
+        def submit(self, *args, **kwargs):
+            CountingExecutor.num_jobs += 1
+            return super().submit(*args, **kwargs)
+
+    counting_executor = CountingExecutor(1)
+    monkeypatch.setattr(terracotta.drivers.raster_base, 'get_executor', lambda: counting_executor)
+
+    band_keys = [['some', 'b3'], ['some', 'b1'], ['some', 'b2'], ['some', 'b1']]
+    tiles = db.get_raster_tiles(band_keys, tile_size=(256, 256))
+
+    # all bands are read in a single job
+    assert CountingExecutor.num_jobs == 1
+    assert len(db._raster_cache) == 3
+
+    settings = terracotta.get_settings()
+
+    for (_, band_key), tile in zip(band_keys, tiles):
+        expected = RasterDriver._get_raster_tile(
+            path, band=int(band_key[1]), tile_size=(256, 256),
+            reprojection_method=settings.REPROJECTION_METHOD,
+            resampling_method=settings.RESAMPLING_METHOD
+        )
+        np.testing.assert_array_equal(tile.data, expected.data)
+        np.testing.assert_array_equal(tile.mask, expected.mask)
+
+    # served from cache
+    single_tile = db.get_raster_tile(['some', 'b3'], tile_size=(256, 256))
+    assert CountingExecutor.num_jobs == 1
+    np.testing.assert_array_equal(single_tile, tiles[0])
+
+
+def test_multiband_direct_read(multiband_raster_file_mercator):
+    from terracotta.drivers.raster_base import RasterDriver
+
+    path = str(multiband_raster_file_mercator)
+    tile_args = dict(reprojection_method='nearest', resampling_method='nearest')
+    tiles = RasterDriver._get_raster_bands(path, bands=(1, 2, 3), **tile_args)
+
+    for band, tile in zip((1, 2, 3), tiles):
+        expected = RasterDriver._get_raster_tile(path, band=band, **tile_args)
+        np.testing.assert_array_equal(tile.data, expected.data)
+        np.testing.assert_array_equal(tile.mask, expected.mask)
+
+    assert not np.array_equal(tiles[0], tiles[2])
+
+
+def test_compute_metadata_invalid_band(multiband_raster_file):
+    from terracotta.drivers.raster_base import RasterDriver
+
+    with pytest.raises(ValueError) as exc:
+        RasterDriver.compute_metadata(str(multiband_raster_file), band=4)
+
+    assert 'has no band 4' in str(exc.value)
+
+
+@pytest.mark.parametrize('provider', DRIVERS)
+def test_raster_metatile(driver_path, provider, raster_file, raster_file_xyz, monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+    import mercantile
+    import terracotta
+    from terracotta import drivers
+    from terracotta.xyz import metatile_bounds
+
+    db = drivers.get_driver(driver_path, provider=provider)
+    keys = ('some', 'keynames')
+
+    db.create(keys)
+    db.insert(['some', 'value'], str(raster_file))
+
+    class CountingExecutor(ThreadPoolExecutor):
+        num_jobs = 0
+
+        def submit(self, *args, **kwargs):
+            CountingExecutor.num_jobs += 1
+            return super().submit(*args, **kwargs)
+
+    counting_executor = CountingExecutor(1)
+    monkeypatch.setattr(terracotta.drivers.raster_base, 'get_executor', lambda: counting_executor)
+
+    with rasterio.open(str(raster_file)) as src:
+        raster_bounds = rasterio.warp.transform_bounds(src.crs, 'epsg:4326', *src.bounds)
+
+    center_tile = mercantile.tile(
+        (raster_bounds[0] + raster_bounds[2]) / 2, (raster_bounds[1] + raster_bounds[3]) / 2, 17
+    )
+    metatile = metatile_bounds(center_tile.x, center_tile.y, center_tile.z, 4)
+    all_tiles = [bounds for row in metatile for bounds in row]
+
+    tile_args = dict(tile_size=(32, 32), metatile=metatile)
+    tile = db.get_raster_tile(['some', 'value'], tile_bounds=all_tiles[0], **tile_args)
+    assert tile.shape == (32, 32)
+    assert len(db._raster_cache) == len(all_tiles) == 16
+    assert CountingExecutor.num_jobs == 1
+
+    # all other tiles are served from cache
+    for bounds in all_tiles:
+        db.get_raster_tile(['some', 'value'], tile_bounds=bounds, tile_size=(32, 32))
+
+    assert CountingExecutor.num_jobs == 1
+
+    with pytest.raises(ValueError):
+        db.get_raster_tile(['some', 'value'], tile_bounds=(0, 0, 1, 1), **tile_args)
+
+    # dataset covers too little of the metatile -> only requested tile is read
+    db._raster_cache.clear()
+    metatile = metatile_bounds(*raster_file_xyz, 4)
+    tile_bounds = tuple(mercantile.xy_bounds(mercantile.Tile(*raster_file_xyz)))
+    tile = db.get_raster_tile(
+        ['some', 'value'], tile_bounds=tile_bounds, tile_size=(32, 32), metatile=metatile
+    )
+    assert tile.shape == (32, 32)
+    assert len(db._raster_cache) == 1
+
+
+@pytest.mark.parametrize('provider', DRIVERS)
+def test_raster_metatile_coalescing(driver_path, provider, raster_file, raster_file_xyz,
+                                    monkeypatch):
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    import mercantile
+    import terracotta
+    from terracotta import drivers
+    from terracotta.drivers.raster_base import RasterDriver
+    from terracotta.xyz import metatile_bounds
+
+    db = drivers.get_driver(driver_path, provider=provider)
+    keys = ('some', 'keynames')
+
+    db.create(keys)
+    db.insert(['some', 'value'], str(raster_file))
+
+    job_started = threading.Event()
+
+    class BlockingExecutor(ThreadPoolExecutor):
+        def submit(self, fn, *args, **kwargs):
+            def blocked_fn(*args, **kwargs):
+                assert job_started.wait(10)
+                return fn(*args, **kwargs)
+
+            return super().submit(blocked_fn, *args, **kwargs)
+
+    blocking_executor = BlockingExecutor(2)
+    monkeypatch.setattr(terracotta.drivers.raster_base, 'get_executor', lambda: blocking_executor)
+
+    get_raster_metatile = RasterDriver._get_raster_metatile
+    calls = []
+
+    def counting_get_raster_metatile(path, **kwargs):
+        calls.append(kwargs['tile_bounds'])
+        return get_raster_metatile(path, **kwargs)
+
+    monkeypatch.setattr(
+        RasterDriver, '_get_raster_metatile', staticmethod(counting_get_raster_metatile)
+    )
+
+    with rasterio.open(str(raster_file)) as src:
+        raster_bounds = rasterio.warp.transform_bounds(src.crs, 'epsg:4326', *src.bounds)
+
+    center_tile = mercantile.tile(
+        (raster_bounds[0] + raster_bounds[2]) / 2, (raster_bounds[1] + raster_bounds[3]) / 2, 17
+    )
+    metatile = metatile_bounds(center_tile.x, center_tile.y, center_tile.z, 4)
+    tile_args = dict(tile_size=(32, 32), metatile=metatile, asynchronous=True)
+
+    # both tiles are part of the same metatile and requested before it is read
+    futures = [
+        db.get_raster_tile(['some', 'value'], tile_bounds=bounds, **tile_args)
+        for bounds in (metatile[0][0], metatile[1][2])
+    ]
+    assert db.get_cache_stats()['coalesced'] == 1
+
+    job_started.set()
+    assert [future.result(timeout=10).shape for future in futures] == [(32, 32)] * 2
+    assert len(calls) == 1
+
+    time.sleep(1)  # allow callbacks to finish
+    assert db.get_cache_stats()['in_flight'] == 0
+    assert len(db._raster_cache) == 16
+
+    # dataset covers too little of the metatile -> waiting tiles are read on their own
+    db._raster_cache.clear()
+    job_started.clear()
+    metatile = metatile_bounds(*raster_file_xyz, 4)
+    tile_bounds = tuple(mercantile.xy_bounds(mercantile.Tile(*raster_file_xyz)))
+    other_bounds = next(
+        bounds for row in metatile for bounds in row if bounds != tile_bounds
+    )
+    tile_args = dict(tile_size=(32, 32), metatile=metatile, asynchronous=True)
+    futures = [
+        db.get_raster_tile(['some', 'value'], tile_bounds=bounds, **tile_args)
+        for bounds in (tile_bounds, other_bounds)
+    ]
+
+    job_started.set()
+    assert futures[0].result(timeout=10).shape == (32, 32)
+
+    try:
+        assert futures[1].result(timeout=10).shape == (32, 32)
+    except terracotta.exceptions.TileOutOfBoundsError:
+        pass
+
+    time.sleep(1)  # allow callbacks to finish
+    assert db.get_cache_stats()['in_flight'] == 0
+
+
+@pytest.mark.parametrize('tile_offset', [(0, 0), (0.3, 0.2), (-0.6, 0.45)])
+def test_raster_retrieval_no_warp(raster_file_mercator, tile_offset, monkeypatch):
+    import rasterio.vrt
+    from rasterio.enums import Resampling
+    from rasterio.transform import from_bounds
+    from terracotta.drivers.raster_base import RasterDriver
+
+    with rasterio.open(str(raster_file_mercator)) as src:
+        # use native resolution so nearest neighbor sampling is unambiguous
+        tile_size = src.shape
+
+        w, s, e, n = src.bounds
+        dx, dy = tile_offset[0] * (e - w), tile_offset[1] * (n - s)
+        tile_bounds = (w + dx, s + dy, e + dx, n + dy)
+
+        with rasterio.vrt.WarpedVRT(
+            src, crs=src.crs, resampling=Resampling.nearest, add_alpha=True,
+            transform=from_bounds(*tile_bounds, width=src.width, height=src.height),
+            width=src.width, height=src.height
+        ) as vrt:
+            expected_data = vrt.read(1)
+            expected_mask = (vrt.read(vrt.count) == 0) | (expected_data == src.nodata)
+
+    def throw(*args, **kwargs):
+        raise AssertionError('WarpedVRT should not be used')
+
+    with monkeypatch.context() as m:
+        m.setattr(rasterio.vrt, 'WarpedVRT', throw)
+        data = RasterDriver._get_raster_tile(
+            str(raster_file_mercator), tile_bounds=tile_bounds, tile_size=tile_size,
+            reprojection_method='nearest', resampling_method='nearest'
+        )
+
+    assert data.shape == tile_size
+    np.testing.assert_array_equal(data.mask, expected_mask)
+    np.testing.assert_array_equal(data.compressed(), expected_data[~expected_mask])
+
+
+def test_raster_retrieval_no_warp_preview(raster_file_mercator, raster_file):
+    from terracotta.drivers.raster_base import RasterDriver
+
+    kwargs = dict(reprojection_method='nearest', resampling_method='nearest')
+    data = RasterDriver._get_raster_tile(str(raster_file_mercator), **kwargs)
+    data_warped = RasterDriver._get_raster_tile(str(raster_file), **kwargs)
+
+    assert data.shape == data_warped.shape == (256, 256)
+    assert abs(data.mask.mean() - data_warped.mask.mean()) < 0.05
+
+
+@pytest.mark.parametrize('tile_offset', [(0.7, 0.2), (-0.6, -0.45)])
+def test_raster_retrieval_partial_overlap(raster_file, tile_offset, monkeypatch):
+    import rasterio.vrt
+    from rasterio.enums import Resampling
+    from rasterio.transform import from_bounds
+    from terracotta.drivers.raster_base import RasterDriver
+
+    with rasterio.open(str(raster_file)) as src:
+        w, s, e, n = rasterio.warp.transform_bounds(src.crs, 'epsg:3857', *src.bounds)
+        dx, dy = tile_offset[0] * (e - w), tile_offset[1] * (n - s)
+        tile_bounds = (w + dx, s + dy, e + dx, n + dy)
+
+        # finer than native resolution so nearest neighbor sampling is unambiguous
+        tile_size = (2 * src.height, 2 * src.width)
+
+        with rasterio.vrt.WarpedVRT(
+            src, crs='epsg:3857', resampling=Resampling.nearest, add_alpha=True,
+            transform=from_bounds(*tile_bounds, width=tile_size[1], height=tile_size[0]),
+            width=tile_size[1], height=tile_size[0]
+        ) as vrt:
+            expected_data = vrt.read(1)
+            expected_mask = (vrt.read(vrt.count) == 0) | (expected_data == src.nodata)
+
+    vrt_shapes = []
+
+    class RecordingWarpedVRT(rasterio.vrt.WarpedVRT):
+        def __init__(self, *args, **kwargs):
+            vrt_shapes.append((kwargs['height'], kwargs['width']))
+            super().__init__(*args, **kwargs)
+
+    with monkeypatch.context() as m:
+        m.setattr(rasterio.vrt, 'WarpedVRT', RecordingWarpedVRT)
+        data = RasterDriver._get_raster_tile(
+            str(raster_file), tile_bounds=tile_bounds, tile_size=tile_size,
+            reprojection_method='nearest', resampling_method='nearest'
+        )
+
+    # only the part of the tile covered by the dataset is warped
+    assert len(vrt_shapes) == 1
+    assert vrt_shapes[0][0] * vrt_shapes[0][1] < 0.5 * tile_size[0] * tile_size[1]
+
+    # the warper approximates the transformation, so pixels at the edges may differ slightly
+    assert data.shape == tile_size
+    assert np.mean(data.mask != expected_mask) < 1e-3
+
+    valid = ~data.mask & ~expected_mask
+    assert np.mean(data.data[valid] != expected_data[valid]) < 1e-3
+
+
+def test_raster_retrieval_warp_options(raster_file, monkeypatch):
+    import rasterio.vrt
+    from terracotta import update_settings
+    from terracotta.drivers.raster_base import RasterDriver
+
+    update_settings(
+        WARP_NUM_THREADS=0, WARP_ERROR_THRESHOLD=0.5, WARP_MEMORY_LIMIT=1024 * 1024 * 10 + 1,
+        WARP_EXTRA_OPTIONS={'UNIFIED_SRC_NODATA': 'YES'}
+    )
+
+    warp_kwargs = []
+
+    class RecordingWarpedVRT(rasterio.vrt.WarpedVRT):
+        def __init__(self, *args, **kwargs):
+            warp_kwargs.append(kwargs)
+            super().__init__(*args, **kwargs)
+
+    with monkeypatch.context() as m:
+        m.setattr(rasterio.vrt, 'WarpedVRT', RecordingWarpedVRT)
+        data = RasterDriver._get_raster_tile(
+            str(raster_file), reprojection_method='nearest', resampling_method='nearest',
+            warp_options=RasterDriver._get_warp_options()
+        )
+
+    assert data.shape == (256, 256)
+    assert len(warp_kwargs) == 1
+    assert warp_kwargs[0]['NUM_THREADS'] == 'ALL_CPUS'
+    assert warp_kwargs[0]['tolerance'] == 0.5
+    assert warp_kwargs[0]['warp_mem_limit'] == 11
+    assert warp_kwargs[0]['UNIFIED_SRC_NODATA'] == 'YES'
+
+
+@pytest.mark.parametrize('resampling_method', ['nearest', 'average'])
+def test_raster_retrieval_numpy_reader(raster_file_mercator_aligned, resampling_method,
+                                       monkeypatch):
+    import mercantile
+    import terracotta
+    from terracotta.drivers.raster_base import RasterDriver
+
+    georef = RasterDriver._compute_georeference_from_file(str(raster_file_mercator_aligned))
+    tile_args = dict(
+        reprojection_method='nearest', resampling_method=resampling_method, georeference=georef
+    )
+
+    def throw(*args, **kwargs):
+        raise AssertionError('file should not be opened through GDAL')
+
+    tile = mercantile.tile(10, 50, 14)
+
+    # zoom 14 is full resolution, 12 and 13 are overviews
+    for aligned_tile in (mercantile.parent(tile, zoom=12), mercantile.parent(tile), tile):
+        tile_bounds = mercantile.xy_bounds(aligned_tile)
+        expected = RasterDriver._get_raster_tile(
+            str(raster_file_mercator_aligned), tile_bounds=tile_bounds, **tile_args
+        )
+
+        with monkeypatch.context() as m:
+            m.setattr(terracotta.drivers.raster_base, 'get_dataset_pool', throw)
+            data = RasterDriver._get_raster_tile(
+                str(raster_file_mercator_aligned), tile_bounds=tile_bounds, numpy_reader=True,
+                **tile_args
+            )
+
+        np.testing.assert_array_equal(data.mask, expected.mask)
+        np.testing.assert_array_equal(data.data, expected.data)
+
+    # tiles that do not line up with the file are read through GDAL
+    for tile_bounds in (mercantile.xy_bounds(mercantile.parent(tile, zoom=11)),
+                        mercantile.xy_bounds(mercantile.children(tile)[0])):
+        expected = RasterDriver._get_raster_tile(
+            str(raster_file_mercator_aligned), tile_bounds=tile_bounds, **tile_args
+        )
+        data = RasterDriver._get_raster_tile(
+            str(raster_file_mercator_aligned), tile_bounds=tile_bounds, numpy_reader=True,
+            **tile_args
+        )
+        np.testing.assert_array_equal(data.mask, expected.mask)
+        np.testing.assert_array_equal(data.data, expected.data)
+
+
+def test_get_cog_reader(raster_file_mercator_aligned, tmpdir):
+    import os
+    import shutil
+    from terracotta.drivers import raster_base
+
+    raster_copy = str(tmpdir.join('img.tif'))
+    shutil.copy(str(raster_file_mercator_aligned), raster_copy)
+
+    reader = raster_base.get_cog_reader(raster_copy)
+    assert reader is not None
+    assert raster_base.get_cog_reader(raster_copy) is reader
+
+    # modifying the file invalidates the reader
+    stat = os.stat(raster_copy)
+    os.utime(raster_copy, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert raster_base.get_cog_reader(raster_copy) is not reader
+
+    # unsupported files are read through GDAL
+    assert raster_base.get_cog_reader(str(tmpdir.join('nonexisting.tif'))) is None
+    assert raster_base.get_cog_reader('ftp://foo/bar.tif') is None
+
+    invalid_file = tmpdir.join('invalid.tif')
+    invalid_file.write('not a tiff')
+    assert raster_base.get_cog_reader(str(invalid_file)) is None
+
+
+def test_raster_retrieval_block_cache(raster_file_mercator_aligned):
+    import mercantile
+    from terracotta import update_settings
+    from terracotta.drivers.raster_base import RasterDriver
+
+    # start with an empty cache
+    update_settings(RASTER_BLOCK_CACHE_SIZE=10 * 1024 * 1024 + 1)
+
+    georef = RasterDriver._compute_georeference_from_file(str(raster_file_mercator_aligned))
+    tile = mercantile.tile(10, 50, 14)
+
+    # same tile with different settings, and parent tile at the same resolution
+    for tile_bounds, tile_size, resampling_method in [
+        (mercantile.xy_bounds(tile), (256, 256), 'nearest'),
+        (mercantile.xy_bounds(tile), (256, 256), 'average'),
+        (mercantile.xy_bounds(mercantile.parent(tile)), (512, 512), 'nearest'),
+    ]:
+        RasterDriver._get_raster_tile(
+            str(raster_file_mercator_aligned), tile_bounds=tile_bounds, tile_size=tile_size,
+            reprojection_method='nearest', resampling_method=resampling_method,
+            georeference=georef, numpy_reader=True
+        )
+
+    # tile covers 4 blocks, parent covers 6 (including those 4)
+    stats = RasterDriver.get_block_cache_stats()
+    assert stats['misses'] == 6
+    assert stats['hits'] == 8
+    assert stats['hit_bytes'] == 8 * 256 * 256 * 2
+    assert stats['maxsize'] == 10 * 1024 * 1024 + 1
+
+    update_settings(RASTER_BLOCK_CACHE_SIZE=0)
+    assert RasterDriver.get_block_cache_stats()['maxsize'] == 0
+
+
+def test_raster_retrieval_remote(raster_file_mercator_aligned, range_server, tmpdir,
+                                 monkeypatch):
+    import shutil
+    import mercantile
+    import terracotta
+    from terracotta import update_settings
+    from terracotta.drivers.raster_base import RasterDriver
+
+    base_url, serve_dir, requests = range_server
+    shutil.copy(str(raster_file_mercator_aligned), str(serve_dir.join('img.tif')))
+    update_settings(REMOTE_RASTER_CACHE_DIR=str(tmpdir.mkdir('cache')))
+
+    georef = RasterDriver._compute_georeference_from_file(str(raster_file_mercator_aligned))
+    tile_args = dict(
+        tile_bounds=mercantile.xy_bounds(mercantile.tile(10, 50, 14)),
+        reprojection_method='nearest', resampling_method='nearest', georeference=georef
+    )
+    expected = RasterDriver._get_raster_tile(str(raster_file_mercator_aligned), **tile_args)
+
+    def throw(*args, **kwargs):
+        raise AssertionError('file should not be opened through GDAL')
+
+    with monkeypatch.context() as m:
+        m.setattr(terracotta.drivers.raster_base, 'get_dataset_pool', throw)
+        data = RasterDriver._get_raster_tile(
+            f'{base_url}/img.tif', numpy_reader=True, **tile_args
+        )
+        num_requests = len(requests)
+
+        # second read is served from cache
+        RasterDriver._get_raster_tile(f'/vsicurl/{base_url}/img.tif', numpy_reader=True,
+                                      **tile_args)
+        assert len(requests) == num_requests
+
+    np.testing.assert_array_equal(data.mask, expected.mask)
+    np.testing.assert_array_equal(data.data, expected.data)
+
+    stats = RasterDriver.get_remote_cache_stats()
+    assert stats['requests'] == num_requests
+    assert stats['memory_hits'] > 0
+
+
+def test_remote_cache_without_numpy_reader(tmpdir):
+    import warnings
+    from terracotta import drivers, exceptions, update_settings
+
+    # defaults do not warn
+    drivers.get_driver(str(tmpdir.join('default.sqlite')), provider='sqlite')
+
+    update_settings(REMOTE_RASTER_CACHE_MEMORY_SIZE=0)
+    with pytest.warns(exceptions.PerformanceWarning, match='REMOTE_RASTER_CACHE_MEMORY_SIZE'):
+        drivers.get_driver(str(tmpdir.join('unused-cache.sqlite')), provider='sqlite')
+
+    update_settings(RASTER_NUMPY_READER=True)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        drivers.get_driver(str(tmpdir.join('numpy-reader.sqlite')), provider='sqlite')
+
+
+def test_dataset_handle_pool(raster_file, tmpdir, monkeypatch):
+    import os
+    import shutil
+    from terracotta.drivers import raster_base
+
+    raster_copy = str(tmpdir.join('img.tif'))
+    shutil.copy(str(raster_file), raster_copy)
+
+    open_calls = []
+    original_open = rasterio.open
+
+    def counting_open(*args, **kwargs):
+        open_calls.append(args[0])
+        return original_open(*args, **kwargs)
+
+    pool = raster_base.DatasetHandlePool(maxsize=1, env_options={})
+
+    with monkeypatch.context() as m:
+        m.setattr(rasterio, 'open', counting_open)
+
+        with pool.open(raster_copy) as src1:
+            pass
+        with pool.open(raster_copy) as src2:
+            pass
+
+        assert src1 is src2
+        assert not src1.closed
+        assert len(open_calls) == 1
+
+        # modifying the file invalidates the handle
+        stat = os.stat(raster_copy)
+        os.utime(raster_copy, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        with pool.open(raster_copy) as src3:
+            pass
+
+        assert src3 is not src1
+        assert src1.closed
+        assert len(open_calls) == 2
+
+        # opening another file evicts the least recently used handle
+        with pool.open(str(raster_file)) as src4:
+            pass
+
+        assert src3.closed
+        assert not src4.closed
+        assert len(pool) == 1
+
+    pool.close()
+    assert src4.closed
+    assert len(pool) == 0
+
+
+def test_dataset_handle_pool_disabled(raster_file):
+    from terracotta.drivers import raster_base
+
+    pool = raster_base.DatasetHandlePool(maxsize=0, env_options={})
+
+    with pool.open(str(raster_file)) as src:
+        assert not src.closed
+
+    assert src.closed
+    assert len(pool) == 0
+    pool.close()
+
+
+def test_dataset_handle_pool_close(raster_file, monkeypatch):
+    from rasterio.env import get_gdal_config
+    from terracotta.drivers import raster_base
+
+    pool = raster_base.DatasetHandlePool(maxsize=1, env_options={'TC_TEST_OPTION': 'foo'})
+    assert get_gdal_config('TC_TEST_OPTION') is None
+
+    # options are only in effect while a dataset is in use
+    with pool.open(str(raster_file)) as src:
+        assert get_gdal_config('TC_TEST_OPTION') == 'foo'
+
+    assert get_gdal_config('TC_TEST_OPTION') is None
+
+    pool.close()
+    assert src.closed
+
+    # closing twice is harmless
+    pool.close()
+
+    # closing pools in any order leaves the environment of the caller intact
+    with rasterio.Env(TC_TEST_OPTION='outer'):
+        for close_order in ((0, 1), (1, 0)):
+            pools = [
+                raster_base.DatasetHandlePool(maxsize=1, env_options={'TC_TEST_OPTION': 'inner'})
+                for _ in range(2)
+            ]
+
+            for pool in pools:
+                with pool.open(str(raster_file)):
+                    assert get_gdal_config('TC_TEST_OPTION') == 'inner'
+
+            for i in close_order:
+                pools[i].close()
+
+            assert rasterio.env.hasenv()
+            assert get_gdal_config('TC_TEST_OPTION') == 'outer'
+
+    # pools inherited from a parent process are closed when replaced
+    with monkeypatch.context() as m:
+        m.setattr(raster_base, '_POOL_STORE', raster_base.threading.local())
+        pool = raster_base.get_dataset_pool()
+
+        with pool.open(str(raster_file)) as src:
+            pass
+
+        raster_base._POOL_STORE.pid = -1
+        new_pool = raster_base.get_dataset_pool()
+
+        assert new_pool is not pool
+        assert src.closed
+
+        new_pool.close()
+
+
 @pytest.mark.parametrize('provider', DRIVERS)
 def test_multiprocessing_fallback(driver_path, provider, raster_file, monkeypatch):
     import concurrent.futures
-    from importlib import reload
     from terracotta import drivers
+    import terracotta.drivers.raster_base
 
     def dummy(*args, **kwargs):
         raise OSError('monkeypatched')
 
     with monkeypatch.context() as m:
-        m.setattr(concurrent.futures, 'ProcessPoolExecutor', dummy)
+        m.setattr(terracotta.drivers.raster_base, 'ProcessPoolExecutor', dummy)
+        m.setattr(terracotta.drivers.raster_base._ExecutorState, 'executor', None)
 
-        import terracotta.drivers.raster_base
-        reload(terracotta.drivers.raster_base)
         db = drivers.get_driver(driver_path, provider=provider)
         keys = ('some', 'keynames')
 
@@ -373,6 +1783,83 @@ def test_multiprocessing_fallback(driver_path, provider, raster_file, monkeypatc
 
         np.testing.assert_array_equal(data1, data2)
 
+        executor = terracotta.drivers.raster_base.get_executor()
+        assert isinstance(executor, concurrent.futures.ThreadPoolExecutor)
+
+
+@pytest.mark.parametrize('executor_type', ['process', 'thread', 'inline'])
+def test_executor_types(tmpdir, raster_file, executor_type):
+    import concurrent.futures
+    import terracotta
+    from terracotta import drivers
+    from terracotta.drivers.raster_base import get_executor, InlineExecutor
+
+    terracotta.update_settings(RASTER_EXECUTOR=executor_type, RASTER_EXECUTOR_WORKERS=2)
+
+    db = drivers.get_driver(str(tmpdir.join('test.sqlite')), provider='sqlite')
+    db.create(('some', 'keynames'))
+    db.insert(['some', 'value'], str(raster_file))
+
+    data = db.get_raster_tile(['some', 'value'], tile_size=(256, 256))
+    assert data.shape == (256, 256)
+
+    expected_type = {
+        'process': concurrent.futures.ProcessPoolExecutor,
+        'thread': concurrent.futures.ThreadPoolExecutor,
+        'inline': InlineExecutor
+    }[executor_type]
+    assert isinstance(get_executor(), expected_type)
+
+
+def test_inline_executor():
+    from terracotta.drivers.raster_base import InlineExecutor
+
+    executor = InlineExecutor()
+    assert executor.submit(sum, [1, 2]).result() == 3
+
+    future = executor.submit(int, 'foo')
+    assert isinstance(future.exception(), ValueError)
+
+
+def test_executor_recycling(monkeypatch):
+    import os
+    import terracotta
+    from terracotta.drivers.raster_base import get_executor
+
+    terracotta.update_settings(
+        RASTER_EXECUTOR='thread', RASTER_EXECUTOR_WORKERS=2, RASTER_EXECUTOR_MAX_TASKS=2
+    )
+
+    executors = [get_executor() for _ in range(5)]
+    assert executors[0] is executors[1] is executors[2] is executors[3]
+    assert executors[4] is not executors[0]
+    assert executors[0]._shutdown
+
+    # changing settings replaces executor
+    terracotta.update_settings(RASTER_EXECUTOR_WORKERS=1)
+    new_executor = get_executor()
+    assert new_executor is not executors[4]
+    assert new_executor._max_workers == 1
+
+    # executors inherited from parent process are not re-used
+    with monkeypatch.context() as m:
+        m.setattr(os, 'getpid', lambda: -1)
+        child_executor = get_executor()
+
+    assert child_executor is not new_executor
+    assert not new_executor._shutdown
+
+
+def test_executor_lazy():
+    import sys
+    import subprocess
+
+    code = (
+        'import terracotta.drivers.raster_base as rb; '
+        'assert rb._ExecutorState.executor is None'
+    )
+    subprocess.run([sys.executable, '-c', code], check=True)
+
 
 @pytest.mark.parametrize('provider', DRIVERS)
 def test_raster_duplicate(driver_path, provider, raster_file):
@@ -426,6 +1913,70 @@ def test_delete_nonexisting(driver_path, provider, raster_file):
         db.delete(dataset)
 
 
+@pytest.mark.parametrize('provider', DRIVERS)
+def test_mosaic(driver_path, provider, mosaic_member_files, raster_file_xyz):
+    import mercantile
+    from terracotta import drivers, exceptions
+    from terracotta.drivers import mosaic
+
+    db = drivers.get_driver(driver_path, provider=provider)
+    db.create(('name',))
+
+    west_file, east_file = mosaic_member_files
+    db.insert(['west'], str(west_file))
+    db.insert(['east'], str(east_file))
+    db.insert_mosaic(['all'], [['west'], ['east']], extra_metadata={'tier': 1})
+
+    assert db.get_datasets()[('all',)] == mosaic.MOSAIC_PATH
+
+    with db.connect():
+        west_meta, east_meta, all_meta = (
+            db.get_metadata([name]) for name in ('west', 'east', 'all')
+        )
+
+    assert all_meta['metadata'] == {'tier': 1}
+    member_bounds = np.array([west_meta['bounds'], east_meta['bounds']])
+    np.testing.assert_allclose(
+        all_meta['bounds'], [*member_bounds[:, :2].min(axis=0), *member_bounds[:, 2:].max(axis=0)]
+    )
+    assert all_meta['range'] == (
+        min(west_meta['range'][0], east_meta['range'][0]),
+        max(west_meta['range'][1], east_meta['range'][1])
+    )
+    assert len(all_meta['percentiles']) == 99
+
+    tile_bounds = mercantile.xy_bounds(*raster_file_xyz)
+    west_tile, east_tile = (
+        db.get_raster_tile([name], tile_bounds=tile_bounds) for name in ('west', 'east')
+    )
+    mosaic_tile = db.get_raster_tile(['all'], tile_bounds=tile_bounds)
+
+    # first valid pixel wins, members fill each other's gaps
+    expected = np.where(~west_tile.mask, west_tile.data, east_tile.data)
+    np.testing.assert_array_equal(mosaic_tile.mask, west_tile.mask & east_tile.mask)
+    np.testing.assert_array_equal(mosaic_tile[~mosaic_tile.mask], expected[~mosaic_tile.mask])
+    assert mosaic_tile.count() > max(west_tile.count(), east_tile.count())
+
+    preview = db.get_raster_tile(['all'], tile_size=(64, 64))
+    assert preview.shape == (64, 64)
+    assert preview.count() > 0
+
+    with pytest.raises(exceptions.TileOutOfBoundsError):
+        db.get_raster_tile(['all'], tile_bounds=mercantile.xy_bounds(0, 0, 10))
+
+    # nested mosaics must not form cycles
+    db.insert_mosaic(['nested'], [['all']])
+    np.testing.assert_array_equal(
+        db.get_raster_tile(['nested'], tile_bounds=tile_bounds), mosaic_tile
+    )
+
+    with pytest.raises(ValueError):
+        db.insert_mosaic(['all'], [['west'], ['nested']])
+
+    db.delete(['all'])
+    assert ('all',) not in db.get_datasets()
+
+
 @pytest.mark.parametrize('provider', DRIVERS)
 def test_nodata_consistency(driver_path, provider, big_raster_file_mask, big_raster_file_nodata):
     from terracotta import drivers
@@ -635,3 +2186,308 @@ def test_compute_metadata_unoptimized(unoptimized_raster_file):
     )
 
     assert geometry_mismatch(shape(mtd['convex_hull']), convex_hull) < 1e-6
+
+
+@pytest.mark.parametrize('provider', DRIVERS)
+def test_prefetch_budget(driver_path, provider, raster_file, raster_file_xyz, monkeypatch):
+    import threading
+    import mercantile
+    from concurrent.futures import ThreadPoolExecutor
+    from terracotta import drivers, update_settings
+    import terracotta.drivers.raster_base
+
+    update_settings(RASTER_EXECUTOR='thread', RASTER_EXECUTOR_WORKERS=8)
+
+    db = drivers.get_driver(driver_path, provider=provider)
+    keys = ('some', 'keynames')
+
+    db.create(keys)
+    db.insert(['some', 'value'], str(raster_file))
+    db.insert(['some', 'other_value'], str(raster_file))
+
+    jobs_released = threading.Event()
+
+    class BlockingExecutor(ThreadPoolExecutor):
+        def submit(self, fn, *args, **kwargs):
+            def blocked_fn(*args, **kwargs):
+                assert jobs_released.wait(10)
+                return fn(*args, **kwargs)
+
+            return super().submit(blocked_fn, *args, **kwargs)
+
+    blocking_executor = BlockingExecutor(8)
+    monkeypatch.setattr(terracotta.drivers.raster_base, 'get_executor', lambda: blocking_executor)
+
+    x, y, z = raster_file_xyz
+    tile_bounds = [
+        mercantile.xy_bounds(mercantile.Tile(x + dx, y, z)) for dx in range(-2, 3)
+    ]
+
+    update_settings(PREFETCH_MAX_PENDING=3, PREFETCH_MAX_PENDING_PER_DATASET=2)
+    num_scheduled = db.prefetch_raster_tiles(
+        [['some', 'value'], ['some', 'other_value']], tile_bounds, tile_size=(64, 64)
+    )
+    assert num_scheduled == 3
+
+    # budget is exhausted until prefetched tiles are done
+    num_scheduled = db.prefetch_raster_tiles([['some', 'value']], tile_bounds, tile_size=(64, 64))
+    assert num_scheduled == 0
+    assert db.get_cache_stats()['prefetched'] == 3
+
+    # requests for prefetched tiles wait for the running retrieval
+    tile = db.get_raster_tile(['some', 'value'], tile_bounds=tile_bounds[0], tile_size=(64, 64),
+                              asynchronous=True)
+    assert db.get_cache_stats()['coalesced'] == 1
+
+    jobs_released.set()
+    assert tile.result().shape == (64, 64)
+    time.sleep(1)  # allow callbacks to finish
+
+    assert db.get_cache_stats()['in_flight'] == 0
+    assert terracotta.drivers.raster_base._PrefetchState.num_pending == 0
+
+
+@pytest.mark.parametrize('provider', DRIVERS)
+def test_prefetch_budget_failed_lookup(driver_path, provider, raster_file, raster_file_xyz,
+                                       monkeypatch):
+    import mercantile
+    from terracotta import drivers, update_settings
+    import terracotta.drivers.raster_base
+
+    update_settings(RASTER_EXECUTOR='thread', RASTER_EXECUTOR_WORKERS=8)
+
+    db = drivers.get_driver(driver_path, provider=provider)
+    keys = ('some', 'keynames')
+
+    db.create(keys)
+    db.insert(['some', 'value'], str(raster_file))
+
+    def failing_lookup(*args, **kwargs):
+        raise RuntimeError('lookup failed')
+
+    monkeypatch.setattr(db, '_find_native_ancestor', failing_lookup)
+
+    prefetch_state = terracotta.drivers.raster_base._PrefetchState
+    num_pending = prefetch_state.num_pending
+    pending_per_dataset = dict(prefetch_state.pending_per_dataset)
+
+    tile_bounds = mercantile.xy_bounds(mercantile.Tile(*raster_file_xyz))
+    num_scheduled = db.prefetch_raster_tiles([['some', 'value']], [tile_bounds],
+                                             tile_size=(64, 64))
+    assert num_scheduled == 0
+
+    assert prefetch_state.num_pending == num_pending
+    assert prefetch_state.pending_per_dataset == pending_per_dataset
+
+
+@pytest.mark.parametrize('provider', DRIVERS)
+def test_prefetch_busy_executor(driver_path, provider, raster_file, raster_file_xyz,
+                                monkeypatch):
+    import mercantile
+    from terracotta import drivers, update_settings
+    import terracotta.drivers.raster_base
+
+    update_settings(RASTER_EXECUTOR='thread', RASTER_EXECUTOR_WORKERS=2)
+    monkeypatch.setattr(terracotta.drivers.raster_base._ExecutorState, 'num_pending', 2)
+
+    db = drivers.get_driver(driver_path, provider=provider)
+    keys = ('some', 'keynames')
+
+    db.create(keys)
+    db.insert(['some', 'value'], str(raster_file))
+
+    tile_bounds = mercantile.xy_bounds(mercantile.Tile(*raster_file_xyz))
+    assert db.prefetch_raster_tiles([['some', 'value']], [tile_bounds]) == 0
+
+    monkeypatch.setattr(terracotta.drivers.raster_base._ExecutorState, 'num_pending', 0)
+    assert db.prefetch_raster_tiles([['some', 'value']], [tile_bounds]) == 1
+
+    time.sleep(1)  # allow prefetch to finish before restoring executor state
+    assert terracotta.drivers.raster_base._ExecutorState.num_pending == 0
+
+
+def test_scheduler_order(monkeypatch):
+    import threading
+    import concurrent.futures
+    from concurrent.futures import ThreadPoolExecutor
+    from terracotta import update_settings
+    import terracotta.drivers.raster_base
+    from terracotta.drivers.raster_base import _InFlightTile, _schedule_job
+    from terracotta.drivers.base import (
+        PRIORITY_INTERACTIVE, PRIORITY_PREVIEW, PRIORITY_PREFETCH
+    )
+
+    update_settings(RASTER_EXECUTOR='thread', RASTER_EXECUTOR_WORKERS=1)
+
+    executor = ThreadPoolExecutor(1)
+    monkeypatch.setattr(terracotta.drivers.raster_base, 'get_executor', lambda: executor)
+    monkeypatch.setattr(terracotta.drivers.raster_base._ExecutorState, 'num_pending', 0)
+    monkeypatch.setattr(terracotta.drivers.raster_base._ExecutorState, 'queue', [])
+
+    first_job_released = threading.Event()
+    started = []
+
+    def make_job(name, block=False):
+        def fun():
+            started.append(name)
+            if block:
+                assert first_job_released.wait(10)
+            return name
+
+        return lambda executor: executor.submit(fun)
+
+    now = time.monotonic()
+    jobs = [
+        ('blocking', PRIORITY_INTERACTIVE, None),
+        ('prefetch', PRIORITY_PREFETCH, None),
+        ('preview', PRIORITY_PREVIEW, None),
+        ('late', PRIORITY_INTERACTIVE, now + 100),
+        ('early', PRIORITY_INTERACTIVE, now + 50),
+        ('expired', PRIORITY_INTERACTIVE, now + 0.1),
+    ]
+
+    futures = {
+        name: _schedule_job(make_job(name, name == 'blocking'), [_InFlightTile(prio, deadline)])
+        for name, prio, deadline in jobs
+    }
+
+    # only one worker, everything else is queued
+    assert started == ['blocking']
+
+    time.sleep(0.2)
+    first_job_released.set()
+
+    for name, future in futures.items():
+        if name == 'expired':
+            with pytest.raises(concurrent.futures.CancelledError):
+                future.result(timeout=10)
+        else:
+            assert future.result(timeout=10) == name
+
+    assert started == ['blocking', 'early', 'late', 'preview', 'prefetch']
+
+
+def test_scheduler_inline_queue(monkeypatch):
+    import sys
+    from terracotta import update_settings
+    import terracotta.drivers.raster_base
+    from terracotta.drivers.raster_base import (
+        InlineExecutor, _InFlightTile, _schedule_job, _dispatch_jobs
+    )
+
+    update_settings(RASTER_EXECUTOR='inline', RASTER_EXECUTOR_WORKERS=1)
+
+    executor = InlineExecutor()
+    monkeypatch.setattr(terracotta.drivers.raster_base, 'get_executor', lambda: executor)
+    monkeypatch.setattr(terracotta.drivers.raster_base._ExecutorState, 'queue', [])
+
+    # queue more jobs than the recursion limit while the only worker is busy
+    num_jobs = sys.getrecursionlimit() * 2
+    monkeypatch.setattr(terracotta.drivers.raster_base._ExecutorState, 'num_pending', 1)
+
+    futures = [
+        _schedule_job(lambda executor, i=i: executor.submit(lambda: i), [_InFlightTile(0, None)])
+        for i in range(num_jobs)
+    ]
+
+    monkeypatch.setattr(terracotta.drivers.raster_base._ExecutorState, 'num_pending', 0)
+    _dispatch_jobs()
+
+    assert [future.result(timeout=0) for future in futures] == list(range(num_jobs))
+    assert terracotta.drivers.raster_base._ExecutorState.num_pending == 0
+
+
+def test_scheduler_drop_expired(monkeypatch):
+    import concurrent.futures
+    from terracotta import update_settings
+    import terracotta.drivers.raster_base
+    from terracotta.drivers.raster_base import _InFlightTile, _schedule_job, executor_is_busy
+
+    update_settings(RASTER_EXECUTOR='thread', RASTER_EXECUTOR_WORKERS=1)
+
+    # the only worker is busy, so jobs stay queued
+    monkeypatch.setattr(terracotta.drivers.raster_base._ExecutorState, 'num_pending', 1)
+    monkeypatch.setattr(terracotta.drivers.raster_base._ExecutorState, 'queue', [])
+
+    def submit(executor):
+        raise AssertionError('job must not start')
+
+    future = _schedule_job(submit, [_InFlightTile(0, time.monotonic() + 0.1)])
+    assert len(terracotta.drivers.raster_base._ExecutorState.queue) == 1
+    assert executor_is_busy()
+
+    time.sleep(0.2)
+
+    # dropped without waiting for the worker
+    monkeypatch.setattr(terracotta.drivers.raster_base._ExecutorState, 'num_pending', 0)
+    assert not executor_is_busy()
+    assert not terracotta.drivers.raster_base._ExecutorState.queue
+
+    with pytest.raises(concurrent.futures.CancelledError):
+        future.result(timeout=0)
+
+
+@pytest.mark.parametrize('provider', DRIVERS)
+def test_raster_deadline(driver_path, provider, raster_file):
+    from terracotta import drivers, exceptions
+
+    db = drivers.get_driver(driver_path, provider=provider)
+    keys = ('some', 'keynames')
+
+    db.create(keys)
+    db.insert(['some', 'value'], str(raster_file))
+
+    with pytest.raises(exceptions.DeadlineExceededError):
+        db.get_raster_tiles(
+            [['some', 'value']], tile_size=(256, 256), deadline=time.monotonic() - 1
+        )
+
+    assert db.get_cache_stats()['in_flight'] == 0
+
+    data = db.get_raster_tiles(
+        [['some', 'value']], tile_size=(256, 256), deadline=time.monotonic() + 100
+    )[0]
+    assert data.shape == (256, 256)
+
+
+@pytest.mark.parametrize('provider', DRIVERS)
+def test_raster_deadline_coalesced(driver_path, provider, raster_file, monkeypatch):
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    from terracotta import drivers, update_settings
+    import terracotta.drivers.raster_base
+    from terracotta.drivers.raster_base import _InFlightTile, _schedule_job
+
+    update_settings(RASTER_EXECUTOR='thread', RASTER_EXECUTOR_WORKERS=1)
+
+    executor = ThreadPoolExecutor(1)
+    monkeypatch.setattr(terracotta.drivers.raster_base, 'get_executor', lambda: executor)
+    monkeypatch.setattr(terracotta.drivers.raster_base._ExecutorState, 'num_pending', 0)
+    monkeypatch.setattr(terracotta.drivers.raster_base._ExecutorState, 'queue', [])
+
+    db = drivers.get_driver(driver_path, provider=provider)
+    keys = ('some', 'keynames')
+
+    db.create(keys)
+    db.insert(['some', 'value'], str(raster_file))
+
+    # occupy the only worker
+    worker_released = threading.Event()
+    _schedule_job(
+        lambda executor: executor.submit(worker_released.wait, 10), [_InFlightTile(0, None)]
+    )
+
+    short_deadline = time.monotonic() + 0.1
+    future1, = db.get_raster_tiles(
+        [['some', 'value']], tile_size=(256, 256), asynchronous=True, deadline=short_deadline
+    )
+    # a second request without deadline keeps the read alive
+    future2, = db.get_raster_tiles(
+        [['some', 'value']], tile_size=(256, 256), asynchronous=True
+    )
+    assert future1 is future2
+
+    time.sleep(0.2)
+    worker_released.set()
+
+    assert future1.result(timeout=10).shape == (256, 256)
@@ -0,0 +1,119 @@
+import gc
+
+import pytest
+import numpy as np
+
+from terracotta.drivers import shared_memory
+
+pytestmark = pytest.mark.skipif(
+    not shared_memory.has_shared_memory,
+    reason='shared memory requires Python 3.8+'
+)
+
+
+@pytest.fixture()
+def allocator():
+    slab = shared_memory.SlabAllocator(1024 * 1024)
+    yield slab
+    slab.close()
+
+
+def test_allocator_reuse(allocator):
+    first = allocator.allocate(1000)
+    second = allocator.allocate(1000)
+    assert first is not None and second is not None
+    assert first[0] + first[1] <= second[0]
+
+    assert allocator.allocate(10 * 1024 * 1024) is None
+
+    allocator.release(*first)
+    assert allocator.allocate(1000) == first
+
+    allocator.release(*first)
+    allocator.release(*second)
+    assert allocator.free_bytes == allocator.size
+    assert allocator.allocate(allocator.size) == (0, allocator.size)
+
+
+def test_pack_roundtrip(allocator):
+    data = np.ma.masked_array(
+        np.arange(100, dtype='float32').reshape(10, 10),
+        mask=np.eye(10, dtype='bool')
+    )
+    result = {(0., 0., 1., 1.): [data, data.astype('uint16')]}
+
+    allocation = allocator.allocate(shared_memory.estimate_size((10, 10), 2))
+    packed = shared_memory.pack_result(result, allocator.name, *allocation)
+    assert all(isinstance(ref, shared_memory.SharedArrayRef) for ref in packed[(0., 0., 1., 1.)])
+
+    unpacked = allocator.unpack(packed, *allocation)
+    for expected, actual in zip(result[(0., 0., 1., 1.)], unpacked[(0., 0., 1., 1.)]):
+        assert actual.dtype == expected.dtype
+        np.testing.assert_array_equal(actual.data, expected.data)
+        np.testing.assert_array_equal(actual.mask, expected.mask)
+
+    # slot is only recycled after all arrays are gone
+    assert allocator.free_bytes == allocator.size - allocation[1]
+    del unpacked, actual
+    gc.collect()
+    assert allocator.free_bytes == allocator.size
+
+
+def test_pack_too_large(allocator):
+    data = np.ma.masked_array(np.ones((10, 10), dtype='complex128'))
+    allocation = allocator.allocate(shared_memory.estimate_size((10, 10), 1))
+
+    packed = shared_memory.pack_result([data], allocator.name, *allocation)
+    assert packed[0] is data
+
+    # unpacking a result without references releases the slot right away
+    allocator.unpack(packed, *allocation)
+    gc.collect()
+    assert allocator.free_bytes == allocator.size
+
+
+def test_raster_retrieval_shared_memory(tmpdir, raster_file):
+    import mmap
+    import terracotta
+    from terracotta import drivers
+
+    terracotta.update_settings(RASTER_EXECUTOR='inline')
+
+    db = drivers.get_driver(str(tmpdir.join('test.sqlite')), provider='sqlite')
+    db.create(('some', 'keynames'))
+    db.insert(['some', 'value'], str(raster_file))
+    expected = db.get_raster_tile(['some', 'value'], tile_size=(256, 256))
+
+    terracotta.update_settings(RASTER_EXECUTOR='process', RASTER_EXECUTOR_WORKERS=1)
+    db._raster_cache.clear()
+
+    data = db.get_raster_tile(['some', 'value'], tile_size=(256, 256))
+    np.testing.assert_array_equal(data, expected)
+    np.testing.assert_array_equal(data.mask, expected.mask)
+
+    # result is a view into shared memory
+    assert isinstance(data.data.base.base, mmap.mmap)
+
+    allocator = shared_memory.get_allocator()
+    assert allocator.free_bytes < allocator.size
+    del data
+    gc.collect()
+    assert allocator.free_bytes == allocator.size
+
+
+def test_raster_retrieval_shared_memory_disabled(tmpdir, raster_file):
+    import mmap
+    import terracotta
+    from terracotta import drivers
+
+    terracotta.update_settings(
+        RASTER_EXECUTOR='process', RASTER_EXECUTOR_WORKERS=1, RASTER_SHARED_MEMORY_SIZE=0
+    )
+
+    db = drivers.get_driver(str(tmpdir.join('test.sqlite')), provider='sqlite')
+    db.create(('some', 'keynames'))
+    db.insert(['some', 'value'], str(raster_file))
+
+    data = db.get_raster_tile(['some', 'value'], tile_size=(256, 256))
+    assert data.shape == (256, 256)
+    assert not isinstance(getattr(data.data.base, 'base', None), mmap.mmap)
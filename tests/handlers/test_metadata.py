@@ -5,3 +5,12 @@ def test_metadata_handler(use_testdb):
     md = metadata.metadata(ds)
     assert md
     assert md['metadata'] == ['extra_data']
+
+
+def test_coverage_handler(use_testdb):
+    from terracotta.handlers import coverage, datasets
+    ds = list(datasets.datasets()[0].values())
+    cov = coverage.coverage(ds)
+    assert list(cov['keys'].values()) == ds
+    assert cov['max_zoom'] > 0
+    assert [level['zoom'] for level in cov['levels']] == list(range(cov['max_zoom'] + 1))
@@ -53,6 +53,23 @@ def test_rgb_out_of_bounds(use_testdb, raster_file):
         assert 'data covers less than' not in str(excinfo.value)
 
 
+def test_rgb_checks_empty_tile_once(use_testdb, raster_file_xyz, monkeypatch):
+    from terracotta import xyz
+    from terracotta.handlers import rgb
+
+    calls = []
+    raise_if_empty_tile = xyz.raise_if_empty_tile
+
+    def count_calls(*args, **kwargs):
+        calls.append(args)
+        return raise_if_empty_tile(*args, **kwargs)
+
+    monkeypatch.setattr(xyz, 'raise_if_empty_tile', count_calls)
+
+    rgb.rgb(['val21', 'x'], ['val22', 'val23', 'val24'], raster_file_xyz)
+    assert len(calls) == 1
+
+
 def test_rgb_lowzoom(use_testdb, raster_file, raster_file_xyz_lowzoom):
     import terracotta
     from terracotta.handlers import rgb
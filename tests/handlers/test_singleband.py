@@ -42,6 +42,28 @@ def test_singleband_out_of_bounds(use_testdb):
             singleband.singleband(keys, (10, 0, 0))
 
 
+def test_singleband_out_of_bounds_cached(use_testdb, testdb, monkeypatch):
+    import terracotta
+    from terracotta.handlers import datasets, singleband
+    ds = datasets.datasets()
+    keys = list(ds[0].values())
+
+    with pytest.raises(terracotta.exceptions.TileOutOfBoundsError):
+        singleband.singleband(keys, (10, 0, 0))
+
+    driver = terracotta.get_driver(testdb)
+
+    def fail():
+        raise AssertionError('database accessed')
+
+    # tile is known to be empty, so it is rejected before connecting
+    with monkeypatch.context() as m:
+        m.setattr(driver, 'connect', fail)
+
+        with pytest.raises(terracotta.exceptions.TileOutOfBoundsError):
+            singleband.singleband(keys, (10, 0, 0))
+
+
 def test_singleband_explicit_colormap(use_testdb, testdb, raster_file_xyz):
     import terracotta
     from terracotta.xyz import get_tile_data
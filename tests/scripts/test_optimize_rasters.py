@@ -71,6 +71,60 @@ def test_optimize_rasters(unoptimized_raster_file, tmpdir, in_memory, reproject,
             np.testing.assert_array_equal(src1.read(), src2.read())
 
 
+def test_optimize_rasters_tile_matrix_set(raster_file_polar, tmpdir):
+    from terracotta.cog import validate
+    from terracotta.scripts import cli
+    from terracotta.tile_matrix import EPSG3031_QUAD
+
+    outfile = tmpdir / raster_file_polar.basename
+
+    runner = CliRunner()
+    result = runner.invoke(cli.cli, [
+        'optimize-rasters', str(raster_file_polar), '-o', str(tmpdir), '-q',
+        '--tile-matrix-set', 'EPSG3031Quad'
+    ])
+
+    assert result.exit_code == 0, format_exception(result)
+    assert validate(str(outfile))
+
+    with rasterio.open(str(outfile)) as src:
+        assert src.crs == rasterio.crs.CRS.from_epsg(3031)
+        res = src.transform.a
+        west, _, _, north = EPSG3031_QUAD.extent
+
+        # aligned to the pixel grid of a zoom level
+        zoom = np.log2((EPSG3031_QUAD.extent[2] - west) / 256 / res)
+        np.testing.assert_allclose(zoom, round(zoom))
+        np.testing.assert_allclose((src.transform.c - west) / res % 1, 0, atol=1e-6)
+        np.testing.assert_allclose((north - src.transform.f) / res % 1, 0, atol=1e-6)
+
+
+def test_optimize_rasters_warp_options(unoptimized_raster_file, tmpdir, monkeypatch):
+    from terracotta import update_settings
+    from terracotta.scripts import cli, optimize_rasters
+
+    update_settings(WARP_NUM_THREADS=2, WARP_ERROR_THRESHOLD=0.25)
+
+    warp_kwargs = []
+
+    class RecordingWarpedVRT(optimize_rasters.WarpedVRT):
+        def __init__(self, *args, **kwargs):
+            warp_kwargs.append(kwargs)
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(optimize_rasters, 'WarpedVRT', RecordingWarpedVRT)
+
+    runner = CliRunner()
+    result = runner.invoke(cli.cli, [
+        'optimize-rasters', str(unoptimized_raster_file), '-o', str(tmpdir), '-q', '--reproject'
+    ])
+
+    assert result.exit_code == 0, format_exception(result)
+    assert len(warp_kwargs) == 1
+    assert warp_kwargs[0]['NUM_THREADS'] == '2'
+    assert warp_kwargs[0]['tolerance'] == 0.25
+
+
 def test_optimize_rasters_small(tiny_raster_file, tmpdir):
     from terracotta.cog import validate
     from terracotta.scripts import cli
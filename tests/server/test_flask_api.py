@@ -44,6 +44,20 @@ def test_get_metadata_nonexisting(client, use_testdb):
     assert rv.status_code == 404
 
 
+def test_get_coverage(client, use_testdb):
+    rv = client.get('/coverage/val11/x/val12/')
+    assert rv.status_code == 200
+
+    payload = json.loads(rv.data)
+    assert payload['keys'] == {'key1': 'val11', 'akey': 'x', 'key2': 'val12'}
+    assert len(payload['levels']) == payload['max_zoom'] + 1
+
+
+def test_get_coverage_nonexisting(client, use_testdb):
+    rv = client.get('/coverage/val11/x/NONEXISTING/')
+    assert rv.status_code == 404
+
+
 def test_get_datasets(client, use_testdb):
     rv = client.get('/datasets')
     assert rv.status_code == 200
@@ -128,6 +142,15 @@ def test_get_singleband_extra_args(client, use_testdb, raster_file_xyz):
     assert np.asarray(img).shape == settings.DEFAULT_TILE_SIZE
 
 
+def test_get_singleband_tile_matrix_set(client, use_testdb, raster_file_xyz):
+    x, y, z = raster_file_xyz
+    rv = client.get(f'/singleband/val11/x/val12/{z}/{x}/{y}.png?tile_matrix_set=WebMercatorQuad')
+    assert rv.status_code == 200
+
+    rv = client.get(f'/singleband/val11/x/val12/{z}/{x}/{y}.png?tile_matrix_set=foo')
+    assert rv.status_code == 400
+
+
 def test_get_singleband_cmap(client, use_testdb, raster_file_xyz):
     import terracotta
     settings = terracotta.get_settings()
@@ -228,6 +251,18 @@ def test_get_singleband_out_of_bounds(client, use_testdb):
     assert np.all(np.asarray(img) == 0)
 
 
+def test_get_singleband_deadline_exceeded(client, use_testdb, raster_file_xyz, monkeypatch):
+    import time
+    import terracotta.xyz
+
+    # tile reads are dropped since deadline passed before they could start
+    monkeypatch.setattr(terracotta.xyz, 'get_deadline', lambda: time.monotonic() - 1)
+
+    x, y, z = raster_file_xyz
+    rv = client.get(f'/singleband/val11/x/val12/{z}/{x}/{y}.png?tile_size=[64,64]')
+    assert rv.status_code == 503
+
+
 def test_get_singleband_unknown_cmap(client, use_testdb, raster_file_xyz):
     x, y, z = raster_file_xyz
     rv = client.get(f'/singleband/val11/x/val12/{z}/{x}/{y}.png?colormap=UNKNOWN')
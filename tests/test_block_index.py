@@ -0,0 +1,50 @@
+import pytest
+import numpy as np
+
+
+def test_block_index_roundtrip():
+    from terracotta.block_index import BlockIndex
+
+    has_data = np.zeros((5, 7), dtype='bool')
+    has_data[0, 0] = has_data[4, 6] = True
+
+    index = BlockIndex.from_bitmap(
+        has_data, shape=(1200, 1700), block_shape=(256, 256),
+        transform=(10., 0., 0., 0., -10., 0.), overviews=[2, 4]
+    )
+    decoded = BlockIndex.from_dict(index.to_dict())
+    assert decoded.shape == index.shape
+    assert decoded.transform == index.transform
+
+    for idx in (index, decoded):
+        assert not idx.is_empty
+        assert idx.window_has_data((0, 10), (0, 10))
+        assert not idx.window_has_data((300, 700), (300, 700))
+        assert idx.window_has_data((1100, 1150), (1600, 1650))
+
+        # windows outside of the raster never have data
+        assert not idx.window_has_data((-100, -10), (0, 10))
+        assert not idx.window_has_data((0, 10), (2000, 2100))
+
+        # coarser levels are conservative
+        assert not idx.window_has_data((300, 500), (300, 500), decimation=1.5)
+        assert idx.window_has_data((300, 500), (300, 500), decimation=2)
+        assert idx.window_has_data((600, 700), (600, 700), decimation=5)
+
+
+def test_block_index_empty():
+    from terracotta.block_index import BlockIndex
+
+    index = BlockIndex.from_bitmap(
+        np.zeros((2, 2), dtype='bool'), shape=(512, 512), block_shape=(256, 256),
+        transform=(1., 0., 0., 0., -1., 0.), overviews=[2]
+    )
+    assert index.is_empty
+    assert not index.window_has_data((0, 512), (0, 512), decimation=100)
+
+
+def test_block_index_invalid():
+    from terracotta.block_index import BlockIndex
+
+    with pytest.raises(ValueError):
+        BlockIndex(shape=(1, 1), block_shape=(1, 1), transform=(1, 0, 0, 0, -1, 0), levels={})
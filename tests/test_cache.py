@@ -1,5 +1,6 @@
 import zlib
 
+import pytest
 import numpy as np
 
 
@@ -9,4 +10,269 @@ def test_get_size():
     data = zlib.compress(np.ones(tile_shape), 9)
     mask = zlib.compress(np.zeros(tile_shape), 9)
     size = CompressedLFUCache._get_size((data, mask, 'float64', tile_shape))
-    assert 1450 < size < 1550
+    # includes the tuple itself
+    assert 1500 < size < 1600
+
+
+def test_compressed_cache_stats():
+    from terracotta.cache import CompressedLFUCache
+
+    tile = np.ma.masked_array(np.random.uniform(size=(256, 256)), mask=np.zeros((256, 256)))
+    # fits two uncompressed tiles (512 kB data and 8 kB mask each)
+    maxsize = 2 * 530 * 1024
+    cache = CompressedLFUCache(maxsize, compression_level=1, codec='none')
+
+    with pytest.raises(KeyError):
+        cache['a']
+
+    cache['a'] = tile
+    cache['b'] = tile
+    cache['a']
+
+    cache['c'] = tile
+    assert 'b' not in cache
+
+    with pytest.raises(ValueError):
+        cache['d'] = np.ma.masked_array(np.ones((1024, 1024)))
+
+    stats = cache.get_stats()
+    assert stats['compress_time'] > 0
+    assert stats['decompress_time'] > 0
+    assert stats['size'] == cache.currsize
+    assert 2 * 520 * 1024 < stats['size'] < maxsize
+    assert {
+        key: stats[key] for key in ('inserts', 'evictions', 'rejected', 'entries', 'maxsize')
+    } == dict(inserts=3, evictions=1, rejected=1, entries=2, maxsize=maxsize)
+
+
+def test_get_allocated_size():
+    import sys
+    from terracotta.cache import _get_allocated_size
+
+    # small objects are rounded up to the alignment of the Python allocator
+    assert _get_allocated_size(b'x') == 48
+    # large objects come from the system allocator
+    large_bytes = b'x' * 1001
+    assert _get_allocated_size(large_bytes) == sys.getsizeof(large_bytes)
+
+    # shared objects are not counted
+    assert _get_allocated_size((None, True, 1, 'band', int)) == _get_allocated_size((0,) * 5)
+
+
+@pytest.mark.parametrize('policy', ['lfu', 'tinylfu'])
+def test_compressed_cache_memory_accounting(policy):
+    import sys
+    import cachetools
+    import cachetools.keys
+    from terracotta.cache import CompressedLFUCache, _get_allocated_size, _get_item_size
+
+    data = np.arange(256 * 256, dtype='float32').reshape(256, 256) % 100
+    tile = np.ma.masked_array(data, mask=data > 90)
+    key = cachetools.keys.hashkey(
+        path='/data/img.tif', band=1, tile_bounds=(0., 0., 1., 1.),
+        tile_size=(256, 256), resampling_method='average'
+    )
+
+    overhead = {}
+    for codec in ('none', 'zlib'):
+        cache = CompressedLFUCache(
+            1024 * 1024 * 1024, compression_level=6, codec=codec, policy=policy
+        )
+        cache[key] = tile
+        data_b, mask_b, *_ = cachetools.Cache.__getitem__(cache, key)
+        assert len(data_b) > 512
+
+        # compressed data is counted by its real size
+        overhead[codec] = (
+            cache.currsize - sys.getsizeof(data_b) - _get_allocated_size(mask_b)
+        )
+
+    assert overhead['none'] == overhead['zlib']
+
+    # bookkeeping is at least the key and one slot in the dictionaries of values and sizes
+    min_overhead = _get_allocated_size(key) + 2 * _get_item_size(dict)
+    assert min_overhead < overhead['none'] < min_overhead + 1024
+
+
+@pytest.mark.parametrize('compression_filter', ['none', 'shuffle', 'delta'])
+@pytest.mark.parametrize('codec', ['none', 'zlib', 'lz4', 'zstd'])
+@pytest.mark.parametrize('dtype', ['uint8', 'int16', '>i4', 'float32', 'float64', 'bool'])
+def test_compressed_cache_roundtrip(codec, compression_filter, dtype):
+    from terracotta.cache import CODECS, CompressedLFUCache
+
+    if codec not in CODECS:
+        pytest.skip(f'{codec} is not installed')
+
+    cache = CompressedLFUCache(
+        10 * 1024 * 1024, compression_level=3, codec=codec, compression_filter=compression_filter
+    )
+
+    np.random.seed(0)
+    data = np.random.uniform(-1000, 1000, size=(256, 256)).astype(dtype)
+    mask = np.random.uniform(size=data.shape) > 0.9
+    cache['tile'] = np.ma.masked_array(data, mask=mask)
+
+    out = cache['tile']
+    assert out.dtype == data.dtype
+    np.testing.assert_array_equal(out.data, data)
+    np.testing.assert_array_equal(out.mask, mask)
+
+    cache['unmasked'] = np.ma.masked_array(data)
+    assert not cache['unmasked'].mask.any()
+
+
+def test_compressed_cache_unavailable_codec(monkeypatch):
+    from terracotta import cache, exceptions
+
+    monkeypatch.delitem(cache.CODECS, 'zstd', raising=False)
+
+    with pytest.warns(exceptions.PerformanceWarning):
+        compressed_cache = cache.CompressedLFUCache(1024, compression_level=9, codec='zstd')
+
+    assert compressed_cache.codec == 'zlib'
+
+    with pytest.raises(ValueError):
+        cache.CompressedLFUCache(1024, compression_level=9, compression_filter='foo')
+
+
+def test_lfu_policy():
+    from terracotta.cache import LFUPolicy
+
+    policy = LFUPolicy(100)
+    for key in 'abc':
+        policy.add(key, 1)
+
+    policy.access('a')
+    policy.access('c')
+    assert policy.victim() == 'b'
+
+    policy.remove('b')
+    # least recently used on ties
+    assert policy.victim() == 'a'
+
+    policy.access('a')
+    assert policy.victim() == 'c'
+
+
+def _replay(policy, num_entries, requests):
+    # return whether each request hits a cache with entries of 1 byte
+    from terracotta.cache import POLICIES
+
+    cache = POLICIES[policy](num_entries)
+    resident = set()
+    hits = []
+
+    for key in requests:
+        cache.access(key)
+        hits.append(key in resident)
+
+        if key in resident:
+            continue
+
+        if len(resident) >= num_entries:
+            victim = cache.victim()
+            cache.remove(victim)
+            resident.remove(victim)
+
+        cache.add(key, 1)
+        resident.add(key)
+
+    return hits
+
+
+def test_tinylfu_policy_scan_resistance():
+    np.random.seed(0)
+    hot_set = [f'hot-{i}' for i in range(50)]
+    requests = [hot_set[i] for i in np.random.randint(0, 50, size=2000)]
+
+    # interleave a scan over many tiles that are requested once
+    for i in range(5000):
+        requests.insert(1000 + 2 * i, f'scan-{i}')
+
+    # hot tiles are still cached after the scan
+    requests.extend(hot_set[i] for i in np.random.randint(0, 50, size=500))
+    hits = _replay('tinylfu', 100, requests)
+    assert np.mean(hits[-500:]) > 0.99
+
+
+def test_tinylfu_policy_aging():
+    np.random.seed(0)
+    # popularity shifts to a new set of tiles that never becomes as popular as the old one
+    old_requests = [f'old-{i}' for i in np.random.randint(0, 100, size=20000)]
+    new_requests = [f'new-{i}' for i in np.random.randint(0, 100, size=5000)]
+
+    tinylfu_hits = _replay('tinylfu', 100, old_requests + new_requests)
+    lfu_hits = _replay('lfu', 100, old_requests + new_requests)
+
+    # LFU keeps the old tiles, since their use counts never decay
+    assert np.mean(tinylfu_hits[-5000:]) > 0.95
+    assert np.mean(lfu_hits[-5000:]) < 0.1
+
+
+@pytest.mark.parametrize('policy', ['lfu', 'tinylfu'])
+def test_compressed_cache_pinning(policy):
+    from terracotta.cache import CompressedLFUCache
+
+    tile = np.ma.masked_array(np.random.uniform(size=(64, 64)))
+    cache = CompressedLFUCache(4 * 34 * 1024, compression_level=1, codec='none', policy=policy)
+
+    cache['pinned'] = tile
+    assert cache.pin('pinned')
+    assert not cache.pin('missing')
+
+    for i in range(10):
+        cache[i] = tile
+        cache[i]
+
+    assert 'pinned' in cache
+    assert len(cache) == 4
+
+    # pinned tiles take up at most half of the cache
+    cache['other'] = tile
+    assert cache.pin('other')
+    cache['third'] = tile
+    assert not cache.pin('third')
+
+    stats = cache.get_stats()
+    assert stats['pinned'] == 2
+    assert 2 * tile.nbytes < stats['pinned_size'] < cache.maxsize // 2
+
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.currsize == 0
+    assert cache.get_stats()['pinned_size'] == 0
+
+
+def test_compressed_cache_invalid_policy():
+    from terracotta.cache import CompressedLFUCache
+
+    with pytest.raises(ValueError):
+        CompressedLFUCache(1024, compression_level=1, policy='foo')
+
+
+def test_block_cache():
+    from terracotta.cache import BlockCache
+
+    block = np.ones((256, 256), dtype='float32')
+    cache = BlockCache(maxsize=2 * block.nbytes)
+
+    assert cache.get_block('a') is None
+    cache.put_block('a', block)
+    cache.put_block('b', block.copy())
+
+    np.testing.assert_array_equal(cache.get_block('a'), block)
+    assert not cache.get_block('a').flags.writeable
+
+    # least recently used block is evicted
+    cache.put_block('c', block.copy())
+    assert cache.get_block('b') is None
+    assert cache.get_block('a') is not None
+
+    # blocks that are bigger than the whole cache are not stored
+    cache.put_block('d', np.ones((1024, 1024), dtype='float32'))
+    assert cache.get_block('d') is None
+
+    assert cache.get_stats() == dict(
+        hits=3, misses=3, hit_bytes=3 * block.nbytes, evictions=1, blocks=2,
+        size=2 * block.nbytes, maxsize=2 * block.nbytes
+    )
@@ -0,0 +1,203 @@
+import pytest
+import numpy as np
+
+TILE_SIZE = (256, 256)
+
+CREATION_OPTIONS = {
+    'deflate': dict(compress='deflate'),
+    'uncompressed': dict(),
+    'predictor': dict(compress='deflate', predictor=2),
+    'float-nan': dict(compress='deflate', dtype='float32', nodata=float('nan')),
+    'no-nodata': dict(compress='deflate', nodata=None),
+    'sparse': dict(compress='deflate', sparse_ok=True),
+    'multiband-pixel': dict(compress='deflate', count=3, interleave='pixel'),
+    'multiband-band': dict(compress='deflate', count=3, interleave='band'),
+    'bigtiff': dict(compress='deflate', BIGTIFF='YES'),
+    'big-endian': dict(compress='deflate', predictor=2, ENDIANNESS='BIG'),
+}
+
+
+def _aligned_tile():
+    import mercantile
+    return mercantile.tile(10, 50, 14)
+
+
+def write_aligned_raster(path, dtype='int16', count=1, nodata=-999, **creation_options):
+    """Write Web Mercator raster with overviews that lines up with XYZ tiles of zoom 12-14"""
+    import rasterio
+    import mercantile
+    from rasterio.enums import Resampling
+    from rasterio.transform import from_origin
+
+    width, height = 1000, 700
+    tile_bounds = mercantile.xy_bounds(_aligned_tile())
+    res = (tile_bounds.right - tile_bounds.left) / 256
+
+    np.random.seed(0)
+    data = np.random.randint(1, 1000, size=(count, height, width)).astype(dtype)
+    # first block is empty
+    data[:, :260, :300] = nodata if nodata is not None else 0
+
+    profile = dict(
+        driver='GTiff', width=width, height=height, count=count, dtype=dtype, nodata=nodata,
+        crs='epsg:3857', transform=from_origin(
+            tile_bounds.left - 100 * res, tile_bounds.top + 60 * res, res, res
+        ),
+        tiled=True, blockxsize=256, blockysize=256
+    )
+    profile.update(creation_options)
+
+    with rasterio.open(str(path), 'w', **profile) as dst:
+        dst.write(data)
+        dst.build_overviews([2, 4], Resampling.nearest)
+
+    return path
+
+
+@pytest.mark.parametrize('resampling', ['nearest', 'average'])
+@pytest.mark.parametrize('options', CREATION_OPTIONS.values(), ids=CREATION_OPTIONS.keys())
+def test_cog_reader_equivalence(tmpdir, options, resampling):
+    import mercantile
+    import rasterio
+    from terracotta.cog_reader import COGReader
+    from terracotta.drivers.raster_base import RasterDriver
+
+    raster_path = write_aligned_raster(tmpdir.join('img.tif'), **options)
+    reader = COGReader(str(raster_path))
+
+    grid_tile = mercantile.parent(_aligned_tile(), zoom=12)
+    tiles = [grid_tile, *mercantile.children(grid_tile), *mercantile.children(grid_tile, zoom=14)]
+
+    with rasterio.open(str(raster_path)) as src:
+        bands = list(range(1, src.count + 1))
+
+        for tile in tiles:
+            tile_bounds = tuple(mercantile.xy_bounds(tile))
+            data = reader.read(bands, tile_bounds, TILE_SIZE)
+            expected = RasterDriver._read_direct(
+                src, bands=bands, tile_bounds=tile_bounds, tile_size=TILE_SIZE,
+                resampling=RasterDriver._get_resampling_enum(resampling)
+            )
+
+            assert len(data) == len(expected)
+            for band_data, expected_data in zip(data, expected):
+                assert band_data.dtype == expected_data.dtype
+                np.testing.assert_array_equal(band_data.mask, expected_data.mask)
+                np.testing.assert_array_equal(band_data.data, expected_data.data)
+
+
+def test_cog_reader_unaligned(tmpdir):
+    import mercantile
+    from terracotta.cog_reader import COGReader
+
+    raster_path = write_aligned_raster(tmpdir.join('img.tif'), compress='deflate')
+    reader = COGReader(str(raster_path))
+
+    tile = _aligned_tile()
+    assert reader.read([1], mercantile.xy_bounds(tile), TILE_SIZE) is not None
+
+    # no overview for zoom 11
+    parent_bounds = mercantile.xy_bounds(mercantile.parent(tile, zoom=11))
+    assert reader.read([1], parent_bounds, TILE_SIZE) is None
+
+    # finer than full resolution
+    assert reader.read([1], mercantile.xy_bounds(tile), (512, 512)) is None
+
+    # shifted by half a pixel
+    west, south, east, north = mercantile.xy_bounds(tile)
+    shift = (east - west) / 512
+    assert reader.read([1], (west + shift, south, east + shift, north), TILE_SIZE) is None
+
+    with pytest.raises(IndexError):
+        reader.read([2], mercantile.xy_bounds(tile), TILE_SIZE)
+
+
+def test_cog_reader_zstd(tmpdir):
+    pytest.importorskip('zstandard')
+
+    import mercantile
+    import rasterio
+    from terracotta.cog_reader import COGReader
+
+    raster_path = write_aligned_raster(tmpdir.join('img.tif'), compress='zstd')
+    tile_bounds = mercantile.xy_bounds(_aligned_tile())
+
+    data = COGReader(str(raster_path)).read([1], tile_bounds, TILE_SIZE)[0]
+
+    with rasterio.open(str(raster_path)) as src:
+        window = rasterio.windows.from_bounds(*tile_bounds, transform=src.transform)
+        expected = src.read(1, window=window.round_offsets().round_lengths(), boundless=True)
+
+    np.testing.assert_array_equal(data.data[~data.mask], expected[~data.mask])
+
+
+@pytest.mark.parametrize('options', [
+    dict(compress='lzw'),
+    dict(compress='deflate', predictor=3, dtype='float32'),
+    dict(tiled=False),
+], ids=['lzw', 'float-predictor', 'striped'])
+def test_cog_reader_unsupported(tmpdir, options):
+    from terracotta.cog_reader import COGReader
+
+    raster_path = write_aligned_raster(tmpdir.join('img.tif'), **options)
+
+    with pytest.raises(ValueError):
+        COGReader(str(raster_path))
+
+
+def test_cog_reader_unsupported_mask(tmpdir):
+    import rasterio
+    from terracotta.cog_reader import COGReader
+
+    raster_path = write_aligned_raster(tmpdir.join('img.tif'), compress='deflate', nodata=None)
+
+    with rasterio.Env(GDAL_TIFF_INTERNAL_MASK=True):
+        with rasterio.open(str(raster_path), 'r+') as dst:
+            dst.write_mask(np.full((dst.height, dst.width), 255, dtype='uint8'))
+
+    with pytest.raises(ValueError):
+        COGReader(str(raster_path))
+
+
+def test_cog_reader_invalid(tmpdir):
+    from terracotta.cog_reader import COGReader
+
+    invalid_file = tmpdir.join('img.tif')
+    invalid_file.write('not a tiff')
+
+    with pytest.raises(ValueError):
+        COGReader(str(invalid_file))
+
+
+def test_cog_reader_block_cache(tmpdir):
+    import mercantile
+    from terracotta.cache import BlockCache
+    from terracotta.cog_reader import COGReader
+
+    raster_path = write_aligned_raster(tmpdir.join('img.tif'), compress='deflate', count=3)
+    block_cache = BlockCache(maxsize=10 * 1024 * 1024)
+    reader = COGReader(str(raster_path), block_cache=block_cache)
+
+    tile = _aligned_tile()
+    neighbor = mercantile.Tile(tile.x + 1, tile.y, tile.z)
+
+    # tile covers 4 blocks, neighbor shares 2 of them
+    expected = COGReader(str(raster_path)).read([1], mercantile.xy_bounds(tile), TILE_SIZE)
+    data = reader.read([1], mercantile.xy_bounds(tile), TILE_SIZE)
+    np.testing.assert_array_equal(data[0], expected[0])
+    assert block_cache.get_stats()['misses'] == 4
+
+    reader.read([1], mercantile.xy_bounds(neighbor), TILE_SIZE)
+    assert block_cache.get_stats()['misses'] == 6
+    assert block_cache.get_stats()['hits'] == 2
+
+    # other bands of interleaved blocks are cached, too
+    data = reader.read([3, 2], mercantile.xy_bounds(tile), TILE_SIZE)
+    expected = COGReader(str(raster_path)).read([3, 2], mercantile.xy_bounds(tile), TILE_SIZE)
+    for band_data, expected_data in zip(data, expected):
+        np.testing.assert_array_equal(band_data, expected_data)
+
+    stats = block_cache.get_stats()
+    assert stats['misses'] == 6
+    assert stats['hits'] == 6
+    assert stats['hit_bytes'] == 6 * 256 * 256 * 3 * 2
@@ -25,6 +25,14 @@ def test_env_config(monkeypatch):
         m.setenv('TC_DEFAULT_TILE_SIZE', json.dumps([1, 2]))
         assert config.parse_config().DEFAULT_TILE_SIZE == (1, 2)
 
+    with monkeypatch.context() as m:
+        m.setenv('TC_WARP_EXTRA_OPTIONS', json.dumps({'SRC_ALPHA_MAX': '1'}))
+        assert config.parse_config().WARP_EXTRA_OPTIONS == {'SRC_ALPHA_MAX': '1'}
+
+    with monkeypatch.context() as m:
+        m.setenv('TC_RASTER_CACHE_PINNED_DATASETS', json.dumps([['a', 'b'], ['c']]))
+        assert config.parse_config().RASTER_CACHE_PINNED_DATASETS == [['a', 'b'], ['c']]
+
 
 def test_env_config_invalid(monkeypatch):
     from terracotta import config
@@ -44,6 +52,11 @@ def test_env_config_invalid(monkeypatch):
         with pytest.raises(ValueError):
             config.parse_config()
 
+    with monkeypatch.context() as m:
+        m.setenv('TC_WARP_ERROR_THRESHOLD', '0')  # must be positive
+        with pytest.raises(ValueError):
+            config.parse_config()
+
     assert True
 
 
@@ -0,0 +1,83 @@
+import numpy as np
+
+
+def test_tile_coverage_roundtrip():
+    from terracotta.coverage import TileCoverage
+
+    tile_x = np.array([4, 5, 7])
+    tile_y = np.array([2, 2, 3])
+    coverage = TileCoverage.from_tiles(tile_x, tile_y, 3)
+    assert coverage.max_zoom == 3
+
+    decoded = TileCoverage.from_dict(coverage.to_dict())
+
+    for cov in (coverage, decoded):
+        assert cov.tile_has_data(0, 0, 0)
+        assert cov.tile_has_data(1, 0, 1)
+        assert not cov.tile_has_data(0, 0, 1)
+        assert cov.tile_has_data(5, 2, 3)
+        assert not cov.tile_has_data(6, 2, 3)
+        assert not cov.tile_has_data(6, 3, 3)
+        assert not cov.tile_has_data(0, 0, 3)
+
+        # deeper zoom levels are checked against their ancestor
+        assert cov.tile_has_data(14, 6, 4)
+        assert not cov.tile_has_data(12, 6, 4)
+
+
+def _corner_grid(lon_range, lat_range, shape):
+    lon, lat = np.meshgrid(
+        np.linspace(*lon_range, shape[1] + 1),
+        np.linspace(*lat_range, shape[0] + 1)
+    )
+    return lon, lat
+
+
+def test_tile_coverage_from_pixel_corners():
+    import mercantile
+    from terracotta.coverage import TileCoverage
+
+    lon, lat = _corner_grid((10, 20), (50, 40), (100, 100))
+    valid = np.zeros((100, 100), dtype='bool')
+    valid[:50, :50] = True
+
+    coverage = TileCoverage.from_pixel_corners(lon, lat, valid)
+    assert coverage is not None
+    assert coverage.max_zoom > 8
+
+    for zoom in range(coverage.max_zoom + 1):
+        for tile in mercantile.tiles(10, 45, 15, 50, zoom):
+            assert coverage.tile_has_data(*tile)
+
+    # a tile well inside the invalid part
+    assert not coverage.tile_has_data(*mercantile.tile(18, 42, 8))
+
+    valid[...] = False
+    assert TileCoverage.from_pixel_corners(lon, lat, valid) is None
+
+
+def test_tile_coverage_antimeridian():
+    import mercantile
+    from terracotta.coverage import TileCoverage
+
+    lon, lat = _corner_grid((175, 185), (10, 0), (10, 10))
+    lon[lon > 180] -= 360
+    valid = np.ones((10, 10), dtype='bool')
+
+    coverage = TileCoverage.from_pixel_corners(lon, lat, valid)
+    assert coverage.max_zoom >= 5
+
+    assert coverage.tile_has_data(*mercantile.tile(179, 5, 5))
+    assert coverage.tile_has_data(*mercantile.tile(-179, 5, 5))
+    assert not coverage.tile_has_data(*mercantile.tile(0, 5, 5))
+
+
+def test_tile_coverage_max_tiles():
+    from terracotta.coverage import TileCoverage
+
+    lon, lat = _corner_grid((-10, 10), (10, -10), (1000, 1000))
+    valid = np.ones((1000, 1000), dtype='bool')
+
+    coverage = TileCoverage.from_pixel_corners(lon, lat, valid, max_tiles=100)
+    (_, _, width, height), _ = coverage._levels[coverage.max_zoom]
+    assert width * height <= 100
@@ -105,3 +105,16 @@ def test_label_invalid():
     with pytest.raises(ValueError) as exc:
         image.label(data, list(range(1000)))
     assert 'more than 255 labels' in str(exc.value)
+
+
+def test_empty_image():
+    from terracotta import image
+
+    img1 = image.empty_image((32, 16))
+    img2 = image.empty_image((32, 16))
+    assert img1 is not img2
+    assert img1.read() == img2.read()
+
+    out_data = np.asarray(Image.open(image.empty_image((32, 16))).convert('RGBA'))
+    assert out_data.shape == (16, 32, 4)
+    assert np.all(out_data[..., -1] == 0)
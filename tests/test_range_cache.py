@@ -0,0 +1,223 @@
+import pytest
+
+
+def test_range_cache_tiers(tmpdir):
+    from terracotta.range_cache import RangeCache
+
+    cache = RangeCache(memory_size=10, disk_dir=str(tmpdir), disk_size=1000)
+    assert cache.get('foo', 1) is None
+
+    cache.put('foo', 1, b'0123456789')
+    assert cache.get('foo', 1) == b'0123456789'
+    assert cache.get_stats()['memory_hits'] == 1
+
+    # evicts first chunk from memory
+    cache.put('foo', 2, b'abcdefghij')
+    assert cache.get('foo', 1) == b'0123456789'
+    assert cache.get_stats()['disk_hits'] == 1
+
+    # headers are pinned in memory
+    cache.put('foo', 0, b'header' * 10)
+    assert cache.get('foo', 0) == b'header' * 10
+    assert cache.get_stats()['disk_hits'] == 1
+
+    # disk tier survives restarts
+    other_cache = RangeCache(memory_size=10, disk_dir=str(tmpdir), disk_size=1000)
+    assert other_cache.get('foo', 0) == b'header' * 10
+    assert other_cache.get('foo', 2) == b'abcdefghij'
+    assert other_cache.get_stats()['disk_hits'] == 2
+
+
+def test_range_cache_disk_eviction(tmpdir):
+    import os
+    from terracotta.range_cache import RangeCache
+
+    cache = RangeCache(memory_size=0, disk_dir=str(tmpdir), disk_size=25)
+    cache.put('foo', 0, b'header' * 10)
+
+    for chunk_idx in range(1, 5):
+        cache.put('foo', chunk_idx, b'0123456789')
+        # make sure modification times differ
+        os.utime(cache._get_disk_path('foo', chunk_idx), ns=(chunk_idx * 10**9,) * 2)
+
+    # oldest chunks are evicted, but never the header
+    assert cache.get('foo', 0) is not None
+    assert cache.get('foo', 1) is None
+    assert cache.get('foo', 2) is None
+    assert cache.get('foo', 3) == b'0123456789'
+    assert cache.get('foo', 4) == b'0123456789'
+
+
+def test_range_cache_pinned_headers(monkeypatch):
+    from terracotta import range_cache
+
+    monkeypatch.setattr(range_cache, '_MAX_PINNED_HEADERS', 2)
+    cache = range_cache.RangeCache(memory_size=0)
+
+    for file_key in ('foo', 'bar', 'baz'):
+        cache.put(file_key, 0, b'header')
+
+    # headers do not count towards the memory size, but their number is limited
+    assert cache.get('foo', 0) is None
+    assert cache.get('bar', 0) == b'header'
+    assert cache.get('baz', 0) == b'header'
+
+
+def test_range_cache_concurrent_eviction(tmpdir, monkeypatch):
+    import threading
+    from terracotta.range_cache import RangeCache
+
+    cache = RangeCache(memory_size=0, disk_dir=str(tmpdir), disk_size=25)
+    scan_started, scan_done = threading.Event(), threading.Event()
+    evict_disk = cache._evict_disk
+
+    def slow_evict_disk():
+        scan_started.set()
+        assert scan_done.wait(timeout=10)
+        return evict_disk()
+
+    monkeypatch.setattr(cache, '_evict_disk', slow_evict_disk)
+
+    # first write scans the cache directory, since disk usage is unknown
+    writer = threading.Thread(target=cache.put, args=('foo', 1, b'0123456789'))
+    writer.start()
+    assert scan_started.wait(timeout=10)
+
+    # cache stays usable during the scan, without starting another one
+    scan_started.clear()
+    cache.put('foo', 2, b'0123456789')
+    assert cache.get('foo', 2) == b'0123456789'
+    assert not scan_started.is_set()
+
+    scan_done.set()
+    writer.join(timeout=10)
+    assert not writer.is_alive()
+    assert cache._disk_usage == 20
+
+
+def test_remote_file_coalescing(range_server):
+    import os
+    from terracotta.range_cache import CHUNK_SIZE, RangeCache, RemoteFile, get_fetcher
+
+    base_url, serve_dir, requests = range_server
+    content = os.urandom(10 * CHUNK_SIZE + 100)
+    serve_dir.join('file.bin').write_binary(content)
+
+    url = f'{base_url}/file.bin'
+    remote_file = RemoteFile(url, get_fetcher(url), RangeCache(memory_size=100 * CHUNK_SIZE))
+
+    # chunks 1-3 and 7
+    ranges = [(CHUNK_SIZE + 10, 100), (2 * CHUNK_SIZE - 5, 2 * CHUNK_SIZE), (7 * CHUNK_SIZE, 1)]
+    data = remote_file.read_ranges(ranges)
+    assert data == [content[offset:offset + size] for offset, size in ranges]
+    assert [header for _, header in requests] == [
+        f'bytes={CHUNK_SIZE}-{4 * CHUNK_SIZE - 1}',
+        f'bytes={7 * CHUNK_SIZE}-{8 * CHUNK_SIZE - 1}',
+    ]
+
+    # only chunks 4 and 5 are missing
+    data = remote_file.read(3 * CHUNK_SIZE, 3 * CHUNK_SIZE)
+    assert data == content[3 * CHUNK_SIZE:6 * CHUNK_SIZE]
+    assert requests[-1][1] == f'bytes={4 * CHUNK_SIZE}-{6 * CHUNK_SIZE - 1}'
+    assert len(requests) == 3
+
+    # last chunk is shorter
+    assert remote_file.read(10 * CHUNK_SIZE, 1000) == content[10 * CHUNK_SIZE:]
+
+
+def test_remote_file_past_eof(tmpdir):
+    import os
+    from terracotta.range_cache import CHUNK_SIZE, RangeCache, RemoteFile
+
+    content = os.urandom(CHUNK_SIZE + 100)
+    requests = []
+
+    def fetch(start, stop):
+        requests.append((start, stop))
+        return content[start:stop]
+
+    cache = RangeCache(memory_size=0, disk_dir=str(tmpdir), disk_size=100 * CHUNK_SIZE)
+    remote_file = RemoteFile('https://example.com/file.bin', fetch, cache)
+
+    assert remote_file.read(CHUNK_SIZE, 3 * CHUNK_SIZE) == content[CHUNK_SIZE:]
+    assert len(requests) == 1
+
+    # empty chunks past the end of the file are not cached
+    assert cache.get(remote_file._file_key, 1) == content[CHUNK_SIZE:]
+    assert not os.path.exists(cache._get_disk_path(remote_file._file_key, 2))
+    assert remote_file.read(2 * CHUNK_SIZE, 10) == b''
+    assert len(requests) == 2
+
+
+def test_cog_reader_remote(raster_file_mercator_aligned, range_server):
+    import shutil
+    import mercantile
+    import numpy as np
+    from terracotta.cog_reader import COGReader
+    from terracotta.range_cache import RangeCache, RemoteFile, get_fetcher
+
+    base_url, serve_dir, requests = range_server
+    shutil.copy(str(raster_file_mercator_aligned), str(serve_dir.join('img.tif')))
+
+    url = f'{base_url}/img.tif'
+    remote_file = RemoteFile(url, get_fetcher(url), RangeCache(memory_size=10 * 1024 * 1024))
+    remote_reader = COGReader(url, source=remote_file)
+    local_reader = COGReader(str(raster_file_mercator_aligned))
+
+    # all image file directories are in the first chunk
+    assert len(requests) == 1
+
+    tile = mercantile.tile(10, 50, 14)
+    for aligned_tile in (mercantile.parent(tile, zoom=12), mercantile.parent(tile), tile):
+        tile_bounds = mercantile.xy_bounds(aligned_tile)
+        data = remote_reader.read([1], tile_bounds, (256, 256))[0]
+        expected = local_reader.read([1], tile_bounds, (256, 256))[0]
+        np.testing.assert_array_equal(data.mask, expected.mask)
+        np.testing.assert_array_equal(data.data, expected.data)
+
+
+def test_range_requests_unsupported(raster_file_mercator_aligned, range_server, monkeypatch):
+    import os
+    import shutil
+    from terracotta import range_cache
+    from terracotta.range_cache import CHUNK_SIZE, RangeCache, RemoteFile, get_fetcher
+    from terracotta.drivers.raster_base import get_cog_reader
+
+    base_url, serve_dir, requests = range_server
+    content = os.urandom(2 * CHUNK_SIZE)
+    serve_dir.join('file.bin').write_binary(content)
+    serve_dir.join('small.bin').write_binary(content[:100])
+
+    url = f'{base_url}/no-range/file.bin'
+    remote_file = RemoteFile(url, get_fetcher(url), RangeCache(memory_size=100 * CHUNK_SIZE))
+
+    with pytest.raises(OSError) as exc:
+        remote_file.read(CHUNK_SIZE, 10)
+
+    assert 'does not support range requests' in str(exc.value)
+
+    # whole file fits into the requested range
+    url = f'{base_url}/no-range/small.bin'
+    remote_file = RemoteFile(url, get_fetcher(url), RangeCache(memory_size=100 * CHUNK_SIZE))
+    assert remote_file.read(10, 20) == content[10:30]
+
+    # files are read through GDAL instead
+    monkeypatch.setattr(range_cache, 'CHUNK_SIZE', 1024)
+    shutil.copy(str(raster_file_mercator_aligned), str(serve_dir.join('img.tif')))
+    assert get_cog_reader(f'{base_url}/no-range/img.tif') is None
+    assert get_cog_reader(f'{base_url}/img.tif') is not None
+
+
+@pytest.mark.parametrize('path,supported', [
+    ('http://example.com/img.tif', True),
+    ('https://example.com/img.tif', True),
+    ('/vsicurl/https://example.com/img.tif', True),
+    ('s3://bucket/img.tif', True),
+    ('/vsis3/bucket/img.tif', True),
+    ('s3://bucket', False),
+    ('/tmp/img.tif', False),
+    ('/vsigs/bucket/img.tif', False),
+])
+def test_get_fetcher(path, supported):
+    from terracotta.range_cache import get_fetcher
+    assert (get_fetcher(path) is not None) == supported
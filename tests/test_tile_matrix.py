@@ -0,0 +1,83 @@
+import pytest
+
+
+@pytest.mark.parametrize('tile_xyz', [(0, 0, 0), (5, 6, 3), (123, 45, 10)])
+def test_web_mercator_bounds(tile_xyz):
+    import mercantile
+    from terracotta.tile_matrix import get_tile_matrix_set
+
+    tms = get_tile_matrix_set()
+    assert tms.crs == 'epsg:3857'
+    assert tms.xy_bounds(*tile_xyz) == tuple(mercantile.xy_bounds(*tile_xyz))
+
+
+def test_polar_bounds():
+    import numpy as np
+    from terracotta.tile_matrix import get_tile_matrix_set
+
+    tms = get_tile_matrix_set('EPSG3031Quad')
+    assert tms.crs == 'epsg:3031'
+    assert tms.xy_bounds(0, 0, 0) == tms.extent
+
+    # children subdivide their parent, rows run north to south
+    west, south, east, north = tms.extent
+    assert tms.xy_bounds(0, 0, 1) == (west, 0, 0, north)
+    assert tms.xy_bounds(1, 1, 1) == (0, south, east, 0)
+
+    tile_width = (east - west) / 2 ** 15
+    np.testing.assert_allclose(tile_width / 256, 1.)
+
+
+def test_polar_tile_intersects():
+    from terracotta.tile_matrix import EPSG3031_QUAD
+
+    # some area near the pole, south of New Zealand
+    wgs_bounds = (170, -80, 175, -78)
+
+    assert EPSG3031_QUAD.tile_intersects(wgs_bounds, 0, 0, 0)
+    assert EPSG3031_QUAD.tile_intersects(wgs_bounds, 1, 1, 1)
+    assert not EPSG3031_QUAD.tile_intersects(wgs_bounds, 0, 0, 1)
+    assert not EPSG3031_QUAD.tile_intersects(wgs_bounds, 1, 0, 1)
+
+
+def test_unknown_tile_matrix_set():
+    from terracotta import exceptions
+    from terracotta.tile_matrix import get_tile_matrix_set
+
+    with pytest.raises(exceptions.InvalidArgumentsError):
+        get_tile_matrix_set('foo')
+
+
+@pytest.mark.parametrize('tms_name', ['WebMercatorQuad', 'EPSG3031Quad'])
+@pytest.mark.parametrize('tile_xyz', [(0, 0, 0), (5, 6, 3), (123, 45, 10), (70000, 30000, 17)])
+def test_tile_from_bounds(tms_name, tile_xyz):
+    from terracotta.tile_matrix import get_tile_matrix_set, find_tile_matrix_set
+
+    tms = get_tile_matrix_set(tms_name)
+    assert find_tile_matrix_set(tms.crs) is tms
+
+    bounds = tms.xy_bounds(*tile_xyz)
+    assert tms.tile_from_bounds(bounds) == tile_xyz
+
+    # not aligned to the grid
+    width = bounds[2] - bounds[0]
+    shifted = (bounds[0] + width / 3, bounds[1], bounds[2] + width / 3, bounds[3])
+    assert tms.tile_from_bounds(shifted) is None
+    assert tms.tile_from_bounds((0, 0, 0, 0)) is None
+
+
+def test_find_tile_matrix_set_unknown():
+    from terracotta.tile_matrix import find_tile_matrix_set
+    assert find_tile_matrix_set('epsg:4326') is None
+
+
+@pytest.mark.parametrize('tms_name', ['WebMercatorQuad', 'EPSG3031Quad'])
+def test_is_valid_tile(tms_name):
+    from terracotta.tile_matrix import get_tile_matrix_set
+
+    tms = get_tile_matrix_set(tms_name)
+    assert tms.is_valid_tile(0, 0, 0)
+    assert tms.is_valid_tile(7, 7, 3)
+
+    for tile_xyz in [(10, 0, 0), (0, 1, 0), (8, 0, 3), (-1, 0, 3), (0, 0, -1)]:
+        assert not tms.is_valid_tile(*tile_xyz)
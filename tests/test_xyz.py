@@ -0,0 +1,265 @@
+import pytest
+
+
+@pytest.mark.parametrize('tile_xyz', [(0, 0, 0), (5, 6, 3), (7, 7, 3), (123, 45, 10)])
+@pytest.mark.parametrize('metatile_size', [1, 2, 3, 4])
+def test_metatile_bounds(tile_xyz, metatile_size):
+    import mercantile
+    from terracotta.xyz import metatile_bounds
+
+    x, y, z = tile_xyz
+    metatile = metatile_bounds(x, y, z, metatile_size)
+
+    tile_bounds = tuple(mercantile.xy_bounds(mercantile.Tile(x, y, z)))
+    assert any(tile_bounds in row for row in metatile)
+
+    num_rows, num_cols = len(metatile), len(metatile[0])
+    assert 1 <= num_rows <= metatile_size
+    assert 1 <= num_cols <= metatile_size
+    assert all(len(row) == num_cols for row in metatile)
+
+    # tiles are adjacent, rows run north to south
+    for i, row in enumerate(metatile):
+        for j, bounds in enumerate(row):
+            if j > 0:
+                assert bounds[0] == pytest.approx(row[j - 1][2], abs=1e-6)
+            if i > 0:
+                assert bounds[3] == pytest.approx(metatile[i - 1][j][1], abs=1e-6)
+
+    # metatiles do not overlap
+    for other_x in range(max(0, x - metatile_size), min(2 ** z, x + metatile_size)):
+        other_metatile = metatile_bounds(other_x, y, z, metatile_size)
+        assert other_metatile == metatile or not any(
+            bounds in row for row in metatile for bounds in other_metatile[0]
+        )
+
+
+def test_get_deadline():
+    import time
+    from terracotta import update_settings
+    from terracotta.xyz import get_deadline
+
+    assert get_deadline() > time.monotonic()
+
+    update_settings(TILE_TIMEOUT=10)
+    assert 9 < get_deadline() - time.monotonic() <= 10
+
+    update_settings(TILE_TIMEOUT=None)
+    assert get_deadline() is None
+
+
+def test_get_tile_data_metatile(use_testdb, testdb, raster_file_xyz):
+    import numpy as np
+    import terracotta
+    from terracotta.xyz import get_tile_data, metatile_bounds
+
+    ds_keys = ['val21', 'x', 'val22']
+    tile_size = (64, 64)
+    x, y, z = raster_file_xyz
+
+    driver = terracotta.get_driver(testdb)
+    with driver.connect():
+        expected = get_tile_data(driver, ds_keys, tile_xyz=raster_file_xyz, tile_size=tile_size)
+
+    driver._raster_cache.clear()
+    terracotta.update_settings(METATILE_SIZE=2)
+
+    with driver.connect():
+        data = get_tile_data(driver, ds_keys, tile_xyz=raster_file_xyz, tile_size=tile_size)
+
+    metatile = metatile_bounds(x, y, z, 2)
+    assert len(driver._raster_cache) == sum(len(row) for row in metatile)
+
+    assert data.shape == expected.shape == tile_size
+    assert np.mean(data.mask != expected.mask) < 0.05
+
+
+@pytest.mark.parametrize('tile_xyz,num_neighbors', [
+    ((0, 0, 0), 0), ((0, 0, 3), 3), ((3, 0, 3), 5), ((5, 6, 3), 8)
+])
+def test_prefetch_candidates(tile_xyz, num_neighbors):
+    import mercantile
+    from terracotta.xyz import prefetch_candidates
+
+    x, y, z = tile_xyz
+    candidates = prefetch_candidates(x, y, z)
+
+    neighbors = candidates[:num_neighbors]
+    assert all(tile.z == z for tile in neighbors)
+    assert all(max(abs(tile.x - x), abs(tile.y - y)) == 1 for tile in neighbors)
+    assert len(set(neighbors)) == num_neighbors
+
+    children = candidates[num_neighbors:]
+    assert sorted(children) == sorted(mercantile.children(mercantile.Tile(x, y, z)))
+
+
+def test_get_tile_data_prefetch(use_testdb, testdb, raster_file_xyz):
+    import time
+    import terracotta
+    from terracotta.xyz import get_tile_data
+
+    terracotta.update_settings(
+        PREFETCH_TILES=True, RASTER_EXECUTOR='thread', RASTER_EXECUTOR_WORKERS=4
+    )
+
+    ds_keys = ['val21', 'x', 'val22']
+    x, y, z = raster_file_xyz
+
+    driver = terracotta.get_driver(testdb)
+    driver._raster_cache.clear()
+    stats_before = driver.get_cache_stats()
+
+    with driver.connect():
+        data = get_tile_data(driver, ds_keys, tile_xyz=raster_file_xyz, tile_size=(64, 64))
+
+    assert data.shape == (64, 64)
+
+    time.sleep(1)  # allow prefetching to finish
+    stats = driver.get_cache_stats()
+    assert stats['misses'] - stats_before['misses'] == 1
+    assert 0 < stats['prefetched'] - stats_before['prefetched'] < 4
+    assert stats['in_flight'] == 0
+
+
+def test_get_tile_data_empty_tile_cache(use_testdb, testdb, monkeypatch):
+    import terracotta
+    from terracotta import exceptions
+    from terracotta.xyz import get_tile_data
+
+    ds_keys = ['val21', 'x', 'val22']
+    driver = terracotta.get_driver(testdb)
+
+    with driver.connect():
+        with pytest.raises(exceptions.TileOutOfBoundsError):
+            get_tile_data(driver, ds_keys, tile_xyz=(10, 0, 0))
+
+        with monkeypatch.context() as m:
+            m.setattr(driver, 'get_metadata', None)
+
+            with pytest.raises(exceptions.TileOutOfBoundsError):
+                get_tile_data(driver, ds_keys, tile_xyz=(10, 0, 0))
+
+
+def test_get_tile_data_empty_tile_cache_key_order(use_testdb, testdb, raster_file_xyz):
+    import mercantile
+    import terracotta
+    from terracotta import exceptions
+    from terracotta.xyz import get_tile_data
+
+    ds_keys = ['val21', 'x', 'val22']
+    x, y, z = raster_file_xyz
+    empty_tile = (x + 100, y, z)
+    tile_bounds = mercantile.xy_bounds(mercantile.Tile(*empty_tile))
+    driver = terracotta.get_driver(testdb)
+
+    with driver.connect():
+        key_names = driver.key_names
+
+        with pytest.raises(exceptions.TileOutOfBoundsError):
+            get_tile_data(driver, ds_keys, tile_xyz=empty_tile)
+
+    # mappings in any order share the cache entry of the corresponding sequence
+    reversed_keys = dict(reversed(list(zip(key_names, ds_keys))))
+    assert driver.is_empty_tile(reversed_keys, tile_bounds)
+
+    driver._clear_dataset_caches()
+
+    with driver.connect():
+        with pytest.raises(exceptions.TileOutOfBoundsError):
+            get_tile_data(driver, reversed_keys, tile_xyz=empty_tile)
+
+    assert driver.is_empty_tile(ds_keys, tile_bounds)
+    driver._clear_dataset_caches()
+
+
+def test_get_tile_data_polar(tmpdir, raster_file_polar):
+    import numpy as np
+    import terracotta
+    from terracotta import exceptions
+    from terracotta.xyz import get_tile_data
+
+    driver = terracotta.get_driver(str(tmpdir.join('polar.sqlite')), provider='sqlite')
+    driver.create(['key'])
+    driver.insert(['polar'], str(raster_file_polar))
+
+    with driver.connect():
+        data = get_tile_data(driver, ['polar'], tile_xyz=(144, 97, 8),
+                             tile_matrix_set='EPSG3031Quad')
+        assert data.shape == (256, 256)
+        assert 0 < np.count_nonzero(~data.mask) < data.size
+
+        # tile address is interpreted in the requested grid
+        with pytest.raises(exceptions.TileOutOfBoundsError):
+            get_tile_data(driver, ['polar'], tile_xyz=(144, 97, 8))
+
+        with pytest.raises(exceptions.TileOutOfBoundsError):
+            get_tile_data(driver, ['polar'], tile_xyz=(0, 0, 8), tile_matrix_set='EPSG3031Quad')
+
+        preview = get_tile_data(driver, ['polar'], tile_matrix_set='EPSG3031Quad')
+        assert preview.shape == (256, 256)
+        assert 0 < np.count_nonzero(~preview.mask) < preview.size
+
+
+def test_get_tile_data_coverage(use_testdb, testdb, raster_file_xyz, monkeypatch):
+    import mercantile
+    import numpy as np
+    import terracotta
+    from terracotta import exceptions
+    from terracotta.coverage import TileCoverage
+    from terracotta.xyz import get_tile_data
+
+    ds_keys = ['val21', 'x', 'val22']
+    x, y, z = raster_file_xyz
+    driver = terracotta.get_driver(testdb)
+
+    with driver.connect():
+        coverage = driver.get_coverage(ds_keys)
+        assert coverage.tile_has_data(x, y, z)
+        assert get_tile_data(driver, ds_keys, tile_xyz=(x, y, z)).shape == (256, 256)
+
+        # tiles inside the bounds but outside of the stored coverage are not read
+        empty_coverage = TileCoverage.from_tiles(np.array([x + 1]), np.array([y]), z)
+        with monkeypatch.context() as m:
+            m.setattr(driver, 'get_coverage', lambda keys: empty_coverage)
+            m.setattr(driver, 'get_raster_tiles', None)
+
+            with pytest.raises(exceptions.TileOutOfBoundsError):
+                get_tile_data(driver, ds_keys, tile_xyz=(x, y, z))
+
+        assert driver.is_empty_tile(ds_keys, mercantile.xy_bounds(mercantile.Tile(x, y, z)))
+        driver._clear_dataset_caches()
+
+
+def test_get_tile_data_sparse_tile(use_testdb, testdb, raster_file_xyz, monkeypatch):
+    import mercantile
+    import terracotta
+    from terracotta import exceptions
+    from terracotta.drivers.raster_base import RasterDriver
+    from terracotta.xyz import get_tile_data
+
+    terracotta.update_settings(RASTER_EXECUTOR='thread')
+
+    def dummy(*args, **kwargs):
+        raise exceptions.TileOutOfBoundsError('dataset covers less than 1% of tile')
+
+    ds_keys = ['val21', 'x', 'val22']
+    x, y, z = raster_file_xyz
+    tile_bounds = mercantile.xy_bounds(mercantile.Tile(x, y, z))
+
+    driver = terracotta.get_driver(testdb)
+    driver._raster_cache.clear()
+
+    with driver.connect():
+        with monkeypatch.context() as m:
+            m.setattr(RasterDriver, '_get_raster_bands', staticmethod(dummy))
+
+            with pytest.raises(exceptions.TileOutOfBoundsError):
+                get_tile_data(driver, ds_keys, tile_xyz=raster_file_xyz)
+
+        assert driver.is_empty_tile(ds_keys, tile_bounds)
+
+        # inserting datasets invalidates the cache
+        driver.insert(['val21', 'y', 'val22'], driver.get_datasets()[tuple(ds_keys)])
+        assert not driver.is_empty_tile(ds_keys, tile_bounds)
+
+        driver.delete(['val21', 'y', 'val22'])